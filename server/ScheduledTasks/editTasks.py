@@ -4,7 +4,7 @@
 from django.conf import settings
 import sys
 sys.path.append('..')
-from ahj_app import views_edits, views_ahjsearch_api
+from ahj_app import geocode_queue, views_edits, views_ahjsearch_api
 
 
 def test_proc():
@@ -20,3 +20,8 @@ def edits_take_effect():
 
 def deactivate_expired_api_tokens():
     views_ahjsearch_api.deactivate_expired_api_tokens()
+
+
+def process_geocode_queue():
+    if geocode_queue.geocode_queue_enabled():
+        geocode_queue.process_geocode_queue()
@@ -14,4 +14,6 @@ def start():
         scheduler.add_job(editTasks.test_proc, 'interval', seconds=60)
     scheduler.add_job(editTasks.edits_take_effect, 'cron', hour=3, jitter=10)
     scheduler.add_job(editTasks.deactivate_expired_api_tokens, 'cron', hour=3, jitter=10)
+    scheduler.add_job(editTasks.process_geocode_queue, 'interval', seconds=getattr(settings, 'GEOCODE_QUEUE_INTERVAL_SECONDS', 60),
+                      max_instances=1, coalesce=True)
     scheduler.start()
@@ -81,6 +81,10 @@ ROOT_URLCONF = 'TheAHJRegistry.urls'
 # Throttle rates
 SUNSPEC_MEMBER_API_THROTTLE_RATE = '100000000/month'
 WEBPAGE_SEARCH_THROTTLE_RATE = '3/day'
+# Number of Locations a member can search with batch search requests
+SUNSPEC_MEMBER_BATCH_API_THROTTLE_RATE = '100000000/month'
+# Max number of Locations in one batch search request
+BATCH_LOCATION_SEARCH_MAX_LOCATIONS = 10000
 
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': {
@@ -91,10 +95,12 @@ REST_FRAMEWORK = {
         'ahj_app.authentication.WebpageTokenAuth',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer'
+        'ahj_app.renderers.FastJSONRenderer',
+        'ahj_app.renderers.MessagePackRenderer'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'member': SUNSPEC_MEMBER_API_THROTTLE_RATE,
+        'member-batch': SUNSPEC_MEMBER_BATCH_API_THROTTLE_RATE,
         'webpage-search': WEBPAGE_SEARCH_THROTTLE_RATE
     },
     'COERCE_DECIMAL_TO_STRING': False,
@@ -142,6 +148,15 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'APICache',
+    },
+    # Cached Location results (see LOCATION_CACHE_BACKEND), kept apart so they do not cull the default cache
+    'location': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'LocationCache',
+        'TIMEOUT': 86400,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000
+        }
     }
 }
 
@@ -157,6 +172,10 @@ LOGGING = {
                 'format': '{request.user} {message}',
                 'style': '{',
             },
+            'process': {
+                'format': '{levelname} {asctime} {message}',
+                'style': '{',
+            },
         },
     'handlers': {
         'file': {
@@ -166,6 +185,14 @@ LOGGING = {
             'when': 'midnight',
             'backupCount': 14,
             'formatter': 'verbose'
+        },
+        'cache_stats_file': {
+            'level': 'INFO',
+            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs/cache_stats.log'),
+            'when': 'midnight',
+            'backupCount': 14,
+            'formatter': 'process'
         }
     },
     'loggers': {
@@ -174,6 +201,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'ahj_app.cache_stats': {
+            'handlers': ['cache_stats_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -256,3 +288,114 @@ STATIC_URL = '/static/'
 STATIC_ROOT = 'static'
 
 GOOGLE_MAPS_KEY = ''
+
+# Resolve searched Locations and polygons to PolygonIDs with an in-process spatial index (see ahj_app/spatial_index.py)
+SPATIAL_INDEX_ENABLED = True
+# How often, in seconds, a worker checks if another worker changed a polygon and its spatial index needs reloading
+SPATIAL_INDEX_VERSION_CHECK_SECONDS = 60
+# Resolve searched Locations with the PolygonGridCell grid index when the spatial index is disabled (see ahj_app/polygon_grid.py)
+# Build the grid with 'python3 manage.py build_polygon_grid' before enabling it
+POLYGON_GRID_ENABLED = False
+# Width and height, in degrees, of a cell of the grid index. The grid must be rebuilt after changing it
+POLYGON_GRID_CELL_SIZE = 0.1
+
+# Cache the AHJs found by searching a Location (see ahj_app/location_cache.py)
+LOCATION_CACHE_ENABLED = True
+# Name of the cache in CACHES used to share cached Location results between workers
+# Create its table with: python3 manage.py createcachetable
+LOCATION_CACHE_BACKEND = 'location'
+# Number of decimal places searched Locations are rounded to before looking them up in the cache
+LOCATION_CACHE_PRECISION = 5
+# Max number of cached Location results kept in each worker's memory
+LOCATION_CACHE_MAX_SIZE = 100000
+# Seconds until a cached Location result expires in the shared cache
+LOCATION_CACHE_TIMEOUT = 86400
+# How often, in seconds, a worker checks if another worker invalidated the cached Location results
+LOCATION_CACHE_VERSION_CHECK_SECONDS = 60
+
+# Max number of compiled AHJ search SQL templates, one per search shape, kept in each worker's memory (see ahj_app/search_query.py)
+SEARCH_TEMPLATE_CACHE_MAX_SIZE = 1000
+# Check the MinX, MaxX, MinY, and MaxY bounding box columns of polygons before ST_CONTAINS and ST_INTERSECTS in AHJ search SQL
+POLYGON_ENVELOPE_PREFILTER_ENABLED = True
+
+# Search AHJName filters and typeahead searches with the AHJNameSearch table (see ahj_app/name_search.py)
+NAME_SEARCH_ENABLED = True
+# 'trigram' to search names with an in-process trigram index, or 'fulltext' to use the MySQL FULLTEXT index of AHJNameSearch
+NAME_SEARCH_BACKEND = 'trigram'
+# MySQL's ngram_token_size; shorter searches are not matched with the FULLTEXT index
+NAME_SEARCH_NGRAM_TOKEN_SIZE = 2
+# How often, in seconds, a worker checks if another worker changed an AHJ's names and its trigram index needs reloading
+NAME_SEARCH_VERSION_CHECK_SECONDS = 60
+# Max number of AHJs with every trigram of a searched name checked by the trigram index; more are searched with LIKE
+NAME_SEARCH_MAX_TRIGRAM_CANDIDATES = 1000
+
+# Fetch the children of a page of serialized AHJs with one query per table (see ahj_app/prefetch.py)
+AHJ_PAGE_PREFETCH_ENABLED = True
+
+# Return AHJs from the stored JSON documents of the AHJDocument table instead of serializing them (see ahj_app/documents.py)
+AHJ_DOCUMENTS_ENABLED = True
+
+# Views that serialize AHJs with the generated functions of ahj_app/compiled_serializers.py instead of the DRF serializers
+COMPILED_SERIALIZER_VIEWS = ['get_single_ahj', 'webpage_ahj_list', 'ahj_list', 'ahj_geo_location', 'ahj_geo_address', 'ahj_geo_location_batch']
+
+# Serialize polygon geometries from the encoded GeoJSON stored in the PolygonGeometry table (see ahj_app/polygon_geometry.py)
+POLYGON_GEOMETRY_CACHE_ENABLED = True
+# Simplified levels of detail of polygon geometries, mapped to their simplification tolerance in degrees
+POLYGON_GEOMETRY_DETAILS = {'low': 0.01, 'medium': 0.001, 'high': 0.0001}
+# Number of decimal places the coordinates of simplified polygon geometries are rounded to
+POLYGON_GEOMETRY_PRECISION = 6
+# Level of detail of polygon geometries when the geometry_detail query parameter is not given: 'none', a level above, or 'full'
+POLYGON_GEOMETRY_DEFAULT_DETAIL = 'full'
+
+# Keep a version of each AHJ, and answer requests with If-None-Match and If-Modified-Since headers with 304 Not Modified (see ahj_app/versions.py)
+AHJ_VERSIONS_ENABLED = True
+
+# Look up enum value rows in an in-process registry of the enum tables instead of querying them (see ahj_app/enum_registry.py)
+ENUM_REGISTRY_ENABLED = True
+# How often, in seconds, a worker checks if another worker changed an enum table and its enum registry needs reloading
+ENUM_REGISTRY_VERSION_CHECK_SECONDS = 60
+
+# Cache the Locations of geocoded addresses in memory and in the GeocodeCacheEntry table (see ahj_app/geocode_cache.py)
+GEOCODE_CACHE_ENABLED = True
+# Max number of geocoded addresses kept in each worker's memory
+GEOCODE_CACHE_MAX_SIZE = 100000
+# Seconds until a geocoded address expires and is geocoded again
+GEOCODE_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+# Seconds until an address that could not be geocoded expires and is geocoded again
+GEOCODE_CACHE_NEGATIVE_TIMEOUT = 24 * 60 * 60
+# Geocoder that geocodes addresses: 'google', 'local' to use the ZipCodeCentroid table, or 'fake' for tests and benchmarks (see ahj_app/geocoders.py)
+GEOCODER_BACKEND = 'google'
+# Seconds the 'fake' geocoder sleeps on each call to stand in for a network call
+GEOCODER_FAKE_LATENCY_SECONDS = 0
+
+# Search Addresses without a street, or in a City entirely within the same polygons, with the AddressJurisdiction index instead of geocoding them (see ahj_app/address_index.py)
+# Build the index with 'python3 manage.py build_address_index' before enabling it
+ADDRESS_INDEX_ENABLED = False
+
+# Geocode the Locations of edited and added Addresses in a background worker pool fed from the LocationGeocodeTask table (see ahj_app/geocode_queue.py)
+GEOCODE_QUEUE_ENABLED = True
+# Max number of addresses geocoded at the same time
+GEOCODE_QUEUE_MAX_WORKERS = 4
+# Max number of tasks claimed at a time
+GEOCODE_QUEUE_BATCH_SIZE = 100
+# Number of attempts raising an error before a task is marked failed
+GEOCODE_QUEUE_MAX_ATTEMPTS = 5
+# Seconds until a task is retried after its first error, doubling after each attempt
+GEOCODE_QUEUE_RETRY_SECONDS = 60
+# Seconds a claimed task is not claimed again, in case the process claiming it stops
+GEOCODE_QUEUE_LEASE_SECONDS = 300
+# How often, in seconds, the scheduler processes the queue
+GEOCODE_QUEUE_INTERVAL_SECONDS = 60
+
+# Directory of SRTM .hgt DEM tiles to look up elevations in before asking the geocoder, or None to only ask the geocoder (see ahj_app/dem_elevation.py)
+DEM_TILE_DIRECTORY = None
+# Max number of DEM tiles kept memory-mapped in each worker
+DEM_TILE_CACHE_SIZE = 16
+
+# Apply edits with a few set-based queries in one transaction instead of saving each edited row and edit (see ahj_app/bulk_edits.py)
+BULK_APPLY_EDITS_ENABLED = True
+# Max number of rows written or queried by each query when applying edits in bulk
+BULK_APPLY_EDITS_BATCH_SIZE = 1000
+
+# How often, in seconds, each worker logs the counters of its in-process caches to logs/cache_stats.log, or None to not log them (see ahj_app/cache_stats.py)
+CACHE_STATS_LOG_SECONDS = 3600
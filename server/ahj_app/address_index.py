@@ -0,0 +1,227 @@
+"""
+An index from the City, County, StateProvince, and ZipPostalCode of an address to the polygons containing it,
+so an address search can find its AHJs without geocoding the address or searching the polygons.
+
+The index has a row in the AddressJurisdiction table for each City and County polygon, with the PolygonIDs of the
+polygons containing the City's internal point (its State, County, CountySubdivision, and itself), or of the County and
+its State. A City's ``IsExact`` is True if each of those polygons covers the whole City, so every address in the City
+is in the same polygons. Each AddressJurisdiction has AddressJurisdictionKey rows with the normalized names it can be
+searched by in its state (its LSAreaCodeName, its Name, and the AHJCensusNames of the AHJs paired to it), and the ZIP
+codes of the ZIP Code Tabulation Areas (ZCTAs) that overlap it in the Census ZCTA relationship files.
+
+``get_address_polygon_ids`` answers an Orange Button Address from the index if it matches one City, or one County and
+no City, where each of the City, County, and ZipPostalCode given must agree on the match:
+    - An address without AddrLine1, AddrLine2, or AddrLine3 is answered with the polygons of the matched City or County.
+      These are the polygons that geocoding the City or County name would find.
+    - An address with a street is only answered if it matches a City with ``IsExact``.
+Otherwise, the address is geocoded as before.
+
+The index is built by ``build_address_index`` (``python3 manage.py build_address_index``), after ``build_polygon_hierarchy``.
+While ``settings.ADDRESS_INDEX_ENABLED``, saving or deleting a polygon deletes the index rows of its state, whose
+addresses are geocoded until the index is rebuilt.
+"""
+import csv
+import functools
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .geocode_cache import normalize_address
+from .geocoders import get_zip_code
+from .models import AddressJurisdiction, AddressJurisdictionKey, AHJCensusName, Polygon, PolygonHierarchy, \
+    StatePolygon, CountyPolygon, CityPolygon, CountySubdivisionPolygon
+from .usf import state_fips_to_abbr
+from .utils import get_ob_value_primitive, get_polygon_ids_containing_points
+
+BULK_CREATE_BATCH_SIZE = 10000
+
+LEVEL_CITY = 'city'
+LEVEL_COUNTY = 'county'
+
+KEY_TYPE_NAME = 'name'
+KEY_TYPE_ZIP = 'zip'
+
+ADDRESS_STREET_FIELDS = ['AddrLine1', 'AddrLine2', 'AddrLine3']
+
+
+def address_index_enabled():
+    return getattr(settings, 'ADDRESS_INDEX_ENABLED', False)
+
+
+def get_address_field(address, field_name):
+    value = get_ob_value_primitive(address, field_name, throw_exception=False, exception_return_value='')
+    return value if isinstance(value, str) else ''
+
+
+def get_state_abbrs():
+    """
+    Returns a dict mapping the PolygonID of each StatePolygon to its state abbreviation.
+    """
+    return {polygon_id: state_fips_to_abbr.get(fips_code, '') for polygon_id, fips_code in
+            StatePolygon.objects.values_list('PolygonID', 'FIPSCode')}
+
+
+def get_city_polygon_ids(city_ids, internal_points):
+    """
+    Returns a dict mapping each City's PolygonID to the PolygonIDs of the polygons containing its internal point,
+    leaving out Cities that do not contain their internal point.
+    """
+    polygon_ids = {}
+    for city_id, point_polygon_ids in zip(city_ids, get_polygon_ids_containing_points(internal_points)):
+        if city_id in point_polygon_ids:
+            polygon_ids[city_id] = point_polygon_ids
+    return polygon_ids
+
+
+def is_city_exact(city_id, polygon_ids, get_prepared_geometry):
+    """
+    Checks if each polygon containing the City's internal point covers the whole City.
+    """
+    geometry = Polygon.objects.values_list('Polygon', flat=True).get(PolygonID=city_id)
+    return all(get_prepared_geometry(polygon_id).covers(geometry) for polygon_id in polygon_ids if polygon_id != city_id)
+
+
+def read_zcta_relationship_file(file):
+    """
+    Returns ``(ZIP code, GEOID)`` pairs from a pipe-separated Census ZCTA to County or ZCTA to Place relationship file,
+    such as ``tab20_zcta520_county20_natl.txt``, with a ``GEOID_ZCTA5_*`` column and a ``GEOID_COUNTY_*`` or ``GEOID_PLACE_*`` column.
+    """
+    reader = csv.DictReader(file, delimiter='|')
+    zcta_column = next(column for column in reader.fieldnames if column.startswith('GEOID_ZCTA5'))
+    geoid_column = next(column for column in reader.fieldnames if column.startswith('GEOID_COUNTY') or column.startswith('GEOID_PLACE'))
+    for row in reader:
+        if row[zcta_column] and row[geoid_column]:
+            yield row[zcta_column], row[geoid_column]
+
+
+def build_address_index(zcta_relationship_files=()):
+    """
+    Rebuilds the AddressJurisdiction and AddressJurisdictionKey tables, with the ZIP codes of the open Census ZCTA
+    relationship files given. Returns the number of AddressJurisdiction and AddressJurisdictionKey rows created.
+    """
+    state_abbrs = get_state_abbrs()
+    jurisdictions = {}
+    names = {}
+    city_rows = list(CityPolygon.objects.values_list('PolygonID', 'StatePolygonID', 'LSAreaCodeName', 'PolygonID__Name',
+                                                     'PolygonID__InternalPLongitude', 'PolygonID__InternalPLatitude'))
+    city_polygon_ids = get_city_polygon_ids([row[0] for row in city_rows],
+                                            [(float(row[4]), float(row[5])) for row in city_rows])
+
+    @functools.lru_cache(maxsize=1024)
+    def get_prepared_geometry(polygon_id):
+        return Polygon.objects.values_list('Polygon', flat=True).get(PolygonID=polygon_id).prepared
+
+    for polygon_id, state_id, ls_area_code_name, name, lng, lat in city_rows:
+        if polygon_id not in city_polygon_ids:
+            continue
+        jurisdictions[polygon_id] = AddressJurisdiction(
+            PolygonID_id=polygon_id, Level=LEVEL_CITY, StateProvince=state_abbrs.get(state_id, ''),
+            PolygonIDs=json.dumps(sorted(city_polygon_ids[polygon_id])),
+            IsExact=is_city_exact(polygon_id, city_polygon_ids[polygon_id], get_prepared_geometry))
+        names[polygon_id] = {ls_area_code_name, name}
+    for polygon_id, state_id, ls_area_code_name, name in CountyPolygon.objects.values_list('PolygonID', 'StatePolygonID', 'LSAreaCodeName', 'PolygonID__Name'):
+        jurisdictions[polygon_id] = AddressJurisdiction(
+            PolygonID_id=polygon_id, Level=LEVEL_COUNTY, StateProvince=state_abbrs.get(state_id, ''),
+            PolygonIDs=json.dumps(sorted([polygon_id, state_id])), IsExact=False)
+        names[polygon_id] = {ls_area_code_name, name}
+    for census_name, polygon_id in AHJCensusName.objects.values_list('AHJCensusName', 'AHJPK__PolygonID'):
+        if polygon_id in names:
+            names[polygon_id].add(census_name)
+
+    keys = set()
+    for polygon_id, jurisdiction_names in names.items():
+        state = jurisdictions[polygon_id].StateProvince
+        for name in jurisdiction_names:
+            key = normalize_address(name or '')
+            if key:
+                keys.add((KEY_TYPE_NAME, state, key, polygon_id))
+    polygon_ids_by_geoid = dict(Polygon.objects.filter(PolygonID__in=jurisdictions).values_list('GEOID', 'PolygonID'))
+    for file in zcta_relationship_files:
+        for zip_code, geoid in read_zcta_relationship_file(file):
+            polygon_id = polygon_ids_by_geoid.get(geoid)
+            if polygon_id is not None:
+                keys.add((KEY_TYPE_ZIP, jurisdictions[polygon_id].StateProvince, zip_code, polygon_id))
+
+    with transaction.atomic():
+        AddressJurisdiction.objects.all().delete()
+        AddressJurisdiction.objects.bulk_create(jurisdictions.values(), batch_size=BULK_CREATE_BATCH_SIZE)
+        AddressJurisdictionKey.objects.bulk_create([AddressJurisdictionKey(KeyType=key_type, StateProvince=state, Key=key, PolygonID_id=polygon_id)
+                                                    for key_type, state, key, polygon_id in keys], batch_size=BULK_CREATE_BATCH_SIZE)
+    return len(jurisdictions), len(keys)
+
+
+def get_unique(jurisdictions):
+    return next(iter(jurisdictions.values())) if len(jurisdictions) == 1 else None
+
+
+def get_address_polygon_ids(address):
+    """
+    Returns the sorted PolygonIDs of the polygons containing an Orange Button Address found with the index,
+    or None if the address must be geocoded or ``settings.ADDRESS_INDEX_ENABLED`` is False.
+    """
+    if not address_index_enabled() or not isinstance(address, dict):
+        return None
+    has_street = any(get_address_field(address, field_name).strip() for field_name in ADDRESS_STREET_FIELDS)
+    state = get_address_field(address, 'StateProvince').strip().upper()
+    city = normalize_address(get_address_field(address, 'City'))
+    county = normalize_address(get_address_field(address, 'County'))
+    zip_code = get_zip_code(get_address_field(address, 'ZipPostalCode'))
+    if not city and not county:
+        return None
+
+    name_cond = Q(KeyType=KEY_TYPE_NAME, Key__in={name for name in [city, county] if name})
+    if state:
+        name_cond &= Q(StateProvince=state)
+    cond = name_cond
+    if zip_code is not None:
+        cond |= Q(KeyType=KEY_TYPE_ZIP, Key=zip_code)
+    matches = {(LEVEL_CITY, KEY_TYPE_NAME): {}, (LEVEL_COUNTY, KEY_TYPE_NAME): {}, (LEVEL_CITY, KEY_TYPE_ZIP): {}, (LEVEL_COUNTY, KEY_TYPE_ZIP): {}}
+    for key in AddressJurisdictionKey.objects.filter(cond).select_related('PolygonID'):
+        jurisdiction = key.PolygonID
+        if key.KeyType == KEY_TYPE_ZIP and state and jurisdiction.StateProvince != state:
+            continue
+        if key.KeyType == KEY_TYPE_NAME and key.Key != (city if jurisdiction.Level == LEVEL_CITY else county):
+            continue
+        matches[(jurisdiction.Level, key.KeyType)][jurisdiction.pk] = jurisdiction
+
+    def get_candidates(level, name):
+        candidates = matches[(level, KEY_TYPE_NAME)] if name else None
+        if zip_code is not None:
+            zip_candidates = matches[(level, KEY_TYPE_ZIP)]
+            candidates = zip_candidates if candidates is None else {pk: j for pk, j in candidates.items() if pk in zip_candidates}
+        return candidates
+
+    county_jurisdiction = None
+    if county:
+        county_jurisdiction = get_unique(get_candidates(LEVEL_COUNTY, county))
+        if county_jurisdiction is None:
+            return None
+    if city:
+        city_jurisdiction = get_unique(get_candidates(LEVEL_CITY, city))
+        if city_jurisdiction is None or (has_street and not city_jurisdiction.IsExact):
+            return None
+        polygon_ids = json.loads(city_jurisdiction.PolygonIDs)
+        if county_jurisdiction is not None and county_jurisdiction.pk not in polygon_ids:
+            return None
+        return polygon_ids
+    if has_street or (zip_code is not None and matches[(LEVEL_CITY, KEY_TYPE_ZIP)]):
+        return None
+    return json.loads(county_jurisdiction.PolygonIDs)
+
+
+@receiver(post_save, sender=Polygon)
+@receiver([post_save, post_delete], sender=StatePolygon)
+@receiver([post_save, post_delete], sender=CountyPolygon)
+@receiver([post_save, post_delete], sender=CityPolygon)
+@receiver([post_save, post_delete], sender=CountySubdivisionPolygon)
+def polygon_changed(sender, instance, **kwargs):
+    if address_index_enabled():
+        state_polygon_ids = set(PolygonHierarchy.objects.filter(DescendantPolygonID=instance.pk).values_list('AncestorPolygonID', flat=True))
+        state_polygon_ids.add(instance.pk)
+        states = {state_fips_to_abbr.get(fips_code) for fips_code in
+                  StatePolygon.objects.filter(PolygonID__in=state_polygon_ids).values_list('FIPSCode', flat=True)}
+        AddressJurisdiction.objects.filter(Q(PolygonID=instance.pk) | Q(StateProvince__in=states)).delete()
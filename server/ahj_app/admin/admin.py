@@ -24,6 +24,8 @@ POLYGON_DATA_MODELS = {
     'CountyPolygon',
     'CityPolygon',
     'CountySubdivisionPolygon',
+    'PolygonHierarchy',
+    'PolygonGridCell',
     'StateTemp',
     'CountyTemp',
     'CityTemp',
@@ -15,6 +15,10 @@ class AhjConfig(AppConfig):
     name = 'ahj_app'
     verbose_name = 'AHJ Registry'
     def ready(self) -> None:
+        # Connect the signal receivers that keep the spatial index, polygon hierarchy, polygon grid, location cache, name search,
+        # enum registry, AHJ documents, polygon geometries, AHJ versions, and address index fresh, and log the cache counters
+        from . import spatial_index, polygon_hierarchy, polygon_grid, location_cache, name_search, enum_registry, documents, polygon_geometry, versions, \
+            address_index, cache_stats
         # Start the updater for db procedures
         from ScheduledTasks import updater
         updater.start()
@@ -0,0 +1,223 @@
+"""
+Applies approved edits to the rows they edit with a few set-based queries, instead of saving each edited row and edit.
+
+While ``settings.BULK_APPLY_EDITS_ENABLED``, ``views_edits.apply_edits`` uses ``bulk_apply_edits``. It first leaves out
+the edits whose row no longer exists, which are listed in the result's ``missing_row_edits`` and left unapplied,
+and then in one transaction:
+    - Marks the edits applied with one UPDATE.
+    - Groups the edits by SourceTable and SourceRow, and resolves the value of each edited column in memory,
+      where the edit with the latest DateEffective (then EditID) wins.
+    - Loads the edited rows of each table with ``in_bulk``, and writes them with ``bulk_update`` of only their edited columns.
+    - Sets the OldValue of the pending or approved edits of the edited columns that are not applied yet to the new value.
+    - Sets the status column of the rows of rejected addition edits to False the same way.
+Historical records of the rows and edits are created in bulk, like saving them would.
+
+``bulk_update`` does not send ``post_save``, so ``signals.ahjs_changed`` is sent with the AHJPKs of the edits,
+and the name search rows of AHJs with edited names are rebuilt, after the transaction commits.
+Geocoding edited Addresses and rebuilding AHJ documents is left to ``views_edits.apply_edits``, as before.
+
+Compare it to saving one edit at a time with ``python3 manage.py benchmark_apply_edits``.
+"""
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from simple_history.utils import bulk_update_with_history
+
+from . import documents, name_search
+from .models import Edit
+from .utils import get_enum_value_row_else_null, ENUM_FIELDS
+
+AWAITING_REVIEW_STATUSES = ['A', 'P']
+
+
+def bulk_apply_edits_enabled():
+    return getattr(settings, 'BULK_APPLY_EDITS_ENABLED', False)
+
+
+def get_batch_size():
+    return getattr(settings, 'BULK_APPLY_EDITS_BATCH_SIZE', 1000)
+
+
+class BulkApplyResult:
+    """
+    What ``bulk_apply_edits`` changed, and how long it took.
+    """
+    def __init__(self):
+        self.ahjpks = set()
+        self.addresses = []
+        self.renamed_ahjpks = []
+        self.polygon_changed = False
+        self.missing_row_edits = []
+        self.num_edits = 0
+        self.num_rows = 0
+        self.seconds = 0.0
+
+    @property
+    def edits_per_second(self):
+        return self.num_edits / self.seconds if self.seconds > 0 else 0.0
+
+    def get_stats(self):
+        return {'edits': self.num_edits, 'rows': self.num_rows, 'missing_row_edits': len(self.missing_row_edits),
+                'seconds': round(self.seconds, 3), 'edits_per_second': round(self.edits_per_second, 1)}
+
+
+def get_edit_order(edit):
+    return edit.DateEffective is not None, edit.DateEffective, edit.EditID
+
+
+def get_column_value(row, column):
+    """
+    Returns the value of a row's column the way it is stored in an edit's OldValue.
+    """
+    value = getattr(row, column)
+    if column in ENUM_FIELDS:
+        value = value.Value if value is not None else ''
+    return value
+
+
+def load_rows(model, row_pks):
+    """
+    Returns a dict of the rows of the model with the primary keys, raising ``DoesNotExist`` if one is missing.
+    """
+    rows = model.objects.in_bulk(list(row_pks))
+    for row_pk in row_pks:
+        if row_pk not in rows:
+            raise model.DoesNotExist(f'{model.__name__} {row_pk} does not exist')
+    return rows
+
+
+def exclude_missing_row_edits(edits, result):
+    """
+    Returns the edits whose row exists, and adds the others to the result's ``missing_row_edits``.
+    """
+    row_pks_by_table = defaultdict(set)
+    for edit in edits:
+        row_pks_by_table[edit.SourceTable].add(edit.SourceRow)
+    batch_size = get_batch_size()
+    existing = set()
+    for source_table, row_pks in row_pks_by_table.items():
+        model = apps.get_model('ahj_app', source_table)
+        row_pks = sorted(row_pks)
+        for i in range(0, len(row_pks), batch_size):
+            existing.update((source_table, row_pk) for row_pk in
+                            model.objects.filter(pk__in=row_pks[i:i + batch_size]).values_list('pk', flat=True))
+    found_edits = []
+    for edit in edits:
+        if (edit.SourceTable, edit.SourceRow) in existing:
+            found_edits.append(edit)
+        else:
+            result.missing_row_edits.append(edit)
+    return found_edits
+
+
+def update_rows(model, rows_by_columns):
+    """
+    Writes the rows with ``bulk_update`` of the columns they were edited in, given a dict of columns to rows.
+    """
+    for columns, rows in rows_by_columns.items():
+        bulk_update_with_history(rows, model, list(columns), batch_size=get_batch_size())
+
+
+def update_awaiting_old_values(source_table, new_values):
+    """
+    Sets the OldValue of the edits not applied yet of each edited ``(SourceRow, SourceColumn)`` in a dict of them to their new value.
+    """
+    row_pks = sorted({row_pk for row_pk, column in new_values})
+    batch_size = get_batch_size()
+    awaiting_edits = []
+    for i in range(0, len(row_pks), batch_size):
+        for edit in Edit.objects.filter(SourceTable=source_table, SourceRow__in=row_pks[i:i + batch_size], IsApplied=False,
+                                        ReviewStatus__in=AWAITING_REVIEW_STATUSES).only('EditID', 'SourceRow', 'SourceColumn', 'OldValue'):
+            key = (edit.SourceRow, edit.SourceColumn)
+            if key in new_values:
+                edit.OldValue = new_values[key]
+                awaiting_edits.append(edit)
+    Edit.objects.bulk_update(awaiting_edits, ['OldValue'], batch_size=batch_size)
+
+
+def apply_ready_edits(ready_edits, result):
+    edits_by_row = defaultdict(dict)
+    for edit in sorted(ready_edits, key=get_edit_order):
+        edits_by_row[(edit.SourceTable, edit.SourceRow)][edit.SourceColumn] = edit
+        result.ahjpks.add(edit.AHJPK_id)
+    row_pks_by_table = defaultdict(set)
+    for source_table, row_pk in edits_by_row:
+        row_pks_by_table[source_table].add(row_pk)
+
+    for source_table, row_pks in row_pks_by_table.items():
+        model = apps.get_model('ahj_app', source_table)
+        rows = load_rows(model, row_pks)
+        rows_by_columns = defaultdict(list)
+        new_values = {}
+        for row_pk in row_pks:
+            row = rows[row_pk]
+            column_edits = edits_by_row[(source_table, row_pk)]
+            for column, edit in column_edits.items():
+                new_value = edit.NewValue
+                if column in ENUM_FIELDS:
+                    new_value = get_enum_value_row_else_null(column, new_value)
+                setattr(row, column, new_value)
+                new_values[(row_pk, column)] = get_column_value(row, column)
+            rows_by_columns[frozenset(column_edits)].append(row)
+        update_rows(model, rows_by_columns)
+        update_awaiting_old_values(source_table, new_values)
+        result.num_rows += len(rows)
+        if source_table == 'Address':
+            result.addresses.extend(rows.values())
+        elif source_table == 'AHJ':
+            if any('PolygonID' in columns for columns in rows_by_columns):
+                result.polygon_changed = True
+            result.renamed_ahjpks.extend(row.AHJPK for columns, column_rows in rows_by_columns.items() if 'AHJName' in columns for row in column_rows)
+
+
+def mark_edits_applied(ready_edits):
+    for edit in ready_edits:
+        edit.IsApplied = True
+    Edit.objects.filter(EditID__in=[edit.EditID for edit in ready_edits]).update(IsApplied=True)
+    Edit.history.bulk_history_create(ready_edits, batch_size=get_batch_size(), update=True)
+
+
+def apply_rejected_addition_edits(rejected_addition_edits, result):
+    row_pks_by_table = defaultdict(set)
+    for edit in rejected_addition_edits:
+        row_pks_by_table[edit.SourceTable].add(edit.SourceRow)
+        result.ahjpks.add(edit.AHJPK_id)
+    for source_table, row_pks in row_pks_by_table.items():
+        model = apps.get_model('ahj_app', source_table)
+        rows = load_rows(model, row_pks)
+        rows_by_columns = defaultdict(list)
+        for row in rows.values():
+            status_field = row.get_relation_status_field()
+            setattr(row, status_field, False)
+            rows_by_columns[frozenset([status_field])].append(row)
+        update_rows(model, rows_by_columns)
+        result.num_rows += len(rows)
+
+
+def bulk_apply_edits(ready_edits, rejected_addition_edits=()):
+    """
+    Applies the changes of the ready edits, and sets the status column of the rows of the rejected addition edits to False.
+    Edits whose row no longer exists are skipped. Returns a BulkApplyResult.
+    """
+    start = time.perf_counter()
+    result = BulkApplyResult()
+    # One deleted row should not roll back every other edit of the day, which would never be applied
+    ready_edits = exclude_missing_row_edits(list(ready_edits), result)
+    rejected_addition_edits = exclude_missing_row_edits(list(rejected_addition_edits), result)
+    with transaction.atomic():
+        # Mark the edits applied first, like apply_edits_one_by_one, so the OldValues of
+        # the edits being applied are not set to their own NewValue with those awaiting review
+        mark_edits_applied(ready_edits)
+        apply_ready_edits(ready_edits, result)
+        apply_rejected_addition_edits(rejected_addition_edits, result)
+    result.ahjpks.discard(None)
+    if documents.ahj_changes_tracked():
+        documents.send_ahjs_changed(Edit, list(result.ahjpks))
+    if name_search.name_search_enabled() and result.renamed_ahjpks:
+        name_search.build_ahj_name_search(ahjpks=result.renamed_ahjpks)
+    result.num_edits = len(ready_edits) + len(rejected_addition_edits)
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,66 @@
+"""
+Logs the counters of the in-process caches of each worker process.
+
+The caches below count their hits, misses, and sizes in each worker process, so the counters are only
+visible to the process keeping them. Each worker logs them to the ``ahj_app.cache_stats`` logger
+(``logs/cache_stats.log``) after a request finishes, at most every ``settings.CACHE_STATS_LOG_SECONDS``:
+    - ``search_templates``: The number of distinct AHJ search shapes, templates compiled, and the most used shapes.
+    - ``location``: The hits and misses of the cached AHJs found for searched Locations.
+    - ``geocode``: The lookups answered by each tier of the geocode cache, and the calls to the geocoding API.
+    - ``dem_tiles``: The tiles mapped and the hits and misses of the DEM tile cache.
+Caches that are disabled are left out.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.dispatch import receiver
+
+from . import dem_elevation, geocode_cache, location_cache, search_query
+
+logger = logging.getLogger(__name__)
+
+# Number of most used search shapes logged
+TOP_SEARCH_SHAPES = 10
+
+_logged_at = time.monotonic()
+_logged_at_lock = threading.Lock()
+
+
+def get_cache_stats():
+    """
+    Returns a dict of the name of each enabled in-process cache to its counters in this process.
+    """
+    stats = {}
+    template_stats = search_query.get_search_template_cache().get_stats()
+    template_stats['uses'] = template_stats['uses'][:TOP_SEARCH_SHAPES]
+    stats['search_templates'] = template_stats
+    if location_cache.location_cache_enabled():
+        stats['location'] = location_cache.get_location_cache().get_stats()
+    if geocode_cache.geocode_cache_enabled():
+        stats['geocode'] = geocode_cache.get_geocode_cache().get_stats()
+    if dem_elevation.dem_elevation_enabled():
+        stats['dem_tiles'] = dem_elevation.get_dem_tile_cache().get_stats()
+    return stats
+
+
+def log_cache_stats():
+    logger.info('pid %s %s', os.getpid(), json.dumps(get_cache_stats(), default=str))
+
+
+@receiver(request_finished)
+def request_finished_log_cache_stats(sender, **kwargs):
+    global _logged_at
+    interval = getattr(settings, 'CACHE_STATS_LOG_SECONDS', None)
+    if interval is None:
+        return
+    now = time.monotonic()
+    with _logged_at_lock:
+        if now - _logged_at < interval:
+            return
+        _logged_at = now
+    log_cache_stats()
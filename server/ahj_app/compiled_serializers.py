@@ -0,0 +1,213 @@
+"""
+Compiled versions of the Orange Button serializers in ``serializers.py``.
+
+DRF serializes every field through ``Field.get_attribute`` and ``Field.to_representation``, and the
+``OrangeButtonSerializer`` and ``EnumModelSerializer`` fields of an AHJ and its children are several hundred
+field objects. At import time, this module reads the declared fields of the serializers in ``COMPILED_SERIALIZERS``
+and generates a plain Python function for each serializer and view (public or not) that reads the attributes directly.
+The functions return the same data as the serializers, so they render the same JSON.
+
+The fields compiled are ``OrangeButtonSerializer``, ``EnumModelSerializer``, ``IntegerField``, ``CharField``,
+and the serializers in ``COMPILED_SERIALIZERS``, nested or with ``many=True``.
+Other fields, like the AHJ's Polygon and Comments, are serialized by their DRF field.
+Enum foreign keys are read from the enum registry of ``enum_registry.py``.
+
+A ``fields`` projection in the context is compiled into a function serializing only those fields of the AHJ.
+Views use the compiled functions if they are in ``settings.COMPILED_SERIALIZER_VIEWS``.
+Compare them to the DRF serializers with ``python3 manage.py benchmark_compiled_serializers``.
+"""
+from django.conf import settings
+from django.db.models import Manager
+from rest_framework import serializers
+
+from .enum_registry import get_enum_attribute, get_enum_foreign_key
+from .models import AHJ, AHJDocumentSubmissionMethodUse, AHJInspection, AHJPermitIssueMethodUse, Address, Contact, \
+    EngineeringReviewRequirement, FeeStructure, Location
+from .prefetch import ahj_page_prefetch_enabled, prefetch_ahj_page
+from .serializers import AHJSerializer, AHJInspectionSerializer, AddressSerializer, ContactSerializer, \
+    DocumentSubmissionMethodUseSerializer, EngineeringReviewRequirementSerializer, EnumModelSerializer, \
+    FeeStructureSerializer, LocationSerializer, OrangeButtonSerializer, PermitIssueMethodUseSerializer
+
+# The serializers compiled, and the models whose SERIALIZER_EXCLUDED_FIELDS they exclude in the public view
+COMPILED_SERIALIZERS = [
+    (LocationSerializer, Location),
+    (AddressSerializer, Address),
+    (ContactSerializer, Contact),
+    (AHJInspectionSerializer, AHJInspection),
+    (DocumentSubmissionMethodUseSerializer, AHJDocumentSubmissionMethodUse),
+    (PermitIssueMethodUseSerializer, AHJPermitIssueMethodUse),
+    (EngineeringReviewRequirementSerializer, EngineeringReviewRequirement),
+    (FeeStructureSerializer, FeeStructure),
+    (AHJSerializer, AHJ)
+]
+
+
+def compiled_serializer_enabled(view_name):
+    return view_name in getattr(settings, 'COMPILED_SERIALIZER_VIEWS', [])
+
+
+class FallbackFields:
+    """
+    Serializes the fields that are not compiled with the DRF fields of serializers bound to the context.
+    """
+    def __init__(self, context):
+        self.context = context
+        self.serializers = {}
+
+    def __call__(self, serializer_class, field_name, instance):
+        if serializer_class not in self.serializers:
+            self.serializers[serializer_class] = serializer_class(context=self.context)
+        field = self.serializers[serializer_class].fields[field_name]
+        attribute = field.get_attribute(instance)
+        if attribute is None:
+            return None
+        return field.to_representation(attribute)
+
+
+class SerializerCompiler:
+    """
+    Generates the source of a function for each serializer and view, and executes it to create the functions.
+    """
+    def __init__(self, serializer_models):
+        self.models = dict(serializer_models)
+        self.sources = {}
+
+    @staticmethod
+    def get_function_name(serializer_class, is_public_view):
+        return f'serialize_{serializer_class.__name__}_{"public" if is_public_view else "private"}'
+
+    def get_attribute_expr(self, model, source):
+        """
+        Returns the expression reading ``source`` from ``instance``, calling it if it is a method of the model.
+        """
+        if callable(getattr(model, source, None)):
+            return f'instance.{source}()'
+        return f'instance.{source}'
+
+    def get_value_lines(self, serializer_class, model, field_name, field, is_public_view):
+        """
+        Returns the lines setting ``ret[field_name]``, like ``Serializer.to_representation``.
+        """
+        key = repr(field_name)
+        source = field.source
+        if not source.isidentifier():
+            return [f'ret[{key}] = fallback({serializer_class.__name__}, {key}, instance)']
+        attribute = self.get_attribute_expr(model, source)
+        if type(field) is OrangeButtonSerializer:
+            return [f'ret[{key}] = {{"Value": {attribute}}}']
+        if type(field) is EnumModelSerializer:
+            if get_enum_foreign_key(model, source) is not None:
+                attribute = f'get_enum_attribute(instance, {source!r})'
+            return [f'value = {attribute}',
+                    f'ret[{key}] = {{"Value": ""}} if value is None else {{"Value": None if value.Value is None else str(value.Value)}}']
+        if type(field) is serializers.IntegerField:
+            return [f'value = {attribute}',
+                    f'ret[{key}] = None if value is None else int(value)']
+        if type(field) is serializers.CharField:
+            return [f'value = {attribute}',
+                    f'ret[{key}] = None if value is None else str(value)']
+        if isinstance(field, serializers.ListSerializer) and type(field.child) in self.models:
+            child = self.compile(type(field.child), is_public_view)
+            return [f'value = {attribute}',
+                    f'ret[{key}] = None if value is None else '
+                    f'[{child}(child, fallback) for child in (value.all() if isinstance(value, Manager) else value)]']
+        if type(field) in self.models:
+            child = self.compile(type(field), is_public_view)
+            return [f'value = {attribute}',
+                    f'ret[{key}] = None if value is None else {child}(value, fallback)']
+        return [f'ret[{key}] = fallback({serializer_class.__name__}, {key}, instance)']
+
+    def compile(self, serializer_class, is_public_view, fields=None):
+        """
+        Generates the source of the function for the serializer and view, if it was not generated yet,
+        and returns the function's name. If ``fields`` is given, the function only serializes the fields in it.
+        """
+        function_name = self.get_function_name(serializer_class, is_public_view)
+        if fields is not None:
+            function_name += '_projected'
+        if function_name in self.sources:
+            return function_name
+        self.sources[function_name] = None
+        model = self.models[serializer_class]
+        excluded_fields = model.SERIALIZER_EXCLUDED_FIELDS if is_public_view else []
+        lines = [f'def {function_name}(instance, fallback):', '    ret = {}']
+        for field_name, field in serializer_class().fields.items():
+            if field_name in excluded_fields or field.write_only or (fields is not None and field_name not in fields):
+                continue
+            lines.extend('    ' + line for line in self.get_value_lines(serializer_class, model, field_name, field, is_public_view))
+        lines.append('    return ret')
+        self.sources[function_name] = '\n'.join(lines)
+        return function_name
+
+    def execute(self):
+        """
+        Executes the generated source, and returns the namespace of the functions.
+        """
+        namespace = {'Manager': Manager, 'get_enum_attribute': get_enum_attribute}
+        namespace.update((serializer_class.__name__, serializer_class) for serializer_class in self.models)
+        exec('\n\n'.join(self.sources.values()), namespace)
+        return namespace
+
+    def build(self):
+        """
+        Returns a dict mapping each (serializer, is_public_view) pair to its function.
+        """
+        for serializer_class in self.models:
+            for is_public_view in [True, False]:
+                self.compile(serializer_class, is_public_view)
+        namespace = self.execute()
+        return {(serializer_class, is_public_view): namespace[self.get_function_name(serializer_class, is_public_view)]
+                for serializer_class in self.models for is_public_view in [True, False]}
+
+    def build_projection(self, serializer_class, is_public_view, fields):
+        """
+        Returns the function for the serializer and view that only serializes the fields in ``fields``.
+        """
+        function_name = self.compile(serializer_class, is_public_view, fields=fields)
+        return self.execute()[function_name]
+
+
+COMPILED_FUNCTIONS = SerializerCompiler(COMPILED_SERIALIZERS).build()
+
+# Max number of functions compiled for ``fields`` projections kept in memory
+PROJECTED_FUNCTIONS_MAX_SIZE = 256
+
+_projected_functions = {}
+
+
+def get_compiled_function(serializer_class, is_public_view, fields=None):
+    """
+    Returns the compiled function of the serializer and view, compiling it first for a ``fields`` projection.
+    """
+    if fields is None:
+        return COMPILED_FUNCTIONS[(serializer_class, is_public_view)]
+    key = (serializer_class, is_public_view, frozenset(fields))
+    if key not in _projected_functions:
+        if len(_projected_functions) >= PROJECTED_FUNCTIONS_MAX_SIZE:
+            _projected_functions.clear()
+        _projected_functions[key] = SerializerCompiler(COMPILED_SERIALIZERS).build_projection(serializer_class, is_public_view, fields)
+    return _projected_functions[key]
+
+
+def compiled_serialize(serializer_class, instances, context=None):
+    """
+    Returns the list of instances serialized like ``serializer_class(instances, many=True, context=context).data``.
+    """
+    if context is None:
+        context = {}
+    function = get_compiled_function(serializer_class, bool(context.get('is_public_view', False)), context.get('fields', None))
+    fallback = FallbackFields(context)
+    return [function(instance, fallback) for instance in instances]
+
+
+def compiled_serialize_ahjs(ahjs, context=None):
+    """
+    Returns the AHJs serialized like ``AHJSerializer(ahjs, many=True, context=context).data``,
+    prefetching their children like ``AHJListSerializer``.
+    """
+    if context is None:
+        context = {}
+    if ahj_page_prefetch_enabled():
+        ahjs = prefetch_ahj_page(ahjs, is_public_view=context.get('is_public_view', False), fields=context.get('fields', None),
+                                 geometry_detail=context.get('geometry_detail', None))
+    return compiled_serialize(AHJSerializer, ahjs, context)
@@ -0,0 +1,178 @@
+"""
+Elevations looked up from digital elevation model (DEM) tiles stored on disk, so geocoding an address with its
+elevation does not need a second call to the geocoder's elevation API.
+
+Tiles are SRTM ``.hgt`` files in ``settings.DEM_TILE_DIRECTORY``, each covering one degree of latitude and longitude
+and named after its southwest corner, such as ``N37W122.hgt``. A tile is a square grid of big-endian signed 16-bit
+elevations in meters, from its northwest corner by rows, whose edge samples overlap those of the adjacent tiles.
+Both the 1 arc-second (3601 x 3601) and 3 arc-second (1201 x 1201) SRTM tiles can be used. USGS 3DEP and other
+GeoTIFF DEMs can be converted to tiles with ``gdal_translate -of SRTMHGT``.
+
+Tiles are memory-mapped when first used, so only the pages of samples that are looked up are read from disk.
+At most ``settings.DEM_TILE_CACHE_SIZE`` tiles are kept mapped in each process, dropping the least recently used.
+The names of tiles not in the directory are remembered until the process restarts.
+
+The elevation of a point is bilinearly interpolated between the four samples around it, leaving out void samples
+(-32768). ``batch_elevation`` looks up a list of points, grouped by tile, and calls the fallback once with the
+points that are not in a tile or only have void samples around them. ``utils.geocode`` uses the geocoder's
+``batch_elevation`` as the fallback while ``settings.DEM_TILE_DIRECTORY`` is set.
+"""
+import math
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+
+VOID_SAMPLE = -32768
+SAMPLE = struct.Struct('>h')
+
+
+def dem_elevation_enabled():
+    return bool(getattr(settings, 'DEM_TILE_DIRECTORY', None))
+
+
+def get_tile_name(latitude, longitude):
+    """
+    Returns the name of the tile containing the point, such as ``'N37W122'``.
+    """
+    south = math.floor(latitude)
+    west = math.floor(longitude)
+    return f'{"N" if south >= 0 else "S"}{abs(south):02d}{"E" if west >= 0 else "W"}{abs(west):03d}'
+
+
+class DEMTile:
+    """
+    A memory-mapped SRTM tile whose southwest corner is at ``(south, west)``.
+    """
+    def __init__(self, path, south, west):
+        self.south = south
+        self.west = west
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self.samples = int(round(math.sqrt(size // SAMPLE.size)))
+            if self.samples < 2 or self.samples ** 2 * SAMPLE.size != size:
+                raise ValueError(f'{path} is not a square grid of 16-bit samples')
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_sample(self, row, col):
+        sample = SAMPLE.unpack_from(self.data, (row * self.samples + col) * SAMPLE.size)[0]
+        return None if sample == VOID_SAMPLE else sample
+
+    def elevation(self, latitude, longitude):
+        """
+        Returns the bilinearly interpolated elevation of a point in the tile, or None if the samples around it are void.
+        """
+        y = (self.south + 1 - latitude) * (self.samples - 1)
+        x = (longitude - self.west) * (self.samples - 1)
+        row = min(max(int(y), 0), self.samples - 2)
+        col = min(max(int(x), 0), self.samples - 2)
+        dy = y - row
+        dx = x - col
+        total = weight_sum = 0.0
+        for sample_row, sample_col, weight in ((row, col, (1 - dy) * (1 - dx)), (row, col + 1, (1 - dy) * dx),
+                                               (row + 1, col, dy * (1 - dx)), (row + 1, col + 1, dy * dx)):
+            sample = self.get_sample(sample_row, sample_col)
+            if sample is not None and weight > 0:
+                total += sample * weight
+                weight_sum += weight
+        return round(total / weight_sum, 2) if weight_sum > 0 else None
+
+
+class DEMTileCache:
+    """
+    LRU cache of the memory-mapped tiles of a directory.
+    """
+    def __init__(self, directory, max_tiles=16):
+        self.directory = directory
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+        self.missing = set()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_tile(self, name):
+        """
+        Returns the tile with the name, or None if it is not in the directory.
+        """
+        with self.lock:
+            if name in self.missing:
+                return None
+            tile = self.tiles.get(name)
+            if tile is not None:
+                self.tiles.move_to_end(name)
+                self.hits += 1
+                return tile
+            self.misses += 1
+            path = os.path.join(self.directory, f'{name}.hgt')
+            if not os.path.exists(path):
+                self.missing.add(name)
+                return None
+            # Evicted tiles are unmapped when no thread is reading them anymore
+            tile = DEMTile(path, int(name[1:3]) * (1 if name[0] == 'N' else -1), int(name[4:7]) * (1 if name[3] == 'E' else -1))
+            self.tiles[name] = tile
+            if len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+            return tile
+
+    def batch_elevation(self, latlngs):
+        """
+        Returns a list of the elevation of each ``(latitude, longitude)``, or None for those not in a tile.
+        """
+        elevations = [None] * len(latlngs)
+        points_by_tile = defaultdict(list)
+        for i, (latitude, longitude) in enumerate(latlngs):
+            points_by_tile[get_tile_name(float(latitude), float(longitude))].append(i)
+        for name, indexes in points_by_tile.items():
+            tile = self.get_tile(name)
+            if tile is None:
+                continue
+            for i in indexes:
+                elevations[i] = tile.elevation(float(latlngs[i][0]), float(latlngs[i][1]))
+        return elevations
+
+    def get_stats(self):
+        with self.lock:
+            return {'tiles': len(self.tiles), 'missing_tiles': len(self.missing), 'hits': self.hits, 'misses': self.misses}
+
+
+_tile_cache = None
+_tile_cache_lock = threading.Lock()
+
+
+def get_dem_tile_cache():
+    """
+    Returns this process' cache of the tiles in ``settings.DEM_TILE_DIRECTORY``.
+    """
+    global _tile_cache
+    directory = settings.DEM_TILE_DIRECTORY
+    with _tile_cache_lock:
+        if _tile_cache is None or _tile_cache.directory != directory:
+            _tile_cache = DEMTileCache(directory, max_tiles=getattr(settings, 'DEM_TILE_CACHE_SIZE', 16))
+        return _tile_cache
+
+
+def batch_elevation(latlngs, fallback=None):
+    """
+    Returns a list of the elevation of each ``(latitude, longitude)`` from the DEM tiles. The elevations of points
+    not found in the tiles are looked up with one call to ``fallback`` with a list of them, or are None if it is not given.
+    """
+    elevations = get_dem_tile_cache().batch_elevation(latlngs)
+    missing = [i for i, elevation in enumerate(elevations) if elevation is None]
+    if missing and fallback is not None:
+        for i, elevation in zip(missing, fallback([latlngs[i] for i in missing])):
+            elevations[i] = elevation
+    return elevations
+
+
+def get_elevation_function(geocoder):
+    """
+    Returns a function returning the elevation of a ``(latitude, longitude)`` from the DEM tiles, falling back to the geocoder,
+    or the geocoder's ``elevation`` if ``settings.DEM_TILE_DIRECTORY`` is not set.
+    """
+    if not dem_elevation_enabled():
+        return geocoder.elevation
+    return lambda latlng: batch_elevation([latlng], fallback=geocoder.batch_elevation)[0]
@@ -0,0 +1,236 @@
+"""
+Stores the serialized JSON of each AHJ in the AHJDocument table, so the search and detail endpoints
+return stored documents instead of serializing every AHJ and its children on each request.
+
+Each AHJDocument has two documents:
+    - ``PublicDocument``: the AHJ serialized for the public API, with ``is_public_view`` True.
+    - ``PrivateDocument``: the AHJ serialized for the webpage, with its Polygon and unconfirmed children.
+      Its Comments are not stored, since they include the commenting users' current profiles,
+      and are serialized when the document is returned. If ``settings.POLYGON_GEOMETRY_CACHE_ENABLED``,
+      its Polygon's geometry is not stored either, and is set from ``polygon_geometry.py`` at the requested level of detail.
+
+The receivers at the end of this module find the AHJs a saved or deleted row is serialized in, including by
+the admin site, and send ``signals.ahjs_changed`` with their AHJPKs. Their documents are deleted, and rebuilt
+the next time they are returned. ``views_edits.apply_edits`` and ``edit_addition`` rebuild the documents of the
+AHJs they change right away (``edit_deletion`` only adds edits, and its rows change when they are applied). If an enum value row is changed, run ``python3 manage.py build_ahj_documents`` to rebuild all documents.
+"""
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.timezone import now
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import AHJ, AHJDocument, AHJDocumentSubmissionMethodUse, AHJInspection, AHJPermitIssueMethodUse, Address, \
+    Contact, EngineeringReviewRequirement, FeeStructure, Location, Polygon, set_prefetched
+from .compiled_serializers import compiled_serialize, compiled_serialize_ahjs
+from .polygon_geometry import NO_DETAIL, get_default_geometry_detail, get_polygon_geometries, polygon_geometry_cache_enabled
+from .prefetch import prefetch_ahj_page, prefetch_comments
+from .serializers import AHJSerializer, CommentSerializer
+from .signals import ahjs_changed
+from .versions import ahj_versions_enabled
+
+def ahj_documents_enabled():
+    return getattr(settings, 'AHJ_DOCUMENTS_ENABLED', False)
+
+
+def dump_document(data):
+    """
+    Returns the JSON of serialized data, encoded like the API's JSON responses.
+    """
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def serialize_ahj_documents(ahjs, compiled=False):
+    """
+    Returns a list of unsaved AHJDocuments of the AHJs, serialized with one prefetch of their children.
+    If ``compiled``, they are serialized with the functions of ``compiled_serializers.py``.
+    """
+    ahjs = prefetch_ahj_page(ahjs, include_comments=False, geometry_detail=NO_DETAIL)
+    for ahj in ahjs:
+        set_prefetched(ahj, 'get_comments', [])
+    private_context = {'is_public_view': False, 'geometry_detail': NO_DETAIL}
+    if compiled:
+        public_data = compiled_serialize(AHJSerializer, ahjs, {'is_public_view': True})
+        private_data = compiled_serialize(AHJSerializer, ahjs, private_context)
+    else:
+        public_data = [AHJSerializer(ahj, context={'is_public_view': True}).data for ahj in ahjs]
+        private_data = [AHJSerializer(ahj, context=private_context).data for ahj in ahjs]
+    return [AHJDocument(AHJPK_id=ahj.AHJPK, PublicDocument=dump_document(public), PrivateDocument=dump_document(private), DateUpdated=now())
+            for ahj, public, private in zip(ahjs, public_data, private_data)]
+
+
+def build_ahj_documents(ahjpks=None, batch_size=500, compiled=False):
+    """
+    Rebuilds the AHJDocuments of the given AHJPKs, or of all AHJs if ``ahjpks`` is None.
+    Returns the number of documents built.
+    """
+    if ahjpks is None:
+        ahjpks = AHJ.objects.order_by('AHJPK').values_list('AHJPK', flat=True)
+    ahjpks = list(ahjpks)
+    built = 0
+    for i in range(0, len(ahjpks), batch_size):
+        batch = ahjpks[i:i + batch_size]
+        documents = serialize_ahj_documents(AHJ.objects.filter(AHJPK__in=batch), compiled=compiled)
+        with transaction.atomic():
+            AHJDocument.objects.filter(AHJPK__in=batch).delete()
+            AHJDocument.objects.bulk_create(documents)
+        built += len(documents)
+    return built
+
+
+def delete_ahj_documents(ahjpks):
+    """
+    Deletes the AHJDocuments of the given AHJPKs, so they are rebuilt the next time they are returned.
+    """
+    ahjpks = [ahjpk for ahjpk in ahjpks if ahjpk is not None]
+    if ahjpks:
+        AHJDocument.objects.filter(AHJPK__in=ahjpks).delete()
+
+
+def get_ahj_documents(ahjs, is_public_view, compiled=False):
+    """
+    Returns a dict mapping the AHJPK of each AHJ to its stored document as a dict.
+    Documents that are missing are built and stored first.
+    """
+    column = 'PublicDocument' if is_public_view else 'PrivateDocument'
+    ahjpks = [ahj.AHJPK for ahj in ahjs]
+    documents = dict(AHJDocument.objects.filter(AHJPK__in=ahjpks).values_list('AHJPK', column))
+    missing_ahjpks = [ahjpk for ahjpk in dict.fromkeys(ahjpks) if ahjpk not in documents]
+    if missing_ahjpks:
+        new_documents = serialize_ahj_documents(AHJ.objects.filter(AHJPK__in=missing_ahjpks), compiled=compiled)
+        AHJDocument.objects.bulk_create(new_documents, ignore_conflicts=True)
+        documents.update((document.AHJPK_id, getattr(document, column)) for document in new_documents)
+    return {ahjpk: json.loads(document) for ahjpk, document in documents.items()}
+
+
+def get_serialized_ahjs(ahjs, context=None, compiled=False):
+    """
+    Returns the AHJs serialized like ``AHJSerializer(ahjs, many=True, context=context).data``.
+    If ``settings.AHJ_DOCUMENTS_ENABLED``, the stored documents are returned instead, and only
+    the Comments of the webpage's documents are serialized.
+    If ``compiled``, AHJs are serialized with the functions of ``compiled_serializers.py``.
+    If ``context['fields']`` is set, only those fields of the documents are returned.
+    """
+    if context is None:
+        context = {}
+    if not ahj_documents_enabled():
+        if compiled:
+            return compiled_serialize_ahjs(ahjs, context)
+        return AHJSerializer(ahjs, many=True, context=context).data
+    ahjs = list(ahjs)
+    is_public_view = context.get('is_public_view', False)
+    fields = context.get('fields', None)
+    documents = get_ahj_documents(ahjs, is_public_view, compiled=compiled)
+    ahjs = [ahj for ahj in ahjs if ahj.AHJPK in documents]
+    if fields is not None:
+        for ahjpk, document in documents.items():
+            documents[ahjpk] = {field_name: value for field_name, value in document.items() if field_name in fields}
+    if not is_public_view and (fields is None or 'Comments' in fields):
+        prefetch_comments(ahjs)
+        for ahj in ahjs:
+            documents[ahj.AHJPK]['Comments'] = CommentSerializer(ahj.get_comments(), many=True, context=context).data
+    if not is_public_view and (fields is None or 'Polygon' in fields) and polygon_geometry_cache_enabled():
+        geometries = get_polygon_geometries([ahj.PolygonID_id for ahj in ahjs if ahj.PolygonID_id is not None],
+                                            context.get('geometry_detail', None) or get_default_geometry_detail())
+        for ahj in ahjs:
+            if documents[ahj.AHJPK].get('Polygon') is not None:
+                documents[ahj.AHJPK]['Polygon']['geometry'] = geometries.get(ahj.PolygonID_id)
+    return [documents[ahj.AHJPK] for ahj in ahjs]
+
+
+def get_contact_ahjpks(contacts):
+    """
+    Returns the AHJPKs of the AHJs the Contacts, or the AHJInspections they are related to, belong to.
+    """
+    ahjpks, inspection_ids = set(), set()
+    for parent_table, parent_id in contacts:
+        if parent_table == 'AHJ':
+            ahjpks.add(parent_id)
+        elif parent_table == 'AHJInspection':
+            inspection_ids.add(parent_id)
+    if inspection_ids:
+        ahjpks.update(AHJInspection.objects.filter(InspectionID__in=inspection_ids).values_list('AHJPK', flat=True))
+    return ahjpks
+
+
+def get_address_ahjpks(address_ids):
+    """
+    Returns the AHJPKs of the AHJs with the Addresses, or with a Contact with the Addresses.
+    """
+    ahjpks = set(AHJ.objects.filter(AddressID__in=address_ids).values_list('AHJPK', flat=True))
+    ahjpks.update(get_contact_ahjpks(Contact.objects.filter(AddressID__in=address_ids).values_list('ParentTable', 'ParentID')))
+    return ahjpks
+
+
+def ahj_changes_tracked():
+    """
+    Checks if the AHJs changed by saving or deleting a row need to be found, to delete their documents or bump their versions.
+    """
+    return ahj_documents_enabled() or ahj_versions_enabled()
+
+
+def send_ahjs_changed(sender, ahjpks):
+    """
+    Sends ``signals.ahjs_changed`` with the AHJPKs of the changed AHJs.
+    """
+    ahjpks = [ahjpk for ahjpk in ahjpks if ahjpk is not None]
+    if ahjpks:
+        ahjs_changed.send(sender=sender, ahjpks=ahjpks)
+
+
+@receiver(ahjs_changed)
+def delete_changed_ahj_documents(sender, ahjpks, **kwargs):
+    if ahj_documents_enabled():
+        delete_ahj_documents(ahjpks)
+
+
+@receiver(post_save, sender=AHJ)
+def ahj_changed(sender, instance, **kwargs):
+    if ahj_changes_tracked():
+        send_ahjs_changed(sender, [instance.AHJPK])
+
+
+@receiver(post_save, sender=AHJInspection)
+@receiver(post_delete, sender=AHJInspection)
+@receiver(post_save, sender=AHJDocumentSubmissionMethodUse)
+@receiver(post_delete, sender=AHJDocumentSubmissionMethodUse)
+@receiver(post_save, sender=AHJPermitIssueMethodUse)
+@receiver(post_delete, sender=AHJPermitIssueMethodUse)
+@receiver(post_save, sender=EngineeringReviewRequirement)
+@receiver(post_delete, sender=EngineeringReviewRequirement)
+@receiver(post_save, sender=FeeStructure)
+@receiver(post_delete, sender=FeeStructure)
+def ahj_child_changed(sender, instance, **kwargs):
+    if ahj_changes_tracked():
+        send_ahjs_changed(sender, [instance.AHJPK_id])
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def contact_changed(sender, instance, **kwargs):
+    if ahj_changes_tracked():
+        send_ahjs_changed(sender, get_contact_ahjpks([(instance.ParentTable, instance.ParentID)]))
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def address_changed(sender, instance, **kwargs):
+    if ahj_changes_tracked():
+        send_ahjs_changed(sender, get_address_ahjpks([instance.AddressID]))
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def location_changed(sender, instance, **kwargs):
+    if ahj_changes_tracked():
+        send_ahjs_changed(sender, get_address_ahjpks(Address.objects.filter(LocationID=instance.LocationID).values_list('AddressID', flat=True)))
+
+
+@receiver(post_save, sender=Polygon)
+@receiver(post_delete, sender=Polygon)
+def polygon_changed(sender, instance, **kwargs):
+    if ahj_changes_tracked():
+        send_ahjs_changed(sender, AHJ.objects.filter(PolygonID=instance.PolygonID).values_list('AHJPK', flat=True))
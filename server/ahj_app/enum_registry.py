@@ -0,0 +1,193 @@
+"""
+An in-process registry of the rows of the enum value tables in ``ENUM_FIELDS``.
+
+Enum values are looked up for every search filter, added object, edit, uploaded CSV cell, and serialized enum field,
+and the tables only have a few rows each. Each worker process loads every table once, the first time a value is
+looked up, into dicts mapping each Value to its row and each primary key to its row. Rows missing from the registry
+are looked up in the database, so a row added by another process is still found before the registry is reloaded.
+
+The registry is kept fresh in two ways:
+    - Saving or deleting a row of an enum table clears this process' registry, and it is reloaded on the next lookup.
+    - The change also bumps a version number stored in the Django cache so that other worker processes
+      reload their registry. Workers check this version at most every ``ENUM_REGISTRY_VERSION_CHECK_SECONDS``.
+
+``bulk_create`` and ``QuerySet.update`` do not send signals, so call ``invalidate_enum_registry`` after using them on an enum table.
+The rows in the registry are shared by every lookup in the process, and must not be modified.
+"""
+import functools
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.signals import post_save, post_delete
+
+ENUM_REGISTRY_VERSION_CACHE_KEY = 'enum-registry-version'
+
+ENUM_FIELDS = {
+    'BuildingCode',
+    'ElectricCode',
+    'FireCode',
+    'ResidentialCode',
+    'WindCode',
+    'AHJLevelCode',
+    'DocumentSubmissionMethod',
+    'PermitIssueMethod',
+    'AddressType',
+    'LocationDeterminationMethod',
+    'LocationType',
+    'ContactType',
+    'PreferredContactMethod',
+    'EngineeringReviewType',
+    'RequirementLevel',
+    'StampType',
+    'FeeStructureType',
+    'InspectionType'
+}
+
+ENUM_PLURALS_TRANSLATE = {
+    'DocumentSubmissionMethods': 'DocumentSubmissionMethod',
+    'PermitIssueMethods': 'PermitIssueMethod'
+}
+
+
+def enum_registry_enabled():
+    return getattr(settings, 'ENUM_REGISTRY_ENABLED', False)
+
+
+def get_enum_model(enum_field):
+    """
+    Returns the model of the enum table of a field name, translating plural field names.
+    """
+    enum_field = ENUM_PLURALS_TRANSLATE.get(enum_field, enum_field)
+    return apps.get_model('ahj_app', enum_field)
+
+
+class EnumRegistry:
+    """
+    The rows of every enum table, by Value and by primary key.
+    """
+    def __init__(self):
+        self.rows_by_value = {}
+        self.rows_by_pk = {}
+
+    def load(self):
+        for enum_field in ENUM_FIELDS:
+            rows = list(get_enum_model(enum_field).objects.all())
+            self.rows_by_value[enum_field] = {row.Value: row for row in rows}
+            self.rows_by_pk[enum_field] = {row.pk: row for row in rows}
+
+    def get_row(self, enum_field, enum_value):
+        """
+        Returns the row with the Value, or None if it is not in the registry.
+        """
+        return self.rows_by_value.get(ENUM_PLURALS_TRANSLATE.get(enum_field, enum_field), {}).get(enum_value)
+
+    def get_row_by_pk(self, enum_field, pk):
+        """
+        Returns the row with the primary key, or None if it is not in the registry.
+        """
+        return self.rows_by_pk.get(ENUM_PLURALS_TRANSLATE.get(enum_field, enum_field), {}).get(pk)
+
+
+_registry = None
+_registry_version = None
+_registry_checked_at = 0
+_registry_lock = threading.Lock()
+
+
+def get_enum_registry():
+    """
+    Returns this process' enum registry, loading or reloading it first if needed.
+    """
+    global _registry, _registry_version, _registry_checked_at
+    with _registry_lock:
+        now = time.monotonic()
+        if _registry is not None and now - _registry_checked_at >= getattr(settings, 'ENUM_REGISTRY_VERSION_CHECK_SECONDS', 60):
+            _registry_checked_at = now
+            if cache.get(ENUM_REGISTRY_VERSION_CACHE_KEY, 0) != _registry_version:
+                _registry = None
+        if _registry is None:
+            _registry_version = cache.get(ENUM_REGISTRY_VERSION_CACHE_KEY, 0)
+            _registry_checked_at = now
+            registry = EnumRegistry()
+            registry.load()
+            _registry = registry
+        return _registry
+
+
+def clear_enum_registry():
+    """
+    Clears this process' enum registry, so it is reloaded on the next lookup.
+    """
+    global _registry
+    with _registry_lock:
+        _registry = None
+
+
+def invalidate_enum_registry():
+    """
+    Clears this process' enum registry, and tells other processes to reload their registry.
+    """
+    global _registry, _registry_version
+    with _registry_lock:
+        _registry = None
+        _registry_version = time.time_ns()
+        cache.set(ENUM_REGISTRY_VERSION_CACHE_KEY, _registry_version, None)
+
+
+def get_enum_row(enum_field, enum_value):
+    """
+    Returns the row of the enum table given the field name and its enum value.
+    Raises the model's DoesNotExist if there is no row with the value.
+    """
+    if enum_registry_enabled():
+        row = get_enum_registry().get_row(enum_field, enum_value)
+        if row is not None:
+            return row
+    return get_enum_model(enum_field).objects.get(Value=enum_value)
+
+
+@functools.lru_cache(maxsize=None)
+def get_enum_foreign_key(model, field_name):
+    """
+    Returns the field of the model named ``field_name`` if it is a foreign key to an enum table, otherwise None.
+    """
+    meta = getattr(model, '_meta', None)
+    if meta is None:
+        return None
+    try:
+        field = meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return None
+    if field.many_to_one and field.related_model.__name__ in ENUM_FIELDS:
+        return field
+    return None
+
+
+def get_enum_attribute(instance, field_name):
+    """
+    Returns the enum row referenced by the foreign key ``field_name`` of the instance from the registry,
+    without querying the database. Other attributes are returned with ``getattr``.
+    """
+    field = get_enum_foreign_key(type(instance), field_name)
+    if field is None or not enum_registry_enabled():
+        return getattr(instance, field_name)
+    pk = getattr(instance, field.attname)
+    if pk is None:
+        return None
+    row = get_enum_registry().get_row_by_pk(field.related_model.__name__, pk)
+    if row is None:
+        return getattr(instance, field_name)
+    return row
+
+
+def enum_row_changed(sender, instance, **kwargs):
+    invalidate_enum_registry()
+
+
+for enum_field in ENUM_FIELDS:
+    post_save.connect(enum_row_changed, sender=f'ahj_app.{enum_field}', dispatch_uid=f'enum_registry_{enum_field}_save')
+    post_delete.connect(enum_row_changed, sender=f'ahj_app.{enum_field}', dispatch_uid=f'enum_registry_{enum_field}_delete')
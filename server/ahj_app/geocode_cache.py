@@ -0,0 +1,203 @@
+"""
+A cache of the Locations of geocoded addresses, so searching the same address does not call the geocoding API again.
+
+Addresses are normalized before they are looked up: they are lowercased, punctuation other than ``#`` and ``-`` is
+removed, and runs of whitespace are collapsed, so ``'123 Main St., Springfield'`` and ``'123  MAIN ST SPRINGFIELD'``
+share a cache entry. Each entry stores the Latitude, Longitude, and Elevation of the address, or that the address
+could not be geocoded. The Elevation is only looked up the first time it is requested for the address.
+Each geocoder backend (see ``geocoders.py``) has its own entries.
+
+Lookups check two tiers:
+    - An in-process LRU cache of at most ``settings.GEOCODE_CACHE_MAX_SIZE`` entries.
+    - The GeocodeCacheEntry table, so entries are shared between worker processes and kept across restarts.
+
+A cache hit returns without calling the geocoding API. Geocoded addresses expire after ``settings.GEOCODE_CACHE_TIMEOUT``
+seconds, and addresses that could not be geocoded expire sooner, after ``settings.GEOCODE_CACHE_NEGATIVE_TIMEOUT`` seconds.
+Errors from the geocoding API are not cached. Expired rows are replaced when their address is geocoded again, and
+``clear_expired_geocode_cache_entries`` deletes the rest.
+
+``get_stats`` returns how many lookups were answered by each tier, and how many times the geocoding API was called.
+"""
+import datetime
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from .models import GeocodeCacheEntry
+
+GeocodedAddress = namedtuple('GeocodedAddress', ['Latitude', 'Longitude', 'Elevation'])
+
+ADDRESS_PUNCTUATION_REGEX = re.compile(r'[^\w\s#-]')
+
+
+def geocode_cache_enabled():
+    return getattr(settings, 'GEOCODE_CACHE_ENABLED', False)
+
+
+def normalize_address(address):
+    """
+    Returns the address lowercased, without punctuation other than ``#`` and ``-``, and with its whitespace collapsed.
+    """
+    return ' '.join(ADDRESS_PUNCTUATION_REGEX.sub(' ', str(address).lower()).split())
+
+
+def get_address_key(normalized_address, namespace=''):
+    return hashlib.sha1(f'{namespace}:{normalized_address}'.encode('utf-8')).hexdigest()
+
+
+class GeocodeCacheResult:
+    """
+    A cached geocoding result. ``is_resolved`` is False if the address could not be geocoded.
+    """
+    __slots__ = ('latitude', 'longitude', 'elevation', 'is_resolved', 'expires_at')
+
+    def __init__(self, latitude, longitude, elevation, is_resolved, expires_at):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.elevation = elevation
+        self.is_resolved = is_resolved
+        self.expires_at = expires_at
+
+    def has(self, with_elevation):
+        return not with_elevation or not self.is_resolved or self.elevation is not None
+
+    def get_geocoded_address(self):
+        if not self.is_resolved:
+            return None
+        return GeocodedAddress(self.latitude, self.longitude, self.elevation)
+
+
+class GeocodeCache:
+    """
+    Two-tier cache of the geocoding results of normalized addresses.
+    """
+    def __init__(self, max_size=100000, timeout=30 * 24 * 60 * 60, negative_timeout=24 * 60 * 60):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.negative_timeout = negative_timeout
+        self.entries = OrderedDict()
+        self.memory_hits = 0
+        self.table_hits = 0
+        self.misses = 0
+        self.geocode_calls = 0
+        self.elevation_calls = 0
+        self.lock = threading.Lock()
+
+    def get_memory_result(self, key, with_elevation):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None or result.expires_at <= time.time() or not result.has(with_elevation):
+                return None
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return result
+
+    def get_table_result(self, key):
+        entry = GeocodeCacheEntry.objects.filter(AddressKey=key, DateExpires__gt=now()).first()
+        if entry is None:
+            return None
+        return GeocodeCacheResult(entry.Latitude, entry.Longitude, entry.Elevation, entry.IsResolved, entry.DateExpires.timestamp())
+
+    def remember(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def store(self, key, normalized_address, result):
+        GeocodeCacheEntry.objects.update_or_create(AddressKey=key, defaults={
+            'NormalizedAddress': normalized_address,
+            'Latitude': result.latitude,
+            'Longitude': result.longitude,
+            'Elevation': result.elevation,
+            'IsResolved': result.is_resolved,
+            'DateExpires': datetime.datetime.fromtimestamp(result.expires_at, tz=datetime.timezone.utc)
+        })
+
+    def get(self, address, geocode, elevation=None, namespace=''):
+        """
+        Returns the GeocodedAddress of the address, or None if it could not be geocoded.
+
+        :param geocode: called with the address on a miss, returns its ``(latitude, longitude)`` or None.
+        :param elevation: if given, the Elevation is also returned, and this is called with the
+                          ``(latitude, longitude)`` of the address on a miss, returning its elevation.
+        :param namespace: the name of the geocoder, so results of different geocoders have different entries.
+        """
+        normalized_address = normalize_address(address)
+        if not normalized_address:
+            return None
+        key = get_address_key(normalized_address, namespace)
+        with_elevation = elevation is not None
+        result = self.get_memory_result(key, with_elevation)
+        if result is not None:
+            return result.get_geocoded_address()
+        result = self.get_table_result(key)
+        if result is not None and result.has(with_elevation):
+            with self.lock:
+                self.table_hits += 1
+            self.remember(key, result)
+            return result.get_geocoded_address()
+        with self.lock:
+            self.misses += 1
+        if result is None:
+            with self.lock:
+                self.geocode_calls += 1
+            latlng = geocode(address)
+            if latlng is None:
+                result = GeocodeCacheResult(None, None, None, False, time.time() + self.negative_timeout)
+            else:
+                result = GeocodeCacheResult(latlng[0], latlng[1], None, True, time.time() + self.timeout)
+        if with_elevation and result.is_resolved:
+            with self.lock:
+                self.elevation_calls += 1
+            result.elevation = elevation((result.latitude, result.longitude))
+        self.store(key, normalized_address, result)
+        self.remember(key, result)
+        return result.get_geocoded_address()
+
+    def clear(self):
+        """
+        Clears this process' in-memory entries.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        """
+        Returns the number of lookups answered by each tier, the misses, the calls to the geocoding API,
+        and the number of entries in this process.
+        """
+        with self.lock:
+            return {'memory_hits': self.memory_hits, 'table_hits': self.table_hits, 'misses': self.misses,
+                    'geocode_calls': self.geocode_calls, 'elevation_calls': self.elevation_calls,
+                    'size': len(self.entries), 'max_size': self.max_size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_geocode_cache():
+    """
+    Returns this process' GeocodeCache, created from the settings the first time it is called.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GeocodeCache(max_size=getattr(settings, 'GEOCODE_CACHE_MAX_SIZE', 100000),
+                                  timeout=getattr(settings, 'GEOCODE_CACHE_TIMEOUT', 30 * 24 * 60 * 60),
+                                  negative_timeout=getattr(settings, 'GEOCODE_CACHE_NEGATIVE_TIMEOUT', 24 * 60 * 60))
+        return _cache
+
+
+def clear_expired_geocode_cache_entries():
+    """
+    Deletes the expired rows of the GeocodeCacheEntry table. Returns the number of rows deleted.
+    """
+    return GeocodeCacheEntry.objects.filter(DateExpires__lte=now()).delete()[0]
@@ -0,0 +1,144 @@
+"""
+A persistent queue of the Locations of edited and added Addresses waiting to be geocoded, and the worker pool that geocodes them.
+
+While ``settings.GEOCODE_QUEUE_ENABLED``, ``views_edits.apply_edits`` and ``views_edits.create_row`` add a
+LocationGeocodeTask with the Address string instead of geocoding it during the request or the nightly job. A task's
+``Status`` is ``'P'`` (pending) until its Location is geocoded and the task is deleted, or ``'F'`` (failed) after
+``settings.GEOCODE_QUEUE_MAX_ATTEMPTS`` attempts raised an error. Failed tasks are kept to be inspected in the admin site,
+and are retried if the Location is queued again.
+
+``process_geocode_queue`` geocodes the pending tasks, at most ``settings.GEOCODE_QUEUE_BATCH_SIZE`` at a time, with a pool
+of ``settings.GEOCODE_QUEUE_MAX_WORKERS`` threads. It is run every ``settings.GEOCODE_QUEUE_INTERVAL_SECONDS`` by
+``ScheduledTasks/updater.py``, or with ``python3 manage.py process_geocode_queue``. A task is claimed by moving its
+``DateNextAttempt`` ahead by ``settings.GEOCODE_QUEUE_LEASE_SECONDS``, so processes running the queue at the same time
+do not geocode it twice. After an error, a task is retried after ``settings.GEOCODE_QUEUE_RETRY_SECONDS`` seconds,
+doubling after each attempt. Addresses that cannot be geocoded set the Location's coordinates to null, like before.
+"""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils.timezone import now
+
+from .models import Location, LocationGeocodeTask
+from .utils import geocode
+
+STATUS_PENDING = 'P'
+STATUS_FAILED = 'F'
+
+
+def geocode_queue_enabled():
+    return getattr(settings, 'GEOCODE_QUEUE_ENABLED', False)
+
+
+def set_location_geocoded_address(location, geocoded_address):
+    """
+    Sets and saves the Latitude, Longitude, and Elevation of a Location to those of a GeocodedAddress, or null if it is None.
+    """
+    location.Latitude = geocoded_address.Latitude if geocoded_address is not None else None
+    location.Longitude = geocoded_address.Longitude if geocoded_address is not None else None
+    location.Elevation = geocoded_address.Elevation if geocoded_address is not None else None
+    location.save()
+
+
+def enqueue_location(location_id, address):
+    """
+    Queues the Location to be geocoded to the address string, replacing any task it already has.
+    """
+    LocationGeocodeTask.objects.update_or_create(LocationID_id=location_id, defaults={
+        'Address': address,
+        'Status': STATUS_PENDING,
+        'Attempts': 0,
+        'DateQueued': now(),
+        'DateNextAttempt': now(),
+        'LastError': ''
+    })
+
+
+def claim_tasks(limit):
+    """
+    Returns at most ``limit`` pending tasks due to be attempted, after leasing them to this process.
+    """
+    current_time = now()
+    lease_until = current_time + datetime.timedelta(seconds=getattr(settings, 'GEOCODE_QUEUE_LEASE_SECONDS', 300))
+    due_tasks = LocationGeocodeTask.objects.filter(Status=STATUS_PENDING, DateNextAttempt__lte=current_time).order_by('DateNextAttempt')[:limit]
+    claimed = []
+    for task in due_tasks:
+        if LocationGeocodeTask.objects.filter(pk=task.pk, DateNextAttempt=task.DateNextAttempt).update(DateNextAttempt=lease_until) == 1:
+            claimed.append(task)
+    return claimed
+
+
+def geocode_task_address(address):
+    """
+    Geocodes an address in a worker thread, returning the GeocodedAddress or the exception raised.
+    """
+    try:
+        return geocode(address, with_elevation=True)
+    except Exception as e:
+        return e
+    finally:
+        # The geocoding cache may have opened a database connection in this thread
+        connections.close_all()
+
+
+def get_retry_delay(attempts):
+    return getattr(settings, 'GEOCODE_QUEUE_RETRY_SECONDS', 60) * 2 ** (attempts - 1)
+
+
+def complete_task(task, result):
+    """
+    Saves the result of geocoding the task's address. Returns True if the Location was geocoded.
+    """
+    # Skip the result if the Location was queued again while it was being geocoded
+    claimed_task = LocationGeocodeTask.objects.filter(pk=task.pk, Address=task.Address, Status=STATUS_PENDING, Attempts=task.Attempts)
+    if isinstance(result, Exception):
+        attempts = task.Attempts + 1
+        fields = {'Attempts': attempts, 'LastError': f'{type(result).__name__}: {result}'}
+        if attempts >= getattr(settings, 'GEOCODE_QUEUE_MAX_ATTEMPTS', 5):
+            fields['Status'] = STATUS_FAILED
+        else:
+            fields['DateNextAttempt'] = now() + datetime.timedelta(seconds=get_retry_delay(attempts))
+        claimed_task.update(**fields)
+        return False
+    with transaction.atomic():
+        if not claimed_task.exists():
+            return False
+        location = Location.objects.filter(LocationID=task.LocationID_id).first()
+        if location is not None:
+            set_location_geocoded_address(location, result)
+        LocationGeocodeTask.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def process_geocode_queue(max_workers=None, batch_size=None, max_batches=None):
+    """
+    Geocodes pending tasks in batches until no task is due, or ``max_batches`` batches were processed.
+    Returns the number of Locations geocoded and the number of attempts that raised an error.
+    """
+    max_workers = max_workers or getattr(settings, 'GEOCODE_QUEUE_MAX_WORKERS', 4)
+    batch_size = batch_size or getattr(settings, 'GEOCODE_QUEUE_BATCH_SIZE', 100)
+    num_geocoded = num_errors = num_batches = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while max_batches is None or num_batches < max_batches:
+            tasks = claim_tasks(batch_size)
+            if not tasks:
+                break
+            num_batches += 1
+            for task, result in zip(tasks, executor.map(geocode_task_address, [task.Address for task in tasks])):
+                if complete_task(task, result):
+                    num_geocoded += 1
+                elif isinstance(result, Exception):
+                    num_errors += 1
+    return num_geocoded, num_errors
+
+
+def get_geocode_queue_status():
+    """
+    Returns the number of pending and failed tasks, and the date of the oldest pending task.
+    """
+    counts = dict(LocationGeocodeTask.objects.values('Status').annotate(Count=Count('pk')).values_list('Status', 'Count'))
+    oldest = LocationGeocodeTask.objects.filter(Status=STATUS_PENDING).order_by('DateQueued').values_list('DateQueued', flat=True).first()
+    return {'pending': counts.get(STATUS_PENDING, 0), 'failed': counts.get(STATUS_FAILED, 0), 'oldest_pending': oldest}
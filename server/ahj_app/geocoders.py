@@ -0,0 +1,208 @@
+"""
+The backends that geocode addresses and look up elevations for ``utils.geocode``.
+
+The backend is chosen by ``settings.GEOCODER_BACKEND``:
+    - ``'google'``: The Google Maps geocoding and elevation APIs, with the key ``settings.GOOGLE_MAPS_KEY``.
+    - ``'local'``: The ZipCodeCentroid table, loaded from the Census Gazetteer ZIP Code Tabulation Area (ZCTA) file
+      with ``python3 manage.py load_zip_code_centroids <file>``. An address is geocoded to the internal point of the
+      last five-digit ZIP code in it, so it resolves to its ZCTA rather than to its street address, and it needs no
+      network access. It has no elevations.
+    - ``'fake'``: A deterministic Location in the contiguous United States derived from a hash of the normalized address,
+      and a deterministic elevation, after sleeping ``settings.GEOCODER_FAKE_LATENCY_SECONDS`` to stand in for a network call.
+      It is meant for tests and benchmarks.
+
+Each backend has a ``geocode`` method returning the ``(latitude, longitude)`` of an address or None if it could not be geocoded,
+a ``batch_geocode`` method doing the same for a list of addresses, an ``elevation`` method returning the elevation
+of a ``(latitude, longitude)`` or None if it is not known, and a ``batch_elevation`` method doing the same for a list of them. Results of backends with ``cached = True`` are cached by
+``geocode_cache.py`` under the backend's name, so results of different backends are not mixed.
+"""
+import csv
+import hashlib
+import re
+import threading
+import time
+
+import googlemaps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .geocode_cache import normalize_address
+from .models import ZipCodeCentroid
+
+ZIP_CODE_REGEX = re.compile(r'\b(\d{5})(?:-\d{4})?\b')
+
+# Bounding box of the contiguous United States that the fake backend's Locations are in
+FAKE_MIN_LATITUDE, FAKE_MAX_LATITUDE = 25.0, 49.0
+FAKE_MIN_LONGITUDE, FAKE_MAX_LONGITUDE = -124.0, -67.0
+FAKE_MAX_ELEVATION = 3000.0
+
+# Max number of locations in one request to the Google Maps elevation API
+GOOGLE_ELEVATION_BATCH_SIZE = 512
+
+
+class Geocoder:
+    """
+    The interface of a geocoding backend.
+    """
+    name = None
+    cached = True
+
+    def geocode(self, address):
+        """
+        Returns the ``(latitude, longitude)`` of the address, or None if it could not be geocoded.
+        """
+        raise NotImplementedError
+
+    def batch_geocode(self, addresses):
+        """
+        Returns a list of the ``(latitude, longitude)`` of each address, or None for those that could not be geocoded.
+        """
+        return [self.geocode(address) for address in addresses]
+
+    def elevation(self, latlng):
+        """
+        Returns the elevation in meters of the ``(latitude, longitude)``, or None if it is not known.
+        """
+        raise NotImplementedError
+
+    def batch_elevation(self, latlngs):
+        """
+        Returns a list of the elevation in meters of each ``(latitude, longitude)``, or None for those not known.
+        """
+        return [self.elevation(latlng) for latlng in latlngs]
+
+
+class GoogleGeocoder(Geocoder):
+    """
+    Geocodes addresses with the Google Maps API. The client is created the first time it is used.
+    """
+    name = 'google'
+
+    def __init__(self, key=None):
+        self.key = key
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = googlemaps.Client(key=self.key if self.key is not None else settings.GOOGLE_MAPS_KEY)
+        return self._client
+
+    def geocode(self, address):
+        geo_res = self.client.geocode(address)
+        if len(geo_res) == 0:
+            return None
+        location = geo_res[0]['geometry']['location']
+        return location['lat'], location['lng']
+
+    def elevation(self, latlng):
+        return self.client.elevation(latlng)[0]['elevation']
+
+    def batch_elevation(self, latlngs):
+        elevations = []
+        for i in range(0, len(latlngs), GOOGLE_ELEVATION_BATCH_SIZE):
+            elevations.extend(result['elevation'] for result in self.client.elevation(list(latlngs[i:i + GOOGLE_ELEVATION_BATCH_SIZE])))
+        return elevations
+
+
+def get_zip_code(address):
+    """
+    Returns the last five-digit ZIP code in the address, or None if it has none.
+    """
+    zip_codes = ZIP_CODE_REGEX.findall(str(address))
+    return zip_codes[-1] if zip_codes else None
+
+
+class LocalGeocoder(Geocoder):
+    """
+    Geocodes addresses to the internal point of their ZIP Code Tabulation Area in the ZipCodeCentroid table.
+    Lookups are a primary key query, so its results are not cached.
+    """
+    name = 'local'
+    cached = False
+
+    def geocode(self, address):
+        return self.batch_geocode([address])[0]
+
+    def batch_geocode(self, addresses):
+        zip_codes = [get_zip_code(address) for address in addresses]
+        centroids = {zip_code: (latitude, longitude) for zip_code, latitude, longitude in
+                     ZipCodeCentroid.objects.filter(ZipCode__in={zip_code for zip_code in zip_codes if zip_code is not None})
+                     .values_list('ZipCode', 'Latitude', 'Longitude')}
+        return [centroids.get(zip_code) for zip_code in zip_codes]
+
+    def elevation(self, latlng):
+        return None
+
+
+class FakeGeocoder(Geocoder):
+    """
+    Geocodes each address to a Location derived from a hash of it, so the same address always has the same Location.
+    """
+    name = 'fake'
+
+    def __init__(self, latency=None):
+        self.latency = latency
+
+    def wait(self):
+        latency = self.latency if self.latency is not None else getattr(settings, 'GEOCODER_FAKE_LATENCY_SECONDS', 0)
+        if latency:
+            time.sleep(latency)
+
+    @staticmethod
+    def get_fractions(text):
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') / 2 ** 64, int.from_bytes(digest[8:16], 'big') / 2 ** 64
+
+    def geocode(self, address):
+        self.wait()
+        normalized_address = normalize_address(address)
+        if not normalized_address:
+            return None
+        lat_fraction, lng_fraction = self.get_fractions(normalized_address)
+        return (round(FAKE_MIN_LATITUDE + lat_fraction * (FAKE_MAX_LATITUDE - FAKE_MIN_LATITUDE), 7),
+                round(FAKE_MIN_LONGITUDE + lng_fraction * (FAKE_MAX_LONGITUDE - FAKE_MIN_LONGITUDE), 7))
+
+    def elevation(self, latlng):
+        self.wait()
+        fraction = self.get_fractions(f'{float(latlng[0]):.7f},{float(latlng[1]):.7f}')[0]
+        return round(fraction * FAKE_MAX_ELEVATION, 2)
+
+
+GEOCODER_BACKENDS = {
+    'google': GoogleGeocoder,
+    'local': LocalGeocoder,
+    'fake': FakeGeocoder
+}
+
+_geocoders = {}
+_geocoders_lock = threading.Lock()
+
+
+def get_geocoder():
+    """
+    Returns this process' geocoder of the backend named by ``settings.GEOCODER_BACKEND``.
+    """
+    backend = getattr(settings, 'GEOCODER_BACKEND', 'google')
+    if backend not in GEOCODER_BACKENDS:
+        raise ImproperlyConfigured(f'GEOCODER_BACKEND must be one of {", ".join(GEOCODER_BACKENDS)}, not \'{backend}\'')
+    with _geocoders_lock:
+        if backend not in _geocoders:
+            _geocoders[backend] = GEOCODER_BACKENDS[backend]()
+        return _geocoders[backend]
+
+
+def load_zip_code_centroids(file):
+    """
+    Replaces the rows of the ZipCodeCentroid table with the ZCTAs of a Census Gazetteer ZCTA file,
+    a tab-separated file with the columns ``GEOID``, ``INTPTLAT``, and ``INTPTLONG``. Returns the number of rows loaded.
+    """
+    reader = csv.DictReader(file, delimiter='\t')
+    reader.fieldnames = [fieldname.strip() for fieldname in reader.fieldnames]
+    centroids = [ZipCodeCentroid(ZipCode=row['GEOID'].strip(), Latitude=float(row['INTPTLAT']), Longitude=float(row['INTPTLONG']))
+                 for row in reader]
+    with transaction.atomic():
+        ZipCodeCentroid.objects.all().delete()
+        ZipCodeCentroid.objects.bulk_create(centroids, batch_size=5000)
+    return len(centroids)
@@ -0,0 +1,173 @@
+"""
+A cache of the AHJs found by searching a Location.
+
+Searched Locations are rounded to ``settings.LOCATION_CACHE_PRECISION`` decimal places, and the
+cache stores the ordered list of AHJPKs whose polygon contains the rounded Location. Every Location
+rounding to the same point shares a cache entry, so the precision should be kept high enough
+(5 decimal places is about one meter) that the points of an entry are in the same jurisdictions.
+
+Lookups check two tiers:
+    - An in-process LRU cache of at most ``settings.LOCATION_CACHE_MAX_SIZE`` entries.
+    - The Django cache named by ``settings.LOCATION_CACHE_BACKEND``, which can be any cache backend
+      configured in ``settings.CACHES``, so entries are shared between worker processes. Its entries
+      expire after ``settings.LOCATION_CACHE_TIMEOUT`` seconds.
+
+The shared cache should be its own cache in ``settings.CACHES``, with its own size limit, so searched Locations
+do not cull the entries of the ``'default'`` cache, such as throttle histories.
+
+The cache is invalidated when a polygon row changes, an AHJ is deleted, or an AHJ is saved with a new PolygonID.
+Invalidating changes a generation number, which is part of every cache key. The generation is stored in a
+CacheGeneration row, so it is not culled or expired with the cache's entries. Other worker processes notice
+the new generation within ``settings.LOCATION_CACHE_VERSION_CHECK_SECONDS``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import AHJ, CacheGeneration, Polygon, StatePolygon, CountyPolygon, CityPolygon, CountySubdivisionPolygon
+
+LOCATION_CACHE_GENERATION_NAME = 'location-cache'
+
+
+def location_cache_enabled():
+    return getattr(settings, 'LOCATION_CACHE_ENABLED', False)
+
+
+class LocationResultCache:
+    """
+    Two-tier cache of the ordered AHJPKs found for each rounded Location.
+    """
+    def __init__(self, backend_alias='default', precision=5, max_size=100000, timeout=86400, version_check_seconds=60):
+        self.backend_alias = backend_alias
+        self.precision = precision
+        self.max_size = max_size
+        self.timeout = timeout
+        self.version_check_seconds = version_check_seconds
+        self.entries = OrderedDict()
+        self.generation = None
+        self.generation_checked_at = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.backend_alias]
+
+    def round_location(self, lng, lat):
+        return round(float(lng), self.precision), round(float(lat), self.precision)
+
+    def get_key(self, lng, lat):
+        return f'location-cache:{self.generation}:{lng}:{lat}'
+
+    def check_generation(self):
+        """
+        Clears the in-process entries if another process invalidated the cache.
+        """
+        now = time.monotonic()
+        if self.generation is None or now - self.generation_checked_at >= self.version_check_seconds:
+            self.generation_checked_at = now
+            generation = CacheGeneration.objects.filter(Name=LOCATION_CACHE_GENERATION_NAME) \
+                .values_list('Generation', flat=True).first() or 0
+            if generation != self.generation:
+                self.generation = generation
+                self.entries.clear()
+
+    def get(self, lng, lat, compute):
+        """
+        Returns the AHJPKs cached for the Location, or caches and returns ``compute(lng, lat)`` if there is no entry.
+        ``compute`` is called with the rounded Location, so every Location sharing the entry gets the AHJs of the same point.
+        """
+        lng, lat = self.round_location(lng, lat)
+        with self.lock:
+            self.check_generation()
+            key = self.get_key(lng, lat)
+            ahjpks = self.entries.get(key)
+            if ahjpks is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return ahjpks
+        ahjpks = self.backend.get(key)
+        if ahjpks is None:
+            with self.lock:
+                self.misses += 1
+            ahjpks = compute(lng, lat)
+            self.backend.set(key, ahjpks, self.timeout)
+        else:
+            with self.lock:
+                self.hits += 1
+        with self.lock:
+            self.entries[key] = ahjpks
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return ahjpks
+
+    def invalidate(self):
+        """
+        Invalidates every entry in this and other processes.
+        """
+        with self.lock:
+            generation = time.time_ns()
+            CacheGeneration.objects.update_or_create(Name=LOCATION_CACHE_GENERATION_NAME, defaults={'Generation': generation})
+            self.generation = generation
+            self.generation_checked_at = time.monotonic()
+            self.entries.clear()
+
+    def get_stats(self):
+        """
+        Returns the hit and miss counts and the number of entries in this process.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'max_size': self.max_size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_location_cache():
+    """
+    Returns this process' LocationResultCache, created from the settings the first time it is called.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LocationResultCache(backend_alias=getattr(settings, 'LOCATION_CACHE_BACKEND', 'default'),
+                                         precision=getattr(settings, 'LOCATION_CACHE_PRECISION', 5),
+                                         max_size=getattr(settings, 'LOCATION_CACHE_MAX_SIZE', 100000),
+                                         timeout=getattr(settings, 'LOCATION_CACHE_TIMEOUT', 86400),
+                                         version_check_seconds=getattr(settings, 'LOCATION_CACHE_VERSION_CHECK_SECONDS', 60))
+        return _cache
+
+
+def invalidate_location_cache():
+    get_location_cache().invalidate()
+
+
+@receiver([post_save, post_delete], sender=Polygon)
+@receiver([post_save, post_delete], sender=StatePolygon)
+@receiver([post_save, post_delete], sender=CountyPolygon)
+@receiver([post_save, post_delete], sender=CityPolygon)
+@receiver([post_save, post_delete], sender=CountySubdivisionPolygon)
+@receiver(post_delete, sender=AHJ)
+def location_results_changed(sender, instance, **kwargs):
+    invalidate_location_cache()
+
+
+@receiver(post_init, sender=AHJ)
+def ahj_loaded(sender, instance, **kwargs):
+    instance._location_cache_polygon_id = instance.PolygonID_id
+
+
+@receiver(post_save, sender=AHJ)
+def ahj_saved(sender, instance, created, **kwargs):
+    polygon_id = instance.PolygonID_id
+    if (created and polygon_id is not None) or (not created and polygon_id != instance._location_cache_polygon_id):
+        invalidate_location_cache()
+    instance._location_cache_polygon_id = polygon_id
@@ -0,0 +1,58 @@
+"""
+Compares applying edits one at a time and with ``bulk_edits.bulk_apply_edits``.
+Run it with ``python3 manage.py benchmark_apply_edits``.
+
+For each path, it adds approved edits renaming the existing AHJs in a transaction, times ``views_edits.apply_edits``
+on them, and rolls the transaction back. It prints the time and throughput of each path,
+and checks both paths left the AHJs with the same names.
+"""
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from ahj_app.models import AHJ, Edit, User
+from ahj_app.views_edits import apply_edits
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks applying edits one at a time and in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edits', type=int, default=100000, help='Number of edits applied.')
+        parser.add_argument('--ahjs', type=int, default=10000, help='Max number of AHJs edited. AHJs are edited more than once if there are fewer.')
+
+    def create_edits(self, ahjpks, num_edits, user):
+        date_effective = timezone.now()
+        edits = [Edit(ChangedBy=user, ApprovedBy=user, AHJPK_id=ahjpk, SourceTable='AHJ', SourceRow=ahjpk, SourceColumn='AHJName',
+                      OldValue='', NewValue=f'Benchmark AHJ {i}', DateRequested=date_effective, DateEffective=date_effective,
+                      ReviewStatus='A', EditType='U')
+                 for i, ahjpk in zip(range(num_edits), itertools.cycle(ahjpks))]
+        Edit.objects.bulk_create(edits, batch_size=5000)
+        return list(Edit.objects.filter(DateEffective=date_effective, ChangedBy=user, IsApplied=False, NewValue__startswith='Benchmark AHJ ').order_by('EditID'))
+
+    def handle(self, *args, **options):
+        ahjpks = list(AHJ.objects.order_by('AHJPK').values_list('AHJPK', flat=True)[:options['ahjs']])
+        user = User.objects.order_by('UserID').first()
+        if not ahjpks or user is None:
+            raise CommandError('There must be an AHJ and a User to add edits.')
+        names = {}
+        for bulk in [False, True]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{"Bulk" if bulk else "One at a time"}, {options["edits"]} edits of {len(ahjpks)} AHJs'))
+            with transaction.atomic():
+                edits = self.create_edits(ahjpks, options['edits'], user)
+                with override_settings(BULK_APPLY_EDITS_ENABLED=bulk):
+                    start = time.perf_counter()
+                    apply_edits(ready_edits=edits)
+                    elapsed = time.perf_counter() - start
+                names[bulk] = dict(AHJ.objects.filter(AHJPK__in=ahjpks).values_list('AHJPK', 'AHJName'))
+                if Edit.objects.filter(EditID__in=[edit.EditID for edit in edits], IsApplied=False).exists():
+                    raise CommandError('Not every edit was marked applied.')
+                transaction.set_rollback(True)
+            self.stdout.write(f'  {elapsed:.3f}s, {len(edits) / elapsed:.0f} edits per second')
+        if names[False] != names[True]:
+            raise CommandError('Applying edits one at a time and in bulk left the AHJs with different names.')
+        self.stdout.write(self.style.SUCCESS('Applying edits one at a time and in bulk left the AHJs with the same names.'))
@@ -0,0 +1,55 @@
+"""
+Compares serializing AHJs with the DRF ``AHJSerializer`` and with the functions of ``compiled_serializers.py``.
+Run it with ``python3 manage.py benchmark_compiled_serializers``.
+
+The children of the AHJs are prefetched once before timing, so only serializing is timed.
+For the public and webpage views, it prints the best time of each path and checks they render the same JSON.
+"""
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from ahj_app.compiled_serializers import compiled_serialize
+from ahj_app.models import AHJ
+from ahj_app.prefetch import prefetch_ahj_page
+from ahj_app.serializers import AHJSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks serializing AHJs with the DRF serializers and the compiled serializers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahjs', type=int, default=1000, help='Number of AHJs serialized. AHJs are repeated if there are fewer.')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of times each path is timed.')
+
+    def time_best(self, function, repeat):
+        best, result = None, None
+        for i in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        ahjs = list(AHJ.objects.order_by('AHJPK')[:options['ahjs']])
+        if not ahjs:
+            raise CommandError('There are no AHJs to serialize.')
+        ahjs = list(itertools.islice(itertools.cycle(ahjs), options['ahjs']))
+        renderer = JSONRenderer()
+        for is_public_view in [True, False]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{"Public" if is_public_view else "Webpage"} view, {len(ahjs)} AHJs'))
+            context = {'is_public_view': is_public_view}
+            prefetch_ahj_page(ahjs, is_public_view=is_public_view)
+            with override_settings(AHJ_PAGE_PREFETCH_ENABLED=False):
+                drf_time, drf_data = self.time_best(lambda: AHJSerializer(ahjs, many=True, context=context).data, options['repeat'])
+                compiled_time, compiled_data = self.time_best(lambda: compiled_serialize(AHJSerializer, ahjs, context), options['repeat'])
+            self.stdout.write(f'  DRF serializers:      {drf_time:.3f}s, {drf_time / len(ahjs) * 1000:.3f}ms per AHJ')
+            self.stdout.write(f'  Compiled serializers: {compiled_time:.3f}s, {compiled_time / len(ahjs) * 1000:.3f}ms per AHJ')
+            self.stdout.write(f'  Speedup: {drf_time / compiled_time:.1f}x')
+            if renderer.render(drf_data) != renderer.render(compiled_data):
+                raise CommandError('The DRF and compiled serializers rendered different JSON.')
+        self.stdout.write(self.style.SUCCESS('The DRF and compiled serializers rendered the same JSON.'))
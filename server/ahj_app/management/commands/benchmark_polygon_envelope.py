@@ -0,0 +1,60 @@
+"""
+Compares the SQL location search of ``utils.filter_ahjs`` with and without the bounding box prefilter
+on the MinX, MaxX, MinY, and MaxY columns of the Polygon table.
+Run it with ``python3 manage.py benchmark_polygon_envelope``.
+
+For each variant, it prints the EXPLAIN plan of the search of the first point,
+then the total and mean time to count the AHJs found for each point.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ahj_app.models import Polygon
+from ahj_app.search_query import AHJSearchBuilder
+from ahj_app.utils import dictfetchall
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the AHJ location search SQL with and without the Polygon bounding box prefilter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100, help='Number of points to search.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random choice of points.')
+
+    def get_points(self, num_points, seed):
+        """
+        Returns the internal points of randomly chosen polygons, so every point is in at least one polygon.
+        """
+        points = list(Polygon.objects.values_list('InternalPLongitude', 'InternalPLatitude'))
+        if not points:
+            raise CommandError('There are no polygons to search.')
+        rng = random.Random(seed)
+        return [(float(lng), float(lat)) for lng, lat in rng.choices(points, k=num_points)]
+
+    def get_query(self, point, prefilter):
+        search = AHJSearchBuilder(prefilter=prefilter)
+        search.add_location(*point)
+        return search.build()
+
+    def handle(self, *args, **options):
+        points = self.get_points(options['points'], options['seed'])
+        counts = {}
+        for prefilter in [False, True]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Prefilter {"enabled" if prefilter else "disabled"}'))
+            sql, params = self.get_query(points[0], prefilter).get_count_sql()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN ' + sql, params)
+                for row in dictfetchall(cursor):
+                    self.stdout.write('  ' + ', '.join(f'{column}={value}' for column, value in row.items()))
+            counts[prefilter] = []
+            start = time.perf_counter()
+            for point in points:
+                counts[prefilter].append(self.get_query(point, prefilter).count())
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'  {len(points)} searches in {elapsed:.3f}s, {elapsed / len(points) * 1000:.2f}ms per search')
+        if counts[False] != counts[True]:
+            raise CommandError('The searches with and without the prefilter found different numbers of AHJs.')
+        self.stdout.write(self.style.SUCCESS('The searches with and without the prefilter found the same AHJs.'))
@@ -0,0 +1,72 @@
+"""
+Compares rendering API responses with DRF's ``JSONRenderer`` and with the renderers of ``renderers.py``.
+Run it with ``python3 manage.py benchmark_renderers``.
+
+The payloads are AHJs serialized with ``AHJSerializer`` for the public and webpage views, and the responses of
+``views_datavis.data_map`` for all states and, with ``--state``, for one state.
+For each payload, it prints the best time and size of each renderer and checks they render the same data.
+"""
+import itertools
+import json
+import time
+
+import msgpack
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from ahj_app.models import AHJ
+from ahj_app.prefetch import prefetch_ahj_page
+from ahj_app.renderers import FastJSONRenderer, MessagePackRenderer
+from ahj_app.serializers import AHJSerializer
+from ahj_app.views_datavis import data_map
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks rendering serialized AHJs and data map responses with DRF\'s JSONRenderer and the API\'s renderers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahjs', type=int, default=1000, help='Number of AHJs serialized. AHJs are repeated if there are fewer.')
+        parser.add_argument('--state', type=int, default=None, help='PolygonID of a state whose data map response is also rendered.')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of times each renderer is timed.')
+
+    def time_best(self, function, repeat):
+        best, result = None, None
+        for i in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def get_payloads(self, options):
+        ahjs = list(AHJ.objects.order_by('AHJPK')[:options['ahjs']])
+        if not ahjs:
+            raise CommandError('There are no AHJs to serialize.')
+        ahjs = list(itertools.islice(itertools.cycle(ahjs), options['ahjs']))
+        for is_public_view in [True, False]:
+            prefetch_ahj_page(ahjs, is_public_view=is_public_view)
+            data = AHJSerializer(ahjs, many=True, context={'is_public_view': is_public_view}).data
+            yield f'{"Public" if is_public_view else "Webpage"} view, {len(ahjs)} AHJs', data
+        factory = APIRequestFactory()
+        yield 'Data map, all states', data_map(factory.get('/data-map/')).data
+        if options['state'] is not None:
+            yield f'Data map, state {options["state"]}', data_map(factory.get('/data-map/', {'StatePK': options['state']})).data
+
+    def handle(self, *args, **options):
+        renderers = [('DRF JSONRenderer', JSONRenderer()), ('FastJSONRenderer', FastJSONRenderer()), ('MessagePackRenderer', MessagePackRenderer())]
+        for name, data in self.get_payloads(options):
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            drf_time, expected = None, None
+            for renderer_name, renderer in renderers:
+                elapsed, rendered = self.time_best(lambda: renderer.render(data), options['repeat'])
+                if renderer_name == 'MessagePackRenderer':
+                    decoded = msgpack.unpackb(rendered, raw=False)
+                else:
+                    decoded = json.loads(rendered)
+                if expected is None:
+                    drf_time, expected = elapsed, decoded
+                elif decoded != expected:
+                    raise CommandError(f'{renderer_name} rendered different data than DRF\'s JSONRenderer.')
+                self.stdout.write(f'  {renderer_name + ":":<21}{elapsed:.3f}s, {len(rendered) / 1024:.1f}KiB, {drf_time / elapsed:.1f}x')
+        self.stdout.write(self.style.SUCCESS('All renderers rendered the same data.'))
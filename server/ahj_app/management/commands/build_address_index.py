@@ -0,0 +1,26 @@
+"""
+Builds the AddressJurisdiction index of the City and County polygons that addresses are matched to without geocoding.
+Run it after ``build_polygon_hierarchy`` with ``python3 manage.py build_address_index``, giving the Census ZCTA to County
+and ZCTA to Place relationship files with ``--zcta-relationship-file`` so addresses can also be matched by ZIP code.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.address_index import build_address_index
+
+
+class Command(BaseCommand):
+    help = 'Builds the AddressJurisdiction and AddressJurisdictionKey index of the CityPolygon and CountyPolygon polygons.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zcta-relationship-file', action='append', default=[], dest='zcta_relationship_files',
+                            help='Path of a pipe-separated Census ZCTA to County or ZCTA to Place relationship file. Can be repeated.')
+
+    def handle(self, *args, **options):
+        files = [open(path, newline='', encoding='utf-8-sig') for path in options['zcta_relationship_files']]
+        try:
+            num_jurisdictions, num_keys = build_address_index(files)
+        finally:
+            for file in files:
+                file.close()
+        self.stdout.write(self.style.SUCCESS(f'Created {num_jurisdictions} AddressJurisdiction rows and {num_keys} AddressJurisdictionKey rows.'))
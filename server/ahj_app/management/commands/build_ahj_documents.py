@@ -0,0 +1,20 @@
+"""
+Rebuilds the AHJDocument table of the serialized JSON of each AHJ.
+Documents are otherwise built when they are first returned, so run it with ``python3 manage.py build_ahj_documents``
+after loading AHJs, or after changing an enum value row, to rebuild every document at once.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.documents import build_ahj_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the stored public and private JSON documents of every AHJ.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of AHJs serialized per batch.')
+
+    def handle(self, *args, **options):
+        num_rows = build_ahj_documents(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Created {num_rows} AHJDocument rows.'))
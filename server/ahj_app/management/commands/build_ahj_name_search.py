@@ -0,0 +1,16 @@
+"""
+Builds the AHJNameSearch table of the names each AHJ can be searched by.
+Run it after loading the AHJs, their AHJCensusNames, and pairing them to polygons with ``python3 manage.py build_ahj_name_search``.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.name_search import build_ahj_name_search
+
+
+class Command(BaseCommand):
+    help = 'Builds the AHJNameSearch table from the AHJName, AHJCensusName, and polygon LSAreaCodeName of each AHJ.'
+
+    def handle(self, *args, **options):
+        num_rows = build_ahj_name_search()
+        self.stdout.write(self.style.SUCCESS(f'Created {num_rows} AHJNameSearch rows.'))
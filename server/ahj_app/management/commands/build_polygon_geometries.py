@@ -0,0 +1,26 @@
+"""
+Rebuilds the PolygonGeometry table of the encoded GeoJSON geometry of each polygon at each level of detail.
+Geometries are otherwise built when they are first serialized, so run it with ``python3 manage.py build_polygon_geometries``
+after loading polygons, or after changing ``POLYGON_GEOMETRY_DETAILS`` or ``POLYGON_GEOMETRY_PRECISION``.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ahj_app.polygon_geometry import build_polygon_geometries, get_geometry_details
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the stored GeoJSON geometries of every polygon at each level of detail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--detail', action='append', help='Level of detail to build. Can be given more than once. Defaults to every level.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of polygons encoded per batch.')
+
+    def handle(self, *args, **options):
+        details = options['detail']
+        if details is not None:
+            unknown_details = [detail for detail in details if detail not in get_geometry_details()]
+            if unknown_details:
+                raise CommandError(f'Unknown levels of detail: {", ".join(unknown_details)}')
+        num_rows = build_polygon_geometries(details=details, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Created {num_rows} PolygonGeometry rows.'))
@@ -0,0 +1,16 @@
+"""
+Builds the PolygonGridCell grid index from the polygon tables.
+Run it after ``usf.translate_polygons`` and ``build_polygon_hierarchy`` with ``python3 manage.py build_polygon_grid``.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.polygon_grid import build_polygon_grid, get_cell_size
+
+
+class Command(BaseCommand):
+    help = 'Builds the PolygonGridCell grid index of the StatePolygon, CountyPolygon, CityPolygon, and CountySubdivisionPolygon polygons.'
+
+    def handle(self, *args, **options):
+        num_cells = build_polygon_grid()
+        self.stdout.write(self.style.SUCCESS(f'Created {num_cells} PolygonGridCell rows with a cell size of {get_cell_size()} degrees.'))
@@ -0,0 +1,16 @@
+"""
+Builds the PolygonHierarchy table from the polygon tables.
+Run it after ``usf.translate_polygons`` with ``python3 manage.py build_polygon_hierarchy``.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.polygon_hierarchy import build_polygon_hierarchy
+
+
+class Command(BaseCommand):
+    help = 'Builds the PolygonHierarchy table from the StatePolygon, CountyPolygon, CityPolygon, and CountySubdivisionPolygon tables.'
+
+    def handle(self, *args, **options):
+        num_rows = build_polygon_hierarchy()
+        self.stdout.write(self.style.SUCCESS(f'Created {num_rows} PolygonHierarchy rows.'))
@@ -0,0 +1,17 @@
+"""
+Increases the version of every AHJ in the AHJVersion table, so clients download them again.
+Versions otherwise change when a row serialized with an AHJ changes, so run it with ``python3 manage.py bump_ahj_versions``
+after changing an enum value row.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.versions import bump_ahj_versions
+
+
+class Command(BaseCommand):
+    help = 'Increases the version of every AHJ, changing the ETags of responses with them.'
+
+    def handle(self, *args, **options):
+        num_rows = bump_ahj_versions()
+        self.stdout.write(self.style.SUCCESS(f'Updated {num_rows} AHJVersion rows.'))
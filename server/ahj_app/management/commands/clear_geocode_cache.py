@@ -0,0 +1,24 @@
+"""
+Deletes the expired rows of the GeocodeCacheEntry table with ``python3 manage.py clear_geocode_cache``,
+or every row with ``python3 manage.py clear_geocode_cache --all``.
+Expired rows are never returned, so this only reclaims space.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.geocode_cache import clear_expired_geocode_cache_entries
+from ahj_app.models import GeocodeCacheEntry
+
+
+class Command(BaseCommand):
+    help = 'Deletes the expired geocoded addresses of the geocoding cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Delete every geocoded address, not only the expired ones.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            num_rows = GeocodeCacheEntry.objects.all().delete()[0]
+        else:
+            num_rows = clear_expired_geocode_cache_entries()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {num_rows} GeocodeCacheEntry rows.'))
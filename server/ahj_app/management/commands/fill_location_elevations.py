@@ -0,0 +1,39 @@
+"""
+Sets the Elevation of the Locations with a Latitude and Longitude but no Elevation with
+``python3 manage.py fill_location_elevations``. Elevations are looked up in the DEM tiles of
+``settings.DEM_TILE_DIRECTORY``, and from the geocoder of ``settings.GEOCODER_BACKEND`` for Locations not in a tile.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ahj_app.dem_elevation import batch_elevation, dem_elevation_enabled
+from ahj_app.geocoders import get_geocoder
+from ahj_app.models import Location
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Sets the Elevation of Locations with coordinates but no Elevation from the DEM tiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-fallback', action='store_true', help='Leave Locations not in a DEM tile without an Elevation instead of asking the geocoder.')
+
+    def handle(self, *args, **options):
+        if not dem_elevation_enabled():
+            raise CommandError('settings.DEM_TILE_DIRECTORY is not set.')
+        fallback = None if options['no_fallback'] else get_geocoder().batch_elevation
+        locations = Location.objects.filter(Elevation=None).exclude(Latitude=None).exclude(Longitude=None).order_by('LocationID')
+        num_filled = 0
+        last_location_id = 0
+        while True:
+            batch = list(locations.filter(LocationID__gt=last_location_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            last_location_id = batch[-1].LocationID
+            elevations = batch_elevation([(float(location.Latitude), float(location.Longitude)) for location in batch], fallback=fallback)
+            for location, elevation in zip(batch, elevations):
+                location.Elevation = elevation
+            Location.objects.bulk_update([location for location in batch if location.Elevation is not None], ['Elevation'])
+            num_filled += sum(1 for elevation in elevations if elevation is not None)
+        self.stdout.write(self.style.SUCCESS(f'Set the Elevation of {num_filled} Locations.'))
@@ -0,0 +1,21 @@
+"""
+Loads the ZipCodeCentroid table used by the ``'local'`` geocoder from a Census Gazetteer ZCTA file with
+``python3 manage.py load_zip_code_centroids <file>``. The file is on the Census Bureau's Gazetteer Files page,
+for example ``2020_Gaz_zcta_national.txt``.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.geocoders import load_zip_code_centroids
+
+
+class Command(BaseCommand):
+    help = 'Replaces the ZIP code centroids of the local geocoder with those of a Census Gazetteer ZCTA file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path of the tab-separated Gazetteer ZCTA file.')
+
+    def handle(self, *args, **options):
+        with open(options['file'], newline='', encoding='utf-8') as file:
+            num_rows = load_zip_code_centroids(file)
+        self.stdout.write(self.style.SUCCESS(f'Loaded {num_rows} ZipCodeCentroid rows.'))
@@ -0,0 +1,25 @@
+"""
+Geocodes the pending Locations of the LocationGeocodeTask table with ``python3 manage.py process_geocode_queue``,
+or prints the number of pending and failed tasks with ``python3 manage.py process_geocode_queue --status``.
+The scheduler also processes the queue every ``settings.GEOCODE_QUEUE_INTERVAL_SECONDS``.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ahj_app.geocode_queue import get_geocode_queue_status, process_geocode_queue
+
+
+class Command(BaseCommand):
+    help = 'Geocodes the Locations waiting in the geocoding queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='store_true', help='Print the number of pending and failed tasks instead of processing them.')
+        parser.add_argument('--max-workers', type=int, help='Max number of addresses geocoded at the same time.')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            status = get_geocode_queue_status()
+            self.stdout.write(f'Pending: {status["pending"]}, failed: {status["failed"]}, oldest pending: {status["oldest_pending"]}')
+            return
+        num_geocoded, num_errors = process_geocode_queue(max_workers=options['max_workers'])
+        self.stdout.write(self.style.SUCCESS(f'Geocoded {num_geocoded} Locations, {num_errors} attempts raised an error.'))
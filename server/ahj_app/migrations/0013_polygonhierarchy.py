@@ -0,0 +1,54 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_polygon_hierarchy(apps, schema_editor):
+    PolygonHierarchy = apps.get_model('ahj_app', 'PolygonHierarchy')
+    rows = []
+    for polygon_id in apps.get_model('ahj_app', 'StatePolygon').objects.values_list('PolygonID', flat=True):
+        rows.append(PolygonHierarchy(AncestorPolygonID_id=polygon_id, DescendantPolygonID_id=polygon_id, Depth=0))
+    for model_name in ['CountyPolygon', 'CityPolygon', 'CountySubdivisionPolygon']:
+        for polygon_id, state_polygon_id in apps.get_model('ahj_app', model_name).objects.values_list('PolygonID', 'StatePolygonID'):
+            rows.append(PolygonHierarchy(AncestorPolygonID_id=polygon_id, DescendantPolygonID_id=polygon_id, Depth=0))
+            rows.append(PolygonHierarchy(AncestorPolygonID_id=state_polygon_id, DescendantPolygonID_id=polygon_id, Depth=1))
+    PolygonHierarchy.objects.bulk_create(rows, batch_size=10000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0012_auto_20210718_0416'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolygonHierarchy',
+            fields=[
+                ('PolygonHierarchyID', models.AutoField(db_column='PolygonHierarchyID', primary_key=True, serialize=False)),
+                ('Depth', models.PositiveSmallIntegerField(db_column='Depth')),
+                ('AncestorPolygonID', models.ForeignKey(db_column='AncestorPolygonID', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ahj_app.polygon')),
+                ('DescendantPolygonID', models.ForeignKey(db_column='DescendantPolygonID', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ahj_app.polygon')),
+            ],
+            options={
+                'verbose_name': 'Polygon Hierarchy',
+                'verbose_name_plural': 'Polygon Hierarchy',
+                'db_table': 'PolygonHierarchy',
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='polygonhierarchy',
+            index=models.Index(fields=['AncestorPolygonID', 'Depth'], name='polygonhierarchy_anc_depth'),
+        ),
+        migrations.AddIndex(
+            model_name='polygonhierarchy',
+            index=models.Index(fields=['DescendantPolygonID'], name='polygonhierarchy_desc'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='polygonhierarchy',
+            unique_together={('AncestorPolygonID', 'DescendantPolygonID')},
+        ),
+        migrations.RunPython(build_polygon_hierarchy, migrations.RunPython.noop),
+    ]
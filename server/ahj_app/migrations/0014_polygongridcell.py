@@ -0,0 +1,34 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0013_polygonhierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolygonGridCell',
+            fields=[
+                ('PolygonGridCellID', models.AutoField(db_column='PolygonGridCellID', primary_key=True, serialize=False)),
+                ('CellX', models.IntegerField(db_column='CellX')),
+                ('CellY', models.IntegerField(db_column='CellY')),
+                ('IsInterior', models.BooleanField(db_column='IsInterior')),
+                ('PolygonID', models.ForeignKey(db_column='PolygonID', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ahj_app.polygon')),
+            ],
+            options={
+                'verbose_name': 'Polygon Grid Cell',
+                'verbose_name_plural': 'Polygon Grid Cells',
+                'db_table': 'PolygonGridCell',
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='polygongridcell',
+            index=models.Index(fields=['CellX', 'CellY'], name='polygongridcell_cell'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+def set_polygon_envelopes(apps, schema_editor):
+    Polygon = apps.get_model('ahj_app', 'Polygon')
+    polygons = []
+    for polygon_id, geometry in Polygon.objects.values_list('PolygonID', 'Polygon').iterator():
+        if geometry is None or geometry.empty:
+            continue
+        min_x, min_y, max_x, max_y = geometry.extent
+        polygons.append(Polygon(PolygonID=polygon_id, MinX=min_x, MaxX=max_x, MinY=min_y, MaxY=max_y))
+    Polygon.objects.bulk_update(polygons, ['MinX', 'MaxX', 'MinY', 'MaxY'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0014_polygongridcell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpolygon',
+            name='MaxX',
+            field=models.FloatField(blank=True, db_column='MaxX', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpolygon',
+            name='MaxY',
+            field=models.FloatField(blank=True, db_column='MaxY', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpolygon',
+            name='MinX',
+            field=models.FloatField(blank=True, db_column='MinX', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpolygon',
+            name='MinY',
+            field=models.FloatField(blank=True, db_column='MinY', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='polygon',
+            name='MaxX',
+            field=models.FloatField(blank=True, db_column='MaxX', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='polygon',
+            name='MaxY',
+            field=models.FloatField(blank=True, db_column='MaxY', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='polygon',
+            name='MinX',
+            field=models.FloatField(blank=True, db_column='MinX', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='polygon',
+            name='MinY',
+            field=models.FloatField(blank=True, db_column='MinY', editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='polygon',
+            index=models.Index(fields=['MinX', 'MaxX', 'MinY', 'MaxY'], name='polygon_envelope_x'),
+        ),
+        migrations.AddIndex(
+            model_name='polygon',
+            index=models.Index(fields=['MinY', 'MaxY', 'MinX', 'MaxX'], name='polygon_envelope_y'),
+        ),
+        migrations.RunPython(set_polygon_envelopes, migrations.RunPython.noop),
+    ]
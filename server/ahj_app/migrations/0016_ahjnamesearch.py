@@ -0,0 +1,58 @@
+# Generated by Django 3.1.3 on 2026-10-18 19:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_ahj_name_search(apps, schema_editor):
+    names = {}
+    ahjpks_by_polygon_id = {}
+    for ahjpk, ahj_name, polygon_id in apps.get_model('ahj_app', 'AHJ').objects.values_list('AHJPK', 'AHJName', 'PolygonID').iterator():
+        names[ahjpk] = [ahj_name]
+        if polygon_id is not None:
+            ahjpks_by_polygon_id.setdefault(polygon_id, []).append(ahjpk)
+    for ahjpk, census_name in apps.get_model('ahj_app', 'AHJCensusName').objects.values_list('AHJPK', 'AHJCensusName').iterator():
+        if ahjpk in names:
+            names[ahjpk].append(census_name)
+    for model_name in ['CountyPolygon', 'CityPolygon', 'CountySubdivisionPolygon']:
+        for polygon_id, ls_area_code_name in apps.get_model('ahj_app', model_name).objects.values_list('PolygonID', 'LSAreaCodeName').iterator():
+            for ahjpk in ahjpks_by_polygon_id.get(polygon_id, []):
+                names[ahjpk].append(ls_area_code_name)
+    AHJNameSearch = apps.get_model('ahj_app', 'AHJNameSearch')
+    AHJNameSearch.objects.bulk_create([AHJNameSearch(AHJPK_id=ahjpk, SearchNames='\n'.join(name for name in dict.fromkeys(ahj_names) if name))
+                                       for ahjpk, ahj_names in names.items()], batch_size=10000)
+
+
+def add_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE AHJNameSearch ADD FULLTEXT INDEX ahjnamesearch_fulltext (SearchNames) WITH PARSER ngram')
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE AHJNameSearch DROP INDEX ahjnamesearch_fulltext')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0015_polygon_envelope'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AHJNameSearch',
+            fields=[
+                ('AHJPK', models.OneToOneField(db_column='AHJPK', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='ahj_app.ahj')),
+                ('SearchNames', models.TextField(db_column='SearchNames')),
+            ],
+            options={
+                'verbose_name': 'AHJ Name Search',
+                'verbose_name_plural': 'AHJ Name Search',
+                'db_table': 'AHJNameSearch',
+                'managed': True,
+            },
+        ),
+        migrations.RunPython(build_ahj_name_search, migrations.RunPython.noop),
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.1.3 on 2026-10-18 21:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0017_ahjdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolygonGeometry',
+            fields=[
+                ('PolygonGeometryID', models.AutoField(db_column='PolygonGeometryID', primary_key=True, serialize=False)),
+                ('Detail', models.CharField(db_column='Detail', max_length=10)),
+                ('GeoJSON', models.TextField(db_column='GeoJSON')),
+                ('PolygonID', models.ForeignKey(db_column='PolygonID', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ahj_app.polygon')),
+            ],
+            options={
+                'verbose_name': 'Polygon Geometry',
+                'verbose_name_plural': 'Polygon Geometries',
+                'db_table': 'PolygonGeometry',
+                'managed': True,
+                'unique_together': {('PolygonID', 'Detail')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.3 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0018_polygongeometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AHJVersion',
+            fields=[
+                ('AHJPK', models.OneToOneField(db_column='AHJPK', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='ahj_app.ahj')),
+                ('Version', models.PositiveIntegerField(db_column='Version', default=1)),
+                ('DateModified', models.DateTimeField(db_column='DateModified', default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'AHJ Version',
+                'verbose_name_plural': 'AHJ Versions',
+                'db_table': 'AHJVersion',
+                'managed': True,
+            },
+        ),
+        migrations.AddField(
+            model_name='polygongeometry',
+            name='DateUpdated',
+            field=models.DateTimeField(db_column='DateUpdated', default=django.utils.timezone.now),
+        ),
+    ]
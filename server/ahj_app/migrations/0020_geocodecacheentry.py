@@ -0,0 +1,33 @@
+# Generated by Django 3.1.3 on 2026-10-18 22:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0019_ahjversion_polygongeometry_dateupdated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('AddressKey', models.CharField(db_column='AddressKey', max_length=40, primary_key=True, serialize=False)),
+                ('NormalizedAddress', models.TextField(db_column='NormalizedAddress')),
+                ('Latitude', models.FloatField(db_column='Latitude', null=True)),
+                ('Longitude', models.FloatField(db_column='Longitude', null=True)),
+                ('Elevation', models.FloatField(db_column='Elevation', null=True)),
+                ('IsResolved', models.BooleanField(db_column='IsResolved')),
+                ('DateCached', models.DateTimeField(db_column='DateCached', default=django.utils.timezone.now)),
+                ('DateExpires', models.DateTimeField(db_column='DateExpires', db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Geocode Cache Entry',
+                'verbose_name_plural': 'Geocode Cache Entries',
+                'db_table': 'GeocodeCacheEntry',
+                'managed': True,
+            },
+        ),
+    ]
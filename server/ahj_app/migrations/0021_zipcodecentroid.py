@@ -0,0 +1,27 @@
+# Generated by Django 3.1.3 on 2026-10-18 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0020_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZipCodeCentroid',
+            fields=[
+                ('ZipCode', models.CharField(db_column='ZipCode', max_length=5, primary_key=True, serialize=False)),
+                ('Latitude', models.FloatField(db_column='Latitude')),
+                ('Longitude', models.FloatField(db_column='Longitude')),
+            ],
+            options={
+                'verbose_name': 'ZIP Code Centroid',
+                'verbose_name_plural': 'ZIP Code Centroids',
+                'db_table': 'ZipCodeCentroid',
+                'managed': True,
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.1.3 on 2026-10-18 23:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0021_zipcodecentroid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AddressJurisdiction',
+            fields=[
+                ('PolygonID', models.OneToOneField(db_column='PolygonID', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='ahj_app.polygon')),
+                ('Level', models.CharField(db_column='Level', max_length=6)),
+                ('StateProvince', models.CharField(db_column='StateProvince', max_length=2)),
+                ('PolygonIDs', models.TextField(db_column='PolygonIDs')),
+                ('IsExact', models.BooleanField(db_column='IsExact')),
+            ],
+            options={
+                'verbose_name': 'Address Jurisdiction',
+                'verbose_name_plural': 'Address Jurisdictions',
+                'db_table': 'AddressJurisdiction',
+                'managed': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='AddressJurisdictionKey',
+            fields=[
+                ('AddressJurisdictionKeyID', models.AutoField(db_column='AddressJurisdictionKeyID', primary_key=True, serialize=False)),
+                ('KeyType', models.CharField(db_column='KeyType', max_length=4)),
+                ('StateProvince', models.CharField(db_column='StateProvince', max_length=2)),
+                ('Key', models.CharField(db_column='Key', max_length=100)),
+                ('PolygonID', models.ForeignKey(db_column='PolygonID', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ahj_app.addressjurisdiction')),
+            ],
+            options={
+                'verbose_name': 'Address Jurisdiction Key',
+                'verbose_name_plural': 'Address Jurisdiction Keys',
+                'db_table': 'AddressJurisdictionKey',
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='addressjurisdictionkey',
+            index=models.Index(fields=['KeyType', 'Key', 'StateProvince'], name='addressjurisdictionkey_key'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.3 on 2026-10-18 23:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0022_addressjurisdiction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationGeocodeTask',
+            fields=[
+                ('LocationID', models.OneToOneField(db_column='LocationID', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='ahj_app.location')),
+                ('Address', models.TextField(db_column='Address')),
+                ('Status', models.CharField(db_column='Status', default='P', max_length=1)),
+                ('Attempts', models.PositiveSmallIntegerField(db_column='Attempts', default=0)),
+                ('DateQueued', models.DateTimeField(db_column='DateQueued', default=django.utils.timezone.now)),
+                ('DateNextAttempt', models.DateTimeField(db_column='DateNextAttempt', default=django.utils.timezone.now)),
+                ('LastError', models.TextField(blank=True, db_column='LastError')),
+            ],
+            options={
+                'verbose_name': 'Location Geocode Task',
+                'verbose_name_plural': 'Location Geocode Tasks',
+                'db_table': 'LocationGeocodeTask',
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='locationgeocodetask',
+            index=models.Index(fields=['Status', 'DateNextAttempt'], name='locationgeocodetask_due'),
+        ),
+    ]
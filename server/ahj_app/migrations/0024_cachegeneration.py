@@ -0,0 +1,26 @@
+# Generated by Django 3.1.3 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ahj_app', '0023_locationgeocodetask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('Name', models.CharField(db_column='Name', max_length=100, primary_key=True, serialize=False)),
+                ('Generation', models.BigIntegerField(db_column='Generation', default=0)),
+            ],
+            options={
+                'verbose_name': 'Cache Generation',
+                'verbose_name_plural': 'Cache Generations',
+                'db_table': 'CacheGeneration',
+                'managed': True,
+            },
+        ),
+    ]
@@ -26,8 +26,33 @@ import rest_framework.authtoken.models
 from taggit.managers import TaggableManager
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from simple_history.models import HistoricalRecords
+import functools
 import uuid
 
+
+def prefetchable(method):
+    """
+    Decorator for methods returning an object's children that lets ``prefetch.py`` set their result beforehand.
+    If the object has a prefetched result for the method, it is returned instead of querying the database.
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        prefetched = getattr(self, '_prefetched_children', None)
+        if prefetched is not None and method.__name__ in prefetched:
+            return prefetched[method.__name__]
+        return method(self)
+    return wrapper
+
+
+def set_prefetched(instance, method_name, value):
+    """
+    Sets the prefetched result of a ``prefetchable`` method of ``instance``.
+    """
+    if getattr(instance, '_prefetched_children', None) is None:
+        instance._prefetched_children = {}
+    instance._prefetched_children[method_name] = value
+
+
 class AHJ(models.Model):
     AHJPK = models.AutoField(db_column='AHJPK', primary_key=True)
     AHJID = models.CharField(db_column='AHJID', unique=True, max_length=36)
@@ -61,42 +86,55 @@ class AHJ(models.Model):
         verbose_name_plural = 'AHJs'
 
 
+    @prefetchable
     def get_contacts(self):
         return Contact.objects.filter(ParentTable='AHJ', ParentID=self.AHJPK, ContactStatus=True)
 
+    @prefetchable
     def get_unconfirmed(self):
         return Contact.objects.filter(ParentTable='AHJ', ParentID=self.AHJPK, ContactStatus=None)
 
+    @prefetchable
     def get_comments(self):
         return Comment.objects.filter(AHJPK=self.AHJPK).order_by('-Date')
 
+    @prefetchable
     def get_inspections(self):
         return AHJInspection.objects.filter(AHJPK=self.AHJPK, InspectionStatus=True)
 
+    @prefetchable
     def get_unconfirmed_inspections(self):
         return AHJInspection.objects.filter(AHJPK=self.AHJPK, InspectionStatus=None)
 
+    @prefetchable
     def get_document_submission_methods(self):
         return AHJDocumentSubmissionMethodUse.objects.filter(AHJPK=self.AHJPK, MethodStatus=True)
 
+    @prefetchable
     def get_uncon_dsm(self):
         return AHJDocumentSubmissionMethodUse.objects.filter(AHJPK=self.AHJPK, MethodStatus=None)
 
+    @prefetchable
     def get_permit_submission_methods(self):
         return AHJPermitIssueMethodUse.objects.filter(AHJPK=self.AHJPK, MethodStatus=True)
 
+    @prefetchable
     def get_uncon_pim(self):
         return AHJPermitIssueMethodUse.objects.filter(AHJPK=self.AHJPK, MethodStatus=None)
 
+    @prefetchable
     def get_err(self):
         return EngineeringReviewRequirement.objects.filter(AHJPK=self.AHJPK, EngineeringReviewRequirementStatus=True)
 
+    @prefetchable
     def get_uncon_err(self):
         return EngineeringReviewRequirement.objects.filter(AHJPK=self.AHJPK, EngineeringReviewRequirementStatus=None)
 
+    @prefetchable
     def get_fee_structures(self):
         return FeeStructure.objects.filter(AHJPK=self.AHJPK, FeeStructureStatus=True)
 
+    @prefetchable
     def get_uncon_fs(self):
         return FeeStructure.objects.filter(AHJPK=self.AHJPK, FeeStructureStatus=None)
 
@@ -114,6 +152,7 @@ class Comment(models.Model):
     ReplyingTo = models.IntegerField(db_column='ReplyingTo', null=True)
     history = HistoricalRecords()
 
+    @prefetchable
     def get_replies(self):
         return Comment.objects.filter(ReplyingTo=self.CommentID).order_by('-Date')
 
@@ -200,9 +239,11 @@ class AHJInspection(models.Model):
     InspectionStatus = models.BooleanField(db_column='InspectionStatus', null=True)
     history = HistoricalRecords()
 
+    @prefetchable
     def get_contacts(self):
         return Contact.objects.filter(ParentTable='AHJInspection', ParentID=self.InspectionID, ContactStatus=True)
 
+    @prefetchable
     def get_uncon_con(self):
         return Contact.objects.filter(ParentTable='AHJInspection', ParentID=self.InspectionID, ContactStatus=None)
 
@@ -444,6 +485,14 @@ class Polygon(models.Model):
                                             help_text="""Latitude of a coordinate within the area of the Polygon. Census name: INTPLAT.""")
     InternalPLongitude = models.DecimalField(db_column='InternalPLongitude', max_digits=11, decimal_places=8,
                                              help_text="""Longitude of a coordinate within the area of the Polygon. Census name: INTPLON.""")
+    MinX = models.FloatField(db_column='MinX', null=True, blank=True, editable=False,
+                             help_text="""Minimum longitude of the Polygon's bounding box. Set when the Polygon is saved.""")
+    MaxX = models.FloatField(db_column='MaxX', null=True, blank=True, editable=False,
+                             help_text="""Maximum longitude of the Polygon's bounding box. Set when the Polygon is saved.""")
+    MinY = models.FloatField(db_column='MinY', null=True, blank=True, editable=False,
+                             help_text="""Minimum latitude of the Polygon's bounding box. Set when the Polygon is saved.""")
+    MaxY = models.FloatField(db_column='MaxY', null=True, blank=True, editable=False,
+                             help_text="""Maximum latitude of the Polygon's bounding box. Set when the Polygon is saved.""")
     history = HistoricalRecords()
 
     class Meta:
@@ -451,6 +500,23 @@ class Polygon(models.Model):
         db_table = 'Polygon'
         verbose_name = 'Polygon'
         verbose_name_plural = 'Polygons'
+        indexes = [
+            models.Index(fields=['MinX', 'MaxX', 'MinY', 'MaxY'], name='polygon_envelope_x'),
+            models.Index(fields=['MinY', 'MaxY', 'MinX', 'MaxX'], name='polygon_envelope_y')
+        ]
+
+    def set_envelope(self):
+        """
+        Sets MinX, MaxX, MinY, and MaxY to the bounding box of the Polygon.
+        """
+        if self.Polygon is None or self.Polygon.empty:
+            self.MinX = self.MaxX = self.MinY = self.MaxY = None
+        else:
+            self.MinX, self.MinY, self.MaxX, self.MaxY = self.Polygon.extent
+
+    def save(self, *args, **kwargs):
+        self.set_envelope()
+        super().save(*args, **kwargs)
 
 class StatePolygon(models.Model):
     PolygonID = models.OneToOneField(Polygon, models.DO_NOTHING, db_column='PolygonID', primary_key=True)
@@ -505,6 +571,70 @@ class CountySubdivisionPolygon(models.Model):
         verbose_name = 'County Subdivision Polygon'
         verbose_name_plural = 'County Subdivision Polygons'
 
+class PolygonHierarchy(models.Model):
+    """
+    Closure table of the State -> County/City/CountySubdivision polygon hierarchy.
+    Each searchable polygon has a row with itself as its ancestor (``Depth=0``), and each
+    County, City, and CountySubdivision polygon has a row with its StatePolygon as its ancestor (``Depth=1``).
+    It is built by ``polygon_hierarchy.build_polygon_hierarchy`` and kept up to date when polygons are added or replaced.
+    """
+    PolygonHierarchyID = models.AutoField(db_column='PolygonHierarchyID', primary_key=True)
+    AncestorPolygonID = models.ForeignKey('Polygon', models.CASCADE, db_column='AncestorPolygonID', related_name='+')
+    DescendantPolygonID = models.ForeignKey('Polygon', models.CASCADE, db_column='DescendantPolygonID', related_name='+')
+    Depth = models.PositiveSmallIntegerField(db_column='Depth')
+
+    class Meta:
+        managed = True
+        db_table = 'PolygonHierarchy'
+        verbose_name = 'Polygon Hierarchy'
+        verbose_name_plural = 'Polygon Hierarchy'
+        unique_together = (('AncestorPolygonID', 'DescendantPolygonID'),)
+        indexes = [
+            models.Index(fields=['AncestorPolygonID', 'Depth'], name='polygonhierarchy_anc_depth'),
+            models.Index(fields=['DescendantPolygonID'], name='polygonhierarchy_desc')
+        ]
+
+class PolygonGridCell(models.Model):
+    """
+    Grid index of which searchable polygons cover or touch each fixed-resolution cell of longitude and latitude.
+    A cell ``(CellX, CellY)`` spans ``[CellX * size, (CellX + 1) * size)`` by ``[CellY * size, (CellY + 1) * size)``
+    degrees, where size is ``settings.POLYGON_GRID_CELL_SIZE``. ``IsInterior`` is ``True`` if the cell is entirely
+    inside the polygon, so any point in the cell is in the polygon without testing its geometry.
+    It is built by ``polygon_grid.build_polygon_grid``.
+    """
+    PolygonGridCellID = models.AutoField(db_column='PolygonGridCellID', primary_key=True)
+    CellX = models.IntegerField(db_column='CellX')
+    CellY = models.IntegerField(db_column='CellY')
+    PolygonID = models.ForeignKey('Polygon', models.CASCADE, db_column='PolygonID', related_name='+')
+    IsInterior = models.BooleanField(db_column='IsInterior')
+
+    class Meta:
+        managed = True
+        db_table = 'PolygonGridCell'
+        verbose_name = 'Polygon Grid Cell'
+        verbose_name_plural = 'Polygon Grid Cells'
+        indexes = [
+            models.Index(fields=['CellX', 'CellY'], name='polygongridcell_cell')
+        ]
+
+class PolygonGeometry(models.Model):
+    """
+    The encoded GeoJSON geometry of a polygon at a level of detail, so it is not simplified and encoded on each request.
+    It is built and kept up to date by ``polygon_geometry.py``.
+    """
+    PolygonGeometryID = models.AutoField(db_column='PolygonGeometryID', primary_key=True)
+    PolygonID = models.ForeignKey('Polygon', models.CASCADE, db_column='PolygonID', related_name='+')
+    Detail = models.CharField(db_column='Detail', max_length=10)
+    GeoJSON = models.TextField(db_column='GeoJSON')
+    DateUpdated = models.DateTimeField(db_column='DateUpdated', default=now)
+
+    class Meta:
+        managed = True
+        db_table = 'PolygonGeometry'
+        verbose_name = 'Polygon Geometry'
+        verbose_name_plural = 'Polygon Geometries'
+        unique_together = (('PolygonID', 'Detail'),)
+
 class SunspecAllianceMember(models.Model):
     MemberID = models.AutoField(db_column='MemberID', primary_key=True)
     MemberName = models.CharField(db_column='MemberName', max_length=254, unique=True)
@@ -581,12 +711,14 @@ class User(AbstractBaseUser):
     def get_email_field_name(self=None):
         return "Email"
 
+    @prefetchable
     def get_maintained_ahjs(self):
         return AHJUserMaintains.objects.filter(UserID=self, MaintainerStatus=True).values_list('AHJPK__AHJPK')
 
     def is_ahj_official(self):
-        return self.get_maintained_ahjs().count() > 0
+        return len(self.get_maintained_ahjs()) > 0
 
+    @prefetchable
     def get_API_token(self):
         return APIToken.objects.filter(user=self).first()
 
@@ -780,3 +912,168 @@ class AHJCensusName(models.Model):
     class Meta:
         verbose_name = 'AHJ Census Name'
         verbose_name_plural = 'AHJ Census Names'
+
+
+class AHJNameSearch(models.Model):
+    """
+    The names an AHJ can be searched by: its AHJName, its AHJCensusName, and the LSAreaCodeName of its polygon,
+    one per line. On MySQL, ``SearchNames`` has a FULLTEXT index using the ngram parser.
+    It is kept up to date by ``name_search.py``.
+    """
+    AHJPK = models.OneToOneField('AHJ', on_delete=models.CASCADE, db_column='AHJPK', primary_key=True, related_name='+')
+    SearchNames = models.TextField(db_column='SearchNames')
+
+    class Meta:
+        managed = True
+        db_table = 'AHJNameSearch'
+        verbose_name = 'AHJ Name Search'
+        verbose_name_plural = 'AHJ Name Search'
+
+
+class AHJDocument(models.Model):
+    """
+    The serialized JSON of an AHJ for the public API and for the webpage, so they can be returned without serializing the AHJ.
+    It is kept up to date by ``documents.py``.
+    """
+    AHJPK = models.OneToOneField('AHJ', on_delete=models.CASCADE, db_column='AHJPK', primary_key=True, related_name='+')
+    PublicDocument = models.TextField(db_column='PublicDocument')
+    PrivateDocument = models.TextField(db_column='PrivateDocument')
+    DateUpdated = models.DateTimeField(db_column='DateUpdated', default=now)
+
+    class Meta:
+        managed = True
+        db_table = 'AHJDocument'
+        verbose_name = 'AHJ Document'
+        verbose_name_plural = 'AHJ Documents'
+
+
+class AHJVersion(models.Model):
+    """
+    A version number of an AHJ that increases each time a row serialized with the AHJ is saved or deleted,
+    and the date it last changed. They are the ETag and Last-Modified of responses with the AHJ.
+    It is kept up to date by ``versions.py``.
+    """
+    AHJPK = models.OneToOneField('AHJ', on_delete=models.CASCADE, db_column='AHJPK', primary_key=True, related_name='+')
+    Version = models.PositiveIntegerField(db_column='Version', default=1)
+    DateModified = models.DateTimeField(db_column='DateModified', default=now)
+
+    class Meta:
+        managed = True
+        db_table = 'AHJVersion'
+        verbose_name = 'AHJ Version'
+        verbose_name_plural = 'AHJ Versions'
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    The Latitude, Longitude, and Elevation of a geocoded address, or that it could not be geocoded (``IsResolved=False``).
+    ``AddressKey`` is the SHA-1 hex digest of the normalized address. It is kept by ``geocode_cache.py``.
+    """
+    AddressKey = models.CharField(db_column='AddressKey', max_length=40, primary_key=True)
+    NormalizedAddress = models.TextField(db_column='NormalizedAddress')
+    Latitude = models.FloatField(db_column='Latitude', null=True)
+    Longitude = models.FloatField(db_column='Longitude', null=True)
+    Elevation = models.FloatField(db_column='Elevation', null=True)
+    IsResolved = models.BooleanField(db_column='IsResolved')
+    DateCached = models.DateTimeField(db_column='DateCached', default=now)
+    DateExpires = models.DateTimeField(db_column='DateExpires', db_index=True)
+
+    class Meta:
+        managed = True
+        db_table = 'GeocodeCacheEntry'
+        verbose_name = 'Geocode Cache Entry'
+        verbose_name_plural = 'Geocode Cache Entries'
+
+
+class ZipCodeCentroid(models.Model):
+    """
+    The internal point of a ZIP Code Tabulation Area (ZCTA) from the Census Gazetteer ZCTA file.
+    Addresses are geocoded to it by the ``'local'`` geocoder of ``geocoders.py``.
+    """
+    ZipCode = models.CharField(db_column='ZipCode', max_length=5, primary_key=True)
+    Latitude = models.FloatField(db_column='Latitude')
+    Longitude = models.FloatField(db_column='Longitude')
+
+    class Meta:
+        managed = True
+        db_table = 'ZipCodeCentroid'
+        verbose_name = 'ZIP Code Centroid'
+        verbose_name_plural = 'ZIP Code Centroids'
+
+
+class AddressJurisdiction(models.Model):
+    """
+    A City or County polygon that addresses can be matched to without geocoding them, the sorted JSON list of the
+    PolygonIDs of the polygons containing it, and if every address in it is in those polygons (``IsExact``).
+    It is built by ``address_index.py``.
+    """
+    PolygonID = models.OneToOneField('Polygon', on_delete=models.CASCADE, db_column='PolygonID', primary_key=True, related_name='+')
+    Level = models.CharField(db_column='Level', max_length=6)
+    StateProvince = models.CharField(db_column='StateProvince', max_length=2)
+    PolygonIDs = models.TextField(db_column='PolygonIDs')
+    IsExact = models.BooleanField(db_column='IsExact')
+
+    class Meta:
+        managed = True
+        db_table = 'AddressJurisdiction'
+        verbose_name = 'Address Jurisdiction'
+        verbose_name_plural = 'Address Jurisdictions'
+
+
+class AddressJurisdictionKey(models.Model):
+    """
+    A normalized name (``KeyType='name'``) or ZIP code (``KeyType='zip'``) in a state that matches an AddressJurisdiction.
+    It is built by ``address_index.py``.
+    """
+    AddressJurisdictionKeyID = models.AutoField(db_column='AddressJurisdictionKeyID', primary_key=True)
+    KeyType = models.CharField(db_column='KeyType', max_length=4)
+    StateProvince = models.CharField(db_column='StateProvince', max_length=2)
+    Key = models.CharField(db_column='Key', max_length=100)
+    PolygonID = models.ForeignKey('AddressJurisdiction', models.CASCADE, db_column='PolygonID', related_name='+')
+
+    class Meta:
+        managed = True
+        db_table = 'AddressJurisdictionKey'
+        verbose_name = 'Address Jurisdiction Key'
+        verbose_name_plural = 'Address Jurisdiction Keys'
+        indexes = [
+            models.Index(fields=['KeyType', 'Key', 'StateProvince'], name='addressjurisdictionkey_key')
+        ]
+
+
+class LocationGeocodeTask(models.Model):
+    """
+    A Location waiting to be geocoded to the ``Address`` string, with a ``Status`` of ``'P'`` (pending) or ``'F'`` (failed).
+    It is added and processed by ``geocode_queue.py``.
+    """
+    LocationID = models.OneToOneField('Location', on_delete=models.CASCADE, db_column='LocationID', primary_key=True, related_name='+')
+    Address = models.TextField(db_column='Address')
+    Status = models.CharField(db_column='Status', max_length=1, default='P')
+    Attempts = models.PositiveSmallIntegerField(db_column='Attempts', default=0)
+    DateQueued = models.DateTimeField(db_column='DateQueued', default=now)
+    DateNextAttempt = models.DateTimeField(db_column='DateNextAttempt', default=now)
+    LastError = models.TextField(db_column='LastError', blank=True)
+
+    class Meta:
+        managed = True
+        db_table = 'LocationGeocodeTask'
+        verbose_name = 'Location Geocode Task'
+        verbose_name_plural = 'Location Geocode Tasks'
+        indexes = [
+            models.Index(fields=['Status', 'DateNextAttempt'], name='locationgeocodetask_due')
+        ]
+
+
+class CacheGeneration(models.Model):
+    """
+    The generation of a cache shared between worker processes, which changes each time the cache is invalidated.
+    It is kept in a table, instead of in the cache, so it is never culled or expired with the cache's entries.
+    """
+    Name = models.CharField(db_column='Name', max_length=100, primary_key=True)
+    Generation = models.BigIntegerField(db_column='Generation', default=0)
+
+    class Meta:
+        managed = True
+        db_table = 'CacheGeneration'
+        verbose_name = 'Cache Generation'
+        verbose_name_plural = 'Cache Generations'
@@ -0,0 +1,393 @@
+"""
+Searches AHJs by name.
+
+Each AHJ has a row in the AHJNameSearch table with the names it can be searched by: its AHJName,
+its AHJCensusName, and the LSAreaCodeName of its polygon. A name matches a search if it contains the
+searched text, ignoring case and repeated whitespace. The table is searched by one of two backends,
+chosen by ``settings.NAME_SEARCH_BACKEND``:
+    - ``'fulltext'``: MySQL's FULLTEXT index of the table, which uses the ngram parser so that
+      any part of a name can be matched.
+    - ``'trigram'``: An in-process index of the three-character substrings (trigrams) of each name.
+      The AHJs with every trigram of the searched text are found by intersecting the AHJs of each
+      trigram, and then only their names are checked for the searched text.
+
+Text too short for the backend's index, or whose trigrams are in the names of more than
+``settings.NAME_SEARCH_MAX_TRIGRAM_CANDIDATES`` AHJs, such as ``"co"``, is instead matched with a
+``LIKE`` condition on the AHJNameSearch table, so the matches are not checked in Python and bound as parameters.
+
+The table is rebuilt by ``build_ahj_name_search`` (``python3 manage.py build_ahj_name_search``). While
+``settings.NAME_SEARCH_ENABLED``, saving an AHJ, AHJCensusName, or CountyPolygon, CityPolygon, or
+CountySubdivisionPolygon row updates the rows of the AHJs whose names changed. Like spatial_index.py,
+changes bump a version number stored in the Django cache so that other worker processes reload
+their trigram index, which they check at most every ``settings.NAME_SEARCH_VERSION_CHECK_SECONDS``.
+
+``typeahead`` returns a few matching AHJs ranked by relevance: AHJs with a name equal to the searched text,
+then those with a name starting with it, then those with a word of a name starting with it, then the rest.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.pagination import _positive_int
+
+from .models import AHJ, AHJCensusName, AHJNameSearch, CountyPolygon, CityPolygon, CountySubdivisionPolygon
+
+NAME_SEARCH_VERSION_CACHE_KEY = 'name-search-version'
+
+TYPEAHEAD_DEFAULT_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+
+# Models with a LSAreaCodeName of the polygon an AHJ is paired to
+LSAREACODENAME_POLYGON_MODELS = [CountyPolygon, CityPolygon, CountySubdivisionPolygon]
+
+# Relevance of a name that is, starts with, has a word starting with, or contains the searched text
+RELEVANCE_EXACT = 3
+RELEVANCE_PREFIX = 2
+RELEVANCE_WORD_PREFIX = 1
+RELEVANCE_CONTAINS = 0
+
+
+def name_search_enabled():
+    return getattr(settings, 'NAME_SEARCH_ENABLED', False)
+
+
+def get_max_trigram_candidates():
+    return getattr(settings, 'NAME_SEARCH_MAX_TRIGRAM_CANDIDATES', 1000)
+
+
+def get_name_search_backend():
+    """
+    Returns the configured backend, which is ``'trigram'`` when the database does not support FULLTEXT indexes.
+    """
+    backend = getattr(settings, 'NAME_SEARCH_BACKEND', 'trigram')
+    if backend == 'fulltext' and connection.vendor != 'mysql':
+        return 'trigram'
+    return backend
+
+
+def normalize_name(name):
+    """
+    Returns a name in lowercase with its whitespace collapsed to single spaces.
+    """
+    return ' '.join(name.lower().split())
+
+
+def get_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def get_relevance(name, text):
+    """
+    Returns the relevance of a normalized name to the normalized searched text, or ``None`` if it does not match.
+    """
+    if name == text:
+        return RELEVANCE_EXACT
+    if name.startswith(text):
+        return RELEVANCE_PREFIX
+    if (' ' + name).find(' ' + text) != -1:
+        return RELEVANCE_WORD_PREFIX
+    if text in name:
+        return RELEVANCE_CONTAINS
+    return None
+
+
+def get_ahj_search_names(ahjpks=None):
+    """
+    Returns a dict of each AHJPK to its list of names, optionally only for the given AHJPKs.
+    """
+    ahjs = AHJ.objects.all()
+    census_names = AHJCensusName.objects.all()
+    if ahjpks is not None:
+        ahjs = ahjs.filter(AHJPK__in=ahjpks)
+        census_names = census_names.filter(AHJPK__in=ahjpks)
+    names = {}
+    ahjpks_by_polygon_id = {}
+    for ahjpk, ahj_name, polygon_id in ahjs.values_list('AHJPK', 'AHJName', 'PolygonID').iterator():
+        names[ahjpk] = [ahj_name]
+        if polygon_id is not None:
+            ahjpks_by_polygon_id.setdefault(polygon_id, []).append(ahjpk)
+    for ahjpk, census_name in census_names.values_list('AHJPK', 'AHJCensusName').iterator():
+        if ahjpk in names:
+            names[ahjpk].append(census_name)
+    for model in LSAREACODENAME_POLYGON_MODELS:
+        for polygon_id, ls_area_code_name in model.objects.filter(PolygonID__in=ahjpks_by_polygon_id.keys()).values_list('PolygonID', 'LSAreaCodeName').iterator():
+            for ahjpk in ahjpks_by_polygon_id[polygon_id]:
+                names[ahjpk].append(ls_area_code_name)
+    return {ahjpk: [name for name in dict.fromkeys(ahj_names) if name] for ahjpk, ahj_names in names.items()}
+
+
+def build_ahj_name_search(ahjpks=None):
+    """
+    Rebuilds the AHJNameSearch rows of the given AHJPKs, or the whole table if ``ahjpks`` is ``None``.
+    Returns the number of rows created.
+    """
+    rows = [AHJNameSearch(AHJPK_id=ahjpk, SearchNames='\n'.join(names)) for ahjpk, names in get_ahj_search_names(ahjpks).items()]
+    with transaction.atomic():
+        if ahjpks is None:
+            AHJNameSearch.objects.all().delete()
+        else:
+            AHJNameSearch.objects.filter(AHJPK__in=ahjpks).delete()
+        AHJNameSearch.objects.bulk_create(rows, batch_size=10000)
+    mark_ahjs_changed(ahjpks)
+    return len(rows)
+
+
+class TrigramNameIndex:
+    """
+    In-process index of the trigrams of the names in the AHJNameSearch table.
+    """
+    def __init__(self):
+        self.names = {}
+        self.trigrams = {}
+
+    def load(self, ahjpks=None):
+        """
+        Loads every row of the AHJNameSearch table, or reloads only the rows of the given AHJPKs.
+        """
+        rows = AHJNameSearch.objects.all()
+        if ahjpks is None:
+            self.names.clear()
+            self.trigrams.clear()
+        else:
+            rows = rows.filter(AHJPK__in=ahjpks)
+            for ahjpk in ahjpks:
+                self.remove(ahjpk)
+        for ahjpk, search_names in rows.values_list('AHJPK', 'SearchNames').iterator():
+            self.add(ahjpk, search_names.split('\n'))
+
+    def add(self, ahjpk, names):
+        names = [normalize_name(name) for name in names]
+        self.names[ahjpk] = names
+        for name in names:
+            for trigram in get_trigrams(name):
+                self.trigrams.setdefault(trigram, set()).add(ahjpk)
+
+    def remove(self, ahjpk):
+        for name in self.names.pop(ahjpk, []):
+            for trigram in get_trigrams(name):
+                ahjpks = self.trigrams.get(trigram)
+                if ahjpks is not None:
+                    ahjpks.discard(ahjpk)
+                    if not ahjpks:
+                        del self.trigrams[trigram]
+
+    def get_candidates(self, text):
+        """
+        Returns the AHJPKs with every trigram of the text, or every AHJPK if the text is shorter than a trigram.
+        """
+        trigrams = get_trigrams(text)
+        if not trigrams:
+            return self.names.keys()
+        postings = sorted((self.trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+        return set.intersection(*postings)
+
+    def search(self, text, max_candidates=None):
+        """
+        Returns a dict of each matching AHJPK to its relevance, or None if ``max_candidates`` is given and the text is
+        shorter than a trigram or more AHJs than it have every trigram of the text.
+        """
+        text = normalize_name(text)
+        candidates = self.get_candidates(text)
+        if max_candidates is not None and (len(text) < 3 or len(candidates) > max_candidates):
+            return None
+        matches = {}
+        for ahjpk in candidates:
+            relevances = [relevance for relevance in (get_relevance(name, text) for name in self.names[ahjpk]) if relevance is not None]
+            if relevances:
+                matches[ahjpk] = max(relevances)
+        return matches
+
+
+_index = None
+_index_version = None
+_index_checked_at = 0
+_changed_ahjpks = set()
+_index_lock = threading.Lock()
+
+
+def get_trigram_index():
+    """
+    Returns this process' trigram index, loading or refreshing it first if needed.
+    """
+    global _index, _index_version, _index_checked_at
+    with _index_lock:
+        now = time.monotonic()
+        if _index is not None and now - _index_checked_at >= getattr(settings, 'NAME_SEARCH_VERSION_CHECK_SECONDS', 60):
+            _index_checked_at = now
+            if cache.get(NAME_SEARCH_VERSION_CACHE_KEY, 0) != _index_version:
+                _index = None
+        if _index is None:
+            _index_version = cache.get(NAME_SEARCH_VERSION_CACHE_KEY, 0)
+            _index_checked_at = now
+            _changed_ahjpks.clear()
+            _index = TrigramNameIndex()
+            _index.load()
+        elif _changed_ahjpks:
+            _index.load(ahjpks=list(_changed_ahjpks))
+            _changed_ahjpks.clear()
+        return _index
+
+
+def mark_ahjs_changed(ahjpks=None):
+    """
+    Marks AHJs to be reloaded by this process' trigram index, or the whole index if ``ahjpks`` is ``None``,
+    and tells other processes to reload their index.
+    """
+    global _index, _index_version
+    with _index_lock:
+        if ahjpks is None:
+            _index = None
+        else:
+            _changed_ahjpks.update(ahjpks)
+        version = time.time_ns()
+        cache.set(NAME_SEARCH_VERSION_CACHE_KEY, version, None)
+        _index_version = version
+
+
+def get_fulltext_query(text):
+    """
+    Returns a MySQL boolean mode full-text search of the text as a phrase, which the
+    ngram parser matches against every name containing the text.
+    """
+    return '"' + normalize_name(text.replace('"', ' ')) + '"'
+
+
+def fulltext_searchable(text):
+    """
+    Checks if the text is at least as long as the ngram parser's tokens, which are two characters by default.
+    """
+    return len(normalize_name(text.replace('"', ' '))) >= getattr(settings, 'NAME_SEARCH_NGRAM_TOKEN_SIZE', 2)
+
+
+def add_name_cond(search, text):
+    """
+    Adds the condition that an AHJ has a name containing the text to an AHJSearchBuilder.
+    """
+    if get_name_search_backend() == 'fulltext' and fulltext_searchable(text):
+        search.add_cond('fulltext', 'AHJName', get_fulltext_query(text))
+        return
+    matches = get_trigram_index().search(text, max_candidates=get_max_trigram_candidates())
+    if matches is None:
+        search.add_cond('name_search', 'AHJName', normalize_name(text))
+    else:
+        search.add_cond('name_in', 'AHJName', sorted(matches))
+
+
+def is_typeahead_requested(request):
+    """
+    Checks if a search endpoint is asked for a typeahead search with the ``typeahead=true`` query parameter.
+    """
+    return request.query_params.get('typeahead', '').lower() == 'true'
+
+
+def get_typeahead_limit(request):
+    """
+    Returns the ``limit`` query parameter of a typeahead search, which is at most ``TYPEAHEAD_MAX_LIMIT``.
+    """
+    try:
+        return _positive_int(request.query_params['limit'], strict=True, cutoff=TYPEAHEAD_MAX_LIMIT)
+    except (KeyError, ValueError):
+        return TYPEAHEAD_DEFAULT_LIMIT
+
+
+def typeahead(text, limit=TYPEAHEAD_DEFAULT_LIMIT, StateProvince=None):
+    """
+    Returns a list of dicts of the AHJPK, AHJID, AHJName, and StateProvince of
+    at most ``limit`` AHJs with a name containing the text, most relevant first.
+    """
+    if get_name_search_backend() == 'fulltext' and fulltext_searchable(text):
+        return fulltext_typeahead(text, limit, StateProvince)
+    index = get_trigram_index()
+    matches = index.search(text, max_candidates=get_max_trigram_candidates())
+    if matches is None:
+        return like_typeahead(text, limit, StateProvince)
+    return trigram_typeahead(index, matches, limit, StateProvince)
+
+
+def fulltext_typeahead(text, limit, StateProvince):
+    params = {'query': get_fulltext_query(text), 'prefix': normalize_name(text) + '%', 'limit': limit}
+    state_cond = ''
+    if StateProvince is not None:
+        params['StateProvince'] = StateProvince
+        state_cond = ' AND Address.StateProvince=%(StateProvince)s'
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT AHJ.AHJPK, AHJ.AHJID, AHJ.AHJName, Address.StateProvince FROM AHJNameSearch '
+                       'JOIN AHJ ON AHJ.AHJPK = AHJNameSearch.AHJPK '
+                       'LEFT JOIN Address ON AHJ.AddressID = Address.AddressID '
+                       'WHERE MATCH(AHJNameSearch.SearchNames) AGAINST(%(query)s IN BOOLEAN MODE)' + state_cond +
+                       ' ORDER BY AHJ.AHJName LIKE %(prefix)s DESC, '
+                       'MATCH(AHJNameSearch.SearchNames) AGAINST(%(query)s IN BOOLEAN MODE) DESC, '
+                       'CHAR_LENGTH(AHJ.AHJName), AHJ.AHJPK LIMIT %(limit)s;', params)
+        return [{'AHJPK': ahjpk, 'AHJID': ahjid, 'AHJName': ahj_name, 'StateProvince': state_province}
+                for ahjpk, ahjid, ahj_name, state_province in cursor.fetchall()]
+
+
+def like_typeahead(text, limit, StateProvince):
+    """
+    Finds the AHJs with a name containing the text with a ``LIKE`` condition on the AHJNameSearch table,
+    ranking AHJs whose AHJName is or starts with the text first.
+    """
+    text = normalize_name(text)
+    params = {'text': text, 'contains': '%' + text + '%', 'prefix': text + '%', 'limit': limit}
+    state_cond = ''
+    if StateProvince is not None:
+        params['StateProvince'] = StateProvince
+        state_cond = ' AND Address.StateProvince=%(StateProvince)s'
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT AHJ.AHJPK, AHJ.AHJID, AHJ.AHJName, Address.StateProvince FROM AHJNameSearch '
+                       'JOIN AHJ ON AHJ.AHJPK = AHJNameSearch.AHJPK '
+                       'LEFT JOIN Address ON AHJ.AddressID = Address.AddressID '
+                       'WHERE AHJNameSearch.SearchNames LIKE %(contains)s' + state_cond +
+                       ' ORDER BY AHJ.AHJName = %(text)s DESC, AHJ.AHJName LIKE %(prefix)s DESC, '
+                       'CHAR_LENGTH(AHJ.AHJName), AHJ.AHJPK LIMIT %(limit)s;', params)
+        return [{'AHJPK': ahjpk, 'AHJID': ahjid, 'AHJName': ahj_name, 'StateProvince': state_province}
+                for ahjpk, ahjid, ahj_name, state_province in cursor.fetchall()]
+
+
+def trigram_typeahead(index, matches, limit, StateProvince):
+    """
+    Ranks the matches of the trigram index, then fetches the rows of the AHJs of the
+    ranked matches in batches until ``limit`` AHJs in the StateProvince are found.
+    """
+    ranked = sorted(matches, key=lambda ahjpk: (-matches[ahjpk], min(len(name) for name in index.names[ahjpk]), ahjpk))
+    results = []
+    batch_size = max(limit, TYPEAHEAD_DEFAULT_LIMIT)
+    for start in range(0, len(ranked), batch_size):
+        batch = ranked[start:start + batch_size]
+        rows = AHJ.objects.filter(AHJPK__in=batch)
+        if StateProvince is not None:
+            rows = rows.filter(AddressID__StateProvince=StateProvince)
+        rows_by_ahjpk = {row['AHJPK']: row for row in rows.values('AHJPK', 'AHJID', 'AHJName', StateProvince=F('AddressID__StateProvince'))}
+        results.extend(rows_by_ahjpk[ahjpk] for ahjpk in batch if ahjpk in rows_by_ahjpk)
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+@receiver(post_save, sender=AHJ)
+@receiver(post_save, sender=AHJCensusName)
+@receiver(post_delete, sender=AHJCensusName)
+def ahj_names_changed(sender, instance, **kwargs):
+    if name_search_enabled():
+        build_ahj_name_search(ahjpks=[instance.pk])
+
+
+@receiver(post_delete, sender=AHJ)
+def ahj_deleted(sender, instance, **kwargs):
+    if name_search_enabled():
+        mark_ahjs_changed(ahjpks=[instance.pk])
+
+
+@receiver(post_save, sender=CountyPolygon)
+@receiver(post_save, sender=CityPolygon)
+@receiver(post_save, sender=CountySubdivisionPolygon)
+def polygon_name_changed(sender, instance, **kwargs):
+    if name_search_enabled():
+        ahjpks = list(AHJ.objects.filter(PolygonID=instance.PolygonID_id).values_list('AHJPK', flat=True))
+        if ahjpks:
+            build_ahj_name_search(ahjpks=ahjpks)
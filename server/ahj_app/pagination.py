@@ -0,0 +1,92 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class AHJSearchCursorPagination(BasePagination):
+    """
+    Keyset pagination of an AHJSearchQuery.
+
+    A page is requested with a ``cursor`` query parameter, which is empty for the first page,
+    and the ``next`` link of each page has the cursor of the page after it. The cursor is an
+    opaque encoding of the order column values of the last AHJ of the previous page, so a page
+    is queried with ``LIMIT`` only, and no AHJs before or after the page are loaded.
+
+    The ``count`` of AHJs is only queried if the ``count`` query parameter is ``true``.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    count_query_param = 'count'
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        """
+        Checks if the request asks for cursor pagination instead of limit-offset pagination.
+        """
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_query(self, query, request):
+        """
+        Returns the list of AHJs of the page of the AHJSearchQuery requested.
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        after = self.decode_cursor(request, query)
+        ahjs = list(query.raw(after=after, limit=self.limit + 1))
+        self.has_next = len(ahjs) > self.limit
+        ahjs = ahjs[:self.limit]
+        self.next_key = query.get_cursor_key(ahjs[-1]) if self.has_next else None
+        self.count = query.count() if request.query_params.get(self.count_query_param, '').lower() == 'true' else None
+        return ahjs
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(request.query_params[self.limit_query_param], strict=True, cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def encode_cursor(self, key):
+        return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request, query):
+        """
+        Returns the order column values encoded in the cursor query parameter, or ``None`` for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param, '')
+        if encoded == '':
+            return None
+        try:
+            key = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(key, list) or len(key) != len(query.order_columns) or \
+                not all(isinstance(value, int) and not isinstance(value, bool) for value in key):
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_key))
+
+    def get_previous_link(self):
+        return None
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -0,0 +1,155 @@
+"""
+Cached GeoJSON geometries of polygons at several levels of detail.
+
+Census polygons have up to hundreds of thousands of coordinates, so encoding a polygon's geometry for every
+AHJ serialized is slow, and a State's geometry is several megabytes. The levels of detail are:
+    - ``full``: the polygon's geometry, as serialized by ``PolygonSerializer`` without the cache.
+    - Each level in ``settings.POLYGON_GEOMETRY_DETAILS``: the geometry simplified with the level's tolerance,
+      in degrees, and rounded to ``settings.POLYGON_GEOMETRY_PRECISION`` decimal places.
+    - ``none``: no geometry, for clients that only use the polygon's properties.
+
+The encoded GeoJSON of each polygon and level is stored in the PolygonGeometry table the first time it is
+serialized, or by ``python3 manage.py build_polygon_geometries``. A polygon's geometries are deleted when it is saved.
+The level is chosen with the ``geometry_detail`` query parameter, which defaults to ``settings.POLYGON_GEOMETRY_DEFAULT_DETAIL``.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.gis.geos import MultiPolygon
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework.exceptions import ParseError
+from rest_framework_gis.fields import GeometryField
+
+from .models import Polygon, PolygonGeometry
+
+FULL_DETAIL = 'full'
+
+NO_DETAIL = 'none'
+
+
+def polygon_geometry_cache_enabled():
+    return getattr(settings, 'POLYGON_GEOMETRY_CACHE_ENABLED', False)
+
+
+def get_geometry_details():
+    """
+    Returns the names of the levels of detail, from least to most detailed.
+    """
+    return [NO_DETAIL] + list(getattr(settings, 'POLYGON_GEOMETRY_DETAILS', {})) + [FULL_DETAIL]
+
+
+def get_default_geometry_detail():
+    return getattr(settings, 'POLYGON_GEOMETRY_DEFAULT_DETAIL', FULL_DETAIL)
+
+
+def get_geometry_detail(request):
+    """
+    Returns the level of detail of the ``geometry_detail`` query parameter, or the default level if it was not given.
+    Raises ParseError if it is not a level of detail.
+    """
+    detail = request.query_params.get('geometry_detail', None)
+    if not detail:
+        return get_default_geometry_detail()
+    if detail not in get_geometry_details():
+        raise ParseError(f'geometry_detail must be one of: {", ".join(get_geometry_details())}')
+    return detail
+
+
+def encode_geometry(geometry, detail):
+    """
+    Returns the GeoJSON text of the geometry at the level of detail.
+    """
+    if detail == NO_DETAIL or geometry is None:
+        return json.dumps(None)
+    if detail == FULL_DETAIL:
+        field = GeometryField()
+    else:
+        simplified = geometry.simplify(settings.POLYGON_GEOMETRY_DETAILS[detail], preserve_topology=True)
+        if simplified.geom_type == 'Polygon':
+            simplified = MultiPolygon(simplified, srid=geometry.srid)
+        if not simplified.empty:
+            geometry = simplified
+        field = GeometryField(precision=settings.POLYGON_GEOMETRY_PRECISION, remove_duplicates=True)
+    return json.dumps(field.to_representation(geometry), separators=(',', ':'))
+
+
+def build_polygon_geometries(polygon_ids=None, details=None, batch_size=100):
+    """
+    Rebuilds the PolygonGeometries of the given PolygonIDs, or of all polygons if ``polygon_ids`` is None,
+    at the given levels of detail, or at every level if ``details`` is None. Returns the number of geometries built.
+    """
+    if polygon_ids is None:
+        polygon_ids = Polygon.objects.order_by('PolygonID').values_list('PolygonID', flat=True)
+    if details is None:
+        details = get_geometry_details()
+    # Geometries with no detail are not stored
+    details = [detail for detail in details if detail != NO_DETAIL]
+    polygon_ids = list(polygon_ids)
+    built = 0
+    for i in range(0, len(polygon_ids), batch_size):
+        batch = polygon_ids[i:i + batch_size]
+        PolygonGeometry.objects.filter(PolygonID__in=batch, Detail__in=details).delete()
+        geometries = [PolygonGeometry(PolygonID_id=polygon_id, Detail=detail, GeoJSON=encode_geometry(geometry, detail))
+                      for polygon_id, geometry in Polygon.objects.filter(PolygonID__in=batch).values_list('PolygonID', 'Polygon')
+                      for detail in details]
+        PolygonGeometry.objects.bulk_create(geometries, ignore_conflicts=True)
+        built += len(geometries)
+    return built
+
+
+def get_polygon_geometries(polygon_ids, detail):
+    """
+    Returns a dict mapping each PolygonID to its GeoJSON geometry at the level of detail.
+    Geometries that are missing are built and stored first.
+    """
+    polygon_ids = set(polygon_ids)
+    if detail == NO_DETAIL:
+        return {polygon_id: None for polygon_id in polygon_ids}
+    geometries = dict(PolygonGeometry.objects.filter(PolygonID__in=polygon_ids, Detail=detail).values_list('PolygonID', 'GeoJSON'))
+    missing_polygon_ids = polygon_ids.difference(geometries)
+    if missing_polygon_ids:
+        new_geometries = [PolygonGeometry(PolygonID_id=polygon_id, Detail=detail, GeoJSON=encode_geometry(geometry, detail))
+                          for polygon_id, geometry in Polygon.objects.filter(PolygonID__in=missing_polygon_ids).values_list('PolygonID', 'Polygon')]
+        PolygonGeometry.objects.bulk_create(new_geometries, ignore_conflicts=True)
+        geometries.update((geometry.PolygonID_id, geometry.GeoJSON) for geometry in new_geometries)
+    return {polygon_id: json.loads(geometry) for polygon_id, geometry in geometries.items()}
+
+
+def get_polygon_geometry_stamp(polygon_id, detail):
+    """
+    Returns the PolygonGeometryID and DateUpdated of the polygon's geometry at the level of detail,
+    or ``None`` if the level is not stored. A new PolygonGeometry is built each time its polygon changes.
+    """
+    if detail == NO_DETAIL:
+        return None
+    stamp = PolygonGeometry.objects.filter(PolygonID=polygon_id, Detail=detail).values_list('PolygonGeometryID', 'DateUpdated').first()
+    if stamp is None:
+        get_polygon_geometries([polygon_id], detail)
+        stamp = PolygonGeometry.objects.filter(PolygonID=polygon_id, Detail=detail).values_list('PolygonGeometryID', 'DateUpdated').first()
+    return stamp
+
+
+def prefetch_polygon_geometries(polygons, detail):
+    """
+    Fetches the geometries of the polygons at the level of detail with one query,
+    and sets them to be returned by ``get_polygon_geometry``.
+    """
+    geometries = get_polygon_geometries([polygon.PolygonID for polygon in polygons], detail)
+    for polygon in polygons:
+        polygon.__dict__.setdefault('_prefetched_geometries', {})[detail] = geometries.get(polygon.PolygonID)
+
+
+def get_polygon_geometry(polygon, detail):
+    """
+    Returns the GeoJSON geometry of the polygon at the level of detail.
+    """
+    prefetched_geometries = polygon.__dict__.get('_prefetched_geometries', {})
+    if detail in prefetched_geometries:
+        return prefetched_geometries[detail]
+    return get_polygon_geometries([polygon.PolygonID], detail).get(polygon.PolygonID)
+
+
+@receiver(post_save, sender=Polygon)
+def polygon_changed(sender, instance, **kwargs):
+    PolygonGeometry.objects.filter(PolygonID=instance.PolygonID).delete()
@@ -0,0 +1,141 @@
+"""
+Builds and searches the PolygonGridCell grid index of the searchable polygons.
+
+The grid splits longitude and latitude into square cells of ``settings.POLYGON_GRID_CELL_SIZE`` degrees.
+For each State, County, City, and CountySubdivision polygon, it stores the cells the polygon covers
+(interior cells) and the cells its boundary crosses (boundary cells). To find the polygons containing a point,
+the polygons of interior cells are matched without any geometry test, and only the polygons of boundary cells
+are checked with ST_CONTAINS.
+
+The grid is built by ``build_polygon_grid`` (``python3 manage.py build_polygon_grid``), which must be rerun
+if ``POLYGON_GRID_CELL_SIZE`` changes. While ``settings.POLYGON_GRID_ENABLED``, saving or deleting a polygon
+rebuilds only the cells of that polygon.
+"""
+import math
+
+from django.conf import settings
+from django.contrib.gis.geos import Polygon as geosPolygon
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Polygon, PolygonGridCell, PolygonHierarchy, StatePolygon, CountyPolygon, CityPolygon, CountySubdivisionPolygon
+
+BULK_CREATE_BATCH_SIZE = 10000
+
+
+def polygon_grid_enabled():
+    return getattr(settings, 'POLYGON_GRID_ENABLED', False)
+
+
+def get_cell_size():
+    return getattr(settings, 'POLYGON_GRID_CELL_SIZE', 0.1)
+
+
+def get_cell(lng, lat, cell_size=None):
+    """
+    Returns the ``(CellX, CellY)`` of the cell containing the point (lng, lat).
+    """
+    cell_size = cell_size or get_cell_size()
+    return math.floor(lng / cell_size), math.floor(lat / cell_size)
+
+
+def get_polygon_cells(polygon_id, geometry, cell_size=None):
+    """
+    Returns the unsaved PolygonGridCell rows of a polygon.
+
+    Instead of testing every cell in the polygon's extent, blocks of cells are tested and split
+    into quarters until they are entirely inside the polygon, entirely outside it, or a single cell.
+    """
+    cell_size = cell_size or get_cell_size()
+    prepared = geometry.prepared
+    xmin, ymin, xmax, ymax = geometry.extent
+    cell_xmin, cell_ymin = get_cell(xmin, ymin, cell_size)
+    cell_xmax, cell_ymax = get_cell(xmax, ymax, cell_size)
+    cells = []
+    blocks = [(cell_xmin, cell_ymin, cell_xmax + 1, cell_ymax + 1)]
+    while blocks:
+        x0, y0, x1, y1 = blocks.pop()
+        block = geosPolygon.from_bbox((x0 * cell_size, y0 * cell_size, x1 * cell_size, y1 * cell_size))
+        if not prepared.intersects(block):
+            continue
+        if prepared.contains_properly(block):
+            cells.extend(PolygonGridCell(CellX=x, CellY=y, PolygonID_id=polygon_id, IsInterior=True)
+                         for x in range(x0, x1) for y in range(y0, y1))
+        elif x1 - x0 == 1 and y1 - y0 == 1:
+            cells.append(PolygonGridCell(CellX=x0, CellY=y0, PolygonID_id=polygon_id, IsInterior=False))
+        else:
+            xmid = (x0 + x1 + 1) // 2
+            ymid = (y0 + y1 + 1) // 2
+            for bx0, bx1 in ((x0, xmid), (xmid, x1)):
+                for by0, by1 in ((y0, ymid), (ymid, y1)):
+                    if bx0 < bx1 and by0 < by1:
+                        blocks.append((bx0, by0, bx1, by1))
+    return cells
+
+
+def get_searchable_polygons(polygon_ids=None):
+    """
+    Returns ``(PolygonID, Polygon)`` pairs of the State, County, City, and CountySubdivision polygons.
+    """
+    searchable_polygon_ids = set(StatePolygon.objects.values_list('PolygonID', flat=True))
+    for model in [CountyPolygon, CityPolygon, CountySubdivisionPolygon]:
+        searchable_polygon_ids.update(model.objects.values_list('PolygonID', flat=True))
+    if polygon_ids is not None:
+        searchable_polygon_ids.intersection_update(polygon_ids)
+    return Polygon.objects.filter(PolygonID__in=searchable_polygon_ids).values_list('PolygonID', 'Polygon').iterator()
+
+
+def build_polygon_grid(polygon_ids=None):
+    """
+    Rebuilds the cells of the given PolygonIDs, or the whole grid if ``polygon_ids`` is ``None``.
+    Returns the number of cells created.
+    """
+    cell_size = get_cell_size()
+    num_cells = 0
+    with transaction.atomic():
+        if polygon_ids is None:
+            PolygonGridCell.objects.all().delete()
+        else:
+            PolygonGridCell.objects.filter(PolygonID__in=polygon_ids).delete()
+        for polygon_id, geometry in get_searchable_polygons(polygon_ids):
+            if geometry is None or geometry.empty:
+                continue
+            cells = get_polygon_cells(polygon_id, geometry, cell_size)
+            PolygonGridCell.objects.bulk_create(cells, batch_size=BULK_CREATE_BATCH_SIZE)
+            num_cells += len(cells)
+    return num_cells
+
+
+def polygon_ids_containing(lng, lat):
+    """
+    Returns the set of PolygonIDs whose polygon contains the point (lng, lat).
+
+    Like ``utils.filter_ahjs``' SQL search, a County, City, or CountySubdivision
+    polygon only matches if the StatePolygon it belongs to also matches.
+    """
+    cell_x, cell_y = get_cell(lng, lat)
+    matched = set()
+    boundary_polygon_ids = []
+    for polygon_id, is_interior in PolygonGridCell.objects.filter(CellX=cell_x, CellY=cell_y).values_list('PolygonID', 'IsInterior'):
+        if is_interior:
+            matched.add(polygon_id)
+        else:
+            boundary_polygon_ids.append(polygon_id)
+    if boundary_polygon_ids:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT PolygonID FROM Polygon WHERE PolygonID IN (' + ', '.join(['%s'] * len(boundary_polygon_ids)) + ') '
+                           'AND ST_CONTAINS(Polygon, POINT(%s, %s))', boundary_polygon_ids + [lng, lat])
+            matched.update(row[0] for row in cursor.fetchall())
+    states_of_matched = PolygonHierarchy.objects.filter(DescendantPolygonID__in=matched, Depth=1).values_list('DescendantPolygonID', 'AncestorPolygonID')
+    return matched.difference(polygon_id for polygon_id, state_polygon_id in states_of_matched if state_polygon_id not in matched)
+
+
+@receiver(post_save, sender=Polygon)
+@receiver([post_save, post_delete], sender=StatePolygon)
+@receiver([post_save, post_delete], sender=CountyPolygon)
+@receiver([post_save, post_delete], sender=CityPolygon)
+@receiver([post_save, post_delete], sender=CountySubdivisionPolygon)
+def polygon_changed(sender, instance, **kwargs):
+    if polygon_grid_enabled():
+        build_polygon_grid(polygon_ids=[instance.pk])
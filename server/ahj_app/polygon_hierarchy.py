@@ -0,0 +1,71 @@
+"""
+Builds and maintains the PolygonHierarchy closure table of the
+State -> County/City/CountySubdivision polygon hierarchy.
+
+The table is built from the polygon tables by ``build_polygon_hierarchy``, which should
+be run after ``usf.translate_polygons`` (``python3 manage.py build_polygon_hierarchy``).
+After that, saving or deleting a StatePolygon, CountyPolygon, CityPolygon, or
+CountySubdivisionPolygon row updates only the rows of that polygon.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import PolygonHierarchy, StatePolygon, CountyPolygon, CityPolygon, CountySubdivisionPolygon
+
+STATE_CHILD_POLYGON_MODELS = [CountyPolygon, CityPolygon, CountySubdivisionPolygon]
+
+BULK_CREATE_BATCH_SIZE = 10000
+
+
+def get_hierarchy_rows(polygon_id, state_polygon_id=None):
+    """
+    Returns the PolygonHierarchy rows of a polygon. ``state_polygon_id`` is ``None`` for a StatePolygon.
+    """
+    rows = [PolygonHierarchy(AncestorPolygonID_id=polygon_id, DescendantPolygonID_id=polygon_id, Depth=0)]
+    if state_polygon_id is not None and state_polygon_id != polygon_id:
+        rows.append(PolygonHierarchy(AncestorPolygonID_id=state_polygon_id, DescendantPolygonID_id=polygon_id, Depth=1))
+    return rows
+
+
+def build_polygon_hierarchy():
+    """
+    Rebuilds the whole PolygonHierarchy table from the polygon tables.
+    """
+    rows = []
+    for polygon_id in StatePolygon.objects.values_list('PolygonID', flat=True):
+        rows.extend(get_hierarchy_rows(polygon_id))
+    for model in STATE_CHILD_POLYGON_MODELS:
+        for polygon_id, state_polygon_id in model.objects.values_list('PolygonID', 'StatePolygonID'):
+            rows.extend(get_hierarchy_rows(polygon_id, state_polygon_id))
+    with transaction.atomic():
+        PolygonHierarchy.objects.all().delete()
+        PolygonHierarchy.objects.bulk_create(rows, batch_size=BULK_CREATE_BATCH_SIZE)
+    return len(rows)
+
+
+def update_polygon_hierarchy(polygon_id):
+    """
+    Replaces the PolygonHierarchy rows of one polygon with its current place in the polygon tables.
+    The rows of the polygons in a StatePolygon are kept when the StatePolygon is replaced.
+    """
+    rows = []
+    if StatePolygon.objects.filter(PolygonID=polygon_id).exists():
+        rows = get_hierarchy_rows(polygon_id)
+    else:
+        for model in STATE_CHILD_POLYGON_MODELS:
+            state_polygon_id = model.objects.filter(PolygonID=polygon_id).values_list('StatePolygonID', flat=True).first()
+            if state_polygon_id is not None:
+                rows = get_hierarchy_rows(polygon_id, state_polygon_id)
+                break
+    with transaction.atomic():
+        PolygonHierarchy.objects.filter(DescendantPolygonID=polygon_id).delete()
+        PolygonHierarchy.objects.bulk_create(rows)
+
+
+@receiver([post_save, post_delete], sender=StatePolygon)
+@receiver([post_save, post_delete], sender=CountyPolygon)
+@receiver([post_save, post_delete], sender=CityPolygon)
+@receiver([post_save, post_delete], sender=CountySubdivisionPolygon)
+def polygon_type_changed(sender, instance, **kwargs):
+    update_polygon_hierarchy(instance.PolygonID_id)
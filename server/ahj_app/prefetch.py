@@ -0,0 +1,282 @@
+"""
+Loads the child objects of a page of AHJs serialized by ``AHJSerializer``.
+
+Serializing an AHJ calls its ``get_contacts``, ``get_inspections``, ``get_err``, etc. methods,
+each of which queries the database, and each enum field and Address of the children is another query.
+Instead, ``prefetch_ahj_page`` fetches each child table for all AHJs of a page in one query,
+joining the enum, Address, and Location rows with ``select_related``, and sets the results
+of the ``prefetchable`` methods of the AHJs and their children.
+
+The number of queries does not depend on the number of AHJs or children on the page:
+    - One query to load the AHJs' Address, Location, enum, and (if not a public view) Polygon rows.
+    - If not a public view, one query for the Polygons' cached geometries (see ``polygon_geometry.py``).
+    - One query for each of the AHJInspection, AHJDocumentSubmissionMethodUse, AHJPermitIssueMethodUse,
+      EngineeringReviewRequirement, and FeeStructure tables.
+    - One query for the Contacts of the AHJs and their AHJInspections.
+    - If not a public view, one recursive query for the Comments of the AHJs and their replies at every depth,
+      one query for the commenting Users, and one query for the AHJs maintained by them.
+
+In the public view, unconfirmed children and Comments are not serialized, so they are not fetched.
+Likewise, with a ``fields`` projection, only the tables of the projected fields are fetched.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import AHJ, AHJInspection, AHJDocumentSubmissionMethodUse, AHJPermitIssueMethodUse, \
+    AHJUserMaintains, Comment, Contact, EngineeringReviewRequirement, FeeStructure, User, set_prefetched
+from .polygon_geometry import get_default_geometry_detail, polygon_geometry_cache_enabled, prefetch_polygon_geometries
+
+ADDRESS_RELATED = ['AddressType', 'LocationID__LocationDeterminationMethod', 'LocationID__LocationType']
+
+CONTACT_RELATED = ['ContactType', 'PreferredContactMethod'] + [f'AddressID__{field}' for field in ADDRESS_RELATED]
+
+AHJ_ENUM_RELATED = ['AHJLevelCode', 'BuildingCode', 'ElectricCode', 'FireCode', 'ResidentialCode', 'WindCode']
+
+USER_RELATED = ['api_token'] + [f'ContactID__{field}' for field in CONTACT_RELATED]
+
+# The child tables with a foreign key to AHJ, as tuples of the child model, its status field,
+# the AHJ methods returning its confirmed (status True) and unconfirmed (status null) rows,
+# their AHJSerializer field names, and the fields joined with select_related
+AHJ_CHILD_TABLES = [
+    (AHJDocumentSubmissionMethodUse, 'MethodStatus', 'get_document_submission_methods', 'get_uncon_dsm',
+     'DocumentSubmissionMethods', 'UnconfirmedDocumentSubmissionMethods', ['DocumentSubmissionMethodID']),
+    (AHJPermitIssueMethodUse, 'MethodStatus', 'get_permit_submission_methods', 'get_uncon_pim',
+     'PermitIssueMethods', 'UnconfirmedPermitIssueMethods', ['PermitIssueMethodID']),
+    (EngineeringReviewRequirement, 'EngineeringReviewRequirementStatus', 'get_err', 'get_uncon_err',
+     'EngineeringReviewRequirements', 'UnconfirmedEngineeringReviewRequirements', ['EngineeringReviewType', 'RequirementLevel', 'StampType']),
+    (FeeStructure, 'FeeStructureStatus', 'get_fee_structures', 'get_uncon_fs',
+     'FeeStructures', 'UnconfirmedFeeStructures', ['FeeStructureType'])
+]
+
+
+def ahj_page_prefetch_enabled():
+    return getattr(settings, 'AHJ_PAGE_PREFETCH_ENABLED', False)
+
+
+def get_status_cond(status_field, include_confirmed, include_unconfirmed):
+    """
+    Returns a Q matching confirmed rows if ``include_confirmed``, and unconfirmed rows if ``include_unconfirmed``.
+    At least one of them must be True.
+    """
+    confirmed_cond = Q(**{status_field: True})
+    unconfirmed_cond = Q(**{f'{status_field}__isnull': True})
+    if include_confirmed and include_unconfirmed:
+        return confirmed_cond | unconfirmed_cond
+    return confirmed_cond if include_confirmed else unconfirmed_cond
+
+
+def group_by_status(rows, parent_field, status_field):
+    """
+    Returns two dicts mapping the parent primary key of each row to its list of
+    confirmed rows and its list of unconfirmed rows, keeping the order of ``rows``.
+    """
+    confirmed, unconfirmed = defaultdict(list), defaultdict(list)
+    for row in rows:
+        if getattr(row, status_field):
+            confirmed[getattr(row, parent_field)].append(row)
+        elif getattr(row, status_field) is None:
+            unconfirmed[getattr(row, parent_field)].append(row)
+    return confirmed, unconfirmed
+
+
+def set_grouped(instances, pk_field, grouped_rows, method_name):
+    for instance in instances:
+        set_prefetched(instance, method_name, grouped_rows.get(getattr(instance, pk_field), []))
+
+
+def prefetch_ahj_related(ahjs, include_polygon, include_address=True):
+    """
+    Sets the enum rows of the AHJs, their Address (with its Location) if ``include_address``,
+    and their Polygon if ``include_polygon`` from one query, so the AHJs can come from a raw query.
+    The Polygons' geometries are not loaded if they are serialized from ``polygon_geometry.py``.
+    """
+    related = list(AHJ_ENUM_RELATED)
+    fields = list(AHJ_ENUM_RELATED)
+    if include_address:
+        related += ['AddressID'] + [f'AddressID__{field}' for field in ADDRESS_RELATED]
+        fields.append('AddressID')
+    if include_polygon:
+        related.append('PolygonID')
+        fields.append('PolygonID')
+    queryset = AHJ.objects.select_related(*related)
+    if include_polygon and polygon_geometry_cache_enabled():
+        queryset = queryset.defer('PolygonID__Polygon')
+    loaded = queryset.in_bulk([ahj.AHJPK for ahj in ahjs])
+    for ahj in ahjs:
+        if ahj.AHJPK not in loaded:
+            continue
+        for field in fields:
+            AHJ._meta.get_field(field).set_cached_value(ahj, getattr(loaded[ahj.AHJPK], field))
+
+
+def prefetch_contacts(ahjs, inspections, ahj_statuses, inspection_statuses):
+    """
+    Sets the Contacts of the AHJs and AHJInspections from one query.
+    The statuses are pairs of whether to fetch confirmed and unconfirmed Contacts.
+    """
+    ahj_pks = [ahj.AHJPK for ahj in ahjs]
+    inspection_ids = [inspection.InspectionID for inspection in inspections]
+    parent_conds = []
+    if any(ahj_statuses):
+        parent_conds.append(Q(get_status_cond('ContactStatus', *ahj_statuses), ParentTable='AHJ', ParentID__in=ahj_pks))
+    if inspection_ids and any(inspection_statuses):
+        parent_conds.append(Q(get_status_cond('ContactStatus', *inspection_statuses), ParentTable='AHJInspection', ParentID__in=inspection_ids))
+    if not parent_conds:
+        return
+    parent_cond = parent_conds[0]
+    for cond in parent_conds[1:]:
+        parent_cond |= cond
+    contacts = Contact.objects.filter(parent_cond).select_related(*CONTACT_RELATED).order_by('ContactID')
+    contacts_by_table = {'AHJ': [], 'AHJInspection': []}
+    for contact in contacts:
+        contacts_by_table[contact.ParentTable].append(contact)
+    confirmed, unconfirmed = group_by_status(contacts_by_table['AHJ'], 'ParentID', 'ContactStatus')
+    set_grouped(ahjs, 'AHJPK', confirmed, 'get_contacts')
+    set_grouped(ahjs, 'AHJPK', unconfirmed, 'get_unconfirmed')
+    confirmed, unconfirmed = group_by_status(contacts_by_table['AHJInspection'], 'ParentID', 'ContactStatus')
+    set_grouped(inspections, 'InspectionID', confirmed, 'get_contacts')
+    set_grouped(inspections, 'InspectionID', unconfirmed, 'get_uncon_con')
+
+
+def fetch_comment_threads(root_field, values):
+    """
+    Returns the Comments whose ``root_field`` (AHJPK or CommentID) is in ``values``, and their replies
+    at every depth, newest first. The replies are found with a recursive query, so it is one query.
+    """
+    if not values:
+        return []
+    placeholders = ', '.join(['%s'] * len(values))
+    thread_sql = ('WITH RECURSIVE Thread (CommentID) AS ('
+                  f'SELECT CommentID FROM Comment WHERE {root_field} IN ({placeholders}) '
+                  'UNION SELECT Reply.CommentID FROM Comment Reply INNER JOIN Thread ON Reply.ReplyingTo = Thread.CommentID'
+                  ') SELECT CommentID FROM Thread')
+    return list(Comment.objects.filter(CommentID__in=RawSQL(thread_sql, list(values))).order_by('-Date'))
+
+
+def fetch_comment_thread_ahjpk(comment_id):
+    """
+    Returns the AHJPK of the root of the thread of the Comment with the CommentID, found by following
+    its ``ReplyingTo`` up to the Comment it replies to with a recursive query, or None if there is none.
+    """
+    if comment_id is None:
+        return None
+    ancestors_sql = ('WITH RECURSIVE Ancestor (CommentID, ReplyingTo) AS ('
+                     'SELECT CommentID, ReplyingTo FROM Comment WHERE CommentID = %s '
+                     'UNION SELECT Parent.CommentID, Parent.ReplyingTo FROM Comment Parent INNER JOIN Ancestor ON Parent.CommentID = Ancestor.ReplyingTo'
+                     ') SELECT CommentID FROM Ancestor')
+    return Comment.objects.filter(CommentID__in=RawSQL(ancestors_sql, [comment_id]), AHJPK__isnull=False) \
+        .values_list('AHJPK', flat=True).first()
+
+
+def set_comment_replies(comments):
+    """
+    Sets the replies of each of the Comments from the others, keeping their order.
+    """
+    replies_by_parent = defaultdict(list)
+    for comment in comments:
+        if comment.ReplyingTo is not None:
+            replies_by_parent[comment.ReplyingTo].append(comment)
+    set_grouped(comments, 'CommentID', replies_by_parent, 'get_replies')
+
+
+def prefetch_comment_users(comments):
+    """
+    Sets the Users of the Comments from one query, with their Contact and APIToken,
+    and the AHJs maintained by all the Users from one query.
+    """
+    users = User.objects.filter(UserID__in={comment.UserID_id for comment in comments}).select_related(*USER_RELATED).in_bulk()
+    maintained = defaultdict(list)
+    for user_id, ahj_pk in AHJUserMaintains.objects.filter(UserID__in=users.keys(), MaintainerStatus=True) \
+            .order_by('MaintainerID').values_list('UserID', 'AHJPK'):
+        maintained[user_id].append((ahj_pk,))
+    for user in users.values():
+        set_prefetched(user, 'get_maintained_ahjs', maintained.get(user.UserID, []))
+        set_prefetched(user, 'get_API_token', getattr(user, 'api_token', None))
+    for comment in comments:
+        if comment.UserID_id in users:
+            Comment._meta.get_field('UserID').set_cached_value(comment, users[comment.UserID_id])
+
+
+def prefetch_comment_threads(comments):
+    """
+    Sets the replies at every depth of the Comments, and the Users of the Comments and replies, with three queries.
+    """
+    comments = list(comments)
+    thread = fetch_comment_threads('CommentID', [comment.CommentID for comment in comments])
+    instances = {comment.CommentID: comment for comment in thread}
+    instances.update((comment.CommentID, comment) for comment in comments)
+    thread = [instances[comment.CommentID] for comment in thread]
+    set_comment_replies(thread)
+    prefetch_comment_users(thread)
+    return comments
+
+
+def prefetch_comments(ahjs):
+    """
+    Sets the Comments of the AHJs and their replies at every depth from one query,
+    and the Users of the Comments and replies with two more queries.
+    """
+    ahj_pks = {ahj.AHJPK for ahj in ahjs}
+    comments = fetch_comment_threads('AHJPK', list(ahj_pks))
+    comments_by_ahj = defaultdict(list)
+    for comment in comments:
+        if comment.AHJPK in ahj_pks:
+            comments_by_ahj[comment.AHJPK].append(comment)
+    set_grouped(ahjs, 'AHJPK', comments_by_ahj, 'get_comments')
+    set_comment_replies(comments)
+    prefetch_comment_users(comments)
+
+
+def prefetch_ahj_page(ahjs, is_public_view=False, include_comments=None, fields=None, geometry_detail=None):
+    """
+    Fetches the children of every AHJ in ``ahjs`` with a constant number of queries, and sets them
+    as the results of the AHJs' ``prefetchable`` methods. Returns the AHJs as a list.
+    If ``fields`` is given, only the children of the AHJSerializer fields in it are fetched.
+    Comments are fetched if ``include_comments``, which defaults to whether the Comments field is serialized.
+    The Polygons' geometries are fetched at ``geometry_detail``, which defaults to ``settings.POLYGON_GEOMETRY_DEFAULT_DETAIL``.
+    """
+    ahjs = list(ahjs)
+    if not ahjs:
+        return ahjs
+
+    def is_serialized(field_name):
+        if is_public_view and field_name in AHJ.SERIALIZER_EXCLUDED_FIELDS:
+            return False
+        return fields is None or field_name in fields
+
+    ahj_pks = [ahj.AHJPK for ahj in ahjs]
+    prefetch_ahj_related(ahjs, include_polygon=is_serialized('Polygon'), include_address=is_serialized('Address'))
+    if is_serialized('Polygon') and polygon_geometry_cache_enabled():
+        prefetch_polygon_geometries([ahj.PolygonID for ahj in ahjs if ahj.PolygonID is not None],
+                                    geometry_detail or get_default_geometry_detail())
+
+    inspection_statuses = (is_serialized('AHJInspections'), is_serialized('UnconfirmedInspections'))
+    inspections = []
+    if any(inspection_statuses):
+        inspections = list(AHJInspection.objects.filter(get_status_cond('InspectionStatus', *inspection_statuses), AHJPK__in=ahj_pks)
+                           .select_related('InspectionType').order_by('InspectionID'))
+        confirmed, unconfirmed = group_by_status(inspections, 'AHJPK_id', 'InspectionStatus')
+        set_grouped(ahjs, 'AHJPK', confirmed, 'get_inspections')
+        set_grouped(ahjs, 'AHJPK', unconfirmed, 'get_unconfirmed_inspections')
+    contact_statuses = (is_serialized('Contacts'), is_serialized('UnconfirmedContacts'))
+    if any(contact_statuses) or inspections:
+        prefetch_contacts(ahjs, inspections, contact_statuses, (True, not is_public_view))
+
+    for model, status_field, confirmed_method, unconfirmed_method, confirmed_field, unconfirmed_field, related in AHJ_CHILD_TABLES:
+        statuses = (is_serialized(confirmed_field), is_serialized(unconfirmed_field))
+        if not any(statuses):
+            continue
+        rows = model.objects.filter(get_status_cond(status_field, *statuses), AHJPK__in=ahj_pks) \
+            .select_related(*related).order_by(model._meta.pk.name)
+        confirmed, unconfirmed = group_by_status(rows, 'AHJPK_id', status_field)
+        set_grouped(ahjs, 'AHJPK', confirmed, confirmed_method)
+        set_grouped(ahjs, 'AHJPK', unconfirmed, unconfirmed_method)
+
+    if include_comments is None:
+        include_comments = is_serialized('Comments')
+    if include_comments:
+        prefetch_comments(ahjs)
+    return ahjs
@@ -0,0 +1,66 @@
+"""
+Renderers of the API's responses, set in ``settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']``.
+
+``FastJSONRenderer`` renders JSON with ``orjson`` instead of the stdlib ``json`` module used by DRF's ``JSONRenderer``.
+Its output is the same JSON, with Decimals as numbers, UTC datetimes ending with ``Z``, and GEOS geometries as GeoJSON.
+
+``MessagePackRenderer`` renders MessagePack, encoding values the same way as ``FastJSONRenderer``.
+It is selected with an ``Accept: application/msgpack`` header or a ``format=msgpack`` query parameter.
+
+Run ``python3 manage.py benchmark_renderers`` to compare them with DRF's ``JSONRenderer``.
+"""
+import json
+
+import msgpack
+import orjson
+from django.contrib.gis.geos import GEOSGeometry
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+drf_encoder = JSONEncoder()
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+def encode_default(obj):
+    """
+    Encodes the values ``orjson`` and ``msgpack`` do not encode natively, like DRF's ``JSONEncoder``.
+    Decimals are encoded as floats, datetimes as ISO 8601 strings, and GEOS geometries as their GeoJSON.
+    """
+    if isinstance(obj, GEOSGeometry):
+        return json.loads(obj.geojson)
+    return drf_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renders JSON with ``orjson``. An ``indent`` in the accepted media type indents the JSON with two spaces.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = ORJSON_OPTIONS
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=encode_default, option=options)
+        # Escape the line and paragraph separators like JSONRenderer, since they are invalid in JavaScript strings
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
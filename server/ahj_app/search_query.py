@@ -0,0 +1,431 @@
+"""
+The SQL query of an AHJ search built by ``utils.get_filter_ahjs_query``.
+
+A search is built with an ``AHJSearchBuilder``, which separates the search into its shape and its parameters.
+The shape is which conditions the search has (the location or polygon search, which fields are filtered, and the
+number of values in each list condition), and the parameters are the values of the conditions. Every search of
+the same shape runs the same SQL, so each shape is compiled once into an ``AHJSearchTemplate`` of all the SQL
+statements of the search, which are cached by ``get_search_template``. The location and polygon of a search are
+bound parameters, so a search's SQL never has values in it. If ``settings.POLYGON_ENVELOPE_PREFILTER_ENABLED``,
+polygons are checked against the bounding box of the location or polygon with range conditions on the indexed
+MinX, MaxX, MinY, and MaxY columns of the Polygon table before the slower geometry function runs. To limit the number of shapes, the size of a list
+condition is rounded up to a power of two, and the extra parameters repeat the list's last value.
+
+An ``AHJSearchQuery`` is a template and the parameters of a search, and runs it as:
+    - A query of every matching AHJ.
+    - A ``COUNT(*)`` query, which does not load the matching AHJs.
+    - A page of AHJs with ``LIMIT`` and ``OFFSET``.
+    - A page of AHJs after a keyset cursor, which is the values of the order columns of the last AHJ of the previous page.
+
+Searches by location or polygon are ordered by AHJLevelCode descending, then by the LandArea of
+the AHJ's polygon ascending, then by AHJPK. Other searches are ordered by AHJPK.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import connection
+
+from .models import AHJ
+from .models_field_enums import AHJLevelCode
+
+# Joins of the AHJ table needed by the ranked order columns
+RANK_JOINS = ' LEFT JOIN Polygon AS OrderPolygon ON AHJ.PolygonID = OrderPolygon.PolygonID ' \
+             ' LEFT JOIN ' + AHJLevelCode._meta.db_table + ' AS OrderAHJLevelCode ON AHJ.AHJLevelCode = OrderAHJLevelCode.AHJLevelCodeID '
+
+# (SQL expression, column alias, is descending) of each order column
+RANK_ORDER_COLUMNS = [
+    ('COALESCE(CAST(OrderAHJLevelCode.Value AS UNSIGNED), 0)', 'SearchRankAHJLevelCode', True),
+    ('COALESCE(OrderPolygon.LandArea, 0)', 'SearchRankLandArea', False),
+    ('AHJ.AHJPK', 'AHJPK', False)
+]
+PK_ORDER_COLUMNS = [
+    ('AHJ.AHJPK', 'AHJPK', False)
+]
+
+# The condition of a polygon matching the searched location or polygon, whose values are bound parameters
+SPATIAL_CONDS = {
+    'location': 'ST_CONTAINS(Polygon, POINT(%(lng)s, %(lat)s))',
+    'polygon': 'ST_INTERSECTS(Polygon, ST_GeomFromText(%(polygon)s))'
+}
+# The range conditions of a polygon's bounding box containing the searched location or intersecting the searched polygon's bounding box
+ENVELOPE_CONDS = {
+    'location': 'Polygon.MinX <= %(lng)s AND Polygon.MaxX >= %(lng)s AND Polygon.MinY <= %(lat)s AND Polygon.MaxY >= %(lat)s',
+    'polygon': 'Polygon.MinX <= %(polygonMaxX)s AND Polygon.MaxX >= %(polygonMinX)s '
+               'AND Polygon.MinY <= %(polygonMaxY)s AND Polygon.MaxY >= %(polygonMinY)s'
+}
+
+
+def envelope_prefilter_enabled():
+    return getattr(settings, 'POLYGON_ENVELOPE_PREFILTER_ENABLED', False)
+
+
+def get_spatial_cond(spatial, prefilter):
+    """
+    Returns the condition of a polygon matching the search, which first checks the
+    polygon's MinX, MaxX, MinY, and MaxY bounding box columns if ``prefilter``.
+    """
+    if prefilter:
+        return ENVELOPE_CONDS[spatial] + ' AND ' + SPATIAL_CONDS[spatial]
+    return SPATIAL_CONDS[spatial]
+
+
+def get_name_query_cond(column: str, val: str, query_params: dict):
+    """
+    Returns the entered string as part of an SQL
+    condition on the AHJ table of the form:
+
+    .. code-block:: sql
+
+        AHJ.`column` = 'val' AND
+
+    If val is not None, otherwise it returns the
+    empty string to represent no condition on the column.
+    """
+    if val is not None and column is not None:
+        query_params[column] = '%' + val + '%'
+        return 'AHJ.' + column + ' LIKE %(' + column + ')s AND '
+    return ''
+
+
+def get_list_query_cond(column: str, val: list, query_params: dict):
+    """
+    Returns the entered list of strings as part of
+    an SQL condition on the AHJ table of the form:
+
+    .. code-block:: sql
+
+        (AHJ.`column` = 'val1' OR AHJ.`column` = 'val2' OR ...) AND
+
+    """
+    if val is not None and len(val) != 0:
+        or_list = []
+        for i in range(len(val)):
+            param_name = f'{column}{i}'
+            query_params[param_name] = val[i]
+            or_list.append('AHJ.' + column + '=%(' + param_name + ')s')
+        ret_str = '(' + ' OR '.join(or_list) + ') AND '
+        return ret_str
+    return ''
+
+
+def get_basic_query_cond(column: str, val: str, query_params: dict):
+    """
+    Returns the entered string as part of an SQL
+    condition on the AHJ table of the form:
+
+    .. code-block:: sql
+
+        AHJ.`column` = 'val' AND
+
+    If val is not None, otherwise it returns the
+    empty string to represent no condition on the column.
+    """
+    if val is not None:
+        query_params[column] = val
+        return 'AHJ.' + column + '=%(' + column + ')s AND '
+    return ''
+
+
+def get_in_query_cond(column: str, val: list, query_params: dict, param_name: str = None):
+    """
+    Returns the entered list of values as part of
+    an SQL condition on the AHJ table of the form:
+
+    .. code-block:: sql
+
+        AHJ.`column` IN ('val1', 'val2', ...) AND
+
+    Unlike ``get_list_query_cond``, an empty list is a condition no row satisfies.
+    The parameters are named after ``param_name``, which defaults to the column.
+    """
+    if len(val) == 0:
+        return 'FALSE AND '
+    param_names = []
+    for i, v in enumerate(val):
+        name = f'{param_name or column}{i}'
+        query_params[name] = v
+        param_names.append('%(' + name + ')s')
+    return 'AHJ.' + column + ' IN (' + ', '.join(param_names) + ') AND '
+
+
+def get_padded_size(size):
+    """
+    Returns the number of parameters of a list condition of ``size`` values, which is ``size`` rounded up to a power of two.
+    """
+    return 0 if size == 0 else 1 << (size - 1).bit_length()
+
+
+# The shape of a search: its spatial condition ('location', 'polygon', or None), whether the spatial condition
+# is prefiltered by bounding box, whether it is ranked, and its (condition kind, column, number of parameters) conditions
+AHJSearchShape = namedtuple('AHJSearchShape', ['spatial', 'prefilter', 'ranked', 'conds'])
+
+
+class AHJSearchBuilder:
+    """
+    Collects the conditions of an AHJ search, and builds the AHJSearchQuery of the compiled template of its shape.
+    """
+    def __init__(self, prefilter=None):
+        self.spatial = None
+        self.prefilter = envelope_prefilter_enabled() if prefilter is None else prefilter
+        self.ranked = False
+        self.conds = []
+        self.params = {}
+
+    def add_location(self, lng, lat):
+        """
+        Matches AHJs whose polygon contains the point (lng, lat).
+        """
+        self.spatial = 'location'
+        self.ranked = True
+        self.params['lng'] = lng
+        self.params['lat'] = lat
+
+    def add_polygon(self, wkt):
+        """
+        Matches AHJs whose polygon intersects the polygon ``wkt``.
+        """
+        self.spatial = 'polygon'
+        self.ranked = True
+        self.params['polygon'] = wkt
+        if self.prefilter:
+            geometry = GEOSGeometry(wkt)
+            if geometry.empty:
+                self.prefilter = False
+            else:
+                self.params['polygonMinX'], self.params['polygonMinY'], self.params['polygonMaxX'], self.params['polygonMaxY'] = geometry.extent
+
+    def add_cond(self, kind, column, value):
+        """
+        Adds a condition on an AHJ column, where ``kind`` is:
+            - ``'name'``: The column contains the value, case insensitive. No condition if the value is None.
+            - ``'basic'``: The column equals the value. No condition if the value is None.
+            - ``'list'``: The column equals any of the list of values. No condition if the list is empty or None.
+            - ``'in'``: The column equals any of the list of values. An empty list matches no AHJs.
+            - ``'state'``: The AHJ's Address' StateProvince equals the value. No condition if the value is None.
+            - ``'fulltext'``: The AHJ's names in the AHJNameSearch table match the MySQL boolean mode full-text search value.
+            - ``'name_in'``: The AHJPK equals any of the list of AHJPKs found by a name search. An empty list matches no AHJs.
+            - ``'name_search'``: The AHJ's names in the AHJNameSearch table contain the value, case insensitive.
+        """
+        if kind in ('name', 'basic', 'state', 'fulltext', 'name_search'):
+            if value is None:
+                return
+            self.params[column] = '%' + value + '%' if kind in ('name', 'name_search') else value
+            self.conds.append((kind, column, 1))
+        else:
+            if kind == 'list' and not value:
+                return
+            size = get_padded_size(len(value))
+            for i in range(size):
+                self.params[f'{column}{i}'] = value[min(i, len(value) - 1)]
+            self.conds.append((kind, column, size))
+
+    def get_shape(self):
+        return AHJSearchShape(self.spatial, self.prefilter and self.spatial is not None, self.ranked, tuple(self.conds))
+
+    def build(self):
+        return AHJSearchQuery(get_search_template(self.get_shape()), self.params)
+
+
+class AHJSearchTemplate:
+    """
+    The SQL statements of an AHJSearchShape, compiled once and reused by every search of the shape.
+    """
+    def __init__(self, shape):
+        self.shape = shape
+        self.order_columns = RANK_ORDER_COLUMNS if shape.ranked else PK_ORDER_COLUMNS
+        self.from_clause, self.where_clause = self.compile_from_where(shape)
+        self.after_cond = self.compile_after_cond()
+        columns = ''.join(', ' + expr + ' AS ' + alias for expr, alias, _ in self.order_columns if alias != 'AHJPK')
+        select = 'SELECT AHJ.*' + columns + self.from_clause + (RANK_JOINS if shape.ranked else '') + ' WHERE '
+        order_by = ' ORDER BY ' + ', '.join(expr + (' DESC' if descending else ' ASC') for expr, _, descending in self.order_columns)
+        self.sql = select + self.where_clause + order_by + ';'
+        self.page_sql = select + self.where_clause + order_by + ' LIMIT %(limit)s OFFSET %(offset)s;'
+        self.after_page_sql = select + self.after_cond + self.where_clause + order_by + ' LIMIT %(limit)s OFFSET %(offset)s;'
+        self.count_sql = 'SELECT COUNT(*)' + self.from_clause + ' WHERE ' + self.where_clause + ';'
+
+    @staticmethod
+    def compile_from_where(shape):
+        """
+        Returns the FROM clause and WHERE condition of a shape.
+
+        The polygons matching a location or polygon search are found by checking
+        the points from a State -> County -> City level, using the PolygonHierarchy
+        table to find the polygons in the matching states. If the shape is prefiltered,
+        the polygons are first checked with range conditions on their bounding box
+        columns, so the geometry function only runs on polygons whose bounding box matches.
+        """
+        from_clause = ' FROM AHJ '
+        where_clause = ''
+        if shape.spatial is not None:
+            spatial_cond = get_spatial_cond(shape.spatial, shape.prefilter)
+            from_clause = ' FROM AHJ JOIN (SELECT PolygonHierarchy.DescendantPolygonID AS PolygonID FROM PolygonHierarchy' \
+                          ' JOIN Polygon ON Polygon.PolygonID = PolygonHierarchy.DescendantPolygonID' \
+                          ' WHERE PolygonHierarchy.AncestorPolygonID IN' \
+                          ' (SELECT Polygon.PolygonID FROM Polygon JOIN StatePolygon ON Polygon.PolygonID = StatePolygon.PolygonID' \
+                          ' WHERE ' + spatial_cond + ') AND ' + spatial_cond + ')' \
+                          ' AS SUBQPOLYS ON AHJ.PolygonID = SUBQPOLYS.PolygonID '
+        placeholders = {}
+        for kind, column, size in shape.conds:
+            if kind == 'state':
+                from_clause += ' JOIN Address ON AHJ.AddressID = Address.AddressID '
+                where_clause += 'Address.' + column + '=%(' + column + ')s AND '
+            elif kind == 'name':
+                where_clause += get_name_query_cond(column, '', placeholders)
+            elif kind == 'basic':
+                where_clause += get_basic_query_cond(column, '', placeholders)
+            elif kind == 'list':
+                where_clause += get_list_query_cond(column, [''] * size, placeholders)
+            elif kind == 'in':
+                where_clause += get_in_query_cond(column, [''] * size, placeholders)
+            elif kind == 'name_in':
+                where_clause += get_in_query_cond('AHJPK', [''] * size, placeholders, param_name=column)
+            elif kind == 'fulltext':
+                where_clause += 'AHJ.AHJPK IN (SELECT AHJNameSearch.AHJPK FROM AHJNameSearch ' \
+                                'WHERE MATCH(AHJNameSearch.SearchNames) AGAINST(%(' + column + ')s IN BOOLEAN MODE)) AND '
+            elif kind == 'name_search':
+                where_clause += 'AHJ.AHJPK IN (SELECT AHJNameSearch.AHJPK FROM AHJNameSearch ' \
+                                'WHERE AHJNameSearch.SearchNames LIKE %(' + column + ')s) AND '
+        # NOTE: we append a 'True' at the end to always make the query valid
+        # because the get_x_query_cond appends an `AND` to the condition
+        return from_clause, where_clause + ' True'
+
+    def compile_after_cond(self):
+        """
+        Returns the condition that a row is ordered after the order column values of the ``after`` parameters.
+        For order columns ``(a DESC, b ASC)``, it is ``(a < %(aftera)s OR (a = %(aftera)s AND b > %(afterb)s))``.
+        """
+        conds = []
+        for i, (expr, alias, descending) in enumerate(self.order_columns):
+            equal_conds = [prev_expr + ' = %(after' + prev_alias + ')s' for prev_expr, prev_alias, _ in self.order_columns[:i]]
+            conds.append('(' + ' AND '.join(equal_conds + [expr + (' < ' if descending else ' > ') + '%(after' + alias + ')s']) + ')')
+        return '(' + ' OR '.join(conds) + ') AND '
+
+
+class AHJSearchTemplateCache:
+    """
+    LRU cache of the compiled AHJSearchTemplate of each AHJSearchShape, which counts how often each shape is used.
+    """
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.templates = OrderedDict()
+        self.uses = {}
+        self.compiles = 0
+        self.lock = threading.Lock()
+
+    def get(self, shape):
+        with self.lock:
+            template = self.templates.get(shape)
+            if template is None:
+                template = AHJSearchTemplate(shape)
+                self.compiles += 1
+                self.templates[shape] = template
+                while len(self.templates) > self.max_size:
+                    self.uses.pop(self.templates.popitem(last=False)[0], None)
+            self.templates.move_to_end(shape)
+            self.uses[shape] = self.uses.get(shape, 0) + 1
+            return template
+
+    def get_stats(self):
+        """
+        Returns the number of distinct shapes cached, the number of templates compiled,
+        and the shapes with the number of searches of each, most used first.
+        """
+        with self.lock:
+            return {
+                'shapes': len(self.templates),
+                'compiles': self.compiles,
+                'max_size': self.max_size,
+                'uses': sorted(self.uses.items(), key=lambda item: item[1], reverse=True)
+            }
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self.uses.clear()
+            self.compiles = 0
+
+
+_template_cache = None
+_template_cache_lock = threading.Lock()
+
+
+def get_search_template_cache():
+    """
+    Returns this process' AHJSearchTemplateCache, created from the settings the first time it is called.
+    """
+    global _template_cache
+    with _template_cache_lock:
+        if _template_cache is None:
+            _template_cache = AHJSearchTemplateCache(max_size=getattr(settings, 'SEARCH_TEMPLATE_CACHE_MAX_SIZE', 1000))
+        return _template_cache
+
+
+def get_search_template(shape):
+    return get_search_template_cache().get(shape)
+
+
+class AHJSearchQuery:
+    """
+    An AHJ search that can be run, counted, and paged without loading AHJs outside of the page.
+    """
+    def __init__(self, template, params):
+        self.template = template
+        self.params = params
+
+    @property
+    def order_columns(self):
+        return self.template.order_columns
+
+    def get_sql(self, after=None, limit=None, offset=None):
+        """
+        Returns the SQL and parameters of the search's AHJs, which are optionally limited to a page.
+        """
+        params = dict(self.params)
+        if limit is None and after is None:
+            return self.template.sql, params
+        # MySQL has no OFFSET without LIMIT, so all rows after the cursor are limited to the largest LIMIT
+        params['limit'] = limit if limit is not None else 18446744073709551615
+        params['offset'] = offset or 0
+        if after is None:
+            return self.template.page_sql, params
+        for i, (_, alias, _) in enumerate(self.order_columns):
+            params['after' + alias] = after[i]
+        return self.template.after_page_sql, params
+
+    def get_count_sql(self):
+        """
+        Returns the SQL and parameters that count the search's AHJs.
+        """
+        return self.template.count_sql, dict(self.params)
+
+    def raw(self, after=None, limit=None, offset=None):
+        sql, params = self.get_sql(after=after, limit=limit, offset=offset)
+        return AHJ.objects.raw(sql, params)
+
+    def count(self):
+        sql, params = self.get_count_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    def get_cursor_key(self, ahj):
+        """
+        Returns the order column values of an AHJ returned by this query, to page after it.
+        """
+        return [getattr(ahj, alias) for _, alias, _ in self.order_columns]
+
+    def __iter__(self):
+        return iter(self.raw())
+
+    def __getitem__(self, k):
+        """
+        Returns a list of AHJs for a slice, which is queried with ``LIMIT`` and ``OFFSET``.
+        """
+        if isinstance(k, slice):
+            if k.step is not None or k.stop is None:
+                return list(self.raw())[k]
+            offset = k.start or 0
+            return list(self.raw(limit=max(k.stop - offset, 0), offset=offset))
+        return list(self.raw(limit=1, offset=k))[0]
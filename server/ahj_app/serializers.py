@@ -4,9 +4,14 @@ from djoser.compat import get_user_email, get_user_email_field_name
 from django.conf import settings
 from django.db import connection
 from rest_framework import serializers
+from rest_framework.exceptions import ParseError
 from rest_framework_gis import serializers as geo_serializers
+from rest_framework_gis.fields import GeometryField
 from djoser.serializers import UserCreateSerializer
 from .models import *
+from .enum_registry import get_enum_attribute, get_enum_foreign_key
+from .polygon_geometry import get_default_geometry_detail, get_polygon_geometry, polygon_geometry_cache_enabled
+from .prefetch import ahj_page_prefetch_enabled, prefetch_ahj_page
 from .utils import get_enum_value_row_else_null
 
 
@@ -30,6 +35,17 @@ def filter_excluded_fields(serializer_instance, serializer_model):
             serializer_instance.fields.pop(field)
 
 
+class CachedGeometryField(GeometryField):
+    """
+    Serializes a Polygon's geometry from ``polygon_geometry.py`` at the context's 'geometry_detail',
+    if ``settings.POLYGON_GEOMETRY_CACHE_ENABLED``.
+    """
+    def get_attribute(self, instance):
+        if polygon_geometry_cache_enabled():
+            return get_polygon_geometry(instance, self.context.get('geometry_detail', None) or get_default_geometry_detail())
+        return super().get_attribute(instance)
+
+
 class PolygonSerializer(geo_serializers.GeoFeatureModelSerializer):
     """
     Class to serialize Polygon objects into GeoJSON format
@@ -37,6 +53,7 @@ class PolygonSerializer(geo_serializers.GeoFeatureModelSerializer):
     the GeoJSON
     """
     AHJID = serializers.SerializerMethodField()
+    Polygon = CachedGeometryField()
 
     class Meta:
         model = Polygon
@@ -87,7 +104,11 @@ class EnumModelSerializer(serializers.Serializer):
     Value = serializers.CharField()
 
     def get_attribute(self, instance):
-        attribute = super().get_attribute(instance)
+        if len(self.source_attrs) == 1 and get_enum_foreign_key(type(instance), self.source_attrs[0]) is not None:
+            # Read the enum row from the enum registry instead of querying it
+            attribute = get_enum_attribute(instance, self.source_attrs[0])
+        else:
+            attribute = super().get_attribute(instance)
         if attribute is None:
             return {'Value': ''}
         else:
@@ -216,10 +237,10 @@ class RecursiveField(serializers.Serializer):
     """
     def to_representation(self, value):
         """
-        Calls the caller serializer that called this serializer
+        Calls the caller serializer that called this serializer.
+        The caller is reused instead of creating a new serializer for each value.
         """
-        serializer = self.parent.parent.__class__(value, context=self.context)
-        return serializer.data
+        return self.parent.parent.to_representation(value)
 
 
 class APITokenSerializer(serializers.Serializer):
@@ -414,9 +435,53 @@ class EngineeringReviewRequirementSerializer(serializers.Serializer):
         return super().to_representation(err)
 
 
+def get_excluded_ahj_field_names(is_public_view, fields=None):
+    """
+    Returns the set of AHJSerializer field names that are not serialized
+    in the view and with the ``fields`` projection, if given.
+    """
+    excluded_field_names = set(AHJ.SERIALIZER_EXCLUDED_FIELDS) if is_public_view else set()
+    if fields is not None:
+        excluded_field_names.update(name for name in AHJSerializer._declared_fields if name not in fields)
+    return excluded_field_names
+
+
+def get_fields_projection(request, is_public_view):
+    """
+    Returns the AHJ fields named in the comma-separated ``fields`` query parameter,
+    or None if it was not given or is empty. Raises ParseError if a name is not an AHJ field in the view.
+    """
+    fields = [name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()]
+    if not fields:
+        return None
+    excluded_field_names = get_excluded_ahj_field_names(is_public_view)
+    unknown_fields = [name for name in fields if name not in AHJSerializer._declared_fields or name in excluded_field_names]
+    if unknown_fields:
+        raise ParseError(f'Unknown fields: {", ".join(unknown_fields)}')
+    return frozenset(fields)
+
+
+class AHJListSerializer(serializers.ListSerializer):
+    """
+    Serializes a list of AHJs, first fetching the children of
+    all the AHJs with ``prefetch.prefetch_ahj_page``.
+    """
+    def to_representation(self, data):
+        if ahj_page_prefetch_enabled():
+            data = prefetch_ahj_page(data, is_public_view=self.context.get('is_public_view', False),
+                                     fields=self.context.get('fields', None),
+                                     geometry_detail=self.context.get('geometry_detail', None))
+        return super().to_representation(data)
+
+
 class AHJSerializer(serializers.Serializer):
     """
     Serializes Orange Button AHJ object
+    Note not every AHJ has every child object.
+    If 'is_public_view' is True, will not serialize fields
+    that are not meant for public api users.
+    If 'fields' is given, only serializes the fields in it.
+    'geometry_detail' is the level of detail of the Polygon's geometry (see polygon_geometry.py).
     """
     AHJPK = OrangeButtonSerializer()
     AHJID = OrangeButtonSerializer()
@@ -455,16 +520,28 @@ class AHJSerializer(serializers.Serializer):
     FeeStructures = FeeStructureSerializer(source='get_fee_structures', many=True)
     UnconfirmedFeeStructures = FeeStructureSerializer(source='get_uncon_fs', many=True)
 
-    def to_representation(self, ahj):
+    class Meta:
+        list_serializer_class = AHJListSerializer
+
+    def get_excluded_field_names(self):
         """
-        Returns an OrderedDict representing an AHJ object
-        Note not every AHJ has every child object.
-        If 'is_public_view' is True, will not serialize fields
-        that are not meant for public api users.
+        Returns the names of the fields not serialized: the AHJ's SERIALIZER_EXCLUDED_FIELDS
+        if 'is_public_view' is True, and the fields not in the 'fields' projection, if given.
         """
-        if self.context.get('is_public_view', False):
-            filter_excluded_fields(self, AHJ)
-        return super().to_representation(ahj)
+        if getattr(self, '_excluded_field_names', None) is None:
+            self._excluded_field_names = get_excluded_ahj_field_names(self.context.get('is_public_view', False),
+                                                                      self.context.get('fields', None))
+        return self._excluded_field_names
+
+    @property
+    def _readable_fields(self):
+        """
+        Skips the excluded fields without removing them from ``self.fields``.
+        """
+        excluded_field_names = self.get_excluded_field_names()
+        for field in super()._readable_fields:
+            if field.field_name not in excluded_field_names:
+                yield field
 
     def get_Polygon(self, instance):
         """
@@ -472,7 +549,28 @@ class AHJSerializer(serializers.Serializer):
         """
         if instance.PolygonID is None:
             return None
-        return PolygonSerializer(instance.PolygonID, context={'AHJID': instance.AHJID}).data
+        return PolygonSerializer(instance.PolygonID, context={'AHJID': instance.AHJID,
+                                                              'geometry_detail': self.context.get('geometry_detail', None)}).data
+
+
+class AHJTypeaheadSerializer(serializers.Serializer):
+    """
+    Serializes the dicts of AHJs returned by ``name_search.typeahead``
+    """
+    AHJPK = OrangeButtonSerializer()
+    AHJID = OrangeButtonSerializer()
+    AHJName = OrangeButtonSerializer()
+    StateProvince = OrangeButtonSerializer()
+
+    def to_representation(self, ahj):
+        """
+        Returns an OrderedDict representing an AHJ's name search result.
+        If 'is_public_view' is True, will not serialize fields
+        that are not meant for public api users.
+        """
+        if self.context.get('is_public_view', False):
+            filter_excluded_fields(self, AHJ)
+        return super().to_representation(ahj)
 
 
 class EditSerializer(serializers.Serializer):
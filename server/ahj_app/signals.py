@@ -1,3 +1,5 @@
 import django.dispatch
 
-activation_email_sent = django.dispatch.Signal()
\ No newline at end of file
+activation_email_sent = django.dispatch.Signal()
+# Sent with the AHJPKs of the AHJs whose serialized data may have changed because a row was saved or deleted
+ahjs_changed = django.dispatch.Signal()
@@ -0,0 +1,247 @@
+"""
+An in-process spatial index of the Polygon table used by the Address/Location-to-AHJ search.
+
+Each worker process loads the State, County, City, and CountySubdivision polygons once into a
+Sort-Tile-Recursive (STR) packed R-tree of their bounding boxes. A search first finds the polygons
+whose bounding box contains the searched point (or intersects the searched polygon) using the tree,
+and then runs the exact containment test against prepared GEOS geometries of only those candidates.
+The database is then only queried for the AHJ rows of the matched PolygonIDs.
+
+The index is kept fresh in two ways:
+    - Saving or deleting a Polygon, StatePolygon, CountyPolygon, CityPolygon or CountySubdivisionPolygon
+      row marks it as changed, and the index reloads only the changed polygons before its next search.
+    - The change also bumps a version number stored in the Django cache so that other worker processes
+      reload their index. Workers check this version at most every ``SPATIAL_INDEX_VERSION_CHECK_SECONDS``.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.gis.geos import Point
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Polygon, StatePolygon, CountyPolygon, CityPolygon, CountySubdivisionPolygon
+
+SPATIAL_INDEX_VERSION_CACHE_KEY = 'spatial-index-version'
+
+# Polygon models whose rows are searched by the index,
+# other than StatePolygon, keyed by model name.
+STATE_CHILD_POLYGON_MODELS = {
+    'CountyPolygon': CountyPolygon,
+    'CityPolygon': CityPolygon,
+    'CountySubdivisionPolygon': CountySubdivisionPolygon
+}
+
+
+def extent_intersects(a, b):
+    """
+    Checks if two extents of the form ``(xmin, ymin, xmax, ymax)`` intersect.
+    """
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def extent_union(extents):
+    """
+    Returns the smallest extent containing all of the given extents.
+    """
+    return (min(e[0] for e in extents), min(e[1] for e in extents),
+            max(e[2] for e in extents), max(e[3] for e in extents))
+
+
+class STRtree:
+    """
+    A static R-tree packed using the Sort-Tile-Recursive algorithm.
+
+    It is built from a list of ``(extent, item)`` pairs, where extent is
+    a tuple ``(xmin, ymin, xmax, ymax)``, and cannot be modified after it
+    is built. Each node is a tuple ``(extent, children, is_leaf)``.
+    """
+    def __init__(self, entries, node_capacity=10):
+        self.node_capacity = node_capacity
+        self.size = len(entries)
+        self.root = self._build([(extent, item, True) for extent, item in entries]) if entries else None
+
+    def _build(self, nodes):
+        is_leaf_level = True
+        while True:
+            nodes = self._pack(nodes, is_leaf_level)
+            is_leaf_level = False
+            if len(nodes) == 1:
+                return nodes[0]
+
+    def _pack(self, nodes, is_leaf_level):
+        """
+        Packs one level of the tree into parent nodes of at most ``node_capacity`` children.
+        """
+        capacity = self.node_capacity
+        num_parents = math.ceil(len(nodes) / capacity)
+        num_slices = math.ceil(math.sqrt(num_parents))
+        slice_size = num_slices * capacity
+        nodes = sorted(nodes, key=lambda n: n[0][0] + n[0][2])
+        parents = []
+        for i in range(0, len(nodes), slice_size):
+            vertical_slice = sorted(nodes[i:i + slice_size], key=lambda n: n[0][1] + n[0][3])
+            for j in range(0, len(vertical_slice), capacity):
+                children = vertical_slice[j:j + capacity]
+                if is_leaf_level:
+                    children = [(extent, item) for extent, item, _ in children]
+                parents.append((extent_union([c[0] for c in children]), children, is_leaf_level))
+        return parents
+
+    def query(self, extent):
+        """
+        Returns the items whose extent intersects the given extent.
+        """
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node_extent, children, is_leaf = stack.pop()
+            if not extent_intersects(node_extent, extent):
+                continue
+            if is_leaf:
+                results.extend(item for item_extent, item in children if extent_intersects(item_extent, extent))
+            else:
+                stack.extend(children)
+        return results
+
+
+class IndexedPolygon:
+    """
+    A polygon stored in the spatial index.
+    ``StatePolygonID`` is ``None`` if the polygon is a StatePolygon.
+    """
+    __slots__ = ('PolygonID', 'StatePolygonID', 'extent', 'geometry', 'prepared')
+
+    def __init__(self, polygon_id, state_polygon_id, geometry):
+        self.PolygonID = polygon_id
+        self.StatePolygonID = state_polygon_id
+        self.extent = geometry.extent
+        self.geometry = geometry
+        self.prepared = geometry.prepared
+
+
+class PolygonSpatialIndex:
+    """
+    Resolves Locations and polygons to the PolygonIDs of the jurisdictions containing or intersecting them.
+
+    The results match ``utils.filter_ahjs``' SQL search: a County, City, or CountySubdivision polygon only
+    matches if the StatePolygon it belongs to also matches.
+    """
+    def __init__(self):
+        self.polygons = {}
+        self.tree = STRtree([])
+
+    def load(self, polygon_ids=None):
+        """
+        Loads the given PolygonIDs from the database, or all polygons if ``polygon_ids`` is ``None``.
+        PolygonIDs that are no longer a searchable polygon are removed from the index.
+        """
+        state_polygons = StatePolygon.objects.all()
+        if polygon_ids is not None:
+            state_polygons = state_polygons.filter(PolygonID__in=polygon_ids)
+            for polygon_id in polygon_ids:
+                self.polygons.pop(polygon_id, None)
+        parents = {polygon_id: None for polygon_id in state_polygons.values_list('PolygonID', flat=True)}
+        for model in STATE_CHILD_POLYGON_MODELS.values():
+            child_polygons = model.objects.all()
+            if polygon_ids is not None:
+                child_polygons = child_polygons.filter(PolygonID__in=polygon_ids)
+            parents.update(child_polygons.values_list('PolygonID', 'StatePolygonID'))
+        polygons = Polygon.objects.all()
+        if polygon_ids is not None:
+            polygons = polygons.filter(PolygonID__in=polygon_ids)
+        for polygon_id, geometry in polygons.values_list('PolygonID', 'Polygon').iterator():
+            if polygon_id in parents and geometry is not None and not geometry.empty:
+                self.polygons[polygon_id] = IndexedPolygon(polygon_id, parents[polygon_id], geometry)
+        self.tree = STRtree([(p.extent, p) for p in self.polygons.values()])
+
+    def _resolve(self, matched):
+        state_ids = {p.PolygonID for p in matched if p.StatePolygonID is None}
+        return {p.PolygonID for p in matched if p.StatePolygonID is None or p.StatePolygonID in state_ids}
+
+    def polygon_ids_containing(self, lng, lat):
+        """
+        Returns the set of PolygonIDs whose polygon contains the point (lng, lat).
+        """
+        point = Point(lng, lat)
+        candidates = self.tree.query((lng, lat, lng, lat))
+        return self._resolve([p for p in candidates if p.prepared.contains(point)])
+
+    def polygon_ids_intersecting(self, geometry):
+        """
+        Returns the set of PolygonIDs whose polygon intersects the given GEOS geometry.
+        """
+        candidates = self.tree.query(geometry.extent)
+        return self._resolve([p for p in candidates if p.prepared.intersects(geometry)])
+
+
+_index = None
+_index_version = None
+_index_checked_at = 0
+_changed_polygon_ids = set()
+_index_lock = threading.Lock()
+
+
+def spatial_index_enabled():
+    return getattr(settings, 'SPATIAL_INDEX_ENABLED', False)
+
+
+def get_spatial_index():
+    """
+    Returns this process' spatial index, loading or refreshing it first if needed.
+    """
+    global _index, _index_version, _index_checked_at
+    with _index_lock:
+        now = time.monotonic()
+        if _index is not None and now - _index_checked_at >= getattr(settings, 'SPATIAL_INDEX_VERSION_CHECK_SECONDS', 60):
+            _index_checked_at = now
+            if cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY, 0) != _index_version:
+                _index = None
+        if _index is None:
+            _index_version = cache.get(SPATIAL_INDEX_VERSION_CACHE_KEY, 0)
+            _index_checked_at = now
+            _changed_polygon_ids.clear()
+            _index = PolygonSpatialIndex()
+            _index.load()
+        elif _changed_polygon_ids:
+            _index.load(polygon_ids=list(_changed_polygon_ids))
+            _changed_polygon_ids.clear()
+        return _index
+
+
+def mark_polygon_changed(polygon_id):
+    """
+    Marks a polygon to be reloaded by this process' index, and tells other processes to reload their index.
+    """
+    global _index_version
+    with _index_lock:
+        _changed_polygon_ids.add(polygon_id)
+        version = time.time_ns()
+        cache.set(SPATIAL_INDEX_VERSION_CACHE_KEY, version, None)
+        _index_version = version
+
+
+def polygon_ids_containing(lng, lat):
+    return get_spatial_index().polygon_ids_containing(lng, lat)
+
+
+def polygon_ids_intersecting(geometry):
+    return get_spatial_index().polygon_ids_intersecting(geometry)
+
+
+@receiver([post_save, post_delete], sender=Polygon)
+def polygon_changed(sender, instance, **kwargs):
+    mark_polygon_changed(instance.PolygonID)
+
+
+@receiver([post_save, post_delete], sender=StatePolygon)
+@receiver([post_save, post_delete], sender=CountyPolygon)
+@receiver([post_save, post_delete], sender=CityPolygon)
+@receiver([post_save, post_delete], sender=CountySubdivisionPolygon)
+def polygon_type_changed(sender, instance, **kwargs):
+    mark_polygon_changed(instance.PolygonID_id)
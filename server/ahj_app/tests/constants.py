@@ -27,6 +27,7 @@ noAuthTokenUrls = [
     ('edit-list', {}),
     ('user-edits', {}),
     ('user-comments', {}),
+    ('ahj-comments', {}),
     ('single-user-info', {'username': 'test'}),
     ('form-validator', {}),
     ('data-map', {}),
@@ -4,6 +4,7 @@ from django.contrib.gis.db import models
 from django.contrib.gis.geos import GEOSGeometry, MultiPolygon
 from django.contrib.gis.geos import Polygon as geosPolygon
 from ahj_app.models import WebpageToken, APIToken, User, Contact, Address, AHJ, AHJUserMaintains, Polygon
+from ahj_app.enum_registry import clear_enum_registry, invalidate_enum_registry
 from ahj_app.utils import ENUM_FIELDS, get_enum_value_row
 from rest_framework.test import APIClient
 from constants import webpageTokenUrls, apiTokenUrls
@@ -14,6 +15,14 @@ import string
 import uuid
 
 
+@pytest.fixture(autouse=True)
+def reset_enum_registry():
+    """
+    Clears the enum registry before each test, since the enum rows of other tests are rolled back.
+    """
+    clear_enum_registry()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -170,6 +179,7 @@ def add_enum_value_rows():
         model = apps.get_model('ahj_app', field)
         model.objects.all().delete()
         model.objects.bulk_create([model(Value=choice[0]) for choice in model._meta.get_field('Value').choices])
+    invalidate_enum_registry()
 
 
 def get_value_or_enum_row(field_name, value):
@@ -0,0 +1,114 @@
+import io
+import uuid
+
+from django.contrib.gis.geos import Polygon as geosPolygon
+from django.contrib.gis.geos import MultiPolygon
+from django.urls import reverse
+
+from ahj_app.address_index import build_address_index, get_address_polygon_ids
+from ahj_app.models import AHJ, Address, AddressJurisdiction, Polygon, StatePolygon, CountyPolygon, CityPolygon
+from fixtures import *
+import pytest
+
+
+ZCTA_COUNTY_FILE = 'OID_ZCTA5_20|GEOID_ZCTA5_20|NAMELSAD_ZCTA5_20|GEOID_COUNTY_20|NAMELSAD_COUNTY_20\n' \
+                   '1|95001|ZCTA5 95001|06001|Alpha County\n' \
+                   '2|95002|ZCTA5 95002|06001|Alpha County\n' \
+                   '3|95002|ZCTA5 95002|06002|Beta County\n'
+
+ZCTA_PLACE_FILE = 'OID_ZCTA5_20|GEOID_ZCTA5_20|NAMELSAD_ZCTA5_20|GEOID_PLACE_20|NAMELSAD_PLACE_20\n' \
+                  '1|95001|ZCTA5 95001|0600001|Springfield city\n'
+
+
+def create_polygon(extent, GEOID, Name):
+    geometry = MultiPolygon(geosPolygon.from_bbox(extent))
+    centroid = geometry.centroid
+    return Polygon.objects.create(Polygon=geometry, GEOID=GEOID, Name=Name, LandArea=1, WaterArea=1,
+                                  InternalPLatitude=centroid.y, InternalPLongitude=centroid.x)
+
+
+@pytest.fixture
+def address_index(settings):
+    """
+    A state with two counties, a city in the first county, and a city crossing the two counties.
+    """
+    settings.ADDRESS_INDEX_ENABLED = True
+    state = StatePolygon.objects.create(PolygonID=create_polygon((0, 0, 10, 10), '06', 'California'), FIPSCode='06')
+    alpha = CountyPolygon.objects.create(PolygonID=create_polygon((0, 0, 5, 10), '06001', 'Alpha'), StatePolygonID=state, LSAreaCodeName='Alpha County')
+    beta = CountyPolygon.objects.create(PolygonID=create_polygon((5, 0, 10, 10), '06002', 'Beta'), StatePolygonID=state, LSAreaCodeName='Beta County')
+    springfield = CityPolygon.objects.create(PolygonID=create_polygon((1, 1, 2, 2), '0600001', 'Springfield'), StatePolygonID=state, LSAreaCodeName='Springfield city')
+    shelbyville = CityPolygon.objects.create(PolygonID=create_polygon((4, 1, 5.5, 2), '0600002', 'Shelbyville'), StatePolygonID=state, LSAreaCodeName='Shelbyville city')
+    assert build_address_index([io.StringIO(ZCTA_COUNTY_FILE), io.StringIO(ZCTA_PLACE_FILE)])[0] == 4
+    return {polygon.PolygonID_id: polygon for polygon in [state, alpha, beta, springfield, shelbyville]}, \
+        state.PolygonID_id, alpha.PolygonID_id, beta.PolygonID_id, springfield.PolygonID_id, shelbyville.PolygonID_id
+
+
+def ob_address(**fields):
+    return {field: {'Value': value} for field, value in fields.items()}
+
+
+@pytest.mark.django_db
+def test_build_address_index(address_index):
+    polygons, state, alpha, beta, springfield, shelbyville = address_index
+    assert AddressJurisdiction.objects.get(PolygonID=springfield).IsExact is True
+    assert AddressJurisdiction.objects.get(PolygonID=shelbyville).IsExact is False
+    assert AddressJurisdiction.objects.get(PolygonID=beta).StateProvince == 'CA'
+
+
+@pytest.mark.django_db
+def test_get_address_polygon_ids__city(address_index):
+    polygons, state, alpha, beta, springfield, shelbyville = address_index
+    assert get_address_polygon_ids(ob_address(City='Springfield', StateProvince='CA')) == sorted([state, alpha, springfield])
+    assert get_address_polygon_ids(ob_address(City='SPRINGFIELD CITY', StateProvince='ca')) == sorted([state, alpha, springfield])
+    assert get_address_polygon_ids(ob_address(City='Shelbyville', StateProvince='CA')) == sorted([state, alpha, shelbyville])
+    assert get_address_polygon_ids(ob_address(City='Springfield', StateProvince='NV')) is None
+    assert get_address_polygon_ids(ob_address(City='Capital City', StateProvince='CA')) is None
+
+
+@pytest.mark.django_db
+def test_get_address_polygon_ids__street_only_in_exact_city(address_index):
+    polygons, state, alpha, beta, springfield, shelbyville = address_index
+    assert get_address_polygon_ids(ob_address(AddrLine1='742 Evergreen Terrace', City='Springfield', StateProvince='CA')) == sorted([state, alpha, springfield])
+    assert get_address_polygon_ids(ob_address(AddrLine1='1 Main St', City='Shelbyville', StateProvince='CA')) is None
+    assert get_address_polygon_ids(ob_address(AddrLine1='1 Main St', County='Alpha', StateProvince='CA')) is None
+
+
+@pytest.mark.django_db
+def test_get_address_polygon_ids__county_and_zip(address_index):
+    polygons, state, alpha, beta, springfield, shelbyville = address_index
+    assert get_address_polygon_ids(ob_address(County='Beta County', StateProvince='CA')) == sorted([state, beta])
+    assert get_address_polygon_ids(ob_address(County='Alpha', StateProvince='CA', ZipPostalCode='95002')) == sorted([state, alpha])
+    # A ZIP code partly in a city could be in the city
+    assert get_address_polygon_ids(ob_address(County='Alpha', StateProvince='CA', ZipPostalCode='95001')) is None
+    # The fields must agree
+    assert get_address_polygon_ids(ob_address(City='Springfield', County='Beta', StateProvince='CA')) is None
+    assert get_address_polygon_ids(ob_address(City='Springfield', StateProvince='CA', ZipPostalCode='95002')) is None
+    assert get_address_polygon_ids(ob_address(City='Springfield', StateProvince='CA', ZipPostalCode='95001-1234')) == sorted([state, alpha, springfield])
+    assert get_address_polygon_ids(ob_address(StateProvince='CA', ZipPostalCode='95002')) is None
+
+
+@pytest.mark.django_db
+def test_get_address_polygon_ids__cleared_when_polygon_changes(address_index):
+    polygons, state, alpha, beta, springfield, shelbyville = address_index
+    polygons[springfield].LSAreaCodeName = 'Springfield town'
+    polygons[springfield].save()
+    assert get_address_polygon_ids(ob_address(City='Springfield', StateProvince='CA')) is None
+    assert AddressJurisdiction.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_get_address_polygon_ids__disabled(address_index, settings):
+    settings.ADDRESS_INDEX_ENABLED = False
+    assert get_address_polygon_ids(ob_address(City='Springfield', StateProvince='CA')) is None
+
+
+@pytest.mark.django_db
+def test_ahj_geo_address__address_index_skips_geocoding(address_index, client_with_credentials, settings):
+    polygons, state, alpha, beta, springfield, shelbyville = address_index
+    settings.GEOCODER_BACKEND = 'unknown' # Geocoding would raise ImproperlyConfigured
+    city_ahj = AHJ.objects.create(AHJID=uuid.uuid4(), AHJName='Springfield city', PolygonID_id=springfield, AddressID=Address.objects.create())
+    state_ahj = AHJ.objects.create(AHJID=uuid.uuid4(), AHJName='California state', PolygonID_id=state, AddressID=Address.objects.create())
+    AHJ.objects.create(AHJID=uuid.uuid4(), AHJName='Shelbyville city', PolygonID_id=shelbyville, AddressID=Address.objects.create())
+    response = client_with_credentials.post(reverse('ahj-geo-address'), {'Address': ob_address(City='Springfield', StateProvince='CA')}, format='json')
+    assert response.status_code == 200
+    assert [ahj['AHJID']['Value'] for ahj in response.data] == [str(city_ahj.AHJID), str(state_ahj.AHJID)]
@@ -94,6 +94,73 @@ def test_webpage_ahj_list__no_search_parameters(url_name, client_with_credential
     response = client_with_credentials.post(url)
     assert response.data['count'] == 5 # returns all 5 AHJs due to no filtering
 
+@pytest.mark.parametrize(
+   'url_name', [
+       ('ahj-private'),
+       ('ahj-public')
+   ])
+@pytest.mark.django_db
+def test_ahj_list__cursor_pagination(url_name, client_with_credentials, list_of_ahjs):
+    url = reverse(url_name) + '?cursor=&limit=2'
+    ahj_codes = []
+    while url is not None:
+        response = client_with_credentials.post(url)
+        assert response.status_code == 200
+        assert response.data['count'] is None # Not counted unless requested
+        ahj_codes.extend(ahj['AHJCode']['Value'] for ahj in get_ahjs_from_response(response, url_name))
+        url = response.data['next']
+    assert ahj_codes == [ahj.AHJCode for ahj in list_of_ahjs]
+
+@pytest.mark.django_db
+def test_ahj_list__cursor_pagination_location_search(client_with_credentials, list_of_ahjs):
+    ahj1, ahj2, ahj3, ahj4, ahj5 = list_of_ahjs
+    url = reverse('ahj-public') + '?cursor=&limit=1&count=true'
+    payload = {'Location': { 'Latitude': { 'Value': 5 }, 'Longitude': { 'Value': 5 }}}
+    response = client_with_credentials.post(url, payload, format='json')
+    assert response.data['count'] == 2
+    assert [ahj['AHJCode']['Value'] for ahj in response.data['AuthorityHavingJurisdictions']] == [ahj2.AHJCode] # Higher AHJLevelCode first
+    response = client_with_credentials.post(response.data['next'], payload, format='json')
+    assert [ahj['AHJCode']['Value'] for ahj in response.data['AuthorityHavingJurisdictions']] == [ahj1.AHJCode]
+    assert response.data['next'] is None
+
+@pytest.mark.django_db
+def test_ahj_list__invalid_cursor(client_with_credentials):
+    url = reverse('ahj-public') + '?cursor=invalid'
+    response = client_with_credentials.post(url)
+    assert response.status_code == 404
+
+@pytest.mark.parametrize(
+   'url_name', [
+       ('ahj-private'),
+       ('ahj-public')
+   ])
+@pytest.mark.django_db
+def test_ahj_list__fields_projection(url_name, client_with_credentials, list_of_ahjs):
+    url = reverse(url_name) + '?fields=AHJName,AHJCode'
+    response = client_with_credentials.post(url)
+    assert response.status_code == 200
+    for ahj in get_ahjs_from_response(response, url_name):
+        assert list(ahj) == ['AHJCode', 'AHJName'] # In the order of the serializer's fields
+
+@pytest.mark.parametrize(
+   'url_name, fields', [
+       ('ahj-private', 'AHJName,NotAField'),
+       ('ahj-public', 'AHJName,NotAField'),
+       ('ahj-public', 'AHJName,AHJPK')  # AHJPK is not in the public view
+   ])
+@pytest.mark.django_db
+def test_ahj_list__unknown_fields(url_name, fields, client_with_credentials):
+    url = reverse(url_name) + '?fields=' + fields
+    response = client_with_credentials.post(url)
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+def test_get_single_ahj__fields_projection(client_with_credentials, list_of_ahjs):
+    url = reverse('single_ahj') + f'?AHJPK={list_of_ahjs[0].AHJPK}&fields=AHJPK,AHJName'
+    response = client_with_credentials.get(url)
+    assert response.status_code == 200
+    assert response.data == {'AHJPK': {'Value': list_of_ahjs[0].AHJPK}, 'AHJName': {'Value': list_of_ahjs[0].AHJName}}
+
 @pytest.mark.parametrize(
    'url_name, payload', [
        ('ahj-private', {'AHJName': 'Orange County'}),
@@ -123,6 +190,47 @@ def test_ahj_list__AHJName_search_multiple_matches(url_name, payload, list_of_ah
     assert ahjs[0]['AHJCode']['Value'] == ahj2.AHJCode and ahjs[1]['AHJCode']['Value'] == ahj3.AHJCode
     
 
+@pytest.mark.parametrize(
+   'url_name, payload', [
+       ('ahj-private', {'AHJName': 'orange'}),
+       ('ahj-public', {'AHJName': { 'Value': 'orange'}})
+   ])
+@pytest.mark.django_db
+def test_ahj_list__typeahead(url_name, payload, list_of_ahjs, client_with_credentials):
+    ahj1, ahj2, ahj3, ahj4, ahj5 = list_of_ahjs
+    url = reverse(url_name) + '?typeahead=true'
+    response = client_with_credentials.post(url, payload, format='json')
+    ahjs = get_ahjs_from_response(response, url_name)
+    assert response.status_code == 200
+    assert [ahj['AHJID']['Value'] for ahj in ahjs] == [ahj3.AHJID, ahj2.AHJID] # Shorter names are more relevant
+    assert ahjs[0]['AHJName']['Value'] == 'Orange City' and ahjs[0]['StateProvince']['Value'] == 'Utah'
+    assert ('AHJPK' in ahjs[0]) == (url_name == 'ahj-private')
+
+@pytest.mark.parametrize(
+   'url_name, payload', [
+       ('ahj-private', {'AHJName': 'Orange', 'StateProvince': 'California'}),
+       ('ahj-public', {'AHJName': { 'Value': 'Orange'}, 'StateProvince': { 'Value': 'California'}})
+   ])
+@pytest.mark.django_db
+def test_ahj_list__typeahead_StateProvince_and_limit(url_name, payload, list_of_ahjs, client_with_credentials):
+    ahj1, ahj2, ahj3, ahj4, ahj5 = list_of_ahjs
+    url = reverse(url_name) + '?typeahead=true&limit=1'
+    response = client_with_credentials.post(url, payload, format='json')
+    ahjs = get_ahjs_from_response(response, url_name)
+    assert response.data['count'] == 1
+    assert ahjs[0]['AHJID']['Value'] == ahj2.AHJID
+
+@pytest.mark.parametrize(
+   'url_name', [
+       ('ahj-private'),
+       ('ahj-public')
+   ])
+@pytest.mark.django_db
+def test_ahj_list__typeahead_no_AHJName(url_name, client_with_credentials):
+    url = reverse(url_name) + '?typeahead=true'
+    response = client_with_credentials.post(url, {}, format='json')
+    assert response.status_code == 400
+
 @pytest.mark.parametrize(
    'url_name, payload', [
        ('ahj-private', {'AHJID': 'f97ea81a-f9c4-4195-889e-ad414b736ce5'}),
@@ -460,6 +568,50 @@ def test_ahj_geo_location__search_array_has_ahj(list_of_ahjs, client_with_creden
     assert len(response.data) == 1
     assert response.status_code == 200
 
+# ahj_geo_location_batch Tests
+
+@pytest.mark.django_db
+def test_ahj_geo_location_batch__results_keyed_by_index(list_of_ahjs, client_with_credentials, valid_location_ob):
+    url = reverse('ahj-geo-location-batch')
+    locations = [valid_location_ob,
+                 { 'Latitude': { 'Value': '5' }, 'Longitude': { 'Value': '5' }},
+                 { 'Latitude': { 'Value': '-5' }, 'Longitude': { 'Value': '-5' }}]
+    response = client_with_credentials.post(url, {'Locations': locations}, format='json')
+    assert response.status_code == 200
+    assert list(response.data.keys()) == ['0', '1', '2']
+    assert [ahj['AHJCode']['Value'] for ahj in response.data['0']] == ['UT-0681820']
+    # Ordered by AHJLevelCode descending, like ahj_geo_location
+    assert [ahj['AHJCode']['Value'] for ahj in response.data['1']] == ['CA-0686300', 'AK-32789121']
+    assert response.data['2'] == []
+
+@pytest.mark.django_db
+def test_ahj_geo_location_batch__matches_ahj_geo_location(list_of_ahjs, client_with_credentials):
+    location = { 'Latitude': { 'Value': '5' }, 'Longitude': { 'Value': '5' }}
+    single_response = client_with_credentials.post(reverse('ahj-geo-location'), {'Location': location}, format='json')
+    batch_response = client_with_credentials.post(reverse('ahj-geo-location-batch'), {'Locations': [location]}, format='json')
+    assert batch_response.data['0'] == single_response.data
+
+@pytest.mark.parametrize(
+   'locations', [
+       None,
+       [],
+       [{ 'Latitude': { 'Value': '25' }}],
+       [{ 'Latitude': { 'Value': '25' }, 'Longitude': { 'Value': '25' }}, { 'Latitude': { 'Value': 'a' }, 'Longitude': { 'Value': 'a' }}]
+   ]
+)
+@pytest.mark.django_db
+def test_ahj_geo_location_batch__invalid_locations(locations, client_with_credentials):
+    url = reverse('ahj-geo-location-batch')
+    response = client_with_credentials.post(url, {'Locations': locations}, format='json')
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+def test_ahj_geo_location_batch__too_many_locations(client_with_credentials, valid_location_ob, settings):
+    url = reverse('ahj-geo-location-batch')
+    settings.BATCH_LOCATION_SEARCH_MAX_LOCATIONS = 2
+    response = client_with_credentials.post(url, {'Locations': [valid_location_ob] * 3}, format='json')
+    assert response.status_code == 400
+
 
 @pytest.mark.django_db
 def test_deactivate_expired_api_tokens(create_user_with_active_api_token):
@@ -0,0 +1,91 @@
+import datetime
+
+from django.utils import timezone
+
+from ahj_app.bulk_edits import bulk_apply_edits
+from ahj_app.models import AHJ, AHJInspection, Edit
+from ahj_app import views_edits
+from fixtures import *
+import pytest
+
+
+@pytest.fixture
+def make_edit(create_user):
+    user = create_user()
+    def make(row, column, new_value, DateEffective=None, **kwargs):
+        fields = {'ChangedBy': user, 'ApprovedBy': user, 'AHJPK_id': getattr(row, 'AHJPK_id', None) or row.pk,
+                  'SourceTable': row.__class__.__name__, 'SourceRow': row.pk, 'SourceColumn': column,
+                  'OldValue': str(getattr(row, column)), 'NewValue': new_value, 'DateRequested': timezone.now(),
+                  'DateEffective': DateEffective or timezone.now(), 'ReviewStatus': 'A', 'EditType': 'U'}
+        fields.update(kwargs)
+        return Edit.objects.create(**fields)
+    return make
+
+
+@pytest.mark.django_db
+def test_bulk_apply_edits__last_effective_wins(ahj_obj, make_edit):
+    later = make_edit(ahj_obj, 'AHJName', 'later', DateEffective=timezone.now() + datetime.timedelta(hours=1))
+    earlier = make_edit(ahj_obj, 'AHJName', 'earlier')
+    code = make_edit(ahj_obj, 'AHJCode', 'code')
+    result = bulk_apply_edits([later, earlier, code])
+    ahj = AHJ.objects.get(AHJPK=ahj_obj.AHJPK)
+    assert ahj.AHJName == 'later'
+    assert ahj.AHJCode == 'code'
+    assert Edit.objects.filter(IsApplied=True).count() == 3
+    assert result.get_stats()['edits'] == 3
+    assert result.get_stats()['rows'] == 1
+    assert result.renamed_ahjpks == [ahj_obj.AHJPK]
+
+
+@pytest.mark.django_db
+def test_bulk_apply_edits__awaiting_old_values_updated(ahj_obj, make_edit):
+    edit = make_edit(ahj_obj, 'AHJName', 'newname')
+    pending_edit = make_edit(ahj_obj, 'AHJName', 'othername', ReviewStatus='P', ApprovedBy=None, DateEffective=None)
+    other_column_edit = make_edit(ahj_obj, 'AHJCode', 'code', ReviewStatus='P', ApprovedBy=None, DateEffective=None)
+    bulk_apply_edits([edit])
+    assert Edit.objects.get(EditID=pending_edit.EditID).OldValue == 'newname'
+    assert Edit.objects.get(EditID=other_column_edit.EditID).OldValue == other_column_edit.OldValue
+    assert Edit.objects.get(EditID=edit.EditID).OldValue == edit.OldValue
+
+
+@pytest.mark.django_db
+def test_bulk_apply_edits__history_created(ahj_obj, make_edit):
+    edit = make_edit(ahj_obj, 'AHJName', 'newname')
+    num_ahj_records = AHJ.history.filter(AHJPK=ahj_obj.AHJPK).count()
+    bulk_apply_edits([edit])
+    assert AHJ.history.filter(AHJPK=ahj_obj.AHJPK).count() == num_ahj_records + 1
+    assert Edit.history.filter(EditID=edit.EditID).latest('history_date').IsApplied is True
+
+
+@pytest.mark.django_db
+def test_bulk_apply_edits__rejected_additions(ahj_obj, make_edit):
+    inspection = AHJInspection.objects.create(AHJPK=ahj_obj, AHJInspectionName='Inspection1', InspectionStatus=True)
+    edit = make_edit(inspection, 'InspectionStatus', 'True', EditType='A', ReviewStatus='R')
+    bulk_apply_edits([], [edit])
+    assert AHJInspection.objects.get(InspectionID=inspection.InspectionID).InspectionStatus is False
+
+
+@pytest.mark.django_db
+def test_bulk_apply_edits__missing_row_skipped(ahj_obj, make_edit):
+    edit = make_edit(ahj_obj, 'AHJName', 'newname')
+    missing_row_edit = make_edit(ahj_obj, 'AHJName', 'othername', SourceRow=ahj_obj.AHJPK + 1000,
+                                 DateEffective=timezone.now() + datetime.timedelta(hours=1))
+    result = bulk_apply_edits([edit, missing_row_edit])
+    assert AHJ.objects.get(AHJPK=ahj_obj.AHJPK).AHJName == 'newname'
+    assert list(Edit.objects.filter(IsApplied=True)) == [edit]
+    assert result.missing_row_edits == [missing_row_edit]
+    assert result.get_stats()['missing_row_edits'] == 1
+
+
+@pytest.mark.parametrize('bulk', [False, True])
+@pytest.mark.django_db
+def test_apply_edits__bulk_same_as_one_by_one(bulk, ahj_obj, make_edit, settings):
+    settings.BULK_APPLY_EDITS_ENABLED = bulk
+    inspection = AHJInspection.objects.create(AHJPK=ahj_obj, AHJInspectionName='Inspection1', InspectionStatus=True)
+    make_edit(ahj_obj, 'AHJName', 'first')
+    make_edit(ahj_obj, 'AHJName', 'second')
+    make_edit(inspection, 'AHJInspectionName', 'Inspection2')
+    views_edits.apply_edits()
+    assert AHJ.objects.get(AHJPK=ahj_obj.AHJPK).AHJName == 'second'
+    assert AHJInspection.objects.get(InspectionID=inspection.InspectionID).AHJInspectionName == 'Inspection2'
+    assert not Edit.objects.filter(IsApplied=False).exists()
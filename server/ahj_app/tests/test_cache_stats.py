@@ -0,0 +1,25 @@
+from ahj_app import cache_stats
+import pytest
+
+
+def test_get_cache_stats(settings):
+    settings.LOCATION_CACHE_ENABLED = True
+    settings.GEOCODE_CACHE_ENABLED = False
+    settings.DEM_TILE_DIRECTORY = None
+    stats = cache_stats.get_cache_stats()
+    assert set(stats) == {'search_templates', 'location'}
+    assert len(stats['search_templates']['uses']) <= cache_stats.TOP_SEARCH_SHAPES
+
+
+def test_request_finished_log_cache_stats(settings, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cache_stats, 'log_cache_stats', lambda: calls.append(True))
+    settings.CACHE_STATS_LOG_SECONDS = None
+    cache_stats.request_finished_log_cache_stats(None)
+    assert calls == []
+    settings.CACHE_STATS_LOG_SECONDS = 0
+    cache_stats.request_finished_log_cache_stats(None)
+    assert calls == [True]
+    settings.CACHE_STATS_LOG_SECONDS = 3600
+    cache_stats.request_finished_log_cache_stats(None)
+    assert calls == [True]
@@ -0,0 +1,100 @@
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from ahj_app.compiled_serializers import SerializerCompiler, compiled_serialize_ahjs
+from ahj_app.models import AHJ, AHJInspection, AHJDocumentSubmissionMethodUse, Contact, DocumentSubmissionMethod, \
+    EngineeringReviewRequirement, FeeStructure, AHJLevelCode
+from ahj_app.serializers import AHJSerializer, EnumModelSerializer, OrangeButtonSerializer
+from fixtures import *
+import pytest
+
+
+class Enum:
+    def __init__(self, Value):
+        self.Value = Value
+
+
+class Child:
+    SERIALIZER_EXCLUDED_FIELDS = ['ChildID']
+
+    def __init__(self, ChildID, Name):
+        self.ChildID = ChildID
+        self.Name = Name
+
+
+class Parent:
+    SERIALIZER_EXCLUDED_FIELDS = ['Notes']
+
+    def __init__(self, Notes, Code, children):
+        self.Notes = Notes
+        self.Code = Code
+        self.children = children
+
+    def get_children(self):
+        return self.children
+
+    def get_count(self):
+        return len(self.children)
+
+
+class ChildSerializer(serializers.Serializer):
+    ChildID = OrangeButtonSerializer()
+    Name = OrangeButtonSerializer()
+
+
+class ParentSerializer(serializers.Serializer):
+    Notes = OrangeButtonSerializer()
+    Code = EnumModelSerializer()
+    Count = serializers.IntegerField(source='get_count')
+    Children = ChildSerializer(source='get_children', many=True)
+    Constant = serializers.SerializerMethodField()
+
+    def get_Constant(self, instance):
+        return 'constant'
+
+
+@pytest.mark.parametrize(
+    'is_public_view, expected_output', [
+        (False, {'Notes': {'Value': None}, 'Code': {'Value': ''}, 'Count': 1,
+                 'Children': [{'ChildID': {'Value': 1}, 'Name': {'Value': 'child'}}], 'Constant': 'constant'}),
+        (True, {'Code': {'Value': ''}, 'Count': 1, 'Children': [{'Name': {'Value': 'child'}}], 'Constant': 'constant'})
+    ]
+)
+def test_serializer_compiler(is_public_view, expected_output):
+    functions = SerializerCompiler([(ChildSerializer, Child), (ParentSerializer, Parent)]).build()
+    result = functions[(ParentSerializer, is_public_view)](Parent(None, None, [Child(1, 'child')]),
+                                                           lambda serializer_class, field_name, instance: 'constant')
+    assert result == expected_output
+    assert list(result) == list(expected_output)
+
+
+def test_serializer_compiler__enum_value():
+    functions = SerializerCompiler([(ChildSerializer, Child), (ParentSerializer, Parent)]).build()
+    result = functions[(ParentSerializer, False)](Parent('notes', Enum('040'), []), lambda *args: None)
+    assert result['Notes'] == {'Value': 'notes'}
+    assert result['Code'] == {'Value': '040'}
+    assert result['Children'] == []
+
+
+@pytest.mark.parametrize(
+    'context', [
+        {'is_public_view': True},
+        {'is_public_view': False},
+        {}
+    ]
+)
+@pytest.mark.django_db
+def test_compiled_serialize_ahjs__same_as_serializer(context, ahj_obj_factory, create_user):
+    ahjs = [ahj_obj_factory() for i in range(2)]
+    ahjs[0].AHJLevelCode = AHJLevelCode.objects.create(Value='040')
+    ahjs[0].save()
+    inspection = AHJInspection.objects.create(AHJPK=ahjs[0], AHJInspectionName='Inspection', InspectionStatus=True)
+    Contact.objects.create(ParentTable='AHJInspection', ParentID=inspection.InspectionID, ContactStatus=True,
+                           AddressID=Address.objects.create())
+    Contact.objects.create(ParentTable='AHJ', ParentID=ahjs[1].AHJPK, ContactStatus=None)
+    AHJDocumentSubmissionMethodUse.objects.create(AHJPK=ahjs[1], DocumentSubmissionMethodID=DocumentSubmissionMethod.objects.create(Value='Email'), MethodStatus=True)
+    EngineeringReviewRequirement.objects.create(AHJPK=ahjs[1], EngineeringReviewRequirementStatus=None)
+    FeeStructure.objects.create(AHJPK=ahjs[0], FeeStructureID=uuid.uuid4(), FeeStructureName='Fee', FeeStructureStatus=True)
+    expected = AHJSerializer(AHJ.objects.filter(AHJPK__in=[ahj.AHJPK for ahj in ahjs]), many=True, context=context).data
+    result = compiled_serialize_ahjs(AHJ.objects.filter(AHJPK__in=[ahj.AHJPK for ahj in ahjs]), context)
+    assert JSONRenderer().render(result) == JSONRenderer().render(expected)
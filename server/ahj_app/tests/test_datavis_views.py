@@ -57,6 +57,30 @@ def test_data_map_get_polygon__normal_call(client_with_webpage_credentials):
     assert response.data['type'] == 'Feature' # Check that a single GeoJSON polygon was returned
     assert response.status_code == 200
 
+@pytest.mark.parametrize(
+    'geometry_detail, expected_type', [
+        ('low', 'MultiPolygon'),
+        ('full', 'MultiPolygon'),
+        ('none', None)
+    ]
+)
+@pytest.mark.django_db
+def test_data_map_get_polygon__geometry_detail(geometry_detail, expected_type, client_with_webpage_credentials):
+    polygon = poly_obj(1)
+
+    url = reverse('data-map-polygon')
+    response = client_with_webpage_credentials.get(url, {'PolygonID': 1, 'geometry_detail': geometry_detail})
+    assert response.status_code == 200
+    assert (response.data['geometry'] or {}).get('type') == expected_type
+
+@pytest.mark.django_db
+def test_data_map_get_polygon__invalid_geometry_detail(client_with_webpage_credentials):
+    polygon = poly_obj(1)
+
+    url = reverse('data-map-polygon')
+    response = client_with_webpage_credentials.get(url, {'PolygonID': 1, 'geometry_detail': 'invalid'})
+    assert response.status_code == 400
+
 @pytest.mark.django_db
 def test_data_map_get_polygon__no_param_passed(client_with_webpage_credentials):
     url = reverse('data-map-polygon')
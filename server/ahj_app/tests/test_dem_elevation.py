@@ -0,0 +1,67 @@
+import struct
+
+from ahj_app.dem_elevation import DEMTileCache, batch_elevation, get_elevation_function, get_tile_name
+from ahj_app.geocoders import FakeGeocoder
+import pytest
+
+
+# A 3 x 3 tile from (38, -122) to (37, -121), with a void sample at its southeast corner
+TILE_SAMPLES = [100, 200, 300,
+                400, 500, 600,
+                700, 800, -32768]
+
+
+@pytest.fixture
+def dem_directory(tmp_path, settings):
+    (tmp_path / 'N37W122.hgt').write_bytes(struct.pack(f'>{len(TILE_SAMPLES)}h', *TILE_SAMPLES))
+    settings.DEM_TILE_DIRECTORY = str(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    'latitude, longitude, expected_output', [
+        (37.5, -121.5, 'N37W122'),
+        (37, -122, 'N37W122'),
+        (-0.5, 0.5, 'S01E000'),
+        (51.2, -0.1, 'N51W001')
+    ])
+def test_get_tile_name(latitude, longitude, expected_output):
+    assert get_tile_name(latitude, longitude) == expected_output
+
+
+@pytest.mark.parametrize(
+    'latlng, expected_output', [
+        ((37.5, -122), 400),
+        ((37.75, -121.75), 300),
+        ((37, -121.5), 800),
+        ((37.25, -121.25), 633.33), # The void sample is left out
+        ((37, -121), None),
+        ((10, 10), None)
+    ])
+def test_dem_tile_cache__bilinear_interpolation(dem_directory, latlng, expected_output):
+    assert DEMTileCache(str(dem_directory)).batch_elevation([latlng]) == [expected_output]
+
+
+def test_batch_elevation__fallback_called_once(dem_directory):
+    calls = []
+    def fallback(latlngs):
+        calls.append(latlngs)
+        return [1.0] * len(latlngs)
+    assert batch_elevation([(37, -121), (37.75, -121.75), (10, 10)], fallback=fallback) == [1.0, 300, 1.0]
+    assert calls == [[(37, -121), (10, 10)]]
+
+
+def test_dem_tile_cache__tiles_kept(dem_directory):
+    tile_cache = DEMTileCache(str(dem_directory), max_tiles=1)
+    tile_cache.batch_elevation([(37.5, -121.5), (10, 10), (37.6, -121.6)])
+    tile_cache.batch_elevation([(37.5, -121.5), (10, 10)])
+    assert tile_cache.get_stats() == {'tiles': 1, 'missing_tiles': 1, 'hits': 1, 'misses': 2}
+
+
+def test_get_elevation_function(dem_directory, settings):
+    geocoder = FakeGeocoder(latency=0)
+    elevation = get_elevation_function(geocoder)
+    assert elevation((37.75, -121.75)) == 300
+    assert elevation((40, -100)) == geocoder.elevation((40, -100))
+    settings.DEM_TILE_DIRECTORY = None
+    assert get_elevation_function(geocoder) == geocoder.elevation
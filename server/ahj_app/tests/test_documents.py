@@ -0,0 +1,76 @@
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from ahj_app.documents import build_ahj_documents, get_serialized_ahjs
+from ahj_app.models import AHJ, AHJDocument, AHJInspection, Comment, Contact, Edit
+from ahj_app.serializers import AHJSerializer
+from ahj_app.views_edits import apply_edits
+from fixtures import *
+import pytest
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+@pytest.mark.parametrize(
+    'context', [
+        {'is_public_view': True},
+        {'is_public_view': False},
+        {}
+    ]
+)
+@pytest.mark.django_db
+def test_get_serialized_ahjs__same_as_serializer(context, ahj_obj_factory, create_user):
+    ahjs = [ahj_obj_factory() for i in range(3)]
+    inspection = AHJInspection.objects.create(AHJPK=ahjs[0], AHJInspectionName='Inspection', InspectionStatus=True)
+    Contact.objects.create(ParentTable='AHJInspection', ParentID=inspection.InspectionID, ContactStatus=True)
+    Contact.objects.create(ParentTable='AHJ', ParentID=ahjs[1].AHJPK, ContactStatus=None)
+    Comment.objects.create(UserID=create_user(), AHJPK=ahjs[2].AHJPK, CommentText='comment')
+    expected = render(AHJSerializer(AHJ.objects.filter(AHJPK__in=[ahj.AHJPK for ahj in ahjs]), many=True, context=context).data)
+    assert render(get_serialized_ahjs(ahjs, context)) == expected
+    assert AHJDocument.objects.count() == 3
+    # Returned again from the stored documents
+    assert render(get_serialized_ahjs(ahjs, context)) == expected
+
+
+@pytest.mark.django_db
+def test_get_serialized_ahjs__comments_are_not_stored(ahj_obj, create_user):
+    get_serialized_ahjs([ahj_obj])
+    Comment.objects.create(UserID=create_user(), AHJPK=ahj_obj.AHJPK, CommentText='comment')
+    assert AHJDocument.objects.filter(AHJPK=ahj_obj.AHJPK).exists()
+    assert get_serialized_ahjs([ahj_obj])[0]['Comments'][0]['CommentText']['Value'] == 'comment'
+
+
+@pytest.mark.django_db
+def test_ahj_documents__deleted_when_rows_change(ahj_obj):
+    inspection = AHJInspection.objects.create(AHJPK=ahj_obj, AHJInspectionName='Inspection', InspectionStatus=True)
+    contact = Contact.objects.create(ParentTable='AHJInspection', ParentID=inspection.InspectionID, ContactStatus=True,
+                                     AddressID=Address.objects.create())
+    for row in [ahj_obj, inspection, contact, contact.AddressID, ahj_obj.AddressID, ahj_obj.PolygonID]:
+        build_ahj_documents(ahjpks=[ahj_obj.AHJPK])
+        row.save()
+        assert not AHJDocument.objects.filter(AHJPK=ahj_obj.AHJPK).exists()
+
+
+@pytest.mark.django_db
+def test_apply_edits__rebuilds_ahj_documents(ahj_obj, create_user):
+    build_ahj_documents(ahjpks=[ahj_obj.AHJPK])
+    user = create_user()
+    edit = Edit.objects.create(ChangedBy=user, ApprovedBy=user, AHJPK=ahj_obj,
+                               SourceTable='AHJ', SourceRow=ahj_obj.AHJPK, SourceColumn='AHJName',
+                               OldValue='oldname', NewValue='newname',
+                               DateRequested=timezone.now(), DateEffective=timezone.now(),
+                               ReviewStatus='A', EditType='U')
+    apply_edits(ready_edits=[edit])
+    document = AHJDocument.objects.get(AHJPK=ahj_obj.AHJPK)
+    assert '"AHJName":{"Value":"newname"}' in document.PublicDocument
+    assert get_serialized_ahjs([ahj_obj], {'is_public_view': True})[0]['AHJName']['Value'] == 'newname'
+
+
+@pytest.mark.django_db
+def test_get_serialized_ahjs__polygon_geometry_not_stored(ahj_obj):
+    full = get_serialized_ahjs([ahj_obj], {'is_public_view': False})[0]['Polygon']
+    assert '"geometry":null' in AHJDocument.objects.get(AHJPK=ahj_obj.AHJPK).PrivateDocument
+    assert full['geometry']['type'] == 'MultiPolygon'
+    assert get_serialized_ahjs([ahj_obj], {'is_public_view': False, 'geometry_detail': 'none'})[0]['Polygon']['geometry'] is None
@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ahj_app.enum_registry import get_enum_attribute, get_enum_registry, get_enum_row
+from ahj_app.models import AHJ, BuildingCode, DocumentSubmissionMethod
+from ahj_app.serializers import AHJSerializer
+from ahj_app.utils import get_enum_value_row_else_null
+from fixtures import *
+import pytest
+
+
+@pytest.mark.django_db
+def test_get_enum_row__no_queries_after_load(add_enum_value_rows):
+    get_enum_registry()
+    with CaptureQueriesContext(connection) as queries:
+        row = get_enum_row('BuildingCode', '2021IBC')
+        plural_row = get_enum_row('DocumentSubmissionMethods', 'SolarApp')
+    assert len(queries) == 0
+    assert row == BuildingCode.objects.get(Value='2021IBC')
+    assert plural_row == DocumentSubmissionMethod.objects.get(Value='SolarApp')
+
+
+@pytest.mark.django_db
+def test_get_enum_row__missing_value(add_enum_value_rows):
+    with pytest.raises(BuildingCode.DoesNotExist):
+        get_enum_row('BuildingCode', 'not a building code')
+    assert get_enum_value_row_else_null('BuildingCode', ['2021IBC', 'not a building code']) == [BuildingCode.objects.get(Value='2021IBC'), None]
+
+
+@pytest.mark.django_db
+def test_get_enum_row__reloaded_when_changed(add_enum_value_rows):
+    get_enum_registry()
+    BuildingCode.objects.filter(Value='2021IBC').delete()
+    with pytest.raises(BuildingCode.DoesNotExist):
+        get_enum_row('BuildingCode', '2021IBC')
+    building_code = BuildingCode.objects.create(Value='2021IBC')
+    assert get_enum_row('BuildingCode', '2021IBC').pk == building_code.pk
+
+
+@pytest.mark.django_db
+def test_get_enum_row__disabled(add_enum_value_rows, settings):
+    settings.ENUM_REGISTRY_ENABLED = False
+    with CaptureQueriesContext(connection) as queries:
+        get_enum_row('BuildingCode', '2021IBC')
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_get_enum_attribute(ahj_obj, add_enum_value_rows):
+    ahj_obj.BuildingCode = BuildingCode.objects.get(Value='2018IBC')
+    ahj_obj.save()
+    ahj = AHJ.objects.get(AHJPK=ahj_obj.AHJPK)
+    get_enum_registry()
+    with CaptureQueriesContext(connection) as queries:
+        assert get_enum_attribute(ahj, 'BuildingCode').Value == '2018IBC'
+        assert get_enum_attribute(ahj, 'FireCode') is None
+    assert len(queries) == 0
+    assert get_enum_attribute(ahj, 'AHJID') == ahj.AHJID
+
+
+@pytest.mark.django_db
+def test_enum_model_serializer__same_as_without_registry(ahj_obj, add_enum_value_rows, settings):
+    ahj_obj.BuildingCode = BuildingCode.objects.get(Value='2018IBC')
+    ahj_obj.save()
+    ahj = AHJ.objects.get(AHJPK=ahj_obj.AHJPK)
+    data = AHJSerializer(ahj, context={'is_public_view': True}).data
+    assert data['BuildingCode'] == {'Value': '2018IBC'}
+    assert data['FireCode'] == {'Value': ''}
+    settings.ENUM_REGISTRY_ENABLED = False
+    assert AHJSerializer(AHJ.objects.get(AHJPK=ahj_obj.AHJPK), context={'is_public_view': True}).data == data
@@ -0,0 +1,116 @@
+import datetime
+
+from django.utils import timezone
+
+from ahj_app.geocode_cache import GeocodeCache, GeocodedAddress, clear_expired_geocode_cache_entries, normalize_address
+from ahj_app.models import GeocodeCacheEntry
+from ahj_app import utils
+import pytest
+
+
+@pytest.fixture
+def geocode_cache():
+    return GeocodeCache(max_size=2)
+
+
+@pytest.fixture
+def geocoder():
+    calls = []
+    def geocode(address):
+        calls.append(address)
+        return None if 'nowhere' in address.lower() else (1.5, 2.5)
+    geocode.calls = calls
+    return geocode
+
+
+def test_normalize_address():
+    assert normalize_address(' 123 Main St.,  Springfield  CA 95050-1234 ') == '123 main st springfield ca 95050-1234'
+    assert normalize_address('Apt #4') == 'apt #4'
+    assert normalize_address(' , ') == ''
+
+
+@pytest.mark.django_db
+def test_geocode_cache__hit_skips_geocoding(geocode_cache, geocoder):
+    assert geocode_cache.get('123 Main St., Springfield', geocoder) == GeocodedAddress(1.5, 2.5, None)
+    assert geocode_cache.get('123 MAIN ST  SPRINGFIELD', geocoder) == GeocodedAddress(1.5, 2.5, None)
+    assert len(geocoder.calls) == 1
+    stats = geocode_cache.get_stats()
+    assert stats['memory_hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['geocode_calls'] == 1
+
+
+@pytest.mark.django_db
+def test_geocode_cache__shared_between_processes(geocode_cache, geocoder):
+    geocode_cache.get('123 Main St', geocoder)
+    other_process_cache = GeocodeCache(max_size=2)
+    assert other_process_cache.get('123 Main St', geocoder) == GeocodedAddress(1.5, 2.5, None)
+    assert len(geocoder.calls) == 1
+    assert other_process_cache.get_stats()['table_hits'] == 1
+
+
+@pytest.mark.django_db
+def test_geocode_cache__negative_caching(geocode_cache, geocoder):
+    assert geocode_cache.get('Nowhere', geocoder) is None
+    assert geocode_cache.get('nowhere', geocoder, elevation=lambda latlng: 10) is None
+    assert len(geocoder.calls) == 1
+    assert GeocodeCacheEntry.objects.get().IsResolved is False
+
+
+@pytest.mark.django_db
+def test_geocode_cache__elevation_looked_up_once(geocode_cache, geocoder):
+    elevations = []
+    def elevation(latlng):
+        elevations.append(latlng)
+        return 10.0
+    geocode_cache.get('123 Main St', geocoder)
+    assert geocode_cache.get('123 Main St', geocoder, elevation=elevation) == GeocodedAddress(1.5, 2.5, 10.0)
+    assert geocode_cache.get('123 Main St', geocoder, elevation=elevation) == GeocodedAddress(1.5, 2.5, 10.0)
+    assert geocode_cache.get('123 Main St', geocoder) == GeocodedAddress(1.5, 2.5, 10.0)
+    assert len(geocoder.calls) == 1
+    assert elevations == [(1.5, 2.5)]
+    assert GeocodeCacheEntry.objects.get().Elevation == 10.0
+
+
+@pytest.mark.django_db
+def test_geocode_cache__expired(geocode_cache, geocoder):
+    geocode_cache.get('123 Main St', geocoder)
+    GeocodeCacheEntry.objects.update(DateExpires=timezone.now() - datetime.timedelta(seconds=1))
+    geocode_cache.clear()
+    geocode_cache.get('123 Main St', geocoder)
+    assert len(geocoder.calls) == 2
+    GeocodeCacheEntry.objects.update(DateExpires=timezone.now() - datetime.timedelta(seconds=1))
+    assert clear_expired_geocode_cache_entries() == 1
+    assert GeocodeCacheEntry.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_geocode_cache__lru_eviction(geocode_cache, geocoder):
+    for address in ['1 Main St', '2 Main St', '1 Main St', '3 Main St']:
+        geocode_cache.get(address, geocoder)
+    assert geocode_cache.get_stats()['size'] == 2
+    geocode_cache.get('2 Main St', geocoder)
+    assert geocode_cache.get_stats()['table_hits'] == 1
+
+
+@pytest.mark.django_db
+def test_geocode_cache__geocoding_errors_not_cached(geocode_cache):
+    def geocode(address):
+        raise RuntimeError('OVER_QUERY_LIMIT')
+    with pytest.raises(RuntimeError):
+        geocode_cache.get('123 Main St', geocode)
+    assert GeocodeCacheEntry.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_get_elevation__cached(monkeypatch, settings):
+    settings.GEOCODE_CACHE_ENABLED = True
+    settings.GEOCODER_BACKEND = 'fake'
+    monkeypatch.setattr(utils.geocode_cache, '_cache', GeocodeCache())
+    location = utils.get_elevation('123 Main St')
+    assert location['Elevation']['Value'] is not None
+    assert utils.get_elevation('123 main st.') == location
+    assert utils.get_location_gecode_address_str('123 Main St') == {'Latitude': location['Latitude'], 'Longitude': location['Longitude']}
+    stats = utils.geocode_cache.get_geocode_cache().get_stats()
+    assert stats['geocode_calls'] == 1
+    assert stats['elevation_calls'] == 1
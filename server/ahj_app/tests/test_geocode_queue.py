@@ -0,0 +1,105 @@
+import datetime
+
+from django.utils import timezone
+
+from ahj_app import geocode_queue
+from ahj_app.geocoders import FakeGeocoder
+from ahj_app.models import Contact, Location, LocationGeocodeTask
+from ahj_app.views_edits import create_row
+import pytest
+
+
+@pytest.fixture
+def queue_settings(settings):
+    settings.GEOCODE_QUEUE_ENABLED = True
+    settings.GEOCODE_CACHE_ENABLED = False
+    settings.GEOCODER_BACKEND = 'fake'
+    settings.GEOCODER_FAKE_LATENCY_SECONDS = 0
+    settings.GEOCODE_QUEUE_MAX_ATTEMPTS = 2
+    settings.GEOCODE_QUEUE_RETRY_SECONDS = 60
+    return settings
+
+
+def make_due(**kwargs):
+    LocationGeocodeTask.objects.filter(**kwargs).update(DateNextAttempt=timezone.now() - datetime.timedelta(seconds=1))
+
+
+@pytest.mark.django_db
+def test_process_geocode_queue(queue_settings):
+    locations = [Location.objects.create() for i in range(3)]
+    for i, location in enumerate(locations):
+        geocode_queue.enqueue_location(location.LocationID, f'{i} Main St, Santa Clara, CA')
+    assert geocode_queue.get_geocode_queue_status()['pending'] == 3
+    assert geocode_queue.process_geocode_queue(max_workers=2, batch_size=2) == (3, 0)
+    assert LocationGeocodeTask.objects.count() == 0
+    location = Location.objects.get(LocationID=locations[0].LocationID)
+    latitude, longitude = FakeGeocoder(latency=0).geocode('0 Main St, Santa Clara, CA')
+    assert float(location.Latitude) == pytest.approx(latitude)
+    assert float(location.Longitude) == pytest.approx(longitude)
+    assert location.Elevation is not None
+
+
+@pytest.mark.django_db
+def test_process_geocode_queue__retry_and_fail(queue_settings, monkeypatch):
+    def geocode(address, with_elevation=False):
+        raise RuntimeError('OVER_QUERY_LIMIT')
+    monkeypatch.setattr(geocode_queue, 'geocode', geocode)
+    location = Location.objects.create()
+    geocode_queue.enqueue_location(location.LocationID, '123 Main St')
+    assert geocode_queue.process_geocode_queue() == (0, 1)
+    task = LocationGeocodeTask.objects.get()
+    assert task.Status == geocode_queue.STATUS_PENDING
+    assert task.Attempts == 1
+    assert task.LastError == 'RuntimeError: OVER_QUERY_LIMIT'
+    assert task.DateNextAttempt > timezone.now() + datetime.timedelta(seconds=30)
+    assert geocode_queue.process_geocode_queue() == (0, 0) # Not due yet
+    make_due()
+    assert geocode_queue.process_geocode_queue() == (0, 1)
+    assert LocationGeocodeTask.objects.get().Status == geocode_queue.STATUS_FAILED
+    assert geocode_queue.get_geocode_queue_status() == {'pending': 0, 'failed': 1, 'oldest_pending': None}
+    # Queuing the Location again retries it
+    geocode_queue.enqueue_location(location.LocationID, '123 Main St')
+    assert LocationGeocodeTask.objects.get().Attempts == 0
+
+
+@pytest.mark.django_db
+def test_claim_tasks__leased(queue_settings):
+    location = Location.objects.create()
+    geocode_queue.enqueue_location(location.LocationID, '123 Main St')
+    assert len(geocode_queue.claim_tasks(10)) == 1
+    assert geocode_queue.claim_tasks(10) == []
+
+
+@pytest.mark.django_db
+def test_complete_task__queued_again(queue_settings):
+    location = Location.objects.create()
+    geocode_queue.enqueue_location(location.LocationID, '123 Main St')
+    task = geocode_queue.claim_tasks(10)[0]
+    geocode_queue.enqueue_location(location.LocationID, '456 Main St')
+    assert geocode_queue.complete_task(task, None) is False
+    assert LocationGeocodeTask.objects.get().Address == '456 Main St'
+
+
+@pytest.mark.django_db
+def test_create_row__address_queued(queue_settings):
+    address = {'AddrLine1': '123 Main St', 'AddrLine2': '', 'AddrLine3': '', 'City': 'Santa Clara', 'County': '',
+               'StateProvince': 'CA', 'Country': 'USA', 'Location': {}}
+    contact = create_row(Contact, {'FirstName': 'first', 'Address': address})
+    location = contact.AddressID.LocationID
+    assert location.Latitude is None
+    task = LocationGeocodeTask.objects.get()
+    assert task.LocationID_id == location.LocationID
+    assert task.Address == '123 Main St, Santa Clara, CA, USA'
+
+
+@pytest.mark.django_db
+def test_complete_task__error_after_queued_again(queue_settings):
+    location = Location.objects.create()
+    geocode_queue.enqueue_location(location.LocationID, '123 Main St')
+    task = geocode_queue.claim_tasks(10)[0]
+    geocode_queue.enqueue_location(location.LocationID, '456 Main St')
+    assert geocode_queue.complete_task(task, RuntimeError('OVER_QUERY_LIMIT')) is False
+    task = LocationGeocodeTask.objects.get()
+    assert task.Address == '456 Main St'
+    assert task.Attempts == 0
+    assert task.LastError == ''
@@ -0,0 +1,62 @@
+import io
+
+from django.core.exceptions import ImproperlyConfigured
+
+from ahj_app.geocoders import FakeGeocoder, LocalGeocoder, get_geocoder, get_zip_code, load_zip_code_centroids
+from ahj_app.models import ZipCodeCentroid
+from ahj_app.utils import get_location_gecode_address_str
+import pytest
+
+
+GAZETTEER_ZCTA_FILE = 'GEOID\tALAND\tAWATER\tALAND_SQMI\tAWATER_SQMI\tINTPTLAT\tINTPTLONG                                                                                                               \n' \
+                      '95050\t7682185\t0\t2.966\t0.000\t37.348993\t-121.952312                                                                                                               \n' \
+                      '10001\t1651725\t0\t0.638\t0.000\t40.750633\t-73.997177                                                                                                                \n'
+
+
+@pytest.mark.parametrize(
+    'address, expected_output', [
+        ('123 Main St, Santa Clara, CA 95050', '95050'),
+        ('12345 Main St, Santa Clara, CA 95050-1234', '95050'),
+        ('12345 Main St, Santa Clara, CA', '12345'),
+        ('Santa Clara, CA', None)
+    ])
+def test_get_zip_code(address, expected_output):
+    assert get_zip_code(address) == expected_output
+
+
+@pytest.mark.django_db
+def test_local_geocoder():
+    assert load_zip_code_centroids(io.StringIO(GAZETTEER_ZCTA_FILE)) == 2
+    geocoder = LocalGeocoder()
+    assert geocoder.geocode('123 Main St, Santa Clara, CA 95050') == (37.348993, -121.952312)
+    assert geocoder.geocode('Santa Clara, CA') is None
+    assert geocoder.batch_geocode(['New York, NY 10001', 'Nowhere 99999', 'Santa Clara, CA 95050']) == [
+        (40.750633, -73.997177), None, (37.348993, -121.952312)]
+    assert load_zip_code_centroids(io.StringIO(GAZETTEER_ZCTA_FILE)) == 2 # Replaces the rows
+    assert ZipCodeCentroid.objects.count() == 2
+
+
+def test_fake_geocoder__deterministic():
+    geocoder = FakeGeocoder(latency=0)
+    latlng = geocoder.geocode('123 Main St, Santa Clara, CA')
+    assert geocoder.geocode('123 MAIN ST. SANTA CLARA CA') == latlng
+    assert geocoder.geocode('456 Main St, Santa Clara, CA') != latlng
+    assert 25 <= latlng[0] <= 49 and -124 <= latlng[1] <= -67
+    assert geocoder.elevation(latlng) == FakeGeocoder(latency=0).elevation(latlng)
+    assert geocoder.batch_geocode(['123 Main St, Santa Clara, CA', ' ']) == [latlng, None]
+
+
+@pytest.mark.django_db
+def test_get_location_gecode_address_str__backend_from_settings(settings):
+    settings.GEOCODER_BACKEND = 'local'
+    load_zip_code_centroids(io.StringIO(GAZETTEER_ZCTA_FILE))
+    assert get_location_gecode_address_str('Santa Clara, CA 95050') == {'Latitude': {'Value': 37.348993}, 'Longitude': {'Value': -121.952312}}
+    settings.GEOCODER_BACKEND = 'fake'
+    latitude, longitude = FakeGeocoder(latency=0).geocode('Santa Clara, CA 95050')
+    assert get_location_gecode_address_str('Santa Clara, CA 95050') == {'Latitude': {'Value': latitude}, 'Longitude': {'Value': longitude}}
+
+
+def test_get_geocoder__unknown_backend(settings):
+    settings.GEOCODER_BACKEND = 'unknown'
+    with pytest.raises(ImproperlyConfigured):
+        get_geocoder()
@@ -0,0 +1,102 @@
+from django.contrib.gis.geos import Polygon as geosPolygon
+from django.contrib.gis.geos import MultiPolygon
+from ahj_app.models import AHJ, Polygon, StatePolygon
+from ahj_app.location_cache import LocationResultCache, get_location_cache
+from ahj_app.utils import filter_ahjs
+import pytest
+
+
+@pytest.fixture
+def location_cache():
+    return LocationResultCache(precision=2, max_size=2)
+
+
+@pytest.mark.django_db
+def test_location_result_cache__hits_and_misses(location_cache):
+    assert location_cache.get(1.001, 2.001, lambda lng, lat: [1, 2]) == [1, 2]
+    assert location_cache.get(1.002, 2.002, lambda lng, lat: [3]) == [1, 2] # Rounds to the same Location
+    assert location_cache.get(1.1, 2.1, lambda lng, lat: [3]) == [3]
+    stats = location_cache.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['size'] == 2
+
+
+@pytest.mark.django_db
+def test_location_result_cache__lru_eviction(location_cache):
+    location_cache.get(1, 1, lambda lng, lat: [1])
+    location_cache.get(2, 2, lambda lng, lat: [2])
+    location_cache.get(1, 1, lambda lng, lat: []) # Makes (2, 2) the least recently used
+    location_cache.get(3, 3, lambda lng, lat: [3])
+    assert len(location_cache.entries) == 2
+    assert location_cache.get_key(2, 2) not in location_cache.entries
+    assert location_cache.get_key(1, 1) in location_cache.entries
+
+
+@pytest.mark.django_db
+def test_location_result_cache__invalidate(location_cache):
+    location_cache.get(1, 1, lambda lng, lat: [1])
+    location_cache.invalidate()
+    assert location_cache.get(1, 1, lambda lng, lat: [2]) == [2]
+
+
+@pytest.mark.django_db
+def test_location_result_cache__shared_between_processes(location_cache):
+    location_cache.get(1, 1, lambda lng, lat: [1])
+    other_process_cache = LocationResultCache(precision=2, max_size=2)
+    assert other_process_cache.get(1, 1, lambda lng, lat: [2]) == [1]
+    other_process_cache.invalidate()
+    location_cache.generation_checked_at = 0 # Check for a new generation immediately
+    assert location_cache.get(1, 1, lambda lng, lat: [3]) == [3]
+
+
+@pytest.mark.django_db
+def test_filter_ahjs__location_cache_invalidated_when_polygon_changes(settings):
+    settings.LOCATION_CACHE_ENABLED = True
+    mp = MultiPolygon(geosPolygon(((0, 0), (0, 10), (10, 10), (10, 0), (0, 0))))
+    polygon = Polygon.objects.create(Polygon=mp, LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+    StatePolygon.objects.create(PolygonID=polygon)
+    ahj = AHJ.objects.create(AHJPK=1, AHJID='63e32327-7a31-4a0c-a715-20d46355cc9e', PolygonID=polygon)
+    assert [a.AHJPK for a in filter_ahjs(location='POINT(5, 5)')] == [ahj.AHJPK]
+    misses = get_location_cache().get_stats()['misses']
+    assert [a.AHJPK for a in filter_ahjs(location='POINT(5, 5)')] == [ahj.AHJPK]
+    assert get_location_cache().get_stats()['misses'] == misses
+    polygon.Polygon = MultiPolygon(geosPolygon(((20, 20), (20, 30), (30, 30), (30, 20), (20, 20))))
+    polygon.save()
+    assert list(filter_ahjs(location='POINT(5, 5)')) == []
+
+
+@pytest.mark.django_db
+def test_location_result_cache__computed_at_rounded_location(location_cache):
+    points = []
+    def compute(lng, lat):
+        points.append((lng, lat))
+        return [1]
+    location_cache.get(1.004, 2.006, compute)
+    assert points == [(1.0, 2.01)]
+
+
+@pytest.mark.django_db
+def test_filter_ahjs__location_cache_invalidated_when_ahj_polygon_changes(settings):
+    settings.LOCATION_CACHE_ENABLED = True
+    inside = Polygon.objects.create(Polygon=MultiPolygon(geosPolygon(((0, 0), (0, 10), (10, 10), (10, 0), (0, 0)))),
+                                    LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+    outside = Polygon.objects.create(Polygon=MultiPolygon(geosPolygon(((20, 20), (20, 30), (30, 30), (30, 20), (20, 20)))),
+                                     LandArea=1, WaterArea=1, InternalPLatitude=25, InternalPLongitude=25)
+    StatePolygon.objects.create(PolygonID=inside)
+    StatePolygon.objects.create(PolygonID=outside)
+    AHJ.objects.create(AHJPK=1, AHJID='63e32327-7a31-4a0c-a715-20d46355cc9e', PolygonID=inside)
+    assert [a.AHJPK for a in filter_ahjs(location='POINT(5, 5)')] == [1]
+    ahj = AHJ.objects.get(AHJPK=1)
+    ahj.PolygonID = outside
+    ahj.save()
+    assert list(filter_ahjs(location='POINT(5, 5)')) == []
+
+
+@pytest.mark.django_db
+def test_location_result_cache__generation_not_culled(location_cache):
+    location_cache.invalidate()
+    location_cache.backend.clear() # Like culling every entry
+    other_process_cache = LocationResultCache(precision=2, max_size=2)
+    other_process_cache.check_generation()
+    assert other_process_cache.generation == location_cache.generation
@@ -48,6 +48,30 @@ def test_user_comments__user_does_not_exist(client_with_webpage_credentials):
     assert len(response.data) == 0 # no comments returned
     assert response.status_code == 200
 
+@pytest.mark.django_db
+def test_ahj_comments__paginated_by_thread(ahj_obj, generate_client_with_webpage_credentials):
+    client = generate_client_with_webpage_credentials(Username='someone')
+    user = User.objects.get(Username='someone')
+    for i in range(3):
+        comment = Comment.objects.create(UserID=user, AHJPK=ahj_obj.AHJPK, CommentText=f'Thread {i}', ReplyingTo=None)
+        for depth in range(3):
+            comment = Comment.objects.create(UserID=user, CommentText=f'Reply {i} {depth}', ReplyingTo=comment.CommentID)
+    url = reverse('ahj-comments')
+    response = client.get(url, {'AHJPK': ahj_obj.AHJPK, 'limit': 2})
+    assert response.status_code == 200
+    assert response.data['count'] == 3 # Only top-level comments are counted
+    assert [comment['CommentText']['Value'] for comment in response.data['results']] == ['Thread 2', 'Thread 1']
+    reply = response.data['results'][0]
+    for depth in range(3):
+        reply = reply['Replies'][0]
+        assert reply['CommentText']['Value'] == f'Reply 2 {depth}'
+
+@pytest.mark.django_db
+def test_ahj_comments__no_AHJPK(client_with_webpage_credentials):
+    url = reverse('ahj-comments')
+    response = client_with_webpage_credentials.get(url)
+    assert response.status_code == 400
+
 @pytest.mark.django_db
 def test_comment_submit__normal_submission(ahj_obj, client_with_webpage_credentials):
     url = reverse('comment-submit')
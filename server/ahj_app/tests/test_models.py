@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon as geosPolygon
+from django.contrib.gis.geos import MultiPolygon
 from ahj_app.models import *
 from fixtures import *
 import pytest
@@ -509,6 +511,19 @@ def test_APIToken_str(create_user):
     token = create_user(Email='a@a.com').api_token
     assert str(token) == 'APIToken(' + token.key + ')'
 
+"""
+    Polygon Model
+"""
+@pytest.mark.django_db
+def test_polygon_save__sets_envelope(mpoly_obj):
+    polygon = Polygon.objects.create(Polygon=mpoly_obj, LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+    polygon.refresh_from_db()
+    assert (polygon.MinX, polygon.MaxX, polygon.MinY, polygon.MaxY) == (0, 2, 0, 2)
+    polygon.Polygon = MultiPolygon(geosPolygon(((5, 6), (5, 8), (7, 8), (5, 6))))
+    polygon.save()
+    polygon.refresh_from_db()
+    assert (polygon.MinX, polygon.MaxX, polygon.MinY, polygon.MaxY) == (5, 7, 6, 8)
+
 """
     Shapefile Models
 """
@@ -0,0 +1,110 @@
+from ahj_app.models import AHJ, AHJCensusName, AHJNameSearch, Address, CityPolygon, Polygon, StatePolygon
+from ahj_app.name_search import TrigramNameIndex, build_ahj_name_search, get_relevance, get_fulltext_query, \
+    normalize_name, typeahead, RELEVANCE_EXACT, RELEVANCE_PREFIX, RELEVANCE_WORD_PREFIX, RELEVANCE_CONTAINS
+from ahj_app.utils import filter_ahjs
+from fixtures import *
+import pytest
+
+
+@pytest.mark.parametrize(
+   'name, text, expected_output', [
+       ('orange county', 'orange county', RELEVANCE_EXACT),
+       ('orange county', 'orange', RELEVANCE_PREFIX),
+       ('city of orange', 'orange', RELEVANCE_WORD_PREFIX),
+       ('orangeburg', 'range', RELEVANCE_CONTAINS),
+       ('orange county', 'apple', None),
+   ]
+)
+def test_get_relevance(name, text, expected_output):
+    assert get_relevance(name, text) == expected_output
+
+
+def test_normalize_name():
+    assert normalize_name('  Orange \t County ') == 'orange county'
+
+
+def test_get_fulltext_query():
+    assert get_fulltext_query('San "Fran') == '"san fran"'
+
+
+def test_trigram_index_search():
+    index = TrigramNameIndex()
+    index.add(1, ['Orange County', 'County of Orange'])
+    index.add(2, ['Orangeburg'])
+    index.add(3, ['Smith City'])
+    assert index.search('ORANGE') == {1: RELEVANCE_PREFIX, 2: RELEVANCE_PREFIX}
+    assert index.search('of orange') == {1: RELEVANCE_WORD_PREFIX}
+    assert index.search('or') == {1: RELEVANCE_PREFIX, 2: RELEVANCE_PREFIX}
+    assert index.search('apple') == {}
+    assert index.search('or', max_candidates=10) is None # Shorter than a trigram
+    assert index.search('orange', max_candidates=1) is None
+    assert index.search('of orange', max_candidates=1) == {1: RELEVANCE_WORD_PREFIX}
+
+
+def test_trigram_index_remove():
+    index = TrigramNameIndex()
+    index.add(1, ['Orange County'])
+    index.add(2, ['Orange City'])
+    index.remove(1)
+    assert index.search('orange') == {2: RELEVANCE_PREFIX}
+    index.remove(2)
+    assert index.trigrams == {}
+
+
+@pytest.fixture
+def named_ahj(mpoly_obj):
+    polygon = Polygon.objects.create(Polygon=mpoly_obj, LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+    state = Polygon.objects.create(Polygon=mpoly_obj, LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+    CityPolygon.objects.create(PolygonID=polygon, StatePolygonID=StatePolygon.objects.create(PolygonID=state), LSAreaCodeName='Sweetwater city')
+    ahj = AHJ.objects.create(AHJID='1', AHJName='Sweetwater', PolygonID=polygon, AddressID=Address.objects.create(StateProvince='Arkansas'))
+    AHJCensusName.objects.create(AHJPK=ahj, AHJCensusName='City of Sweetwater', StateProvince='AR')
+    return ahj
+
+
+@pytest.mark.django_db
+def test_build_ahj_name_search(named_ahj):
+    AHJNameSearch.objects.all().delete()
+    assert build_ahj_name_search() == 1
+    assert AHJNameSearch.objects.get(AHJPK=named_ahj).SearchNames == 'Sweetwater\nCity of Sweetwater\nSweetwater city'
+
+
+@pytest.mark.django_db
+def test_ahj_name_search__updated_on_save(named_ahj):
+    named_ahj.AHJName = 'Greenwater'
+    named_ahj.save()
+    assert AHJNameSearch.objects.get(AHJPK=named_ahj).SearchNames == 'Greenwater\nCity of Sweetwater\nSweetwater city'
+
+
+@pytest.mark.django_db
+def test_filter_ahjs__AHJName_matches_census_name(named_ahj, settings):
+    settings.NAME_SEARCH_BACKEND = 'trigram'
+    assert [ahj.AHJPK for ahj in filter_ahjs(AHJName='city of sweet')] == [named_ahj.AHJPK]
+    assert list(filter_ahjs(AHJName='apple')) == []
+
+@pytest.mark.django_db
+def test_filter_ahjs__fulltext_short_AHJName_matches_census_name(named_ahj, settings):
+    settings.NAME_SEARCH_BACKEND = 'fulltext'
+    # Shorter than the ngram parser's tokens and a trigram, so the names are searched with LIKE
+    assert [ahj.AHJPK for ahj in filter_ahjs(AHJName='y')] == [named_ahj.AHJPK]
+
+
+@pytest.mark.django_db
+def test_typeahead(named_ahj, settings):
+    settings.NAME_SEARCH_BACKEND = 'trigram'
+    assert typeahead('sweet') == [{'AHJPK': named_ahj.AHJPK, 'AHJID': '1', 'AHJName': 'Sweetwater', 'StateProvince': 'Arkansas'}]
+    assert typeahead('sweet', StateProvince='Utah') == []
+
+
+@pytest.mark.django_db
+def test_filter_ahjs__too_many_trigram_candidates(named_ahj, settings):
+    settings.NAME_SEARCH_BACKEND = 'trigram'
+    settings.NAME_SEARCH_MAX_TRIGRAM_CANDIDATES = 0
+    assert [ahj.AHJPK for ahj in filter_ahjs(AHJName='city of sweet')] == [named_ahj.AHJPK]
+    assert list(filter_ahjs(AHJName='apple')) == []
+
+
+@pytest.mark.django_db
+def test_typeahead__short_text(named_ahj, settings):
+    settings.NAME_SEARCH_BACKEND = 'trigram'
+    assert typeahead('sw') == [{'AHJPK': named_ahj.AHJPK, 'AHJID': '1', 'AHJName': 'Sweetwater', 'StateProvince': 'Arkansas'}]
+    assert typeahead('sw', StateProvince='Utah') == []
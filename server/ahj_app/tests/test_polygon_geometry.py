@@ -0,0 +1,79 @@
+import json
+import math
+
+from django.contrib.gis.geos import MultiPolygon
+from django.contrib.gis.geos import Polygon as geosPolygon
+from rest_framework_gis.fields import GeometryField
+
+from ahj_app.models import PolygonGeometry
+from ahj_app.polygon_geometry import build_polygon_geometries, encode_geometry, get_polygon_geometries
+from ahj_app.serializers import AHJSerializer, PolygonSerializer
+from fixtures import *
+import pytest
+
+
+def circle(num_points, radius=5):
+    points = [(math.cos(i / num_points * 2 * math.pi) * radius, math.sin(i / num_points * 2 * math.pi) * radius) for i in range(num_points)]
+    return MultiPolygon(geosPolygon(points + [points[0]]), srid=4326)
+
+
+def get_coordinates(geojson):
+    return json.loads(geojson)['coordinates'][0][0]
+
+
+def test_encode_geometry__full_same_as_geometry_field():
+    geometry = circle(1000)
+    assert json.loads(encode_geometry(geometry, 'full')) == json.loads(json.dumps(GeometryField().to_representation(geometry)))
+
+
+@pytest.mark.parametrize(
+    'less_detail, more_detail', [
+        ('low', 'medium'),
+        ('medium', 'high'),
+        ('high', 'full')
+    ]
+)
+def test_encode_geometry__simplified(less_detail, more_detail):
+    geometry = circle(10000)
+    assert len(get_coordinates(encode_geometry(geometry, less_detail))) < len(get_coordinates(encode_geometry(geometry, more_detail)))
+    assert json.loads(encode_geometry(geometry, less_detail))['type'] == 'MultiPolygon'
+
+
+def test_encode_geometry__rounded(settings):
+    settings.POLYGON_GEOMETRY_PRECISION = 2
+    for longitude, latitude in get_coordinates(encode_geometry(circle(1000), 'high')):
+        assert longitude == round(longitude, 2) and latitude == round(latitude, 2)
+
+
+def test_encode_geometry__no_detail():
+    assert encode_geometry(circle(1000), 'none') == 'null'
+
+
+@pytest.mark.django_db
+def test_get_polygon_geometries__stored_and_deleted_when_polygon_saved(ahj_obj):
+    polygon = ahj_obj.PolygonID
+    geometries = get_polygon_geometries([polygon.PolygonID], 'low')
+    assert geometries[polygon.PolygonID]['type'] == 'MultiPolygon'
+    assert PolygonGeometry.objects.filter(PolygonID=polygon.PolygonID, Detail='low').exists()
+    polygon.save()
+    assert not PolygonGeometry.objects.filter(PolygonID=polygon.PolygonID).exists()
+
+
+@pytest.mark.django_db
+def test_build_polygon_geometries(ahj_obj):
+    assert build_polygon_geometries(details=['none', 'low', 'full']) == 2
+    assert set(PolygonGeometry.objects.values_list('Detail', flat=True)) == {'low', 'full'}
+
+
+@pytest.mark.django_db
+def test_polygon_serializer__same_as_without_cache(ahj_obj, settings):
+    cached = PolygonSerializer(ahj_obj.PolygonID).data
+    settings.POLYGON_GEOMETRY_CACHE_ENABLED = False
+    assert json.loads(json.dumps(PolygonSerializer(ahj_obj.PolygonID).data)) == json.loads(json.dumps(cached))
+
+
+@pytest.mark.django_db
+def test_ahj_serializer__geometry_detail(ahj_obj):
+    data = AHJSerializer([ahj_obj], many=True, context={'geometry_detail': 'none'}).data
+    assert data[0]['Polygon']['geometry'] is None
+    assert data[0]['Polygon']['properties']['AHJID'] == ahj_obj.AHJID
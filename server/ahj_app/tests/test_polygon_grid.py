@@ -0,0 +1,71 @@
+from django.contrib.gis.geos import Polygon as geosPolygon
+from django.contrib.gis.geos import MultiPolygon
+from ahj_app.models import Polygon, StatePolygon, CountyPolygon, PolygonGridCell
+from ahj_app.polygon_grid import get_cell, get_polygon_cells, build_polygon_grid, polygon_ids_containing
+import pytest
+
+
+def square(xmin, ymin, xmax, ymax):
+    return MultiPolygon(geosPolygon(((xmin, ymin), (xmin, ymax), (xmax, ymax), (xmax, ymin), (xmin, ymin))))
+
+
+def create_polygon(xmin, ymin, xmax, ymax):
+    return Polygon.objects.create(Polygon=square(xmin, ymin, xmax, ymax), LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+
+
+@pytest.mark.parametrize(
+   'lng, lat, cell_size, expected_output', [
+       (0.5, 0.5, 1, (0, 0)),
+       (-0.5, 0.5, 1, (-1, 0)),
+       (1, 1, 1, (1, 1)),
+       (-111.55, 33.45, 0.1, (-1116, 334))
+   ]
+)
+def test_get_cell(lng, lat, cell_size, expected_output):
+    assert get_cell(lng, lat, cell_size) == expected_output
+
+
+def test_get_polygon_cells():
+    cells = get_polygon_cells(1, square(0.5, 0.5, 3.5, 3.5), 1)
+    interior_cells = {(c.CellX, c.CellY) for c in cells if c.IsInterior}
+    boundary_cells = {(c.CellX, c.CellY) for c in cells if not c.IsInterior}
+    assert interior_cells == {(1, 1), (1, 2), (2, 1), (2, 2)}
+    assert len(boundary_cells) == 12
+    assert interior_cells.isdisjoint(boundary_cells)
+
+
+@pytest.mark.django_db
+def test_build_polygon_grid(settings):
+    settings.POLYGON_GRID_CELL_SIZE = 1
+    state = create_polygon(0.5, 0.5, 3.5, 3.5)
+    StatePolygon.objects.create(PolygonID=state)
+    create_polygon(0, 0, 1, 1) # Not a searchable polygon
+    assert build_polygon_grid() == 16
+    assert PolygonGridCell.objects.filter(PolygonID=state).count() == 16
+
+
+@pytest.mark.django_db
+def test_polygon_ids_containing(settings):
+    settings.POLYGON_GRID_CELL_SIZE = 1
+    state = create_polygon(0.5, 0.5, 3.5, 3.5)
+    state_polygon = StatePolygon.objects.create(PolygonID=state)
+    county = create_polygon(0.5, 0.5, 2, 2)
+    CountyPolygon.objects.create(PolygonID=county, StatePolygonID=state_polygon)
+    build_polygon_grid()
+    assert polygon_ids_containing(1.5, 1.5) == {state.PolygonID, county.PolygonID} # Interior cell of the state
+    assert polygon_ids_containing(0.75, 0.75) == {state.PolygonID, county.PolygonID} # Boundary cell of both
+    assert polygon_ids_containing(3, 3) == {state.PolygonID}
+    assert polygon_ids_containing(0.25, 0.25) == set()
+
+
+@pytest.mark.django_db
+def test_polygon_grid__updated_when_polygon_changed(settings):
+    settings.POLYGON_GRID_CELL_SIZE = 1
+    settings.POLYGON_GRID_ENABLED = True
+    state = create_polygon(0.5, 0.5, 3.5, 3.5)
+    StatePolygon.objects.create(PolygonID=state)
+    assert polygon_ids_containing(1.5, 1.5) == {state.PolygonID}
+    state.Polygon = square(10.5, 10.5, 11.5, 11.5)
+    state.save()
+    assert polygon_ids_containing(1.5, 1.5) == set()
+    assert polygon_ids_containing(11, 11) == {state.PolygonID}
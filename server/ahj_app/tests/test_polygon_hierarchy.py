@@ -0,0 +1,61 @@
+from django.contrib.gis.geos import Polygon as geosPolygon
+from django.contrib.gis.geos import MultiPolygon
+from ahj_app.models import Polygon, StatePolygon, CountyPolygon, CityPolygon, CountySubdivisionPolygon, PolygonHierarchy
+from ahj_app.polygon_hierarchy import build_polygon_hierarchy
+import pytest
+
+
+def create_polygon():
+    p1 = geosPolygon( ((0, 0), (0, 1), (1, 1), (0, 0)) )
+    mp = MultiPolygon(p1)
+    return Polygon.objects.create(Polygon=mp, LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+
+
+def get_hierarchy():
+    return set(PolygonHierarchy.objects.values_list('AncestorPolygonID', 'DescendantPolygonID', 'Depth'))
+
+
+@pytest.fixture
+def state_with_children():
+    state = StatePolygon.objects.create(PolygonID=create_polygon())
+    county = CountyPolygon.objects.create(PolygonID=create_polygon(), StatePolygonID=state)
+    city = CityPolygon.objects.create(PolygonID=create_polygon(), StatePolygonID=state)
+    cousub = CountySubdivisionPolygon.objects.create(PolygonID=create_polygon(), StatePolygonID=state)
+    return state.PolygonID_id, county.PolygonID_id, city.PolygonID_id, cousub.PolygonID_id
+
+
+def expected_hierarchy(state, *children):
+    hierarchy = {(state, state, 0)}
+    for child in children:
+        hierarchy.add((child, child, 0))
+        hierarchy.add((state, child, 1))
+    return hierarchy
+
+
+@pytest.mark.django_db
+def test_build_polygon_hierarchy(state_with_children):
+    PolygonHierarchy.objects.all().delete()
+    assert build_polygon_hierarchy() == 7
+    assert get_hierarchy() == expected_hierarchy(*state_with_children)
+
+
+@pytest.mark.django_db
+def test_polygon_hierarchy__updated_when_polygon_added(state_with_children):
+    assert get_hierarchy() == expected_hierarchy(*state_with_children)
+
+
+@pytest.mark.django_db
+def test_polygon_hierarchy__updated_when_polygon_replaced(state_with_children):
+    state, county, city, cousub = state_with_children
+    new_state = StatePolygon.objects.create(PolygonID=create_polygon())
+    city_polygon = CityPolygon.objects.get(PolygonID=city)
+    city_polygon.StatePolygonID = new_state
+    city_polygon.save()
+    assert get_hierarchy() == expected_hierarchy(state, county, cousub) | expected_hierarchy(new_state.PolygonID_id, city)
+
+
+@pytest.mark.django_db
+def test_polygon_hierarchy__updated_when_polygon_deleted(state_with_children):
+    state, county, city, cousub = state_with_children
+    CountyPolygon.objects.get(PolygonID=county).delete()
+    assert get_hierarchy() == expected_hierarchy(state, city, cousub)
@@ -0,0 +1,100 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ahj_app.models import AHJ, AHJInspection, AHJPermitIssueMethodUse, AHJUserMaintains, Comment, Contact, \
+    EngineeringReviewRequirement, FeeStructure, PermitIssueMethod
+from ahj_app.prefetch import prefetch_ahj_page, prefetch_comments
+from ahj_app.serializers import AHJSerializer, CommentSerializer
+from fixtures import *
+import pytest
+
+
+@pytest.fixture
+def ahj_with_children_factory(ahj_obj_factory, create_user, add_enum_value_rows):
+    user = create_user()
+
+    def make_ahj_with_children():
+        ahj = ahj_obj_factory()
+        for status in [True, None]:
+            Contact.objects.create(ParentTable='AHJ', ParentID=ahj.AHJPK, ContactStatus=status,
+                                   AddressID=Address.objects.create())
+            inspection = AHJInspection.objects.create(AHJPK=ahj, AHJInspectionName=f'Inspection {status}', InspectionStatus=status)
+            Contact.objects.create(ParentTable='AHJInspection', ParentID=inspection.InspectionID, ContactStatus=status)
+            EngineeringReviewRequirement.objects.create(AHJPK=ahj, EngineeringReviewRequirementStatus=status)
+            FeeStructure.objects.create(AHJPK=ahj, FeeStructureID=uuid.uuid4(), FeeStructureName=f'{ahj.AHJID} {status}', FeeStructureStatus=status)
+        AHJPermitIssueMethodUse.objects.create(AHJPK=ahj, PermitIssueMethodID=PermitIssueMethod.objects.first(), MethodStatus=True)
+        comment = Comment.objects.create(UserID=user, AHJPK=ahj.AHJPK, CommentText='comment')
+        Comment.objects.create(UserID=user, ReplyingTo=comment.CommentID, CommentText='reply')
+        AHJUserMaintains.objects.create(AHJPK=ahj, UserID=user, MaintainerStatus=True)
+        return ahj
+    return make_ahj_with_children
+
+
+def count_serializer_queries(ahjs, is_public_view, fields=None):
+    with CaptureQueriesContext(connection) as context:
+        AHJSerializer(AHJ.objects.filter(AHJPK__in=[ahj.AHJPK for ahj in ahjs]), many=True,
+                      context={'is_public_view': is_public_view, 'fields': fields}).data
+    return len(context.captured_queries)
+
+
+@pytest.mark.parametrize(
+    'is_public_view', [
+        True,
+        False
+    ]
+)
+@pytest.mark.django_db
+def test_ahj_serializer__query_count_is_constant(is_public_view, ahj_with_children_factory):
+    one_ahj = [ahj_with_children_factory()]
+    many_ahjs = [ahj_with_children_factory() for i in range(5)]
+    assert count_serializer_queries(one_ahj, is_public_view) == count_serializer_queries(many_ahjs, is_public_view)
+
+
+@pytest.mark.parametrize(
+    'is_public_view', [
+        True,
+        False
+    ]
+)
+@pytest.mark.django_db
+def test_prefetch_ahj_page__same_as_not_prefetched(is_public_view, ahj_with_children_factory, settings):
+    ahjs = [ahj_with_children_factory() for i in range(3)]
+    context = {'is_public_view': is_public_view}
+    prefetched = AHJSerializer(prefetch_ahj_page(AHJ.objects.filter(AHJPK__in=[ahj.AHJPK for ahj in ahjs]), is_public_view=is_public_view),
+                               many=True, context=context).data
+    settings.AHJ_PAGE_PREFETCH_ENABLED = False
+    assert AHJSerializer(AHJ.objects.filter(AHJPK__in=[ahj.AHJPK for ahj in ahjs]), many=True, context=context).data == prefetched
+
+
+@pytest.mark.parametrize(
+    'is_public_view', [
+        True,
+        False
+    ]
+)
+@pytest.mark.django_db
+def test_ahj_serializer__fields_projection(is_public_view, ahj_with_children_factory):
+    ahjs = [ahj_with_children_factory() for i in range(3)]
+    data = AHJSerializer(AHJ.objects.filter(AHJPK__in=[ahj.AHJPK for ahj in ahjs]), many=True,
+                         context={'is_public_view': is_public_view, 'fields': frozenset(['AHJName', 'Contacts'])}).data
+    assert all(list(ahj) == ['AHJName', 'Contacts'] for ahj in data)
+    assert count_serializer_queries(ahjs, is_public_view, fields=frozenset(['AHJName', 'Contacts'])) < count_serializer_queries(ahjs, is_public_view)
+
+
+@pytest.mark.django_db
+def test_prefetch_ahj_page__empty_page():
+    assert prefetch_ahj_page(AHJ.objects.none()) == []
+
+
+@pytest.mark.django_db
+def test_prefetch_comments__one_query_for_all_depths(ahj_obj, create_user):
+    user = create_user()
+    comment = Comment.objects.create(UserID=user, AHJPK=ahj_obj.AHJPK, CommentText='comment')
+    for depth in range(5):
+        comment = Comment.objects.create(UserID=user, ReplyingTo=comment.CommentID, CommentText=f'reply {depth}')
+    expected = CommentSerializer(Comment.objects.filter(AHJPK=ahj_obj.AHJPK).order_by('-Date'), many=True).data
+    with CaptureQueriesContext(connection) as context:
+        prefetch_comments([ahj_obj])
+        data = CommentSerializer(ahj_obj.get_comments(), many=True).data
+    assert data == expected
+    assert len(context.captured_queries) == 3 # Comments, Users, and maintained AHJs
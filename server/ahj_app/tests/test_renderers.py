@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from decimal import Decimal
+import datetime
+import json
+
+from django.contrib.gis.geos import Point
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+import msgpack
+
+from ahj_app.renderers import FastJSONRenderer, MessagePackRenderer
+from fixtures import *
+import pytest
+
+
+DATA = [
+    OrderedDict([('Decimal', Decimal('12.5')), ('Integer', 1), ('Null', None), ('Bool', True)]),
+    {'Date': datetime.date(2021, 7, 18), 'DateTime': datetime.datetime(2021, 7, 18, 4, 16, 30, 123456, tzinfo=timezone.utc),
+     'NaiveDateTime': datetime.datetime(2021, 7, 18, 4, 16), 'Time': datetime.time(4, 16)},
+    {'Text': 'ünïcode', 'List': [1, 'two', [3.5]], 'Tuple': (1, 2)}
+]
+
+
+@pytest.mark.parametrize(
+    'data', DATA
+)
+def test_fast_json_renderer__same_as_json_renderer(data):
+    assert json.loads(FastJSONRenderer().render(data)) == json.loads(JSONRenderer().render(data))
+
+
+def test_fast_json_renderer__escapes_line_separators():
+    rendered = FastJSONRenderer().render({'Text': '\u2028\u2029'})
+    assert rendered == b'{"Text":"\\u2028\\u2029"}'
+
+
+def test_fast_json_renderer__indent():
+    rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+    assert rendered == b'{\n  "a": 1\n}'
+
+
+def test_fast_json_renderer__geometry():
+    rendered = FastJSONRenderer().render({'Point': Point(1, 2)})
+    assert json.loads(rendered) == {'Point': {'type': 'Point', 'coordinates': [1.0, 2.0]}}
+
+
+@pytest.mark.parametrize(
+    'data', DATA
+)
+def test_message_pack_renderer__same_as_json_renderer(data):
+    assert msgpack.unpackb(MessagePackRenderer().render(data), raw=False) == json.loads(JSONRenderer().render(data))
+
+
+@pytest.mark.parametrize(
+    'renderer', [FastJSONRenderer(), MessagePackRenderer()]
+)
+def test_renderers__none(renderer):
+    assert renderer.render(None) == b''
+
+
+@pytest.mark.django_db
+def test_data_map__accept_header_selects_renderer(client_with_webpage_credentials):
+    url = reverse('data-map')
+    json_response = client_with_webpage_credentials.get(url)
+    msgpack_response = client_with_webpage_credentials.get(url, HTTP_ACCEPT='application/msgpack')
+    assert json_response['Content-Type'] == 'application/json'
+    assert msgpack_response['Content-Type'] == 'application/msgpack'
+    assert msgpack.unpackb(msgpack_response.content, raw=False) == json.loads(json_response.content)
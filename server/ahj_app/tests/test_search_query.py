@@ -0,0 +1,107 @@
+from ahj_app.search_query import AHJSearchBuilder, AHJSearchTemplateCache, get_padded_size
+import pytest
+
+
+@pytest.mark.parametrize(
+   'size, expected_output', [
+       (0, 0),
+       (1, 1),
+       (2, 2),
+       (3, 4),
+       (5, 8),
+       (8, 8),
+   ]
+)
+def test_get_padded_size(size, expected_output):
+    assert get_padded_size(size) == expected_output
+
+
+def test_builder__shape_excludes_values():
+    a = AHJSearchBuilder()
+    a.add_location(1.5, 2.5)
+    a.add_cond('name', 'AHJName', 'San')
+    a.add_cond('basic', 'AHJID', None)
+    b = AHJSearchBuilder()
+    b.add_location(-120, 35)
+    b.add_cond('name', 'AHJName', 'Los')
+    assert a.get_shape() == b.get_shape()
+    assert a.params == {'lng': 1.5, 'lat': 2.5, 'AHJName': '%San%'}
+
+
+def test_builder__list_cond_padded():
+    search = AHJSearchBuilder()
+    search.add_cond('list', 'BuildingCode', [1, 2, 3])
+    search.add_cond('list', 'FireCode', [])
+    assert search.get_shape().conds == (('list', 'BuildingCode', 4),)
+    assert search.params == {'BuildingCode0': 1, 'BuildingCode1': 2, 'BuildingCode2': 3, 'BuildingCode3': 3}
+
+
+@pytest.mark.parametrize(
+   'spatial, value', [
+       ('location', (1.5, 2.5)),
+       ('polygon', ('MULTIPOLYGON(((0 0,0 1,1 1,0 0)))',)),
+   ]
+)
+def test_template__geometry_is_bound_parameter(spatial, value):
+    search = AHJSearchBuilder()
+    getattr(search, 'add_' + spatial)(*value)
+    template = AHJSearchTemplateCache().get(search.get_shape())
+    for sql in [template.sql, template.page_sql, template.after_page_sql, template.count_sql]:
+        assert 'MULTIPOLYGON' not in sql and '1.5' not in sql
+
+
+def test_template_cache__compiles_each_shape_once():
+    cache = AHJSearchTemplateCache()
+    shapes = []
+    for name in ['a', 'b', None]:
+        search = AHJSearchBuilder()
+        search.add_cond('name', 'AHJName', name)
+        shapes.append(search.get_shape())
+    assert cache.get(shapes[0]) is cache.get(shapes[1])
+    cache.get(shapes[2])
+    stats = cache.get_stats()
+    assert stats['shapes'] == 2
+    assert stats['compiles'] == 2
+    assert stats['uses'][0] == (shapes[0], 2)
+
+
+def test_template_cache__max_size():
+    cache = AHJSearchTemplateCache(max_size=1)
+    for column in ['AHJID', 'AHJCode']:
+        search = AHJSearchBuilder()
+        search.add_cond('basic', column, 'value')
+        cache.get(search.get_shape())
+    assert cache.get_stats()['shapes'] == 1
+    assert cache.get_stats()['compiles'] == 2
+
+
+def test_template__count_sql_has_no_order_or_limit():
+    search = AHJSearchBuilder()
+    search.add_polygon('MULTIPOLYGON(((0 0,0 1,1 1,0 0)))')
+    template = AHJSearchTemplateCache().get(search.get_shape())
+    assert template.count_sql.startswith('SELECT COUNT(*) FROM AHJ')
+    assert 'ORDER BY' not in template.count_sql and 'LIMIT' not in template.count_sql
+
+
+@pytest.mark.parametrize(
+   'spatial, value, params', [
+       ('location', (1.5, 2.5), {'lng': 1.5, 'lat': 2.5}),
+       ('polygon', ('MULTIPOLYGON(((0 0,0 1,2 3,0 0)))',), {'polygon': 'MULTIPOLYGON(((0 0,0 1,2 3,0 0)))', 'polygonMinX': 0, 'polygonMinY': 0, 'polygonMaxX': 2, 'polygonMaxY': 3}),
+   ]
+)
+def test_template__envelope_prefilter(spatial, value, params):
+    prefiltered = AHJSearchBuilder(prefilter=True)
+    getattr(prefiltered, 'add_' + spatial)(*value)
+    not_prefiltered = AHJSearchBuilder(prefilter=False)
+    getattr(not_prefiltered, 'add_' + spatial)(*value)
+    assert prefiltered.params == params
+    assert prefiltered.get_shape() != not_prefiltered.get_shape()
+    cache = AHJSearchTemplateCache()
+    assert 'Polygon.MinX <=' in cache.get(prefiltered.get_shape()).count_sql
+    assert 'Polygon.MinX <=' not in cache.get(not_prefiltered.get_shape()).count_sql
+
+
+def test_builder__prefilter_only_with_spatial_cond():
+    search = AHJSearchBuilder(prefilter=True)
+    search.add_cond('basic', 'AHJID', 'value')
+    assert search.get_shape().prefilter is False
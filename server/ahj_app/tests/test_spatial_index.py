@@ -0,0 +1,104 @@
+from django.contrib.gis.geos import Polygon as geosPolygon
+from django.contrib.gis.geos import MultiPolygon
+from ahj_app.models import Polygon, StatePolygon, CountyPolygon, CityPolygon
+from ahj_app.spatial_index import STRtree, PolygonSpatialIndex, extent_intersects, extent_union
+from ahj_app import spatial_index
+import pytest
+
+
+def square(xmin, ymin, xmax, ymax):
+    return MultiPolygon(geosPolygon(((xmin, ymin), (xmin, ymax), (xmax, ymax), (xmax, ymin), (xmin, ymin))))
+
+
+def create_polygon(xmin, ymin, xmax, ymax):
+    return Polygon.objects.create(Polygon=square(xmin, ymin, xmax, ymax), LandArea=1, WaterArea=1, InternalPLatitude=1, InternalPLongitude=1)
+
+
+@pytest.mark.parametrize(
+   'a, b, expected_output', [
+       ((0, 0, 1, 1), (0.5, 0.5, 2, 2), True),
+       ((0, 0, 1, 1), (1, 1, 2, 2), True), # Touching extents intersect
+       ((0, 0, 1, 1), (2, 2, 3, 3), False),
+       ((0, 0, 10, 10), (2, 2, 3, 3), True),
+   ]
+)
+def test_extent_intersects(a, b, expected_output):
+    assert extent_intersects(a, b) == expected_output
+
+
+def test_extent_union():
+    assert extent_union([(0, 0, 1, 1), (-1, 2, 0, 3)]) == (-1, 0, 1, 3)
+
+
+def test_strtree_query():
+    entries = [((i, i, i + 1, i + 1), i) for i in range(100)]
+    tree = STRtree(entries, node_capacity=4)
+    assert sorted(tree.query((10.5, 10.5, 10.5, 10.5))) == [10]
+    assert sorted(tree.query((10, 10, 12.5, 12.5))) == [9, 10, 11, 12]
+    assert tree.query((200, 200, 201, 201)) == []
+
+
+def test_strtree_query__empty_tree():
+    assert STRtree([]).query((0, 0, 1, 1)) == []
+
+
+@pytest.mark.django_db
+def test_polygon_spatial_index__contains():
+    state = create_polygon(0, 0, 10, 10)
+    state_polygon = StatePolygon.objects.create(PolygonID=state)
+    county = create_polygon(0, 0, 5, 5)
+    CountyPolygon.objects.create(PolygonID=county, StatePolygonID=state_polygon)
+    city = create_polygon(6, 6, 8, 8)
+    CityPolygon.objects.create(PolygonID=city, StatePolygonID=state_polygon)
+    index = PolygonSpatialIndex()
+    index.load()
+    assert index.polygon_ids_containing(1, 1) == {state.PolygonID, county.PolygonID}
+    assert index.polygon_ids_containing(7, 7) == {state.PolygonID, city.PolygonID}
+    assert index.polygon_ids_containing(20, 20) == set()
+
+
+@pytest.mark.django_db
+def test_polygon_spatial_index__child_outside_state_not_matched():
+    state = create_polygon(0, 0, 10, 10)
+    state_polygon = StatePolygon.objects.create(PolygonID=state)
+    county = create_polygon(20, 20, 30, 30) # County's polygon is not in its state's polygon
+    CountyPolygon.objects.create(PolygonID=county, StatePolygonID=state_polygon)
+    index = PolygonSpatialIndex()
+    index.load()
+    assert index.polygon_ids_containing(25, 25) == set()
+
+
+@pytest.mark.django_db
+def test_polygon_spatial_index__intersects():
+    state1 = create_polygon(0, 0, 10, 10)
+    StatePolygon.objects.create(PolygonID=state1)
+    state2 = create_polygon(20, 20, 30, 30)
+    StatePolygon.objects.create(PolygonID=state2)
+    index = PolygonSpatialIndex()
+    index.load()
+    assert index.polygon_ids_intersecting(square(5, 5, 25, 25)) == {state1.PolygonID, state2.PolygonID}
+    assert index.polygon_ids_intersecting(square(11, 11, 12, 12)) == set()
+
+
+@pytest.mark.django_db
+def test_polygon_spatial_index__load_changed_polygons():
+    state = create_polygon(0, 0, 10, 10)
+    StatePolygon.objects.create(PolygonID=state)
+    index = PolygonSpatialIndex()
+    index.load()
+    state.Polygon = square(20, 20, 30, 30)
+    state.save()
+    index.load(polygon_ids=[state.PolygonID])
+    assert index.polygon_ids_containing(5, 5) == set()
+    assert index.polygon_ids_containing(25, 25) == {state.PolygonID}
+
+
+@pytest.mark.django_db
+def test_get_spatial_index__reloads_after_polygon_saved():
+    state = create_polygon(0, 0, 10, 10)
+    StatePolygon.objects.create(PolygonID=state)
+    assert state.PolygonID in spatial_index.polygon_ids_containing(5, 5)
+    state.Polygon = square(20, 20, 30, 30)
+    state.save()
+    assert state.PolygonID not in spatial_index.polygon_ids_containing(5, 5)
+    assert state.PolygonID in spatial_index.polygon_ids_containing(25, 25)
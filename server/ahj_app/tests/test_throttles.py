@@ -42,6 +42,41 @@ def test_member_rate_throttle__regular_user(urlName, args, generate_client_with_
     response = client.post(url, args, format='json')
     assert response.data['detail'][0:22] == 'Request was throttled.'
 
+"""
+    MemberBatchRateThrottle
+"""
+@pytest.mark.django_db
+def test_member_batch_rate_throttle__charges_per_location(generate_client_with_api_credentials):
+    memberID, domain = generate_sunspec_alliance_member()
+    client = generate_client_with_api_credentials(Email=f'f@{domain}')
+    User.objects.filter(Email=f'f@{domain}').update(MemberID = memberID)
+
+    url = reverse('ahj-geo-location-batch')
+    location = { 'Latitude': { 'Value': '25' }, 'Longitude': { 'Value': '25' }}
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['member-batch'] = '5/day'
+    response = client.post(url, {'Locations': [location] * 3}, format='json')
+    assert response.status_code == 200
+    response = client.post(url, {'Locations': [location] * 3}, format='json') # 6 Locations is over the rate
+    assert response.data['detail'][0:22] == 'Request was throttled.'
+    response = client.post(url, {'Locations': [location] * 2}, format='json')
+    assert response.status_code == 200
+
+@pytest.mark.django_db
+def test_member_batch_rate_throttle__invalid_batch_not_charged(generate_client_with_api_credentials):
+    memberID, domain = generate_sunspec_alliance_member()
+    client = generate_client_with_api_credentials(Email=f'f@{domain}')
+    User.objects.filter(Email=f'f@{domain}').update(MemberID = memberID)
+
+    url = reverse('ahj-geo-location-batch')
+    location = { 'Latitude': { 'Value': '25' }, 'Longitude': { 'Value': '25' }}
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['member-batch'] = '5/day'
+    response = client.post(url, {'Locations': [location] * (settings.BATCH_LOCATION_SEARCH_MAX_LOCATIONS + 1)}, format='json')
+    assert response.status_code == 400
+    response = client.post(url, {'Locations': [location, { 'Latitude': { 'Value': '25' }}]}, format='json')
+    assert response.status_code == 400
+    response = client.post(url, {'Locations': [location] * 5}, format='json')
+    assert response.status_code == 200
+
 """
     WebpageSearchThrottle
 """
@@ -312,6 +312,16 @@ def test_filter_ahjs__search_filters_and_location(ahj_filter_ahjs, ahj_filter_lo
     assert len(ahj_list) == 1
     assert ahj_list[0].AHJPK == 3
 
+@pytest.mark.django_db
+def test_filter_ahjs__polygon_search_ordered_by_AHJLevelCode_PolygonLandArea(ahj_filter_ahjs):
+    ahj1, ahj2, ahj3, ahj4, ahj5 = ahj_filter_ahjs
+    Polygon.objects.filter(PolygonID=ahj4.PolygonID_id).update(LandArea=100)
+    Polygon.objects.filter(PolygonID=ahj5.PolygonID_id).update(LandArea=50)
+    mp = MultiPolygon(geosPolygon(((0, 0), (0, 200), (200, 200), (200, 0), (0, 0))))
+    ahj_list = filter_ahjs(polygon=get_multipolygon_wkt(mp))
+    # Higher AHJLevelCode comes first. If tied, lower land area comes first. If tied, lower AHJPK comes first.
+    assert [ahj.AHJPK for ahj in ahj_list] == [2, 3, 1, 5, 4]
+
 
 @pytest.mark.django_db
 def test_filter_dict_keys():
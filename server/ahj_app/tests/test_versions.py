@@ -0,0 +1,115 @@
+import datetime
+
+from django.urls import reverse
+from django.utils import timezone
+
+from ahj_app.models import AHJ, AHJInspection, AHJVersion, Comment, Edit
+from ahj_app.versions import bump_ahj_versions, get_ahj_versions
+from fixtures import *
+import pytest
+
+
+@pytest.mark.django_db
+def test_get_ahj_versions__created_when_missing(ahj_obj_factory):
+    ahjs = [ahj_obj_factory() for i in range(2)]
+    versions = get_ahj_versions([ahj.AHJPK for ahj in ahjs])
+    assert {ahjpk: version for ahjpk, (version, date_modified) in versions.items()} == {ahj.AHJPK: 1 for ahj in ahjs}
+    assert AHJVersion.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_get_ahj_versions__date_modified_from_latest_applied_edit(ahj_obj, create_user):
+    user = create_user()
+    date_effective = timezone.now() - datetime.timedelta(days=3)
+    for days, is_applied in [(0, True), (2, True), (-1, False)]:
+        Edit.objects.create(ChangedBy=user, AHJPK=ahj_obj, SourceTable='AHJ', SourceColumn='AHJName', SourceRow=ahj_obj.AHJPK,
+                            DateRequested=date_effective, DateEffective=date_effective - datetime.timedelta(days=days), IsApplied=is_applied)
+    assert get_ahj_versions([ahj_obj.AHJPK])[ahj_obj.AHJPK][1] == date_effective
+
+
+@pytest.mark.django_db
+def test_bump_ahj_versions__changed_rows(ahj_obj, create_user):
+    get_ahj_versions([ahj_obj.AHJPK])
+    ahj_obj.AHJName = 'new name'
+    ahj_obj.save()
+    assert get_ahj_versions([ahj_obj.AHJPK])[ahj_obj.AHJPK][0] == 2
+    AHJInspection.objects.create(AHJPK=ahj_obj, AHJInspectionName='Inspection')
+    assert get_ahj_versions([ahj_obj.AHJPK])[ahj_obj.AHJPK][0] == 3
+    Comment.objects.create(UserID=create_user(), AHJPK=ahj_obj.AHJPK, CommentText='comment')
+    assert get_ahj_versions([ahj_obj.AHJPK])[ahj_obj.AHJPK][0] == 4
+    bump_ahj_versions()
+    assert get_ahj_versions([ahj_obj.AHJPK])[ahj_obj.AHJPK][0] == 5
+
+
+@pytest.mark.django_db
+def test_get_single_ahj__not_modified(ahj_obj, client_with_webpage_credentials):
+    url = reverse('single_ahj') + f'?AHJPK={ahj_obj.AHJPK}'
+    response = client_with_webpage_credentials.get(url)
+    assert response.status_code == 200
+    etag, last_modified = response['ETag'], response['Last-Modified']
+    response = client_with_webpage_credentials.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert response.content == b''
+    response = client_with_webpage_credentials.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+    # Other representations of the AHJ have other ETags
+    response = client_with_webpage_credentials.get(url + '&fields=AHJName', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_get_single_ahj__modified(ahj_obj, client_with_webpage_credentials):
+    url = reverse('single_ahj') + f'?AHJPK={ahj_obj.AHJPK}'
+    etag = client_with_webpage_credentials.get(url)['ETag']
+    AHJ.objects.get(AHJPK=ahj_obj.AHJPK).save()
+    response = client_with_webpage_credentials.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_get_single_ahj__modified_by_reply(ahj_obj, create_user, client_with_webpage_credentials):
+    user = create_user()
+    comment = Comment.objects.create(UserID=user, AHJPK=ahj_obj.AHJPK, CommentText='comment')
+    reply = Comment.objects.create(UserID=user, AHJPK=None, CommentText='reply', ReplyingTo=comment.CommentID)
+    url = reverse('single_ahj') + f'?AHJPK={ahj_obj.AHJPK}'
+    etag = client_with_webpage_credentials.get(url)['ETag']
+    assert client_with_webpage_credentials.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    # Replies are posted without an AHJPK
+    Comment.objects.create(UserID=user, AHJPK=None, CommentText='reply to reply', ReplyingTo=reply.CommentID)
+    response = client_with_webpage_credentials.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.parametrize(
+   'url_name', [
+       ('ahj-private'),
+       ('ahj-public')
+   ])
+@pytest.mark.django_db
+def test_ahj_list__preconditions_not_evaluated(url_name, ahj_obj_factory, client_with_credentials):
+    ahj_obj_factory()
+    url = reverse(url_name)
+    # Searches are POST requests, whose preconditions are not evaluated
+    response = client_with_credentials.post(url, HTTP_IF_NONE_MATCH='*')
+    assert response.status_code == 200
+    assert 'ETag' not in response
+    assert not AHJVersion.objects.exists()
+
+
+@pytest.mark.django_db
+def test_get_single_ahj__head_not_modified(ahj_obj, client_with_webpage_credentials):
+    url = reverse('single_ahj') + f'?AHJPK={ahj_obj.AHJPK}'
+    etag = client_with_webpage_credentials.get(url)['ETag']
+    assert client_with_webpage_credentials.head(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+@pytest.mark.django_db
+def test_versions__disabled(ahj_obj, client_with_webpage_credentials, settings):
+    settings.AHJ_VERSIONS_ENABLED = False
+    response = client_with_webpage_credentials.get(reverse('single_ahj') + f'?AHJPK={ahj_obj.AHJPK}', HTTP_IF_NONE_MATCH='*')
+    assert response.status_code == 200
+    assert 'ETag' not in response
@@ -1,6 +1,8 @@
 from rest_framework.throttling import UserRateThrottle
 from django.conf import settings
 
+from .utils import get_batch_points
+
 class MemberRateThrottle(UserRateThrottle):
     # Define a custom scope name to be referenced by DRF in settings.py
     scope = "member"
@@ -89,4 +91,66 @@ class WebpageSearchThrottle(UserRateThrottle):
         if user.is_authenticated:
             if user.MemberID or user.get_API_token(): # Allows access if member OR if they have an API token
                 return True                         
-        return False                                
\ No newline at end of file
+        return False                                
+
+class MemberBatchRateThrottle(MemberRateThrottle):
+    """
+    Throttles batch search requests by the number of items they search instead of by
+    the number of requests, so a batch of 1000 Locations costs as much as 1000 searches.
+    Invalid batches, which the view rejects without searching, are not charged.
+    The throttle history is a list of (timestamp, cost) pairs.
+    """
+    # Define a custom scope name to be referenced by DRF in settings.py
+    scope = "member-batch"
+    # Name of the request's array of items to search
+    items_field = 'Locations'
+
+    def get_request_cost(self, request):
+        """
+        Returns the number of items the request searches, or None if the view rejects the batch.
+        The cost is at most settings.BATCH_LOCATION_SEARCH_MAX_LOCATIONS.
+        """
+        try:
+            return len(get_batch_points(request.data.get(self.items_field, None)))
+        except ValueError:
+            return None
+
+    def allow_request(self, request, view):
+        """
+        Override MemberRateThrottle.allow_request to count the cost of each request.
+        """
+        if request.user.is_staff:
+            # No throttling
+            return True
+
+        if not request.user.is_authenticated:
+            # Unauthenticated user will be blocked by authentication guard
+            return True
+
+        self.key = f'User{request.user.pk}-batch'
+        if self.rate is None or self.key is None:
+            return True
+        self.cost = self.get_request_cost(request)
+        if self.cost is None:
+            # The view responds with 400 Bad Request
+            return True
+        self.history = self.cache.get(self.key, [])
+        self.now = self.timer()
+
+        # Drop any requests from the history which have now passed the
+        # throttle duration
+        while self.history and self.history[-1][0] <= self.now - self.duration:
+            self.history.pop()
+        if sum(cost for timestamp, cost in self.history) + self.cost > self.num_requests:
+            return self.throttle_failure()
+        self.history.insert(0, (self.now, self.cost))
+        self.cache.set(self.key, self.history, self.duration)
+        return True
+
+    def wait(self):
+        """
+        Returns the recommended number of seconds to wait before the next request.
+        """
+        if self.history:
+            return self.duration - (self.now - self.history[-1][0])
+        return self.duration
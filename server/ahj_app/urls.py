@@ -7,6 +7,7 @@ urlpatterns = [
     path('ahj-private/',                         views_ahjsearch.webpage_ahj_list,                        name='ahj-private'),
     path('geo/address/',                         views_ahjsearch_api.ahj_geo_address,                     name='ahj-geo-address'),
     path('geo/location/',                        views_ahjsearch_api.ahj_geo_location,                    name='ahj-geo-location'),
+    path('geo/location/batch/',                  views_ahjsearch_api.ahj_geo_location_batch,              name='ahj-geo-location-batch'),
     path('ahj-one/',                             views_ahjsearch.get_single_ahj,                          name='single_ahj'),
     path('ahj/set-maintainer/',                  views_users.set_ahj_maintainer,                          name='ahj-set-maintainer'),
     path('ahj/remove-maintainer/',               views_users.remove_ahj_maintainer,                       name='ahj-remove-maintainer'),
@@ -22,6 +23,7 @@ urlpatterns = [
     path('user/active/',                         views_users.get_active_user,                             name='active-user-info'),
     path('user-one/<str:username>/',             views_users.get_single_user,                             name='single-user-info'),
     path('ahj/comment/submit/',                  views_misc.comment_submit,                               name="comment-submit"),
+    path('ahj/comments/',                        views_misc.ahj_comments,                                 name='ahj-comments'),
     path('data-vis/data-map/',                   views_datavis.data_map,                                  name='data-map'),
     path('data-vis/data-map/polygon/',           views_datavis.data_map_get_polygon,                      name='data-map-polygon'),
     path('contact/',                             views_misc.send_support_email,                           name='send-support-email'),
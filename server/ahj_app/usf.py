@@ -47,6 +47,21 @@ Order to Call Functions
        Copies the shapefile data from the temporary
        tables into the shapefile tables used by the AHJ Registry.
 
+    #. **build_polygon_hierarchy:**
+
+       Builds the PolygonHierarchy table of which StatePolygon each County, City, and CountySubdivision polygon is in.
+       Run with 'python3 manage.py build_polygon_hierarchy'.
+
+    #. **build_polygon_grid:**
+
+       Builds the PolygonGridCell grid index used to search Locations when settings.POLYGON_GRID_ENABLED.
+       Run with 'python3 manage.py build_polygon_grid'.
+
+    #. **build_polygon_geometries:**
+
+       Builds the PolygonGeometry table of each polygon's encoded GeoJSON geometry at each level of detail.
+       Run with 'python3 manage.py build_polygon_geometries'.
+
     #. **add_enum_values:**
 
        Populates the tables that store enumerated values with their values.
@@ -90,6 +105,16 @@ Order to Call Functions
        Pairs AHJs with their shapefile polygon, if it is found.
        This function calls other functions that pair each type of polygon to an AHJ.
 
+    #. **build_ahj_name_search:**
+
+       Builds the AHJNameSearch table of the AHJName, AHJCensusName, and polygon LSAreaCodeName of each AHJ.
+       Run with 'python3 manage.py build_ahj_name_search'.
+
+    #. **build_ahj_documents:**
+
+       Builds the AHJDocument table of the serialized JSON of each AHJ.
+       Run with 'python3 manage.py build_ahj_documents'.
+
     #. **load_user_data_csv:**
 
        Uploads user data from a CSV into the User and Contact tables.
@@ -100,6 +125,7 @@ import os
 from django.contrib.gis.utils import LayerMapping
 from .models import *
 from .models_field_enums import *
+from .enum_registry import invalidate_enum_registry
 from .utils import ENUM_FIELDS, get_enum_value_row
 
 BASE_DIR = os.path.expanduser('~/AHJRegistryData/')
@@ -293,6 +319,8 @@ def add_enum_values():
         model.objects.all().delete()
         model.objects.bulk_create(list(map(lambda choice: model(Value=choice[0]),
                                            model._meta.get_field('Value').choices)))
+    # bulk_create does not send signals to reload the enum registry
+    invalidate_enum_registry()
 
 
 def is_zero_depth_field(name):
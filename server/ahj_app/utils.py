@@ -4,41 +4,15 @@ import re
 from django.apps import apps
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 
-import googlemaps
 from django.contrib.gis.geos import GEOSGeometry, MultiPolygon
 
 from .models import AHJ
-
-
-ENUM_FIELDS = {
-    'BuildingCode',
-    'ElectricCode',
-    'FireCode',
-    'ResidentialCode',
-    'WindCode',
-    'AHJLevelCode',
-    'DocumentSubmissionMethod',
-    'PermitIssueMethod',
-    'AddressType',
-    'LocationDeterminationMethod',
-    'LocationType',
-    'ContactType',
-    'PreferredContactMethod',
-    'EngineeringReviewType',
-    'RequirementLevel',
-    'StampType',
-    'FeeStructureType',
-    'InspectionType'
-}
-
-ENUM_PLURALS_TRANSLATE = {
-    'DocumentSubmissionMethods': 'DocumentSubmissionMethod',
-    'PermitIssueMethods': 'PermitIssueMethod'
-}
-
-
-gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_KEY)
+from .search_query import AHJSearchBuilder, envelope_prefilter_enabled, get_name_query_cond, get_list_query_cond, get_basic_query_cond
+from .enum_registry import ENUM_FIELDS, get_enum_row
+from .polygon_geometry import polygon_geometry_cache_enabled
+from . import spatial_index, polygon_grid, location_cache, name_search, geocode_cache, geocoders, dem_elevation
 
 
 def get_ob_value_primitive(ob_json, field_name, throw_exception=True, exception_return_value=None):
@@ -82,6 +56,15 @@ def get_str_location(location):
         raise ValueError(f'Invalid Latitude or Longitude, got (Latitude:\'{lat}\', Longitude:\'{lng}\')')
 
 
+def parse_str_location(str_location):
+    """
+    Returns the (longitude, latitude) floats of a string
+    returned by ``get_str_location``.
+    """
+    lng, lat = str_location[str_location.index('(') + 1:str_location.index(')')].split(',')
+    return float(lng), float(lat)
+
+
 def get_str_address(address):
     """
     Returns a string representation of an Orange Button Address dict.
@@ -96,6 +79,25 @@ def get_str_address(address):
         get_ob_value_primitive(address, 'ZipPostalCode', exception_return_value='')
 
 
+def geocode(address, with_elevation=False):
+    """
+    Returns the GeocodedAddress of an address string, or None if it is falsey or could not be geocoded.
+    Its Elevation is None unless ``with_elevation`` is True.
+    The address is geocoded by the backend of ``settings.GEOCODER_BACKEND`` (see ``geocoders.py``), and the result
+    is looked up in the geocoding cache if ``settings.GEOCODE_CACHE_ENABLED`` (see ``geocode_cache.py``).
+    Elevations are looked up in the DEM tiles of ``settings.DEM_TILE_DIRECTORY`` if it is set (see ``dem_elevation.py``).
+    """
+    if not bool(address):
+        return None
+    geocoder = geocoders.get_geocoder()
+    elevation = dem_elevation.get_elevation_function(geocoder) if with_elevation else None
+    if geocoder.cached and geocode_cache.geocode_cache_enabled():
+        return geocode_cache.get_geocode_cache().get(address, geocoder.geocode, elevation=elevation, namespace=geocoder.name)
+    latlng = geocoder.geocode(address)
+    if latlng is None:
+        return None
+    return geocode_cache.GeocodedAddress(latlng[0], latlng[1], elevation(latlng) if with_elevation else None)
+
 def get_location_gecode_address_str(address):
     """
     Returns the latlng of an address given in the request Address parameter
@@ -111,14 +113,10 @@ def get_location_gecode_address_str(address):
             'Value': None
         }
     }
-    geo_res = []
-    if bool(address): # Check if address is non-falsey 
-        geo_res = gmaps.geocode(address)
-    if len(geo_res) != 0:
-        latitude = geo_res[0]['geometry']['location']['lat']
-        longitude = geo_res[0]['geometry']['location']['lng']
-        location['Latitude']['Value'] = latitude
-        location['Longitude']['Value'] = longitude
+    geocoded_address = geocode(address)
+    if geocoded_address is not None:
+        location['Latitude']['Value'] = geocoded_address.Latitude
+        location['Longitude']['Value'] = geocoded_address.Longitude
     return location
 
 def get_elevation(Address):
@@ -127,21 +125,24 @@ def get_elevation(Address):
 
     :param Address: a string representation of an Address.
     """
-    loc = get_location_gecode_address_str(Address)
-    lat, lng = loc['Latitude']['Value'], loc['Longitude']['Value']
-    loc['Elevation'] = {'Value': None}
-    if lat is not None and lng is not None:
-        elev = gmaps.elevation((lat, lng))
-        loc['Elevation']['Value'] = elev[0]['elevation']
+    loc = {
+        'Latitude': {'Value': None},
+        'Longitude': {'Value': None},
+        'Elevation': {'Value': None}
+    }
+    geocoded_address = geocode(Address, with_elevation=True)
+    if geocoded_address is not None:
+        loc['Latitude']['Value'] = geocoded_address.Latitude
+        loc['Longitude']['Value'] = geocoded_address.Longitude
+        loc['Elevation']['Value'] = geocoded_address.Elevation
     return loc
 
 def get_enum_value_row(enum_field, enum_value):
     """
     Finds the row of the enum table given the field name and its enum value.
+    The row is looked up in the process' enum registry if ``settings.ENUM_REGISTRY_ENABLED``.
     """
-    # Translate plural, if given
-    enum_field = ENUM_PLURALS_TRANSLATE[enum_field] if enum_field in ENUM_PLURALS_TRANSLATE else enum_field
-    return apps.get_model('ahj_app', enum_field).objects.get(Value=enum_value)
+    return get_enum_row(enum_field, enum_value)
 
 
 def get_enum_value_row_else_null(enum_field, enum_value):
@@ -159,63 +160,6 @@ def get_enum_value_row_else_null(enum_field, enum_value):
         return None
 
 
-def get_name_query_cond(column: str, val: str, query_params: dict):
-    """
-    Returns the entered string as part of an SQL
-    condition on the AHJ table of the form:
-
-    .. code-block:: sql
-
-        AHJ.`column` = 'val' AND
-
-    If val is not None, otherwise it returns the
-    empty string to represent no condition on the column.
-    """
-    if val is not None and column is not None:
-        query_params[column] = '%' + val + '%'
-        return 'AHJ.' + column + ' LIKE %(' + column + ')s AND '
-    return ''
-
-
-def get_list_query_cond(column: str, val: list, query_params: dict):
-    """
-    Returns the entered list of strings as part of
-    an SQL condition on the AHJ table of the form:
-
-    .. code-block:: sql
-
-        (AHJ.`column` = 'val1' OR AHJ.`column` = 'val2' OR ...) AND
-
-    """
-    if val is not None and len(val) != 0:
-        or_list = []
-        for i in range(len(val)):
-            param_name = f'{column}{i}'
-            query_params[param_name] = val[i]
-            or_list.append('AHJ.' + column + '=%(' + param_name + ')s')
-        ret_str = '(' + ' OR '.join(or_list) + ') AND '
-        return ret_str
-    return ''
-
-
-def get_basic_query_cond(column: str, val: str, query_params: dict):
-    """
-    Returns the entered string as part of an SQL
-    condition on the AHJ table of the form:
-
-    .. code-block:: sql
-
-        AHJ.`column` = 'val' AND
-
-    If val is not None, otherwise it returns the
-    empty string to represent no condition on the column.
-    """
-    if val is not None:
-        query_params[column] = val
-        return 'AHJ.' + column + '=%(' + column + ')s AND '
-    return ''
-
-
 def point_to_polygon_geojson(g):
     """
     Takes a GeoJSON point and converts it into a GeoJSON polygon.
@@ -262,9 +206,16 @@ def get_multipolygon_wkt(multipolygon):
     return multipolygon.wkt.replace(" ", "", 1)
 
 
-def filter_ahjs(AHJName=None, AHJID=None, AHJPK=None, AHJCode=None, AHJLevelCode=None,
-                BuildingCode=[], ElectricCode=[], FireCode=[], ResidentialCode=[], WindCode=[],
-                StateProvince=None, location=None, polygon=None):
+def filter_ahjs(*args, **kwargs):
+    """
+    Returns the AHJs found by the search query of ``get_filter_ahjs_query`` as a RawQuerySet.
+    """
+    return get_filter_ahjs_query(*args, **kwargs).raw()
+
+
+def get_filter_ahjs_query(AHJName=None, AHJID=None, AHJPK=None, AHJCode=None, AHJLevelCode=None,
+                          BuildingCode=[], ElectricCode=[], FireCode=[], ResidentialCode=[], WindCode=[],
+                          StateProvince=None, location=None, polygon=None, polygon_ids=None, use_location_cache=True):
     """
     Main Idea: This functional view uses raw SQL queries to
     get the information out of the databases. To make this
@@ -275,103 +226,92 @@ def filter_ahjs(AHJName=None, AHJID=None, AHJPK=None, AHJCode=None, AHJLevelCode
     Most difficult is the Polygon modifications due to
     the polygon structure. However, we simply check the
     points from a State -> County -> City level to filter
-    at each step.
+    at each step, using the PolygonHierarchy table to find
+    the polygons in the matching states. If ``settings.SPATIAL_INDEX_ENABLED``,
+    the matching PolygonIDs are instead found with the
+    in-process index in spatial_index.py, and the query
+    only filters the AHJ table by those PolygonIDs. Otherwise,
+    if ``settings.POLYGON_GRID_ENABLED``, a location's matching
+    PolygonIDs are found with the grid index in polygon_grid.py.
+    If ``settings.LOCATION_CACHE_ENABLED``, the AHJPKs found for
+    a location are cached by location_cache.py, and the query
+    only filters the AHJ table by those AHJPKs. If ``polygon_ids``
+    is given instead of a location, such as the PolygonIDs of an
+    address found with address_index.py, the query filters the
+    AHJ table by those PolygonIDs.
 
     The other filtering such as BuildingCode, FireCode, ...
     are simply expanded as where clauses on the final
     condition. AHJName is a slight exception to this as
     we match any names that contain the string that was
-    given (case insensitive). Lastly, the StateProvince
+    given (case insensitive). If ``settings.NAME_SEARCH_ENABLED``,
+    the AHJName is instead searched with the name index in
+    name_search.py, which also matches the AHJ's AHJCensusName
+    and its polygon's LSAreaCodeName. Lastly, the StateProvince
     also requires extra logic because it will modify the
     query to also join on the Address table.
+
+    The query is built with an AHJSearchBuilder, so the SQL of
+    each combination of fields is compiled once and the values
+    of the fields, location, and polygon are bound parameters.
+    The query is returned as an AHJSearchQuery, which can
+    count the AHJs or get a page of them without loading the others.
     """
-    full_query_string = ''' SELECT * FROM AHJ '''
-    query_params = {}
-    if location is not None or polygon is not None:
+    search = AHJSearchBuilder()
+    if polygon_ids is not None:
+        search.add_cond('in', 'PolygonID', sorted(polygon_ids))
+        search.ranked = True
+    elif location is not None and polygon is None and use_location_cache and location_cache.location_cache_enabled():
+        ahjpks = location_cache.get_location_cache().get(*parse_str_location(location), compute=lambda lng, lat: get_location_ahjpks(f'POINT({lng}, {lat})'))
+        search.add_cond('in', 'AHJPK', ahjpks)
+        search.ranked = True
+    elif (location is not None or polygon is not None) and spatial_index.spatial_index_enabled():
         if polygon is not None:
-            intersects = 'ST_INTERSECTS(Polygon, ST_GeomFromText(\'' + polygon + '\'))'
+            polygon_ids = spatial_index.polygon_ids_intersecting(GEOSGeometry(polygon))
         else:
-            intersects = 'ST_CONTAINS(Polygon, ' + location + ')'
-
-        # State IDS that contain the location
-        state_ids = ''' 
-             (SELECT Polygon.PolygonID FROM Polygon 
-             JOIN StatePolygon 
-             on Polygon.PolygonID = StatePolygon.PolygonID 
-             WHERE ''' + intersects + ')'
-
-        # All polygon ids that contain the location
-        polygonset = '''
-             (SELECT PolygonID FROM StatePolygon
-             WHERE PolygonID IN ''' + state_ids + \
-                     ''' UNION
-             SELECT Polygon.PolygonID FROM Polygon
-             JOIN CountyPolygon
-             on Polygon.PolygonID = CountyPolygon.PolygonID
-             WHERE
-             CountyPolygon.StatePolygonID IN ''' + state_ids + \
-                     '''AND ''' + intersects + \
-                     ''' UNION
-             SELECT Polygon.PolygonID FROM Polygon
-             JOIN CityPolygon
-             on Polygon.PolygonID = CityPolygon.PolygonID
-             WHERE
-             CityPolygon.StatePolygonID IN ''' + state_ids + \
-                     ' AND ' + intersects + \
-                     ''' UNION
-             SELECT Polygon.PolygonID FROM Polygon
-             JOIN CityPolygon
-             on Polygon.PolygonID = CityPolygon.PolygonID
-             WHERE
-             CityPolygon.StatePolygonID IN ''' + state_ids + \
-                ' AND ' + intersects + \
-                    ''' UNION
-            SELECT Polygon.PolygonID FROM Polygon
-            JOIN CountySubdivisionPolygon
-            on Polygon.PolygonID = CountySubdivisionPolygon.PolygonID
-            WHERE
-            CountySubdivisionPolygon.StatePolygonID IN ''' + state_ids + \
-                ' AND ' + intersects + ')'
-
-        # Join AHJ on SUBQPOLYS (temp relation containing matching PolygonID)
-        polygon_query = '''
-            SELECT * FROM AHJ join ''' + polygonset + '''
-            AS SUBQPOLYS ON AHJ.PolygonID = SUBQPOLYS.PolygonID
-            '''
-        # Change the stem of the query string
-        full_query_string = polygon_query
-
-    # Initialize empty where clause filtering
-    where_clauses = ''
+            polygon_ids = spatial_index.polygon_ids_containing(*parse_str_location(location))
+        search.add_cond('in', 'PolygonID', sorted(polygon_ids))
+        search.ranked = True
+    elif location is not None and polygon is None and polygon_grid.polygon_grid_enabled():
+        polygon_ids = polygon_grid.polygon_ids_containing(*parse_str_location(location))
+        search.add_cond('in', 'PolygonID', sorted(polygon_ids))
+        search.ranked = True
+    elif polygon is not None:
+        search.add_polygon(polygon)
+    elif location is not None:
+        search.add_location(*parse_str_location(location))
+
     # NOTE: StateProvince is located in the Address table,
     # so the StateProvince query needs to join a table and
     # include a where condition
-    _state = StateProvince
-    if _state is not None:
-        query_params['StateProvince'] = _state
-        full_query_string += ' JOIN Address ON AHJ.AddressID = Address.AddressID '
-        where_clauses += ' Address.StateProvince=%(StateProvince)s AND '
+    search.add_cond('state', 'StateProvince', StateProvince)
 
     # Match a partially matching string for name
-    where_clauses += get_name_query_cond('AHJName', AHJName, query_params)
-
-    # Append additional clauses onto condition when NOT NULL, (checked by `basic_query_cond`
-    where_clauses += get_basic_query_cond('AHJPK', AHJPK, query_params)
-    where_clauses += get_basic_query_cond('AHJID', AHJID, query_params)
-    where_clauses += get_basic_query_cond('AHJPK', AHJPK, query_params)
-    where_clauses += get_basic_query_cond('AHJCode', AHJCode, query_params)
-    where_clauses += get_basic_query_cond('AHJLevelCode', getattr(get_enum_value_row_else_null('AHJLevelCode', AHJLevelCode), 'pk', None), query_params)
-    where_clauses += get_list_query_cond('BuildingCode', [e.pk for e in get_enum_value_row_else_null('BuildingCode', BuildingCode) if e is not None], query_params)
-    where_clauses += get_list_query_cond('ElectricCode', [e.pk for e in get_enum_value_row_else_null('ElectricCode', ElectricCode) if e is not None], query_params)
-    where_clauses += get_list_query_cond('FireCode', [e.pk for e in get_enum_value_row_else_null('FireCode', FireCode) if e is not None], query_params)
-    where_clauses += get_list_query_cond('ResidentialCode', [e.pk for e in get_enum_value_row_else_null('ResidentialCode', ResidentialCode) if e is not None], query_params)
-    where_clauses += get_list_query_cond('WindCode', [e.pk for e in get_enum_value_row_else_null('WindCode', WindCode) if e is not None], query_params)
-
-    # NOTE: we append a 'True' at the end to always make the query valid
-    # because the get_x_query_cond appends an `AND` to the condition
-    full_query_string += ' WHERE ' + where_clauses + ' True;'
-    #print(AHJ.objects.raw('EXPLAIN ' + full_query_string, query_params))
-    return AHJ.objects.raw(full_query_string, query_params)
+    if AHJName is not None and name_search.name_search_enabled():
+        name_search.add_name_cond(search, AHJName)
+    else:
+        search.add_cond('name', 'AHJName', AHJName)
+
+    # Append additional clauses onto condition when NOT NULL
+    search.add_cond('basic', 'AHJPK', AHJPK)
+    search.add_cond('basic', 'AHJID', AHJID)
+    search.add_cond('basic', 'AHJCode', AHJCode)
+    search.add_cond('basic', 'AHJLevelCode', getattr(get_enum_value_row_else_null('AHJLevelCode', AHJLevelCode), 'pk', None))
+    search.add_cond('list', 'BuildingCode', [e.pk for e in get_enum_value_row_else_null('BuildingCode', BuildingCode) if e is not None])
+    search.add_cond('list', 'ElectricCode', [e.pk for e in get_enum_value_row_else_null('ElectricCode', ElectricCode) if e is not None])
+    search.add_cond('list', 'FireCode', [e.pk for e in get_enum_value_row_else_null('FireCode', FireCode) if e is not None])
+    search.add_cond('list', 'ResidentialCode', [e.pk for e in get_enum_value_row_else_null('ResidentialCode', ResidentialCode) if e is not None])
+    search.add_cond('list', 'WindCode', [e.pk for e in get_enum_value_row_else_null('WindCode', WindCode) if e is not None])
+
+    return search.build()
+
+
+def get_location_ahjpks(location):
+    """
+    Returns the AHJPKs of the AHJs whose polygon contains the location,
+    ordered by ``order_ahj_list_AHJLevelCode_PolygonLandArea``.
+    """
+    return [ahj.AHJPK for ahj in filter_ahjs(location=location, use_location_cache=False)]
 
 def order_ahj_list_AHJLevelCode_PolygonLandArea(ahj_list):
     ahj_list.sort(key=lambda ahj: int(ahj.PolygonID.LandArea) if ahj.PolygonID is not None else 0) # Sort first by landarea ascending
@@ -379,6 +319,91 @@ def order_ahj_list_AHJLevelCode_PolygonLandArea(ahj_list):
     return ahj_list
 
 
+def get_point_envelope_cond(table):
+    """
+    Returns the condition that the bounding box of a polygon table contains the points of
+    ``get_polygon_ids_containing_points``, if ``settings.POLYGON_ENVELOPE_PREFILTER_ENABLED``.
+    """
+    if not envelope_prefilter_enabled():
+        return ''
+    return table + '.MinX <= points.Longitude AND ' + table + '.MaxX >= points.Longitude AND ' + \
+        table + '.MinY <= points.Latitude AND ' + table + '.MaxY >= points.Latitude AND '
+
+
+def get_polygon_ids_containing_points(points, chunk_size=500):
+    """
+    Returns a list of the sets of PolygonIDs whose polygon contains each (lng, lat) point.
+    Like ``filter_ahjs``, it uses the in-process spatial index or the grid index if enabled.
+    Otherwise, the points are sent ``chunk_size`` at a time as a derived table joined
+    against the StatePolygons and the polygons in them from the PolygonHierarchy table,
+    whose bounding box columns can be checked before ST_CONTAINS.
+    """
+    if spatial_index.spatial_index_enabled():
+        index = spatial_index.get_spatial_index()
+        return [index.polygon_ids_containing(lng, lat) for lng, lat in points]
+    if polygon_grid.polygon_grid_enabled():
+        return [polygon_grid.polygon_ids_containing(lng, lat) for lng, lat in points]
+    polygon_ids = [set() for _ in points]
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        params = []
+        for i, (lng, lat) in enumerate(chunk, start=start):
+            params.extend([i, lng, lat])
+        points_table = ' UNION ALL '.join(['SELECT %s AS PointIndex, %s AS Longitude, %s AS Latitude'] * len(chunk))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT points.PointIndex, PolygonHierarchy.DescendantPolygonID FROM '
+                           '(' + points_table + ') AS points '
+                           'JOIN Polygon AS State ON ' + get_point_envelope_cond('State') +
+                           'ST_CONTAINS(State.Polygon, POINT(points.Longitude, points.Latitude)) '
+                           'JOIN StatePolygon ON StatePolygon.PolygonID = State.PolygonID '
+                           'JOIN PolygonHierarchy ON PolygonHierarchy.AncestorPolygonID = StatePolygon.PolygonID '
+                           'JOIN Polygon ON Polygon.PolygonID = PolygonHierarchy.DescendantPolygonID AND ' + get_point_envelope_cond('Polygon') +
+                           'ST_CONTAINS(Polygon.Polygon, POINT(points.Longitude, points.Latitude));', params)
+            for point_index, polygon_id in cursor.fetchall():
+                polygon_ids[point_index].add(polygon_id)
+    return polygon_ids
+
+
+def get_batch_points(ob_locations):
+    """
+    Returns the (lng, lat) points of a batch search's array of Orange Button Locations.
+    Raises ValueError with the reason the batch is invalid.
+    """
+    if not isinstance(ob_locations, list) or len(ob_locations) == 0:
+        raise ValueError('Locations must be a non-empty array of Locations.')
+    if len(ob_locations) > settings.BATCH_LOCATION_SEARCH_MAX_LOCATIONS:
+        raise ValueError(f'At most {settings.BATCH_LOCATION_SEARCH_MAX_LOCATIONS} Locations can be searched per request.')
+    points = []
+    for i, ob_location in enumerate(ob_locations):
+        try:
+            str_location = get_str_location(ob_location)
+        except (TypeError, KeyError, ValueError) as e:
+            raise ValueError(f'Location {i}: {e}')
+        if str_location is None:
+            raise ValueError(f'Location {i}: Location field(s) cannot be empty.')
+        points.append(parse_str_location(str_location))
+    return points
+
+
+def filter_ahjs_by_points(points):
+    """
+    Returns a list of the AHJs whose polygon contains each (lng, lat) point,
+    ordered by ``order_ahj_list_AHJLevelCode_PolygonLandArea``.
+    The AHJs of all the points are fetched with one query.
+    """
+    polygon_ids = get_polygon_ids_containing_points(points)
+    ahjs_by_polygon_id = {}
+    all_polygon_ids = set().union(*polygon_ids)
+    ahjs = AHJ.objects.filter(PolygonID__in=all_polygon_ids).select_related('PolygonID', 'AHJLevelCode')
+    if polygon_geometry_cache_enabled():
+        # The serializers read the geometries from the polygon geometry cache
+        ahjs = ahjs.defer('PolygonID__Polygon')
+    for ahj in ahjs:
+        ahjs_by_polygon_id.setdefault(ahj.PolygonID_id, []).append(ahj)
+    return [order_ahj_list_AHJLevelCode_PolygonLandArea([ahj for polygon_id in point_polygon_ids for ahj in ahjs_by_polygon_id.get(polygon_id, [])])
+            for point_polygon_ids in polygon_ids]
+
+
 def get_public_api_serializer_context():
     context = {'is_public_view': True}
     return context
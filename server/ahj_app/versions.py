@@ -0,0 +1,173 @@
+"""
+Keeps a version of each AHJ in the AHJVersion table, and answers conditional requests with them.
+
+An AHJ's ``Version`` increases, and its ``DateModified`` is set, each time ``signals.ahjs_changed`` is sent with
+its AHJPK (see ``documents.py``), or one of its Comments or their replies at any depth is saved or deleted.
+A missing AHJVersion is created when it is first read, with the ``DateEffective`` of the AHJ's latest applied Edit
+as its ``DateModified``, if it has one.
+
+GET and HEAD responses of ``get_single_ahj``, the search endpoints, and ``data_map_get_polygon`` have a strong ``ETag``,
+which is a hash of the request, its accepted media type, and the versions of the AHJs in the response, and a
+``Last-Modified`` header, the latest ``DateModified`` of the AHJs. A request with the response's ETag in its
+``If-None-Match`` header is answered with ``304 Not Modified`` without serializing any AHJs. For search endpoints,
+the ETag also covers the count and order of the AHJs found. ``If-Modified-Since`` is only checked by ``get_single_ahj``
+and ``data_map_get_polygon``, since the AHJs found by a search can change without any of them changing.
+
+Preconditions are only evaluated for GET and HEAD requests (RFC 7232), so POST searches are answered
+without looking up the versions of the AHJs they find, and without an ETag.
+
+A polygon's ETag and Last-Modified are those of its PolygonGeometry at the requested level of detail, which is
+rebuilt each time the polygon is saved, so they are only sent if ``settings.POLYGON_GEOMETRY_CACHE_ENABLED``.
+
+Changes to enum value rows and to the profiles of commenting users do not change the versions of AHJs.
+Run ``python3 manage.py bump_ahj_versions`` after changing them.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import F, Max
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import AHJVersion, Comment, Edit
+from .polygon_geometry import get_polygon_geometry_stamp, polygon_geometry_cache_enabled
+from .prefetch import fetch_comment_thread_ahjpk
+from .signals import ahjs_changed
+
+
+def ahj_versions_enabled():
+    return getattr(settings, 'AHJ_VERSIONS_ENABLED', False)
+
+
+def has_preconditions(request):
+    """
+    Checks if the request's conditional headers are evaluated, which they are for GET and HEAD requests.
+    """
+    return ahj_versions_enabled() and request.method in ('GET', 'HEAD')
+
+
+def bump_ahj_versions(ahjpks=None):
+    """
+    Increases the versions of the given AHJPKs, or of all AHJs if ``ahjpks`` is None.
+    AHJs without an AHJVersion are skipped, since no response has their version yet.
+    """
+    versions = AHJVersion.objects.all()
+    if ahjpks is not None:
+        versions = versions.filter(AHJPK__in=list(ahjpks))
+    return versions.update(Version=F('Version') + 1, DateModified=now())
+
+
+def get_ahj_versions(ahjpks):
+    """
+    Returns a dict mapping each AHJPK to its ``(Version, DateModified)``.
+    AHJVersions that are missing are created first.
+    """
+    ahjpks = set(ahjpks)
+    versions = {ahjpk: (version, date_modified) for ahjpk, version, date_modified in
+                AHJVersion.objects.filter(AHJPK__in=ahjpks).values_list('AHJPK', 'Version', 'DateModified')}
+    missing_ahjpks = ahjpks.difference(versions)
+    if missing_ahjpks:
+        edit_dates = dict(Edit.objects.filter(AHJPK__in=missing_ahjpks, IsApplied=True).values('AHJPK')
+                          .annotate(LatestDateEffective=Max('DateEffective')).values_list('AHJPK', 'LatestDateEffective'))
+        date_modified = now()
+        new_versions = [AHJVersion(AHJPK_id=ahjpk, DateModified=edit_dates.get(ahjpk, None) or date_modified) for ahjpk in missing_ahjpks]
+        AHJVersion.objects.bulk_create(new_versions, ignore_conflicts=True)
+        versions.update((version.AHJPK_id, (version.Version, version.DateModified)) for version in new_versions)
+    return versions
+
+
+def make_etag(request, *parts):
+    """
+    Returns a strong ETag of the response to the request, given the parts of the response's data it depends on.
+    """
+    key = [request.get_full_path(), getattr(request, 'accepted_media_type', None), parts]
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def get_ahjs_validators(request, ahjs, *parts):
+    """
+    Returns the ETag and Last-Modified date of a response with the AHJs, in order, and the given parts,
+    or None if ``settings.AHJ_VERSIONS_ENABLED`` is False or the request is not a GET or HEAD request.
+    """
+    if not has_preconditions(request):
+        return None
+    ahjpks = [ahj.AHJPK for ahj in ahjs]
+    versions = get_ahj_versions(ahjpks)
+    etag = make_etag(request, [[ahjpk, versions[ahjpk][0]] for ahjpk in ahjpks], *parts)
+    last_modified = max((date_modified for version, date_modified in versions.values()), default=None)
+    return etag, last_modified
+
+
+def get_polygon_validators(request, polygon_id, detail):
+    """
+    Returns the ETag and Last-Modified date of a response with the polygon at the level of detail,
+    or None if they are not known or the request is not a GET or HEAD request.
+    """
+    if not has_preconditions(request) or not polygon_geometry_cache_enabled():
+        return None
+    stamp = get_polygon_geometry_stamp(polygon_id, detail)
+    if stamp is None:
+        return None
+    geometry_id, date_updated = stamp
+    return make_etag(request, geometry_id), date_updated
+
+
+def is_not_modified(request, etag, last_modified, check_modified_since=False):
+    """
+    Checks if the request's ``If-None-Match`` header has the ETag, or, if it has no ``If-None-Match``
+    header and ``check_modified_since``, if the response was not modified after its ``If-Modified-Since`` date.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', None)
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags or f'W/{etag}' in etags
+    if check_modified_since and last_modified is not None:
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and int(last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+def conditional_response(request, validators, get_response, check_modified_since=False):
+    """
+    Returns a ``304 Not Modified`` response if the request's conditional headers match the validators,
+    otherwise the response of ``get_response()``. Successful responses have the ETag and Last-Modified
+    headers of the validators. If ``validators`` is None, or the request is not a GET or HEAD request,
+    it returns the response of ``get_response()``.
+    """
+    if validators is None or not has_preconditions(request):
+        return get_response()
+    etag, last_modified = validators
+    if is_not_modified(request, etag, last_modified, check_modified_since=check_modified_since):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = get_response()
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+@receiver(ahjs_changed)
+def bump_changed_ahj_versions(sender, ahjpks, **kwargs):
+    if ahj_versions_enabled():
+        bump_ahj_versions(ahjpks)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    if not ahj_versions_enabled():
+        return
+    ahjpk = instance.AHJPK
+    if ahjpk is None:
+        # Replies have no AHJPK, so bump the AHJ of the Comment their thread starts with
+        ahjpk = fetch_comment_thread_ahjpk(instance.ReplyingTo)
+    if ahjpk is not None:
+        bump_ahj_versions([ahjpk])
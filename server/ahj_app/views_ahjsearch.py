@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from rest_framework import status
 from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.pagination import LimitOffsetPagination
@@ -6,9 +8,14 @@ from rest_framework.throttling import AnonRateThrottle
 
 from .throttles import WebpageSearchThrottle
 from .models import AHJ
-from .serializers import AHJSerializer
+from .compiled_serializers import compiled_serializer_enabled
+from .documents import get_serialized_ahjs
+from .serializers import AHJTypeaheadSerializer, get_fields_projection
+from .pagination import AHJSearchCursorPagination
+from .polygon_geometry import get_geometry_detail
+from . import name_search, versions
 from .utils import get_multipolygon, get_multipolygon_wkt, get_str_location, \
-    filter_ahjs, order_ahj_list_AHJLevelCode_PolygonLandArea, get_location_gecode_address_str
+    get_filter_ahjs_query, get_location_gecode_address_str
 
 
 @api_view(['POST'])
@@ -26,7 +33,27 @@ def webpage_ahj_list(request):
         - Allows filtering with GeoJSON through the ``FeatureCollection`` parameter.
 
     See the AHJSearchPageFilter.vue and store.js for more information about how this endpoint is used.
+
+    The response has an ETag and Last-Modified date from the versions of the AHJs found (see ``versions.py``).
+
+    With the ``typeahead=true`` query parameter, it returns the AHJPK, AHJID, AHJName, and StateProvince of
+    at most ``limit`` AHJs with a name containing the ``AHJName``, most relevant first.
     """
+    if name_search.is_typeahead_requested(request):
+        ahj_name = request.data.get('AHJName', None)
+        if not isinstance(ahj_name, str):
+            return Response('An AHJName is required for a typeahead search', status=status.HTTP_400_BAD_REQUEST)
+        ahjs = name_search.typeahead(ahj_name, limit=name_search.get_typeahead_limit(request),
+                                     StateProvince=request.data.get('StateProvince', None))
+        context = {'is_public_view': request.data.get('use_public_view', False)}
+        payload = AHJTypeaheadSerializer(ahjs, many=True, context=context).data
+        return Response(OrderedDict([
+            ('count', len(payload)),
+            ('next', None),
+            ('previous', None),
+            ('results', {'Location': None, 'ahjlist': payload})
+        ]))
+
     json_location = get_location_gecode_address_str(request.data.get('Address', None))
 
     polygon = get_multipolygon(request=request, location=json_location)
@@ -34,7 +61,7 @@ def webpage_ahj_list(request):
     if polygon is not None:
         polygon_wkt = get_multipolygon_wkt(multipolygon=polygon)
     str_location = get_str_location(location=json_location)
-    ahjs = filter_ahjs(
+    ahjs = get_filter_ahjs_query(
         AHJName=request.data.get('AHJName', None),
         AHJID=request.data.get('AHJID', None),
         AHJPK=request.data.get('AHJPK', None),
@@ -56,32 +83,42 @@ def webpage_ahj_list(request):
         polygon_center = polygon.centroid
         json_location = {'Latitude': {'Value': polygon_center[1]}, 'Longitude': {'Value': polygon_center[0]}}
 
-    serializer = AHJSerializer
-    paginator = LimitOffsetPagination()
     context = {'is_public_view': request.data.get('use_public_view', False)}
-    page = paginator.paginate_queryset(ahjs, request)
-
-    if str_location is not None or polygon is not None:
-        """
-        Sort the AHJs returned if a location or polygon was searched
-        """
-        page = order_ahj_list_AHJLevelCode_PolygonLandArea(page)
+    context['fields'] = get_fields_projection(request, context['is_public_view'])
+    context['geometry_detail'] = get_geometry_detail(request)
+    if AHJSearchCursorPagination.is_requested(request):
+        paginator = AHJSearchCursorPagination()
+        page = paginator.paginate_query(ahjs, request)
+    else:
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(ahjs, request)
 
-    payload = serializer(page, many=True, context=context).data
+    def get_response():
+        payload = get_serialized_ahjs(page, context, compiled=compiled_serializer_enabled('webpage_ahj_list'))
+        return paginator.get_paginated_response({
+            'Location': json_location,
+            'ahjlist': payload
+        })
 
-    return paginator.get_paginated_response({
-        'Location': json_location,
-        'ahjlist': payload
-    })
+    validators = versions.get_ahjs_validators(request, page, json_location, paginator.count, paginator.get_next_link())
+    return versions.conditional_response(request, validators, get_response)
 
 
 @api_view(['GET'])
 def get_single_ahj(request):
     """
     Endpoint to get a single AHJ given an ``AHJPK`` query parameter.
+    The ``fields`` query parameter limits the AHJ fields returned,
+    and the ``geometry_detail`` query parameter sets the level of detail of its Polygon.
+    The response has an ETag and Last-Modified date from the AHJ's version (see ``versions.py``).
     """
     try:
+        context = {'fields': get_fields_projection(request, is_public_view=False),
+                   'geometry_detail': get_geometry_detail(request)}
         ahj = AHJ.objects.get(AHJPK=request.query_params.get('AHJPK'))
-        return Response(AHJSerializer(ahj).data, status=status.HTTP_200_OK)
+        return versions.conditional_response(
+            request, versions.get_ahjs_validators(request, [ahj]),
+            lambda: Response(get_serialized_ahjs([ahj], context, compiled=compiled_serializer_enabled('get_single_ahj'))[0], status=status.HTTP_200_OK),
+            check_modified_since=True)
     except Exception as e:
         return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
@@ -3,20 +3,26 @@ import datetime
 
 
 from django.apps import apps
+from django.conf import settings
 from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.decorators import permission_classes, authentication_classes, throttle_classes, api_view
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
-from .throttles import MemberRateThrottle
+from .throttles import MemberRateThrottle, MemberBatchRateThrottle
 from rest_framework.response import Response
 
 from .authentication import APITokenAuth
 from .models import APIToken
-from .serializers import AHJSerializer
-from .utils import order_ahj_list_AHJLevelCode_PolygonLandArea, filter_ahjs, get_str_location, \
-    get_public_api_serializer_context, get_ob_value_primitive, get_str_address, get_location_gecode_address_str, check_address_empty
+from .compiled_serializers import compiled_serializer_enabled
+from .documents import get_serialized_ahjs
+from .serializers import AHJTypeaheadSerializer, get_fields_projection
+from .pagination import AHJSearchCursorPagination
+from . import address_index, name_search, versions
+from .utils import filter_ahjs, get_filter_ahjs_query, get_str_location, \
+    get_public_api_serializer_context, get_ob_value_primitive, get_str_address, get_location_gecode_address_str, check_address_empty, \
+    filter_ahjs_by_points, get_batch_points
 
 
 def deactivate_expired_api_tokens():
@@ -33,7 +39,22 @@ def deactivate_expired_api_tokens():
 def ahj_list(request):
     """
     Public API endpoint for AHJ Search. See the API documentation for more information.
+    The response has an ETag and Last-Modified date from the versions of the AHJs found (see ``versions.py``).
     """
+    if name_search.is_typeahead_requested(request):
+        ahj_name = get_ob_value_primitive(request.data, 'AHJName', throw_exception=False)
+        if not isinstance(ahj_name, str):
+            return Response('An AHJName is required for a typeahead search', status=status.HTTP_400_BAD_REQUEST)
+        ahjs = name_search.typeahead(ahj_name, limit=name_search.get_typeahead_limit(request),
+                                     StateProvince=get_ob_value_primitive(request.data, 'StateProvince', throw_exception=False))
+        payload = AHJTypeaheadSerializer(ahjs, many=True, context=get_public_api_serializer_context()).data
+        return Response(OrderedDict([
+            ('count', len(payload)),
+            ('next', None),
+            ('previous', None),
+            ('AuthorityHavingJurisdictions', payload)
+        ]))
+
     str_location = None
     try:
         ob_location = request.data.get('Location', None)
@@ -43,16 +64,20 @@ def ahj_list(request):
         return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
 
     # Process sent Address object if no location provided
+    polygon_ids = None
     try:
         if ob_location is None:
             ob_address = request.data.get('Address', None)
             if ob_address is not None:
                 str_address = get_str_address(ob_address)
-                json_location = get_location_gecode_address_str(str_address)
-                str_location = get_str_location(location=json_location)
+                # Skip geocoding if the address's polygons are in the address index
+                polygon_ids = address_index.get_address_polygon_ids(ob_address)
+                if polygon_ids is None:
+                    json_location = get_location_gecode_address_str(str_address)
+                    str_location = get_str_location(location=json_location)
     except TypeError:
         return Response('Invalid Address, all values must be strings', status=status.HTTP_400_BAD_REQUEST)
-    ahjs = filter_ahjs(
+    ahjs = get_filter_ahjs_query(
         AHJName=get_ob_value_primitive(request.data, 'AHJName', throw_exception=False),
         AHJID=get_ob_value_primitive(request.data, 'AHJID', throw_exception=False),
         AHJCode=get_ob_value_primitive(request.data, 'AHJCode', throw_exception=False),
@@ -63,24 +88,30 @@ def ahj_list(request):
         ResidentialCode=get_ob_value_primitive(request.data, 'ResidentialCodes', throw_exception=False, exception_return_value=[]),
         WindCode=get_ob_value_primitive(request.data, 'WindCodes', throw_exception=False, exception_return_value=[]),
         StateProvince=get_ob_value_primitive(request.data, 'StateProvince', throw_exception=False),
-        location=str_location)
+        location=str_location, polygon_ids=polygon_ids)
 
-    serializer = AHJSerializer
-    paginator = LimitOffsetPagination()
     context = get_public_api_serializer_context()
-    page = paginator.paginate_queryset(ahjs, request)
+    context['fields'] = get_fields_projection(request, is_public_view=True)
+    # The AHJs of a location search are ordered by the query, so they are paginated in order
+    if AHJSearchCursorPagination.is_requested(request):
+        paginator = AHJSearchCursorPagination()
+        page = paginator.paginate_query(ahjs, request)
+    else:
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(ahjs, request)
 
-    if str_location is not None:
-        page = order_ahj_list_AHJLevelCode_PolygonLandArea(page)
-    payload = serializer(page, many=True, context=context).data
+    def get_response():
+        payload = get_serialized_ahjs(page, context, compiled=compiled_serializer_enabled('ahj_list'))
+        # Mimics implementation of LimitOffsetPagination.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', paginator.count),
+            ('next', paginator.get_next_link()),
+            ('previous', paginator.get_previous_link()),
+            ('AuthorityHavingJurisdictions', payload)  # Match Array name of AuthorityHavingJurisdiction
+        ]))
 
-    # Mimics implementation of LimitOffsetPagination.get_paginated_response(data)
-    return Response(OrderedDict([
-        ('count', paginator.count),
-        ('next', paginator.get_next_link()),
-        ('previous', paginator.get_previous_link()),
-        ('AuthorityHavingJurisdictions', payload)  # Match Array name of AuthorityHavingJurisdiction
-    ]))
+    validators = versions.get_ahjs_validators(request, page, paginator.count, paginator.get_next_link())
+    return versions.conditional_response(request, validators, get_response)
 
 
 @api_view(['POST'])
@@ -92,6 +123,8 @@ def ahj_geo_location(request):
     Public API endpoint for searching AHJs by Location.
     This endpoint is from AHJ Registry 1.0, and the AHJ Registry 2.0 ``ahj_list`` endpoint should be used instead.
     """
+    context = get_public_api_serializer_context()
+    context['fields'] = get_fields_projection(request, is_public_view=True)
     ahjs_to_search = request.data.get('ahjs_to_search', None)
 
     # If sent an Orange Button Address containing Location
@@ -114,8 +147,9 @@ def ahj_geo_location(request):
         ahj_result = [ahj for ahj in ahjs]
     else:
         ahj_result = [ahj for ahj in ahjs if ahj.AHJID in ahjs_to_search]
-    ahj_result = order_ahj_list_AHJLevelCode_PolygonLandArea(ahj_result)
-    return Response(AHJSerializer(ahj_result, many=True, context=get_public_api_serializer_context()).data, status=status.HTTP_200_OK)
+    return versions.conditional_response(
+        request, versions.get_ahjs_validators(request, ahj_result),
+        lambda: Response(get_serialized_ahjs(ahj_result, context, compiled=compiled_serializer_enabled('ahj_geo_location')), status=status.HTTP_200_OK))
 
 
 @api_view(['POST'])
@@ -127,6 +161,8 @@ def ahj_geo_address(request):
     Public API endpoint for searching AHJs by Address.
     This endpoint is from AHJ Registry 1.0, and the AHJ Registry 2.0 ``ahj_list`` endpoint should be used instead.
     """
+    context = get_public_api_serializer_context()
+    context['fields'] = get_fields_projection(request, is_public_view=True)
     ahjs_to_search = request.data.get('ahjs_to_search', None)
 
     ob_address = request.data.get('Address', None)
@@ -140,15 +176,54 @@ def ahj_geo_address(request):
     except Exception:
         return Response('Invalid Address, all values must be strings', status=status.HTTP_400_BAD_REQUEST)
 
-    ob_location = get_location_gecode_address_str(str_address)
-    str_location = get_str_location(ob_location)
+    # Skip geocoding if the address's polygons are in the address index
+    polygon_ids = address_index.get_address_polygon_ids(ob_address)
+    str_location = None
+    if polygon_ids is None:
+        ob_location = get_location_gecode_address_str(str_address)
+        str_location = get_str_location(ob_location)
 
-    ahjs = filter_ahjs(location=str_location)
+    ahjs = filter_ahjs(location=str_location, polygon_ids=polygon_ids)
 
     # Only include ahjs whose AHJID is in ahjs_to_search, if ahjs_to_search was given
     if ahjs_to_search is None:
         ahj_result = [ahj for ahj in ahjs]
     else:
         ahj_result = [ahj for ahj in ahjs if ahj.AHJID in ahjs_to_search]
-    ahj_result = order_ahj_list_AHJLevelCode_PolygonLandArea(ahj_result)
-    return Response(AHJSerializer(ahj_result, many=True, context=get_public_api_serializer_context()).data, status=status.HTTP_200_OK)
+    return versions.conditional_response(
+        request, versions.get_ahjs_validators(request, ahj_result),
+        lambda: Response(get_serialized_ahjs(ahj_result, context, compiled=compiled_serializer_enabled('ahj_geo_address')), status=status.HTTP_200_OK))
+
+
+@api_view(['POST'])
+@authentication_classes([APITokenAuth])
+@permission_classes([IsAuthenticated])
+@throttle_classes([MemberBatchRateThrottle])
+def ahj_geo_location_batch(request):
+    """
+    Public API endpoint for searching the AHJs of many Locations in one request.
+    Given an array of Orange Button Locations in the ``Locations`` field, it returns
+    a dict mapping the index of each Location to its list of AHJs, ordered like ``ahj_geo_location``.
+    Each Location counts against the ``member-batch`` throttle rate.
+    """
+    context = get_public_api_serializer_context()
+    context['fields'] = get_fields_projection(request, is_public_view=True)
+    try:
+        points = get_batch_points(request.data.get('Locations', None))
+    except ValueError as e:
+        return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+
+    ahj_lists = filter_ahjs_by_points(points)
+
+    # Serialize each AHJ once, even if it is found for many Locations
+    unique_ahjs = {ahj.AHJPK: ahj for ahj_list in ahj_lists for ahj in ahj_list}
+
+    def get_response():
+        serialized_ahjs = dict(zip(unique_ahjs.keys(), get_serialized_ahjs(list(unique_ahjs.values()), context,
+                                                                        compiled=compiled_serializer_enabled('ahj_geo_location_batch'))))
+        return Response(OrderedDict(
+            (str(i), [serialized_ahjs[ahj.AHJPK] for ahj in ahj_list]) for i, ahj_list in enumerate(ahj_lists)
+        ), status=status.HTTP_200_OK)
+
+    validators = versions.get_ahjs_validators(request, unique_ahjs.values(), [[ahj.AHJPK for ahj in ahj_list] for ahj_list in ahj_lists])
+    return versions.conditional_response(request, validators, get_response)
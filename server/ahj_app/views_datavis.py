@@ -6,8 +6,10 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 from .models import Polygon
+from .polygon_geometry import get_geometry_detail, polygon_geometry_cache_enabled
 from .serializers import PolygonSerializer
 from .utils import dictfetchall
+from . import versions
 
 
 @api_view(['GET'])
@@ -25,6 +27,8 @@ def data_map(request):
         - The number of known BuildingCodes, ElectricsCodes, FireCodes, ResidentialCodes, and WindCodes
         - The state's PolygonID, InternalPLatitude, InternalPLongitude, and Name
 
+    The polygons in each state are looked up in the PolygonHierarchy table.
+
     """
     try:
         state_pk = request.query_params.get('StatePK', None)
@@ -38,9 +42,8 @@ def data_map(request):
                                'IF(FireCode IS NULL,0,1) as numFireCodes,'
                                'IF(ResidentialCode IS NULL,0,1) as numResidentialCodes,'
                                'IF(WindCode IS NULL,0,1) as numWindCodes FROM '
-                               '(SELECT PolygonID FROM CountyPolygon WHERE StatePolygonID=%(StatePK)s '
-                               'UNION SELECT PolygonID FROM CityPolygon WHERE StatePolygonID=%(StatePK)s '
-                               'UNION SELECT PolygonID FROM CountySubdivisionPolygon WHERE StatePolygonID=%(StatePK)s) '
+                               '(SELECT DescendantPolygonID as PolygonID FROM PolygonHierarchy '
+                               'WHERE AncestorPolygonID=%(StatePK)s AND Depth=1) '
                                'as polygons_of_state '
                                'JOIN Polygon ON Polygon.PolygonID=polygons_of_state.PolygonID '
                                'LEFT JOIN AHJ ON Polygon.PolygonID=AHJ.PolygonID;',
@@ -57,9 +60,8 @@ def data_map(request):
                                'SUM(ResidentialCode IS NOT NULL) as numResidentialCodes,'
                                'SUM(WindCode IS NOT NULL) as numWindCodes,'
                                'StatePolygonID FROM '
-                               '(SELECT PolygonID, StatePolygonID FROM CountyPolygon '
-                               'UNION SELECT PolygonID, StatePolygonID FROM CityPolygon '
-                               'UNION SELECT PolygonID, StatePolygonID FROM CountySubdivisionPolygon) '
+                               '(SELECT DescendantPolygonID as PolygonID, AncestorPolygonID as StatePolygonID '
+                               'FROM PolygonHierarchy WHERE Depth=1) '
                                'as polygons_of_state '
                                'LEFT JOIN AHJ ON polygons_of_state.PolygonID=AHJ.PolygonID GROUP BY StatePolygonID) '
                                'as all_states '
@@ -75,8 +77,18 @@ def data_map(request):
 def data_map_get_polygon(request):
     """
     Returns a polygon in GeoJSON given its PolygonID from the request's PolygonID query parameter.
+    The ``geometry_detail`` query parameter sets the level of detail of its geometry.
+    The response has an ETag and Last-Modified date from its stored geometry (see ``versions.py``).
     """
     try:
-        return Response(PolygonSerializer(Polygon.objects.get(PolygonID=request.query_params.get('PolygonID', None))).data, status=status.HTTP_200_OK)
+        polygons = Polygon.objects.all()
+        if polygon_geometry_cache_enabled():
+            polygons = polygons.defer('Polygon')
+        polygon = polygons.get(PolygonID=request.query_params.get('PolygonID', None))
+        geometry_detail = get_geometry_detail(request)
+        return versions.conditional_response(
+            request, versions.get_polygon_validators(request, polygon.PolygonID, geometry_detail),
+            lambda: Response(PolygonSerializer(polygon, context={'geometry_detail': geometry_detail}).data, status=status.HTTP_200_OK),
+            check_modified_since=True)
     except Exception as e:
         return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
@@ -8,6 +8,7 @@ from rest_framework.decorators import api_view, authentication_classes, permissi
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from . import bulk_edits, documents, geocode_queue, location_cache
 from .authentication import WebpageTokenAuth
 
 from .models import AHJ, Edit, Location, AHJUserMaintains
@@ -142,16 +143,30 @@ def edit_get_old_new_value(edit, old_new_field):
     return edit_value
 
 
-def apply_edits(ready_edits=None):
+def geocode_edited_address(row):
     """
-    Applies the changes of a list of edits.
-    If a list is not provided, it applies all edits whose DateEffective is today.
-    For rejected edit additions, this sets the SourceColumn of the edited row to False.
+    Geocodes an edited Address to set its Location fields.
     """
-    if ready_edits is None:
-        ready_edits = Edit.objects.filter(ReviewStatus='A',
-                                          DateEffective__date=datetime.date.today()).exclude(ApprovedBy=None)
+    addr_string = create_addr_string(row)
+    if addr_string != '' and geocode_queue.geocode_queue_enabled():
+        geocode_queue.enqueue_location(row.LocationID_id, addr_string)
+    elif addr_string != '':
+        loc = get_elevation(addr_string)
+        location = row.LocationID
+        location.Elevation = loc['Elevation']['Value']
+        location.Longitude = loc['Longitude']['Value']
+        location.Latitude = loc['Latitude']['Value']
+        location.save()
+
+
+def apply_edits_one_by_one(ready_edits, rejected_addition_edits):
+    """
+    Applies the changes of a list of edits by saving each edited row and edit.
+    Returns the AHJPKs of the edits.
+    """
+    edited_ahjpks = set()
     for edit in ready_edits:
+        edited_ahjpks.add(edit.AHJPK_id)
         row = edit.get_edited_row()
         edit_value = edit_get_old_new_value(edit, 'NewValue')
         setattr(row, edit.SourceColumn, edit_value)
@@ -159,26 +174,45 @@ def apply_edits(ready_edits=None):
         edit.IsApplied = True
         edit.save()
         edit_update_old_value_all_awaiting_apply_or_review(edit)
+        if edit.SourceTable == 'AHJ' and edit.SourceColumn == 'PolygonID':
+            # The AHJs found by searching a Location may have changed
+            location_cache.invalidate_location_cache()
         if edit.SourceTable == "Address":
-            """
-            Geocode Address objects to set Location fields.
-            """
-            addr_string = create_addr_string(row)
-            if addr_string != '':
-                loc = get_elevation(create_addr_string(row))
-                location = row.LocationID
-                location.Elevation = loc['Elevation']['Value']
-                location.Longitude = loc['Longitude']['Value']
-                location.Latitude = loc['Latitude']['Value']
-                location.save()
+            geocode_edited_address(row)
     # If an addition edit is rejected, set its status false
-    rejected_addition_edits = Edit.objects.filter(ReviewStatus='R',
-                                                  EditType='A',
-                                                  DateEffective__date=datetime.date.today()).exclude(ApprovedBy=None)
     for edit in rejected_addition_edits:
+        edited_ahjpks.add(edit.AHJPK_id)
         row = edit.get_edited_row()
         setattr(row, row.get_relation_status_field(), False)
         row.save()
+    return edited_ahjpks
+
+
+def apply_edits(ready_edits=None):
+    """
+    Applies the changes of a list of edits.
+    If a list is not provided, it applies all edits whose DateEffective is today.
+    For rejected edit additions, this sets the SourceColumn of the edited row to False.
+    The edits are applied with ``bulk_edits.bulk_apply_edits`` if ``settings.BULK_APPLY_EDITS_ENABLED``.
+    """
+    if ready_edits is None:
+        ready_edits = Edit.objects.filter(ReviewStatus='A',
+                                          DateEffective__date=datetime.date.today()).exclude(ApprovedBy=None)
+    rejected_addition_edits = Edit.objects.filter(ReviewStatus='R',
+                                                  EditType='A',
+                                                  DateEffective__date=datetime.date.today()).exclude(ApprovedBy=None)
+    if bulk_edits.bulk_apply_edits_enabled():
+        result = bulk_edits.bulk_apply_edits(ready_edits, rejected_addition_edits)
+        if result.polygon_changed:
+            # The AHJs found by searching a Location may have changed
+            location_cache.invalidate_location_cache()
+        for row in result.addresses:
+            geocode_edited_address(row)
+        edited_ahjpks = result.ahjpks
+    else:
+        edited_ahjpks = apply_edits_one_by_one(ready_edits, rejected_addition_edits)
+    if documents.ahj_documents_enabled():
+        documents.build_ahj_documents(ahjpks=[ahjpk for ahjpk in edited_ahjpks if ahjpk is not None])
 
 
 def revert_edit(user, edit):
@@ -359,11 +393,21 @@ def create_row(model, obj):
                 """
                 Geocode Address objects to set Location fields.
                 """
-                addr = get_elevation(addr_string_from_dict(value))
-                value["Location"]["Longitude"] = addr["Longitude"]["Value"]
-                value["Location"]["Latitude"] = addr["Latitude"]["Value"]
-                value["Location"]["Elevation"] = addr["Elevation"]["Value"]
-            rel_one_to_one.append(create_row(apps.get_model('ahj_app', field), value))
+                if geocode_queue.geocode_queue_enabled():
+                    value["Location"]["Longitude"] = None
+                    value["Location"]["Latitude"] = None
+                    value["Location"]["Elevation"] = None
+                else:
+                    addr = get_elevation(addr_string_from_dict(value))
+                    value["Location"]["Longitude"] = addr["Longitude"]["Value"]
+                    value["Location"]["Latitude"] = addr["Latitude"]["Value"]
+                    value["Location"]["Elevation"] = addr["Elevation"]["Value"]
+            rel_row = create_row(apps.get_model('ahj_app', field), value)
+            if field == "Address" and geocode_queue.geocode_queue_enabled():
+                addr_string = addr_string_from_dict(value)
+                if addr_string != '' and rel_row.LocationID_id is not None:
+                    geocode_queue.enqueue_location(rel_row.LocationID_id, addr_string)
+            rel_one_to_one.append(rel_row)
         elif type(value) is list:
             plurals_to_singular = {'Contacts': 'Contact'}
             if field in plurals_to_singular:
@@ -510,6 +554,8 @@ def edit_addition(request):
                 edits.append(edit)
 
                 response_data.append(get_serializer(row)(edit_info_row).data)
+        if documents.ahj_documents_enabled():
+            documents.build_ahj_documents(ahjpks=[ahj.AHJPK])
         return Response(response_data, status=response_status)
     except Exception as e:
         print('ERROR in edit_addition', str(e))
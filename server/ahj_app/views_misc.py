@@ -1,5 +1,6 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.core.mail import send_mail
@@ -7,6 +8,7 @@ from django.conf import settings
 
 from .authentication import WebpageTokenAuth
 from .models import User, Comment, Edit
+from .prefetch import prefetch_comment_threads
 from .serializers import CommentSerializer, EditSerializer
 
 
@@ -33,12 +35,29 @@ def user_comments(request):
     This expects a ``UserID`` to be provided as a query parameter.
     """
     try:
-        comments = Comment.objects.filter(UserID=request.query_params.get('UserID'))
+        comments = prefetch_comment_threads(Comment.objects.filter(UserID=request.query_params.get('UserID')))
         return Response(CommentSerializer(comments, many=True).data, status=status.HTTP_200_OK)
     except Exception as e:
         return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+def ahj_comments(request):
+    """
+    Endpoint to get the comments on an AHJPage given an ``AHJPK`` query parameter.
+    It is paginated by thread with the ``limit`` and ``offset`` query parameters: each page has
+    at most ``limit`` comments on the AHJPage, newest first, and each comment has all its replies.
+    """
+    try:
+        ahjpk = int(request.query_params.get('AHJPK'))
+    except (TypeError, ValueError):
+        return Response('An AHJPK is required', status=status.HTTP_400_BAD_REQUEST)
+    paginator = LimitOffsetPagination()
+    threads = paginator.paginate_queryset(Comment.objects.filter(AHJPK=ahjpk).order_by('-Date', '-CommentID'), request)
+    prefetch_comment_threads(threads)
+    return paginator.get_paginated_response(CommentSerializer(threads, many=True).data)
+
+
 @api_view(['POST'])
 @authentication_classes([WebpageTokenAuth])
 @permission_classes([IsAuthenticated])